@@ -0,0 +1,379 @@
+"""Допуск запусков 1С с учетом памяти, лицензий и числа одновременных процессов.
+
+Конфигуратор на большой конфигурации занимает 2-6 Гб памяти. Если запустить их больше,
+чем помещается в память или чем есть лицензий, платформа падает с невнятными ошибками,
+а общая производительность резко снижается. Контроллер допуска стоит перед запуском 1С
+(RunInfobase.set_admission_params) и пропускает запуск, только если:
+- есть свободное место (slots) и лицензия (licenses);
+- свободной памяти хватает на оценку памяти операции с запасом memory_reserve_bytes.
+
+Оценка памяти ведется по типу операции (load_cfg, update_from_repo, ...) по пиковой памяти
+прошлых запусков: растет сразу до нового пика, снижается плавно (скользящее среднее).
+Только что запущенный процесс еще набирает память, поэтому оценки запусков моложе
+ramp_seconds вычитаются из свободной памяти. Запуски ждут в порядке очереди.
+
+Один контроллер обслуживает все потоки процесса (сервис заданий, исполнитель очереди).
+
+Пример:
+    admission = AdmissionController(slots=4, licenses=3, estimates_file=r'D:\\1c\\memory.json')
+    designer.set_admission_params(admission)
+"""
+
+from collections import deque
+from contextlib import contextmanager
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from cancellation import CancellationToken, OperationCancelled, start_process, watch_process
+from fileops import atomic_write
+from logger_ import logger
+
+__all__ = ['AdmissionController', 'AdmissionTimeout', 'free_memory', 'run_process']
+
+GB = 1024 ** 3
+DEFAULT_ESTIMATE_BYTES = 2 * GB
+MEMORY_RESERVE_BYTES = 1 * GB
+RAMP_SECONDS = 60
+POLL_SECONDS = 1.0
+SMOOTHING = 0.3
+
+# Операции, не занимающие лицензию
+LICENSE_FREE_OPERATIONS = ('create_base',)
+
+
+class AdmissionTimeout(Exception):
+    """Nсключение 'Запуск не допущен за отведенное время'"""
+
+
+class _Ticket:
+    """Запрос на запуск."""
+
+    def __init__(self, operation: str, estimate: int, uses_license: bool):
+        self.operation = operation
+        self.estimate = estimate
+        self.uses_license = uses_license
+        self.admitted = None
+        self.peak_memory = None
+
+
+class AdmissionController:
+    """Контроллер допуска запусков 1С."""
+
+    def __init__(self, slots: int=None,
+                 licenses: int=None,
+                 memory_reserve_bytes: int=MEMORY_RESERVE_BYTES,
+                 default_estimate_bytes: int=DEFAULT_ESTIMATE_BYTES,
+                 estimates_file: str='',
+                 ramp_seconds: float=RAMP_SECONDS,
+                 poll_seconds: float=POLL_SECONDS,
+                 timeout: float=None,
+                 memory_probe=None):
+        """
+        Args:
+          slots: int: Максимум одновременных запусков. None - без ограничения (Default value = None)
+          licenses: int: Количество лицензий. None - без ограничения (Default value = None)
+          memory_reserve_bytes: int: Свободная память, которая должна остаться после запуска (Default value = 1 Гб)
+          default_estimate_bytes: int: Оценка памяти операции, по которой еще нет запусков (Default value = 2 Гб)
+          estimates_file: str: Файл JSON, в котором сохраняются оценки памяти. '' - не сохраняются (Default value = '')
+          ramp_seconds: float: Сколько секунд после запуска процесс считается набирающим память (Default value = 60)
+          poll_seconds: float: Период проверки свободной памяти при ожидании (Default value = 1)
+          timeout: float: Максимальное ожидание допуска, сек. None - без ограничения (Default value = None)
+          memory_probe: Функция без параметров -> свободная память в байтах или None.
+                        None - free_memory (Default value = None)
+        """
+
+        self._slots = slots
+        self._licenses = licenses
+        self._memory_reserve_bytes = memory_reserve_bytes
+        self._default_estimate_bytes = default_estimate_bytes
+        self._estimates_file = estimates_file
+        self._ramp_seconds = ramp_seconds
+        self._poll_seconds = poll_seconds
+        self._timeout = timeout
+        self._memory_probe = memory_probe or free_memory
+        self._estimates = self._load_estimates()
+        self._running = []
+        self._waiting = deque()
+        self._changed = threading.Condition()
+        self.metrics = {'admitted': 0, 'delayed': 0, 'timeouts': 0, 'wait_seconds': 0.0}
+
+    @contextmanager
+    def admit(self, operation: str='', token: CancellationToken=None):
+        """Допуск запуска на время блока with. Ждет, пока запуск станет возможен.
+        В блоке можно задать пиковую память процесса (ticket.peak_memory) для уточнения оценки.
+
+        Args:
+          operation: str: Тип операции, например load_cfg (Default value = '')
+          token: CancellationToken: Токен отмены, прерывает ожидание (Default value = None)
+
+        Yields:
+          Запрос на запуск с атрибутом peak_memory
+
+        Raises:
+          AdmissionTimeout: Запуск не допущен за timeout секунд
+          OperationCancelled: Ожидание отменено
+        """
+
+        ticket = _Ticket(operation, self.estimate(operation), operation not in LICENSE_FREE_OPERATIONS)
+        self._acquire(ticket, token)
+
+        try:
+            yield ticket
+        finally:
+            self._release(ticket)
+
+    def estimate(self, operation: str) -> int:
+        """Оценка пиковой памяти операции, байт."""
+
+        with self._changed:
+            return int(self._estimates.get(operation, self._default_estimate_bytes))
+
+    def estimates(self) -> dict:
+        """Оценки памяти по операциям, байт."""
+
+        with self._changed:
+            return self._estimates_snapshot()
+
+    def state(self) -> dict:
+        """Текущее состояние: running, waiting, reserved_bytes (сумма оценок выполняющихся запусков)."""
+
+        with self._changed:
+            return {'running': len(self._running),
+                    'waiting': len(self._waiting),
+                    'reserved_bytes': sum(ticket.estimate for ticket in self._running)}
+
+    def _acquire(self, ticket: _Ticket, token: CancellationToken=None):
+        """Ожидание допуска в порядке очереди. Отмена токена проверяется каждые poll_seconds."""
+
+        start_time = time.monotonic()
+        deadline = None if self._timeout is None else start_time + self._timeout
+        delayed = False
+
+        with self._changed:
+            self._waiting.append(ticket)
+
+            try:
+                while True:
+                    reason = self._refusal(ticket) if self._waiting[0] is ticket else 'очередь'
+
+                    if reason is None:
+                        break
+
+                    if not delayed:
+                        delayed = True
+                        self.metrics['delayed'] += 1
+                        logger().info(f'Запуск {ticket.operation or "1С"} ожидает допуска: '
+                                      f'{reason}')
+
+                    if token is not None and token.cancelled:
+                        raise OperationCancelled(token.reason)
+
+                    remaining = None if deadline is None else deadline - time.monotonic()
+
+                    if remaining is not None and remaining <= 0:
+                        self.metrics['timeouts'] += 1
+                        raise AdmissionTimeout(f'Запуск {ticket.operation or "1С"} не допущен '
+                                               f'за {self._timeout} сек: {reason}')
+
+                    self._changed.wait(self._poll_seconds if remaining is None
+                                       else min(self._poll_seconds, remaining))
+            finally:
+                self._waiting.remove(ticket)
+                self._changed.notify_all()
+
+            ticket.admitted = time.monotonic()
+            self._running.append(ticket)
+            self.metrics['admitted'] += 1
+            self.metrics['wait_seconds'] += ticket.admitted - start_time
+
+    def _refusal(self, ticket: _Ticket) -> str:
+        """Причина, по которой запуск сейчас невозможен. None - запуск возможен.
+        Вызывается под блокировкой."""
+
+        if self._slots is not None and len(self._running) >= self._slots:
+            return f'заняты все места ({self._slots})'
+
+        if (ticket.uses_license and self._licenses is not None
+                and sum(running.uses_license for running in self._running) >= self._licenses):
+            return f'заняты все лицензии ({self._licenses})'
+
+        if not self._running:
+            return None # единственный запуск допускается всегда, иначе он не выполнится никогда
+
+        free = self._memory_probe()
+
+        if free is None:
+            return None
+
+        now = time.monotonic()
+        ramping = sum(running.estimate for running in self._running
+                      if now - running.admitted < self._ramp_seconds)
+        available = free - ramping
+
+        if available - ticket.estimate < self._memory_reserve_bytes:
+            return (f'не хватает памяти: доступно {available // 1024 ** 2} Мб, '
+                    f'нужно {(ticket.estimate + self._memory_reserve_bytes) // 1024 ** 2} Мб')
+
+        return None
+
+    def _release(self, ticket: _Ticket):
+        """Завершение запуска и уточнение оценки памяти."""
+
+        with self._changed:
+            if ticket in self._running:
+                self._running.remove(ticket)
+
+            if ticket.peak_memory and ticket.operation:
+                previous = self._estimates.get(ticket.operation)
+
+                if previous is None or ticket.peak_memory > previous:
+                    self._estimates[ticket.operation] = ticket.peak_memory
+                else:
+                    self._estimates[ticket.operation] = (previous * (1 - SMOOTHING)
+                                                         + ticket.peak_memory * SMOOTHING)
+
+                self._save_estimates()
+
+            self._changed.notify_all()
+
+    def _load_estimates(self) -> dict:
+        if not self._estimates_file:
+            return {}
+
+        try:
+            with open(self._estimates_file, encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger().warning(f'Файл оценок памяти {self._estimates_file} поврежден и не используется')
+            return {}
+
+    def _save_estimates(self):
+        """Запись оценок в файл. Вызывается под блокировкой."""
+
+        if self._estimates_file:
+            atomic_write(self._estimates_file, json.dumps(self._estimates_snapshot()), encoding='utf-8')
+
+    def _estimates_snapshot(self) -> dict:
+        return {operation: int(value) for operation, value in self._estimates.items()}
+
+
+def free_memory() -> int:
+    """Доступная память ОС, байт. None - определить не удалось."""
+
+    if sys.platform == 'win32':
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [('dwLength', ctypes.c_ulong),
+                        ('dwMemoryLoad', ctypes.c_ulong),
+                        ('ullTotalPhys', ctypes.c_ulonglong),
+                        ('ullAvailPhys', ctypes.c_ulonglong),
+                        ('ullTotalPageFile', ctypes.c_ulonglong),
+                        ('ullAvailPageFile', ctypes.c_ulonglong),
+                        ('ullTotalVirtual', ctypes.c_ulonglong),
+                        ('ullAvailVirtual', ctypes.c_ulonglong),
+                        ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+
+        if not ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return None
+
+        return status.ullAvailPhys
+
+    try:
+        with open('/proc/meminfo', encoding='ascii') as file:
+            for line in file:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    return None
+
+def run_process(params: list, token: CancellationToken=None) -> tuple:
+    """Запуск процесса с замером его пиковой памяти.
+
+    Args:
+      params: list: Параметры запуска согласно требования функции subprocess.run
+      token: CancellationToken: Токен отмены, при отмене дерево процесса завершается.
+                                None - без отмены (Default value = None)
+
+    Returns:
+      tuple: (код возврата, пиковая память процесса в байтах или None)
+
+    Raises:
+      OperationCancelled: Токен отменен
+    """
+
+    if token is None:
+        process = subprocess.Popen(params)
+    else:
+        token.raise_if_cancelled()
+        process = start_process(params)
+
+    with watch_process(process, token):
+        return_code, peak_memory = _wait_process(process)
+
+    return return_code, peak_memory
+
+def _wait_process(process: subprocess.Popen) -> tuple:
+    """Ожидание процесса и его пиковая память."""
+
+    if sys.platform == 'win32':
+        return_code = process.wait()
+        return return_code, _windows_peak_memory(process)
+
+    if not hasattr(os, 'wait4'):
+        return process.wait(), None
+
+    while True:
+        try:
+            _, status, rusage = os.wait4(process.pid, 0)
+            break
+        except InterruptedError:
+            continue
+        except ChildProcessError:
+            # процесс дождался поток отмены (terminate_process_tree)
+            return process.wait(), None
+
+    # процесс уже завершен, код возврата сохраняется в объекте, чтобы Popen не ждал его повторно
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    # ru_maxrss: на Linux в Кб, на macOS в байтах
+    peak_memory = rusage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+    return process.returncode, peak_memory
+
+def _windows_peak_memory(process: subprocess.Popen) -> int:
+    """Пиковый рабочий набор завершенного процесса Windows, байт."""
+
+    import ctypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [('cb', ctypes.c_ulong),
+                    ('PageFaultCount', ctypes.c_ulong),
+                    ('PeakWorkingSetSize', ctypes.c_size_t),
+                    ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t),
+                    ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(ProcessMemoryCounters)
+
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(int(process._handle), ctypes.byref(counters),
+                                                    counters.cb):
+        return None
+
+    return counters.PeakWorkingSetSize
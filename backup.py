@@ -0,0 +1,264 @@
+"""Резервное копирование информационных баз: выгрузка .dt со сжатием и контрольной суммой.
+
+Выгрузка (/DumpIB) сразу после записи сжимается параллельно блоками: каждый блок
+сжимается отдельным потоком в самостоятельный член gzip, члены пишутся по порядку,
+поэтому результат - обычный .gz, который распаковывается любым gunzip.
+Одновременно считается SHA-256 несжатых данных, она записывается рядом в файл .sha256
+до появления архива и проверяется при распаковке. При загрузке (/RestoreIB) архив распаковывается потоком
+во временный файл.
+
+Пример:
+    designer = Designer(server='server1', infobase='base1')
+    designer.set_platform_params(exename)
+    stats = backup_ib(designer, r'D:\\backup\\base1.dt.gz')
+    restore_ib(designer, r'D:\\backup\\base1.dt.gz')
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import hashlib
+import os
+import tempfile
+import time
+
+from fileops import atomic_write
+from logger_ import logger
+from ones import Designer
+
+__all__ = ['BackupError', 'backup_ib', 'restore_ib', 'compress_file', 'decompress_file']
+
+BLOCK_SIZE = 4 * 1024 * 1024
+COMPRESS_LEVEL = 6
+CHECKSUM_SUFFIX = '.sha256'
+
+
+class BackupError(Exception):
+    """Nсключение 'Ошибка резервного копирования'"""
+
+
+def backup_ib(designer: Designer,
+              file_name_gz: str,
+              workers: int=None,
+              keep_dt: bool=False) -> dict:
+    """Выгрузка базы в сжатый файл .dt.gz.
+
+    Args:
+      designer: Designer: Настроенный объект конфигуратора
+      file_name_gz: str: Полное имя сжатого файла
+      workers: int: Количество потоков сжатия. None - по числу процессоров (Default value = None)
+      keep_dt: bool: Оставить несжатый файл .dt рядом со сжатым. Nначе выгрузка идет
+                     во временный файл, а существующий .dt с тем же именем не затрагивается (Default value = False)
+
+    Returns:
+      dict: Статистика сжатия (см. compress_file) или None, если выгрузка неуспешна
+    """
+
+    file_name_dt = _dt_file_name(file_name_gz)
+
+    if keep_dt:
+        # удаляется только файл, созданный этой выгрузкой
+        created = not os.path.exists(file_name_dt)
+    else:
+        fd, file_name_dt = tempfile.mkstemp(prefix=os.path.basename(file_name_dt) + '.', suffix='.dt',
+                                            dir=os.path.dirname(os.path.abspath(file_name_gz)))
+        os.close(fd)
+        created = True
+
+    try:
+        if not designer.dump_ib(file_name_dt):
+            if created:
+                _remove(file_name_dt)
+            return None
+
+        stats = compress_file(file_name_dt, file_name_gz, workers)
+
+    finally:
+        if not keep_dt:
+            _remove(file_name_dt)
+
+    return stats
+
+def restore_ib(designer: Designer, file_name_gz: str, temp_dir: str='') -> bool:
+    """Загрузка базы из сжатого файла .dt.gz.
+    Архив распаковывается во временный файл с проверкой контрольной суммы.
+
+    Args:
+      designer: Designer: Настроенный объект конфигуратора
+      file_name_gz: str: Полное имя сжатого файла
+      temp_dir: str: Каталог временного файла. '' - каталог архива (Default value = '')
+
+    Returns:
+      bool: Успешно/неуспешно
+
+    Raises:
+      BackupError: Контрольная сумма не совпала
+    """
+
+    fd, file_name_dt = tempfile.mkstemp(suffix='.dt',
+                                        dir=temp_dir or os.path.dirname(os.path.abspath(file_name_gz)))
+    os.close(fd)
+
+    try:
+        decompress_file(file_name_gz, file_name_dt)
+        result = designer.restore_ib(file_name_dt)
+    finally:
+        _remove(file_name_dt)
+
+    return result
+
+def compress_file(source_file_name: str,
+                  target_file_name: str,
+                  workers: int=None,
+                  block_size: int=BLOCK_SIZE,
+                  level: int=COMPRESS_LEVEL) -> dict:
+    """Параллельное сжатие файла в gzip с подсчетом SHA-256 исходных данных.
+    Контрольная сумма атомарно записывается в файл target_file_name + '.sha256'
+    до замены сжатого файла, поэтому архив не появляется без своей контрольной суммы.
+
+    Args:
+      source_file_name: str: Полное имя исходного файла
+      target_file_name: str: Полное имя сжатого файла
+      workers: int: Количество потоков сжатия. None - по числу процессоров (Default value = None)
+      block_size: int: Размер блока, сжимаемого одним потоком (Default value = 4 Мб)
+      level: int: Уровень сжатия от 1 до 9 (Default value = 6)
+
+    Returns:
+      dict: source_bytes, target_bytes, ratio, seconds, throughput (байт/сек исходных данных), sha256
+    """
+
+    workers = workers or os.cpu_count() or 1
+    sha256 = hashlib.sha256()
+    source_bytes = target_bytes = 0
+    start_time = time.monotonic()
+    temp_file_name = target_file_name + '.tmp'
+    pending = deque()
+
+    try:
+        with open(source_file_name, 'rb') as source, \
+             open(temp_file_name, 'wb') as target, \
+             ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gzip') as executor:
+
+            while True:
+                block = source.read(block_size)
+
+                if block:
+                    sha256.update(block)
+                    source_bytes += len(block)
+                    pending.append(executor.submit(gzip.compress, block, level, mtime=0))
+
+                # в памяти не больше двух блоков на поток
+                while pending and (not block or len(pending) >= workers * 2):
+                    data = pending.popleft().result()
+                    target.write(data)
+                    target_bytes += len(data)
+
+                if not block:
+                    break
+
+            target.flush()
+            os.fsync(target.fileno())
+
+        checksum = sha256.hexdigest()
+        atomic_write(target_file_name + CHECKSUM_SUFFIX,
+                     f'{checksum} *{_data_file_name(source_file_name, target_file_name)}\n',
+                     encoding='utf-8')
+        os.replace(temp_file_name, target_file_name)
+
+    except BaseException:
+        _remove(temp_file_name)
+        raise
+
+    stats = _stats(source_bytes, target_bytes, time.monotonic() - start_time, checksum)
+
+    logger().info(f'Сжатие {source_file_name}. Размер: {source_bytes} -> {target_bytes} байт, '
+                  f'коэффициент: {stats["ratio"]:.2f}, '
+                  f'скорость: {stats["throughput"] / 1024 ** 2:.1f} Мб/сек')
+
+    return stats
+
+def decompress_file(source_file_name: str, target_file_name: str, verify: bool=True) -> dict:
+    """Потоковая распаковка gzip с проверкой SHA-256 по файлу .sha256, если он есть.
+
+    Args:
+      source_file_name: str: Полное имя сжатого файла
+      target_file_name: str: Полное имя распакованного файла
+      verify: bool: Проверять контрольную сумму (Default value = True)
+
+    Returns:
+      dict: Статистика, как у compress_file. source_bytes - размер распакованных данных
+
+    Raises:
+      BackupError: Контрольная сумма не совпала
+    """
+
+    sha256 = hashlib.sha256()
+    source_bytes = 0
+    start_time = time.monotonic()
+
+    with gzip.open(source_file_name, 'rb') as source, open(target_file_name, 'wb') as target:
+        while True:
+            block = source.read(BLOCK_SIZE)
+
+            if not block:
+                break
+
+            sha256.update(block)
+            source_bytes += len(block)
+            target.write(block)
+
+    checksum = sha256.hexdigest()
+    expected_checksum = _read_checksum(source_file_name) if verify else ''
+
+    if expected_checksum and expected_checksum != checksum:
+        _remove(target_file_name)
+        raise BackupError(f'Контрольная сумма {source_file_name} не совпадает: '
+                          f'ожидалась {expected_checksum}, получена {checksum}')
+
+    stats = _stats(source_bytes, os.path.getsize(source_file_name),
+                   time.monotonic() - start_time, checksum)
+
+    logger().info(f'Распаковка {source_file_name}. Размер: {source_bytes} байт, '
+                  f'скорость: {stats["throughput"] / 1024 ** 2:.1f} Мб/сек')
+
+    return stats
+
+
+def _stats(source_bytes: int, target_bytes: int, seconds: float, checksum: str) -> dict:
+    return {'source_bytes': source_bytes,
+            'target_bytes': target_bytes,
+            'ratio': source_bytes / target_bytes if target_bytes else 0,
+            'seconds': seconds,
+            'throughput': source_bytes / seconds if seconds else 0,
+            'sha256': checksum}
+
+def _read_checksum(file_name: str) -> str:
+    """Контрольная сумма из файла .sha256, '' - файла нет."""
+
+    try:
+        with open(file_name + CHECKSUM_SUFFIX, encoding='utf-8') as file:
+            return file.read().split()[0].lower()
+    except (FileNotFoundError, IndexError):
+        return ''
+
+def _data_file_name(source_file_name: str, target_file_name: str) -> str:
+    """Nмя несжатых данных для файла .sha256: как после распаковки архива gunzip."""
+
+    if target_file_name.lower().endswith('.gz'):
+        return os.path.basename(target_file_name[:-3])
+
+    return os.path.basename(source_file_name)
+
+def _dt_file_name(file_name_gz: str) -> str:
+    """Nмя несжатого файла выгрузки для архива."""
+
+    if file_name_gz.lower().endswith('.gz'):
+        return file_name_gz[:-3]
+
+    return file_name_gz + '.dt'
+
+def _remove(file_name: str):
+    try:
+        os.remove(file_name)
+    except FileNotFoundError:
+        pass
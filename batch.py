@@ -0,0 +1,221 @@
+"""Параллельное выполнение пакета операций, в том числе внешней обработки на многих базах.
+
+Пример:
+    enterprises = []
+
+    for infobase in ('base1', 'base2', 'base3'):
+        enterprise = Enterprise(server='server1', infobase=infobase)
+        enterprise.set_platform_params(exename)
+        enterprises.append(enterprise)
+
+    results = run_processor(enterprises, r'D:\\maintenance.epf',
+                            launch_param='Режим=Проверка;Результат={result_file}',
+                            result_dir=r'D:\\results', max_workers=4)
+    summary = summarize_batch(results)
+
+Обработка получает имя файла результата через /C (подстановка {result_file})
+и записывает в него результат, который попадает в TaskResult.output. Каждый запуск
+run_processor пишет результаты в свой подкаталог result_dir, поэтому одновременные
+запуски с общим каталогом не затирают результаты друг друга.
+
+Задачи называются ключом базы (без имени пользователя и пароля): имена попадают в лог и сводку.
+
+При отмене токена (см. модуль cancellation) выполняющиеся задачи завершают процессы 1С,
+а еще не начавшиеся не запускаются; такие задачи считаются неуспешными.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import os
+import tempfile
+import time
+import traceback
+
+from cancellation import CancellationToken, OperationCancelled, cancel_scope, current_token
+from logger_ import logger
+from metrics import summarize
+from ones import GenInfobaseLogFileName
+
+__all__ = ['TaskResult', 'run_batch', 'run_processor', 'summarize_batch']
+
+RESULT_FILE_PLACEHOLDER = '{result_file}'
+RESULT_FILE_ENCODING = 'utf_8_sig'
+
+
+class TaskResult:
+    """Результат задачи пакета."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.value = None
+        self.error = ''
+        self.output = None
+        self.duration = None
+
+    @property
+    def succeeded(self) -> bool:
+        """Задача выполнена без исключения и не вернула False."""
+
+        return not self.error and self.value is not False
+
+    def as_dict(self) -> dict:
+        return {'name': self.name,
+                'succeeded': self.succeeded,
+                'value': self.value if isinstance(self.value, (bool, int, float, str)) else None,
+                'error': self.error,
+                'output': self.output,
+                'duration': self.duration}
+
+
+def run_batch(tasks: list, max_workers: int=4, token: CancellationToken=None) -> list:
+    """Параллельное выполнение задач.
+    Nсключение задачи не прерывает пакет, а записывается в результат задачи.
+
+    Args:
+      tasks: list: Задачи: кортежи (имя, функция без параметров)
+      max_workers: int: Количество одновременно выполняемых задач (Default value = 4)
+      token: CancellationToken: Токен отмены пакета, задачи выполняются в его контексте.
+                                None - токен контекста cancel_scope (Default value = None)
+
+    Returns:
+      list: TaskResult в порядке задач
+    """
+
+    token = token if token is not None else current_token()
+    results = [TaskResult(name) for name, _ in tasks]
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch') as executor:
+        for result, (_, func) in zip(results, tasks):
+            executor.submit(_run_task, result, func, token)
+
+    return results
+
+def run_processor(enterprises: list,
+                  processor_file_name: str,
+                  launch_param: str='',
+                  result_dir: str='',
+                  max_workers: int=4,
+                  log_file_prefix: str='',
+                  token: CancellationToken=None) -> list:
+    """Выполнение внешней обработки (/Execute) на списке баз.
+
+    Args:
+      enterprises: list: Настроенные объекты Enterprise, по одному на базу
+      processor_file_name: str: Полное имя внешней обработки (.epf)
+      launch_param: str: Параметр /C. {result_file} заменяется на имя файла результата базы (Default value = '')
+      result_dir: str: Каталог файлов результата, в нем для запуска создается свой подкаталог.
+                       '' - результаты не собираются (Default value = '')
+      max_workers: int: Количество баз, обрабатываемых одновременно (Default value = 4)
+      log_file_prefix: str: Префикс файлов /Out, у каждой базы свой файл.
+                            '' - как задано в объектах Enterprise (Default value = '')
+      token: CancellationToken: Токен отмены пакета (Default value = None)
+
+    Returns:
+      list: TaskResult в порядке баз, в output - содержимое файла результата или None
+    """
+
+    log_names = GenInfobaseLogFileName(log_file_prefix, reserve=True) if log_file_prefix else None
+    run_dir = _make_run_dir(result_dir) if result_dir else ''
+    tasks = []
+    result_file_names = []
+
+    for number, enterprise in enumerate(enterprises, 1):
+        result_file_name = os.path.join(run_dir, f'{number}.result') if run_dir else ''
+
+        client = copy.copy(enterprise)
+        client.set_other_params(access_code=enterprise._access_code,
+                                locale=enterprise._locale,
+                                other_params=enterprise._other_params,
+                                launch_param=launch_param.replace(RESULT_FILE_PLACEHOLDER,
+                                                                  result_file_name),
+                                execute=processor_file_name)
+
+        if log_names:
+            client._ib_log_file_name = log_names.another_file_name()
+
+        tasks.append((enterprise._infobase_key(), client.run))
+        result_file_names.append(result_file_name)
+
+    logger().info(f'Внешняя обработка {processor_file_name}. Баз: {len(tasks)}, '
+                  f'одновременно: {max_workers}')
+
+    results = run_batch(tasks, max_workers, token)
+
+    for result, result_file_name in zip(results, result_file_names):
+        result.output = _read_result_file(result_file_name)
+
+        if result_file_name and result.succeeded and result.output is None:
+            result.error = 'Обработка не записала файл результата'
+
+    summary = summarize_batch(results)
+
+    logger().info(f'Внешняя обработка {processor_file_name}. Успешно: {summary["succeeded"]}, '
+                  f'неуспешно: {summary["failed"]}, '
+                  f'длительность p50: {_format_seconds(summary["duration"]["p50"])}, '
+                  f'максимум: {_format_seconds(summary["duration"]["max"])}')
+
+    for result in results:
+        if not result.succeeded:
+            logger().error(f'Внешняя обработка {processor_file_name}. Неуспешно: {result.name}. '
+                           f'{result.error}')
+
+    return results
+
+def summarize_batch(results: list) -> dict:
+    """Сводка по результатам пакета.
+
+    Args:
+      results: list: TaskResult
+
+    Returns:
+      dict: Количество успешных и неуспешных задач, имена неуспешных, сводка по длительности
+    """
+
+    failures = [result.name for result in results if not result.succeeded]
+
+    return {'total': len(results),
+            'succeeded': len(results) - len(failures),
+            'failed': len(failures),
+            'failures': failures,
+            'duration': summarize([result.duration for result in results])}
+
+
+def _run_task(result: TaskResult, func, token: CancellationToken=None):
+    """Выполнение задачи с замером длительности и перехватом исключений."""
+
+    start_time = time.monotonic()
+
+    try:
+        with cancel_scope(token):
+            if token is not None:
+                token.raise_if_cancelled()
+
+            result.value = func()
+    except OperationCancelled as ex:
+        result.error = f'Отменено: {ex}'
+    except Exception:
+        result.error = traceback.format_exc()
+
+    result.duration = time.monotonic() - start_time
+
+def _make_run_dir(result_dir: str) -> str:
+    """Создание уникального подкаталога запуска в каталоге результатов."""
+
+    os.makedirs(result_dir, exist_ok=True)
+
+    return tempfile.mkdtemp(prefix=time.strftime('%Y%m%d_%H%M%S_'), dir=result_dir)
+
+def _read_result_file(file_name: str) -> str:
+    """Содержимое файла результата или None, если файла нет."""
+
+    if not file_name:
+        return None
+
+    try:
+        with open(file_name, encoding=RESULT_FILE_ENCODING) as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+def _format_seconds(value: float) -> str:
+    return '-' if value is None else f'{value:.0f} сек'
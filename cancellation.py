@@ -0,0 +1,344 @@
+"""Кооперативная отмена операций с базами и пакетов.
+
+Если конвейер CI прерван, скрипт Python завершается, а запущенные им процессы 1cv8
+продолжают работать десятки минут, занимая базы и лицензии. Токен отмены передается
+операциям и пакетам; при отмене:
+- процесс 1С и все его дочерние процессы получают сигнал завершения (Windows: taskkill /T),
+  а через grace_seconds завершаются принудительно;
+- ожидание повтора и ожидание допуска запуска прерываются;
+- операция завершается исключением OperationCancelled, блоки finally удаляют временные
+  файлы и базы, дополнительные действия регистрируются через CancellationToken.register.
+
+Токен операции задается явно (RunInfobase.set_cancellation_params) или берется
+из контекста cancel_scope. Обработчики SIGINT/SIGTERM (handle_signals) отменяют токен,
+а с ним все дочерние токены выполняющихся заданий. Дочерний токен закрывается (close
+или блок with), когда задание завершено, чтобы родитель не хранил его обработчик.
+
+Пример:
+    token = CancellationToken()
+
+    with handle_signals(token), cancel_scope(token):
+        designer.load_cfg(r'D:\\build\\1.cf')
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+
+from logger_ import logger
+
+__all__ = ['CancellationToken', 'OperationCancelled', 'cancel_scope', 'current_token',
+           'handle_signals', 'start_process', 'watch_process', 'terminate_process_tree',
+           'run_process']
+
+GRACE_SECONDS = 10
+POLL_SECONDS = 0.5
+
+
+class OperationCancelled(Exception):
+    """Nсключение 'Операция отменена'"""
+
+
+class CancellationToken:
+    """Токен отмены. Отмена распространяется на дочерние токены."""
+
+    def __init__(self, parent: 'CancellationToken'=None):
+        """
+        Args:
+          parent: CancellationToken: Родительский токен, его отмена отменяет и этот (Default value = None)
+        """
+
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = {}
+        self._next_handle = 0
+        self._parent = parent
+        self._parent_handle = 0
+        self.reason = ''
+
+        if parent is not None:
+            self._parent_handle = parent.register(lambda: self.cancel(parent.reason))
+
+    def __enter__(self) -> 'CancellationToken':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str='Отменено'):
+        """Отмена. Повторная отмена ничего не делает.
+        Обработчики вызываются в потоке отмены и должны выполняться быстро.
+
+        Args:
+          reason: str: Причина отмены (Default value = 'Отменено')
+        """
+
+        with self._lock:
+            if self._event.is_set():
+                return
+
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks.values())
+            self._callbacks = {}
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as ex:
+                logger().error(f'Ошибка обработчика отмены: {ex}')
+
+    def register(self, callback) -> int:
+        """Регистрация обработчика отмены. Если токен уже отменен, обработчик вызывается сразу.
+
+        Args:
+          callback: Функция без параметров
+
+        Returns:
+          int: Nдентификатор для unregister
+        """
+
+        with self._lock:
+            if not self._event.is_set():
+                self._next_handle += 1
+                self._callbacks[self._next_handle] = callback
+                return self._next_handle
+
+        callback()
+
+        return 0
+
+    def unregister(self, handle: int):
+        """Удаление обработчика, зарегистрированного register."""
+
+        with self._lock:
+            self._callbacks.pop(handle, None)
+
+    def child(self) -> 'CancellationToken':
+        """Дочерний токен: отменяется вместе с этим, но может быть отменен отдельно.
+        Когда дочерний токен не нужен, он закрывается (close или блок with)."""
+
+        return CancellationToken(self)
+
+    def close(self):
+        """Отключение от родительского токена: его отмена больше не отменяет этот токен.
+        Повторный вызов ничего не делает."""
+
+        parent, self._parent = self._parent, None
+
+        if parent is not None:
+            parent.unregister(self._parent_handle)
+
+    def raise_if_cancelled(self):
+        """Raises:
+          OperationCancelled: Токен отменен
+        """
+
+        if self.cancelled:
+            raise OperationCancelled(self.reason)
+
+    def wait(self, timeout: float=None) -> bool:
+        """Прерываемое ожидание.
+
+        Returns:
+          bool: Токен отменен
+        """
+
+        return self._event.wait(timeout)
+
+
+@contextmanager
+def cancel_scope(token: CancellationToken):
+    """Токен отмены операций, выполняемых в текущем контексте.
+
+    Args:
+      token: CancellationToken: Токен. None - операции не отменяются
+    """
+
+    context_token = _token.set(token)
+
+    try:
+        yield token
+    finally:
+        _token.reset(context_token)
+
+def current_token() -> CancellationToken:
+    """Токен отмены текущего контекста, None - нет."""
+
+    return _token.get()
+
+@contextmanager
+def handle_signals(token: CancellationToken, signals: tuple=None):
+    """Отмена токена по сигналам завершения на время блока with.
+    Повторный сигнал прерывает процесс исключением KeyboardInterrupt.
+    Вызывается только из основного потока.
+
+    Токен отменяется в отдельном потоке, который получает номер сигнала через signal.set_wakeup_fd:
+    сигнал может прервать основной поток, пока тот держит блокировку токена или логгера,
+    поэтому обработчик сигнала блокировок не берет.
+
+    Args:
+      token: CancellationToken: Отменяемый токен
+      signals: tuple: Сигналы. None - SIGINT и SIGTERM (Default value = None)
+    """
+
+    if signals is None:
+        signals = (signal.SIGINT, signal.SIGTERM)
+
+    def handler(signum, frame):
+        if token.cancelled:
+            raise KeyboardInterrupt
+
+    def watch():
+        while True:
+            try:
+                data = reader.recv(1)
+            except OSError:
+                return
+
+            if not data:
+                return
+
+            if data[0] in signals and not token.cancelled:
+                name = signal.Signals(data[0]).name
+                logger().warning(f'Получен сигнал {name}, операции отменяются')
+                token.cancel(f'Сигнал {name}')
+
+    reader, writer = socket.socketpair()
+    writer.setblocking(False)
+    previous = {signum: signal.signal(signum, handler) for signum in signals}
+    previous_wakeup_fd = signal.set_wakeup_fd(writer.fileno())
+    watcher = threading.Thread(target=watch, name='cancel-signals', daemon=True)
+    watcher.start()
+
+    try:
+        yield token
+    finally:
+        signal.set_wakeup_fd(previous_wakeup_fd)
+
+        for signum, previous_handler in previous.items():
+            signal.signal(signum, previous_handler)
+
+        writer.close()
+        watcher.join()
+        reader.close()
+
+def start_process(params: list, **kwargs) -> subprocess.Popen:
+    """Запуск процесса в отдельной группе, чтобы при отмене завершить его вместе с дочерними.
+
+    Args:
+      params: list: Параметры запуска согласно требования функции subprocess.run
+      **kwargs: Прочие параметры subprocess.Popen, например stdout
+    """
+
+    if sys.platform == 'win32':
+        return subprocess.Popen(params, creationflags=subprocess.CREATE_NEW_PROCESS_GROUP, **kwargs)
+
+    return subprocess.Popen(params, start_new_session=True, **kwargs)
+
+@contextmanager
+def watch_process(process: subprocess.Popen, token: CancellationToken,
+                  grace_seconds: float=GRACE_SECONDS):
+    """Завершение дерева процесса при отмене токена на время блока with (ожидания процесса).
+    Если токен отменен, по выходе из блока возбуждается OperationCancelled.
+
+    Args:
+      process: subprocess.Popen: Процесс, запущенный start_process
+      token: CancellationToken: Токен отмены. None - процесс не завершается
+      grace_seconds: float: Время на штатное завершение до принудительного (Default value = 10)
+    """
+
+    if token is None:
+        yield process
+        return
+
+    def on_cancel():
+        # обработчик может вызываться из обработчика сигнала: ожидание завершения в отдельном потоке
+        threading.Thread(target=terminate_process_tree, args=(process, grace_seconds),
+                         name='cancel-process', daemon=True).start()
+
+    handle = token.register(on_cancel)
+
+    try:
+        yield process
+    finally:
+        token.unregister(handle)
+
+    token.raise_if_cancelled()
+
+def terminate_process_tree(process: subprocess.Popen, grace_seconds: float=GRACE_SECONDS):
+    """Завершение процесса и его дочерних процессов: штатное, затем принудительное.
+
+    Args:
+      process: subprocess.Popen: Процесс, запущенный start_process
+      grace_seconds: float: Время на штатное завершение (Default value = 10)
+    """
+
+    if process.poll() is not None:
+        return
+
+    logger().warning(f'Завершение процесса {process.pid} и его дочерних процессов')
+
+    _signal_tree(process, force=False)
+
+    try:
+        process.wait(grace_seconds)
+        return
+    except subprocess.TimeoutExpired:
+        pass
+    except ChildProcessError:
+        return # процесс уже дождался другой поток (os.wait4)
+
+    logger().warning(f'Процесс {process.pid} не завершился за {grace_seconds} сек, '
+                     f'принудительное завершение')
+
+    _signal_tree(process, force=True)
+
+def run_process(params: list, token: CancellationToken, grace_seconds: float=GRACE_SECONDS) -> int:
+    """Запуск процесса с завершением его дерева при отмене.
+
+    Args:
+      params: list: Параметры запуска согласно требования функции subprocess.run
+      token: CancellationToken: Токен отмены
+      grace_seconds: float: Время на штатное завершение (Default value = 10)
+
+    Returns:
+      int: Код возврата
+
+    Raises:
+      OperationCancelled: Токен отменен
+    """
+
+    token.raise_if_cancelled()
+    process = start_process(params)
+
+    with watch_process(process, token, grace_seconds):
+        return_code = process.wait()
+
+    return return_code
+
+def _signal_tree(process: subprocess.Popen, force: bool):
+    """Сигнал завершения группе процесса."""
+
+    try:
+        if sys.platform == 'win32':
+            subprocess.run(['taskkill', '/T'] + (['/F'] if force else []) + ['/PID', str(process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(process.pid, signal.SIGKILL if force else signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+    except OSError as ex:
+        logger().error(f'Процесс {process.pid} не завершен: {ex}')
+
+
+_token = ContextVar('cancellation_token', default=None)
@@ -0,0 +1,360 @@
+"""Архив с дедупликацией: файлы .dt/.cf хранятся уникальными фрагментами.
+
+Файл делится на фрагменты по содержимому (content-defined chunking): граница ставится там,
+где несколько последних байт дают заданный шаблон. Каждому байту сопоставлен 4-битный
+символ по постоянной таблице, и шаблон ищется в строке символов поиском подстроки,
+поэтому разбиение выполняется на скорости bytes.translate/bytes.find, без цикла по байтам.
+Вставка или удаление данных сдвигает только соседние границы, остальные фрагменты
+совпадают с прошлыми версиями и не записываются повторно.
+
+Фрагменты хранятся по SHA-256 в каталоге chunks, для каждого файла архива пишется
+манифест со списком фрагментов. Сборка файла идет потоком по фрагментам.
+
+Пример:
+    store = ChunkStore(r'D:\\archive')
+    store.put('base1/2024-01-01.dt', r'D:\\backup\\base1.dt')
+
+    with store.materialize('base1/2024-01-01.dt') as file_name_dt:
+        designer.restore_ib(file_name_dt)
+
+    store.delete('base1/2023-12-01.dt')
+    store.gc()
+"""
+
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+import tempfile
+import time
+import urllib.parse
+
+from fileops import FileLock, atomic_write
+from logger_ import logger
+
+__all__ = ['ChunkStore', 'ChunkStoreError', 'iter_chunks']
+
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+ANCHOR_BITS = 20 # средний размер фрагмента сверх минимального - 2 ** 20 байт
+READ_SIZE = 8 * 1024 * 1024
+
+# Таблица байт -> символ из 16. Не должна меняться: от нее зависят границы сохраненных фрагментов
+_SYMBOLS = b'0123456789abcdef'
+_SYMBOL_BITS = 4
+_SYMBOL_TABLE = bytes(_SYMBOLS[hashlib.sha256(bytes([value])).digest()[0] & 0xF]
+                      for value in range(256))
+# Шаблон границы. Символы в нем разные, поэтому на однородных данных
+# граница ставится по максимальному размеру фрагмента
+_ANCHOR_PATTERN = b'3a9f1c7e5b2d4086'
+
+
+class ChunkStoreError(Exception):
+    """Nсключение 'Ошибка архива'"""
+
+
+def iter_chunks(stream,
+                min_size: int=MIN_CHUNK_SIZE,
+                max_size: int=MAX_CHUNK_SIZE,
+                anchor_bits: int=ANCHOR_BITS):
+    """Деление потока на фрагменты по содержимому.
+
+    Args:
+      stream: Двоичный поток с методом read
+      min_size: int: Минимальный размер фрагмента (Default value = 256 Кб)
+      max_size: int: Максимальный размер фрагмента (Default value = 4 Мб)
+      anchor_bits: int: Средний размер фрагмента сверх минимального - 2 ** anchor_bits, кратно 4
+
+    Yields:
+      bytes: Фрагменты
+    """
+
+    pattern = _ANCHOR_PATTERN[:max(1, anchor_bits // _SYMBOL_BITS)]
+    read_size = max(READ_SIZE, max_size)
+    buffer = symbols = b''
+    offset = 0
+    eof = False
+
+    while not eof:
+        data = stream.read(read_size)
+        eof = not data
+        buffer = buffer[offset:] + data
+        symbols = symbols[offset:] + data.translate(_SYMBOL_TABLE)
+        offset = 0
+
+        while True:
+            cut = _find_cut(symbols, offset, eof, pattern, min_size, max_size)
+
+            if not cut:
+                break
+
+            yield buffer[offset:cut]
+            offset = cut
+
+def _find_cut(symbols: bytes, offset: int, eof: bool, pattern: bytes, min_size: int, max_size: int) -> int:
+    """Граница фрагмента, начинающегося с offset. 0 - нужно больше данных или данные кончились."""
+
+    available = len(symbols) - offset
+
+    if not available or (available < min_size and not eof):
+        return 0
+
+    window = len(pattern)
+    position = symbols.find(pattern, offset + max(0, min_size - window), offset + min(available, max_size))
+
+    if position >= 0:
+        return position + window
+
+    if available >= max_size:
+        return offset + max_size
+
+    return len(symbols) if eof else 0
+
+
+class ChunkStore:
+    """Хранилище файлов с дедупликацией фрагментов.
+
+    Запись в архив берет разделяемую блокировку, сборка мусора - монопольную,
+    поэтому сборка мусора не удалит фрагменты файла, который записывается в этот момент.
+    На Windows блокировка всегда монопольная, и записи выполняются по очереди.
+    """
+
+    def __init__(self, root_dir: str,
+                 min_chunk_size: int=MIN_CHUNK_SIZE,
+                 max_chunk_size: int=MAX_CHUNK_SIZE,
+                 anchor_bits: int=ANCHOR_BITS):
+        """
+        Args:
+          root_dir: str: Каталог архива. Создается при отсутствии
+          min_chunk_size: int: Минимальный размер фрагмента (Default value = 256 Кб)
+          max_chunk_size: int: Максимальный размер фрагмента (Default value = 4 Мб)
+          anchor_bits: int: Средний размер фрагмента сверх минимального - 2 ** anchor_bits (Default value = 20)
+        """
+
+        self._root_dir = root_dir
+        self._chunks_dir = os.path.join(root_dir, 'chunks')
+        self._manifests_dir = os.path.join(root_dir, 'manifests')
+        self._lock_file_name = os.path.join(root_dir, 'store.lock')
+        self._chunking = {'min_size': min_chunk_size, 'max_size': max_chunk_size,
+                          'anchor_bits': anchor_bits}
+
+        os.makedirs(self._chunks_dir, exist_ok=True)
+        os.makedirs(self._manifests_dir, exist_ok=True)
+
+    def put(self, name: str, file_name: str) -> dict:
+        """Помещение файла в архив. Существующий файл с тем же именем заменяется.
+
+        Args:
+          name: str: Nмя файла в архиве, например base1/2024-01-01.dt
+          file_name: str: Полное имя помещаемого файла
+
+        Returns:
+          dict: size, chunks, new_chunks, new_bytes, seconds, throughput (байт/сек)
+        """
+
+        start_time = time.monotonic()
+        sha256 = hashlib.sha256()
+        chunks = []
+        new_chunks = new_bytes = size = 0
+
+        with FileLock(self._lock_file_name, exclusive=False), open(file_name, 'rb') as file:
+            for chunk in iter_chunks(file, **self._chunking):
+                chunk_hash = hashlib.sha256(chunk).hexdigest()
+                sha256.update(chunk)
+                size += len(chunk)
+                chunks.append([chunk_hash, len(chunk)])
+
+                if self._write_chunk(chunk_hash, chunk):
+                    new_chunks += 1
+                    new_bytes += len(chunk)
+
+            manifest = {'name': name,
+                        'size': size,
+                        'sha256': sha256.hexdigest(),
+                        'created': time.time(),
+                        'chunks': chunks}
+
+            atomic_write(self._manifest_file_name(name), json.dumps(manifest), encoding='utf-8')
+
+        seconds = time.monotonic() - start_time
+        stats = {'size': size,
+                 'chunks': len(chunks),
+                 'new_chunks': new_chunks,
+                 'new_bytes': new_bytes,
+                 'seconds': seconds,
+                 'throughput': size / seconds if seconds else 0}
+
+        logger().info(f'Архив. Помещен {name}: {size} байт, фрагментов: {len(chunks)}, '
+                      f'новых: {new_chunks} ({new_bytes} байт), '
+                      f'скорость: {stats["throughput"] / 1024 ** 2:.1f} Мб/сек')
+
+        return stats
+
+    def iter_data(self, name: str):
+        """Содержимое файла архива потоком, по фрагментам.
+        Контрольная сумма файла проверяется после последнего фрагмента.
+
+        Raises:
+          ChunkStoreError: Файла нет в архиве, фрагмент отсутствует или поврежден
+        """
+
+        manifest = self._read_manifest(name)
+        sha256 = hashlib.sha256()
+
+        for chunk_hash, _ in manifest['chunks']:
+            try:
+                with open(self._chunk_file_name(chunk_hash), 'rb') as file:
+                    chunk = file.read()
+            except FileNotFoundError:
+                raise ChunkStoreError(f'Архив. Нет фрагмента {chunk_hash} файла {name}') from None
+
+            sha256.update(chunk)
+            yield chunk
+
+        if sha256.hexdigest() != manifest['sha256']:
+            raise ChunkStoreError(f'Архив. Контрольная сумма файла {name} не совпадает')
+
+    def get(self, name: str, file_name: str):
+        """Сборка файла архива в указанный файл.
+
+        Args:
+          name: str: Nмя файла в архиве
+          file_name: str: Полное имя собираемого файла
+        """
+
+        try:
+            with open(file_name, 'wb') as file:
+                for chunk in self.iter_data(name):
+                    file.write(chunk)
+        except ChunkStoreError:
+            os.remove(file_name)
+            raise
+
+    @contextmanager
+    def materialize(self, name: str, temp_dir: str=''):
+        """Сборка файла архива во временный файл на время блока with, например для load_cfg.
+
+        Args:
+          name: str: Nмя файла в архиве
+          temp_dir: str: Каталог временного файла. '' - системный (Default value = '')
+
+        Yields:
+          str: Полное имя временного файла
+        """
+
+        suffix = os.path.splitext(name)[1]
+        fd, file_name = tempfile.mkstemp(suffix=suffix, dir=temp_dir or None)
+        os.close(fd)
+
+        try:
+            self.get(name, file_name)
+            yield file_name
+        finally:
+            if os.path.exists(file_name):
+                os.remove(file_name)
+
+    def names(self) -> list:
+        """Nмена файлов архива."""
+
+        return sorted(urllib.parse.unquote(file_name[:-len('.json')])
+                      for file_name in os.listdir(self._manifests_dir)
+                      if file_name.endswith('.json'))
+
+    def delete(self, name: str) -> bool:
+        """Удаление файла из архива. Фрагменты удаляются сборкой мусора.
+
+        Returns:
+          bool: Файл был в архиве
+        """
+
+        try:
+            os.remove(self._manifest_file_name(name))
+        except FileNotFoundError:
+            return False
+
+        return True
+
+    def gc(self) -> dict:
+        """Сборка мусора: удаление фрагментов, на которые не ссылается ни один манифест,
+        и временных файлов прерванных записей.
+
+        Returns:
+          dict: removed_chunks, freed_bytes
+        """
+
+        removed_chunks = freed_bytes = 0
+
+        with FileLock(self._lock_file_name, exclusive=True):
+            referenced = set()
+
+            for name in self.names():
+                referenced.update(chunk_hash for chunk_hash, _ in self._read_manifest(name)['chunks'])
+
+            for dir_entry in os.scandir(self._chunks_dir):
+                for entry in os.scandir(dir_entry.path):
+                    if entry.name in referenced:
+                        continue
+
+                    freed_bytes += entry.stat().st_size
+                    os.remove(entry.path)
+                    removed_chunks += 1
+
+        logger().info(f'Архив. Сборка мусора: удалено фрагментов: {removed_chunks}, '
+                      f'освобождено байт: {freed_bytes}')
+
+        return {'removed_chunks': removed_chunks, 'freed_bytes': freed_bytes}
+
+    def stats(self) -> dict:
+        """Статистика архива.
+
+        Returns:
+          dict: artifacts, logical_bytes (сумма размеров файлов), chunks,
+                stored_bytes (размер уникальных фрагментов), dedup_ratio
+        """
+
+        names = self.names()
+        logical_bytes = 0
+        chunk_sizes = {}
+
+        for name in names:
+            manifest = self._read_manifest(name)
+            logical_bytes += manifest['size']
+            chunk_sizes.update(manifest['chunks'])
+
+        stored_bytes = sum(chunk_sizes.values())
+
+        return {'artifacts': len(names),
+                'logical_bytes': logical_bytes,
+                'chunks': len(chunk_sizes),
+                'stored_bytes': stored_bytes,
+                'dedup_ratio': logical_bytes / stored_bytes if stored_bytes else 0}
+
+    def _write_chunk(self, chunk_hash: str, chunk: bytes) -> bool:
+        """Запись фрагмента, если его еще нет.
+
+        Returns:
+          bool: Фрагмент записан впервые
+        """
+
+        chunk_file_name = self._chunk_file_name(chunk_hash)
+
+        if os.path.exists(chunk_file_name):
+            return False
+
+        os.makedirs(os.path.dirname(chunk_file_name), exist_ok=True)
+        atomic_write(chunk_file_name, chunk)
+
+        return True
+
+    def _read_manifest(self, name: str) -> dict:
+        try:
+            with open(self._manifest_file_name(name), encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            raise ChunkStoreError(f'Архив. Нет файла {name}') from None
+
+    def _chunk_file_name(self, chunk_hash: str) -> str:
+        return os.path.join(self._chunks_dir, chunk_hash[:2], chunk_hash)
+
+    def _manifest_file_name(self, name: str) -> str:
+        return os.path.join(self._manifests_dir, urllib.parse.quote(name, safe='') + '.json')
@@ -0,0 +1,200 @@
+"""Командная строка для запуска операций 1С без написания скрипта.
+
+Запуск: python -m ones <команда> [параметры]
+
+Примеры:
+    python -m ones --exename "D:\\1cv8\\bin\\1cv8.exe" --dir D:\\base1 create
+    python -m ones --exename ... --dir D:\\base1 load D:\\1.cf
+    python -m ones --exename ... --server srv1 --infobase base1 run --launch-param W
+
+Модули с тяжелыми зависимостями импортируются только при выполнении команды,
+поэтому вывод справки и разбор параметров укладываются в STARTUP_BUDGET_SECONDS.
+"""
+
+import sys
+
+__all__ = ['main']
+
+# Бюджет времени старта интерпретатора с выводом справки, проверяется в тестах.
+# Измеренное время около 0,08 сек
+STARTUP_BUDGET_SECONDS = 0.3
+
+# Команды: имя -> (класс запуска, метод)
+COMMANDS = {
+    'create': ('CreationInfobase', 'create_base'),
+    'load': ('Designer', 'load_cfg'),
+    'dump': ('Designer', 'dump_config_to_files'),
+    'dump-ib': ('Designer', 'dump_ib'),
+    'restore-ib': ('Designer', 'restore_ib'),
+    'update': ('Designer', 'update_from_repo'),
+    'label': ('Designer', 'set_repo_label'),
+    'run': ('Enterprise', 'run'),
+}
+
+
+def main(argv: list=None, ones_module=None) -> int:
+    """Точка входа командной строки.
+
+    Args:
+      argv: list: Параметры командной строки без имени программы.
+                  Если не заданы, берутся из sys.argv (Default value = None)
+      ones_module: Загруженный модуль ones. При запуске python -m ones это модуль __main__,
+                   повторный импорт загрузил бы модуль второй раз. None - import ones (Default value = None)
+
+    Returns:
+      int: Код возврата: 0 - успешно, 1 - неуспешно
+    """
+
+    args = _create_parser().parse_args(argv)
+
+    import logger_
+
+    logger_.init_logger(args.log_file)
+
+    from cancellation import CancellationToken, OperationCancelled, cancel_scope, handle_signals
+
+    # прерывание конвейера (SIGINT/SIGTERM) завершает и запущенный процесс 1С
+    token = CancellationToken()
+
+    try:
+        with handle_signals(token), cancel_scope(token):
+            return 0 if _run_command(args, ones_module) else 1
+    except OperationCancelled as ex:
+        logger_.logger().error(f'Операция отменена: {ex}')
+        return 1
+
+def _create_parser():
+    """Описание параметров командной строки.
+
+    Returns:
+      ArgumentParser: Парсер параметров
+    """
+
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m ones',
+                                     description='Выполнение команд платформы 1С')
+
+    parser.add_argument('--exename', required=True, help='Полное имя исполняемого файла 1С')
+    parser.add_argument('--platform-version', default='', help='Версия платформы, например 8.3.18.1363')
+    parser.add_argument('--dir', default='', help='Каталог файловой базы')
+    parser.add_argument('--server', default='', help='Имя сервера 1С')
+    parser.add_argument('--infobase', default='', help='Имя базы на сервере 1С')
+    parser.add_argument('--user', default='', help='Имя пользователя базы')
+    parser.add_argument('--password', default='', help='Пароль пользователя базы')
+    parser.add_argument('--ib-log', default='', help='Файл служебных сообщений 1С (/Out)')
+    parser.add_argument('--log-file', default='', help='Файл лога скрипта')
+
+    repo_parser = argparse.ArgumentParser(add_help=False)
+    repo_parser.add_argument('--repo-dir', default='', help='Каталог хранилища')
+    repo_parser.add_argument('--repo-user', default='', help='Имя пользователя хранилища')
+    repo_parser.add_argument('--repo-password', default='', help='Пароль пользователя хранилища')
+
+    fingerprint_parser = argparse.ArgumentParser(add_help=False)
+    fingerprint_parser.add_argument('--fingerprints', default='',
+                                    help='Файл отпечатков: уже загруженная конфигурация не загружается повторно')
+    fingerprint_parser.add_argument('--ignore-fingerprint', action='store_true',
+                                    help='Загрузить, даже если конфигурация уже загружена')
+
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    create = subparsers.add_parser('create', help='Создание базы')
+    create.add_argument('--add-in-list', default='', help='Имя базы в списке баз')
+    create.add_argument('--template', default='', help='Файл шаблона .cf или .dt')
+
+    load = subparsers.add_parser('load', parents=[fingerprint_parser],
+                                 help='Загрузка конфигурации из файла')
+    load.add_argument('file_name_cf', help='Файл .cf или .cfe')
+
+    dump = subparsers.add_parser('dump', help='Выгрузка конфигурации в файлы')
+    dump.add_argument('dir_', metavar='dir', help='Каталог выгрузки')
+    dump.add_argument('--format', dest='format_', choices=['Plain', 'Hierarchical'], default=None)
+    dump.add_argument('--no-update', dest='update', action='store_false')
+    dump.add_argument('--no-force', dest='force', action='store_false')
+
+    dump_ib = subparsers.add_parser('dump-ib', help='Выгрузка информационной базы в файл')
+    dump_ib.add_argument('file_name_dt', help='Файл .dt')
+
+    restore_ib = subparsers.add_parser('restore-ib', help='Загрузка информационной базы из файла')
+    restore_ib.add_argument('file_name_dt', help='Файл .dt')
+
+    update = subparsers.add_parser('update', parents=[repo_parser, fingerprint_parser],
+                                   help='Обновление конфигурации из хранилища')
+    update.add_argument('--version', dest='version_', type=int, default=0)
+    update.add_argument('--revised', action='store_true')
+    update.add_argument('--force', action='store_true')
+    update.add_argument('--objects', default='', help='Файл со списком объектов')
+    update.add_argument('--update-db-cfg', action='store_true',
+                        help='Обновить конфигурацию базы данных (/UpdateDBCfg)')
+
+    label = subparsers.add_parser('label', parents=[repo_parser],
+                                  help='Установка метки на версию хранилища')
+    label.add_argument('label')
+    label.add_argument('--version', dest='version_', type=int, default=0)
+    label.add_argument('--comment', default='')
+
+    run = subparsers.add_parser('run', help='Запуск в режиме предприятия')
+    run.add_argument('--launch-param', default='', help='Параметр /C')
+    run.add_argument('--execute', default='', help='Внешняя обработка (.epf) для /Execute')
+
+    return parser
+
+def _run_command(args, ones=None) -> bool:
+    """Создание объекта запуска 1С по параметрам и выполнение команды.
+
+    Args:
+      args: Namespace: Разобранные параметры командной строки
+      ones: Модуль ones. None - импортируется (Default value = None)
+
+    Returns:
+      bool: Успешно/неуспешно
+    """
+
+    if ones is None:
+        import ones
+
+    class_name, method_name = COMMANDS[args.command]
+
+    ib = getattr(ones, class_name)(dir_=args.dir, server=args.server, infobase=args.infobase)
+    ib.set_platform_params(args.exename, args.platform_version)
+    ib.set_log_ib_params(args.ib_log)
+
+    if args.user:
+        ib.set_auth_params(user=args.user, password=args.password)
+
+    if getattr(args, 'repo_dir', ''):
+        ib.set_repo_params(dir_=args.repo_dir, user=args.repo_user, password=args.repo_password)
+
+    if getattr(args, 'fingerprints', ''):
+        ib.set_fingerprint_params(args.fingerprints)
+
+    method = getattr(ib, method_name)
+
+    if args.command == 'create':
+        return method(base_name_in_the_list=args.add_in_list, template=args.template)
+
+    if args.command == 'load':
+        return method(args.file_name_cf, ignore_fingerprint=args.ignore_fingerprint)
+
+    if args.command == 'dump':
+        format_ = ones.ConfigDumpFormats(args.format_) if args.format_ else None
+        return method(args.dir_, update=args.update, force=args.force, format_=format_)
+
+    if args.command in ('dump-ib', 'restore-ib'):
+        return method(args.file_name_dt)
+
+    if args.command == 'update':
+        ib.set_update_db_cfg_params(update_db_cfg=args.update_db_cfg)
+        return method(version_=args.version_, revised=args.revised,
+                      force=args.force, objects=args.objects,
+                      ignore_fingerprint=args.ignore_fingerprint)
+
+    if args.command == 'label':
+        return method(args.label, version_=args.version_, comment=args.comment)
+
+    ib.set_other_params(launch_param=args.launch_param, execute=args.execute)
+    return method()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1027 @@
+"""Распределенное выполнение заданий 1С на нескольких агентах сборки.
+
+Координатор принимает задания (см. модуль jobs) и раздает их исполнителям по TCP.
+Исполнитель запускается на агенте, сообщает координатору свою емкость (сколько заданий
+выполняется одновременно) и установленные версии платформы с путями к 1cv8.
+Задание с версией платформы (set_platform_params.platform_version) выполняется только
+на исполнителе с этой версией, путь к платформе исполнитель подставляет свой.
+
+Каждое задание сразу закрепляется за наименее загруженным подходящим исполнителем.
+Освободившийся исполнитель берет задания из своей очереди, а когда она пуста - забирает
+с конца самой длинной подходящей очереди другого исполнителя (work stealing).
+Строки лога задания и результат передаются координатору, пароли из задания в строках лога маскируются.
+
+Задания содержат пароли баз, хранилищ и кластера, а исполнитель запускает процессы,
+поэтому координатор и исполнитель подтверждают друг другу общий токен (HMAC от случайных
+значений, сам токен по сети не передается), координатор по умолчанию слушает только
+localhost, а исполнитель запускает только исполняемые файлы своих платформ и списка --exename.
+Протокол без шифрования, между агентами его следует использовать с ssl_context (TLS).
+
+Каждое выполняющееся задание исполнителя имеет токен отмены: Coordinator.cancel и отмена
+токена, переданного Coordinator.wait, завершают процесс 1С задания на исполнителе,
+отмена токена исполнителя (Ctrl+C) останавливает его без ожидания. При остановке исполнителя
+без ожидания его задания отменяются (процессы 1С завершаются) и возвращаются координатору
+после завершения. Если исполнитель отключился без отчета, он сам отменяет свои задания,
+а координатор возвращает их в очередь через requeue_delay секунд, чтобы два конфигуратора
+не работали с одной базой.
+
+Протокол: строки JSON в UTF-8, по одному сообщению на строку.
+
+Пример:
+    coordinator = Coordinator(auth_token, port=8766)
+    coordinator.start()
+    job_ids = [coordinator.submit(job_from_runner(designer, 'load_cfg', file_name_cf=...))
+               for designer in designers]
+    statuses = [coordinator.wait(job_id) for job_id in job_ids]
+
+На агенте:
+    ONES_DISTRIBUTED_TOKEN=... python -m distributed --coordinator build1:8766 --capacity 2 --platform 8.3.22.1709=C:\\1cv8\\8.3.22.1709\\bin\\1cv8.exe
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import hmac
+import itertools
+import json
+import logging
+import os
+import secrets
+import socket
+import threading
+import time
+import traceback
+
+from packaging import version
+
+from cancellation import GRACE_SECONDS, CancellationToken, OperationCancelled, handle_signals
+import jobs
+import logger_
+from logger_ import logger
+from service import JobStates
+
+__all__ = ['Coordinator', 'Worker']
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8766
+MAX_ATTEMPTS = 3
+RECONNECT_SECONDS = 10
+ACCEPT_POLL_SECONDS = 0.5
+# Задания отключившегося исполнителя возвращаются в очередь после завершения их процессов 1С
+REQUEUE_DELAY_SECONDS = 6 * GRACE_SECONDS
+TOKEN_ENV = 'ONES_DISTRIBUTED_TOKEN'
+# Параметры задания, значения которых маскируются в логе
+SECRET_PARAMS = ('password', 'access_code')
+MASK = '***'
+
+
+class _Connection:
+    """Соединение с обменом сообщениями JSON построчно."""
+
+    def __init__(self, sock: socket.socket):
+        self._sock = sock
+        self._reader = sock.makefile('r', encoding='utf-8', newline='\n')
+        self._send_lock = threading.Lock()
+
+    def send(self, message: dict) -> bool:
+        """Отправка сообщения.
+
+        Returns:
+          bool: Отправлено. False - соединение разорвано
+        """
+
+        data = (json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8')
+
+        try:
+            with self._send_lock:
+                self._sock.sendall(data)
+        except OSError:
+            return False
+
+        return True
+
+    def receive(self) -> dict:
+        """Следующее сообщение, None - соединение закрыто."""
+
+        try:
+            line = self._reader.readline()
+        except (OSError, ValueError):
+            return None
+
+        return json.loads(line) if line else None
+
+    def close(self):
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        self._sock.close()
+
+
+class _Job:
+    """Задание в координаторе."""
+
+    def __init__(self, job_id: str, spec: dict, platform_version: str):
+        self.id = job_id
+        self.spec = spec
+        self.platform_version = platform_version
+        self.state = JobStates.QUEUED
+        self.result = None
+        self.error = ''
+        self.worker = ''
+        self.attempts = 0
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.log_lines = []
+        self.cancel_requested = False
+
+    def status(self) -> dict:
+        return {'id': self.id,
+                'state': self.state,
+                'operation': f'{self.spec.get("class")}.{self.spec.get("operation")}',
+                'platform_version': self.platform_version,
+                'worker': self.worker,
+                'attempts': self.attempts,
+                'result': self.result,
+                'error': self.error,
+                'submitted': self.submitted,
+                'started': self.started,
+                'finished': self.finished}
+
+
+class _WorkerState:
+    """Исполнитель, подключенный к координатору."""
+
+    def __init__(self, name: str, connection: _Connection, capacity: int, platforms: list):
+        self.name = name
+        self.connection = connection
+        self.capacity = max(1, capacity)
+        self.platforms = platforms
+        self.pending = deque()
+        self.running = {}
+        self.stopping = False
+
+    def can_run(self, job: _Job) -> bool:
+        return not self.stopping and _match_version(job.platform_version, self.platforms) is not None
+
+    def load(self) -> float:
+        return (len(self.pending) + len(self.running)) / self.capacity
+
+    def info(self) -> dict:
+        return {'name': self.name,
+                'capacity': self.capacity,
+                'platforms': self.platforms,
+                'pending': len(self.pending),
+                'running': len(self.running)}
+
+
+class Coordinator:
+    """Координатор: очередь заданий и раздача их исполнителям."""
+
+    def __init__(self, auth_token: str,
+                 host: str=DEFAULT_HOST,
+                 port: int=DEFAULT_PORT,
+                 max_attempts: int=MAX_ATTEMPTS,
+                 on_log=None,
+                 requeue_delay: float=REQUEUE_DELAY_SECONDS,
+                 ssl_context=None):
+        """
+        Args:
+          auth_token: str: Общий токен координатора и исполнителей
+          host: str: Адрес. По умолчанию только локальный (Default value = DEFAULT_HOST)
+          port: int: Порт. 0 - любой свободный (Default value = DEFAULT_PORT)
+          max_attempts: int: Сколько раз задание выдается исполнителям, если они отключаются (Default value = 3)
+          on_log: Функция (идентификатор задания, строка лога), вызывается при получении строк лога (Default value = None)
+          requeue_delay: float: Через сколько секунд возвращаются в очередь выполнявшиеся задания
+                                исполнителя, отключившегося без отчета (Default value = 60)
+          ssl_context: ssl.SSLContext: Контекст TLS сервера. None - без шифрования (Default value = None)
+
+        Raises:
+          ValueError: Не задан токен
+        """
+
+        if not auth_token:
+            raise ValueError('Не задан токен координатора')
+
+        self._auth_token = auth_token
+        self._address = (host, port)
+        self._max_attempts = max_attempts
+        self._on_log = on_log
+        self._requeue_delay = requeue_delay
+        self._ssl_context = ssl_context
+        self._server = None
+        self._threads = []
+        self._timers = []
+        self._jobs = {}
+        self._workers = {}
+        self._unassigned = deque()
+        self._changed = threading.Condition()
+        self._ids = itertools.count(1)
+        self.metrics = {'submitted': 0, 'succeeded': 0, 'failed': 0, 'cancelled': 0,
+                        'stolen': 0, 'requeued': 0}
+
+    @property
+    def address(self) -> tuple:
+        """Адрес (хост, порт), на котором координатор принимает исполнителей."""
+
+        return self._server.getsockname()[:2] if self._server else self._address
+
+    def start(self) -> tuple:
+        """Запуск приема исполнителей в фоновом потоке.
+
+        Returns:
+          tuple: Адрес (хост, порт)
+        """
+
+        self._server = socket.create_server(self._address)
+        self._server.settimeout(ACCEPT_POLL_SECONDS) # чтобы stop не ждал очередного подключения
+        self._start_thread(self._accept_loop, 'coordinator')
+
+        logger().info(f'Координатор запущен: {self.address[0]}:{self.address[1]}')
+
+        return self.address
+
+    def stop(self):
+        """Остановка координатора. Соединения с исполнителями закрываются."""
+
+        server, self._server = self._server, None
+
+        if server is not None:
+            server.close()
+
+        with self._changed:
+            connections = [worker.connection for worker in self._workers.values()]
+
+        for connection in connections:
+            connection.close()
+
+        for timer in self._timers:
+            timer.cancel()
+
+        for thread in self._threads:
+            thread.join(5)
+
+    def submit(self, spec: dict, platform_version: str=None) -> str:
+        """Постановка задания.
+
+        Args:
+          spec: dict: Задание (см. модуль jobs)
+          platform_version: str: Нужная версия платформы, например 8.3.22 или 8.3.22.1709.
+                                 None - из set_platform_params задания, '' - любая (Default value = None)
+
+        Returns:
+          str: Nдентификатор задания
+
+        Raises:
+          JobSpecError: Неверное задание
+        """
+
+        jobs.create_runner(spec) # проверка задания до постановки в очередь
+
+        if platform_version is None:
+            platform_version = (spec.get('settings', {}).get('set_platform_params', {})
+                                .get('platform_version') or '')
+
+        with self._changed:
+            job = _Job(str(next(self._ids)), spec, platform_version)
+            self._jobs[job.id] = job
+            self.metrics['submitted'] += 1
+            self._assign(job)
+            messages = self._dispatch()
+
+        self._send_all(messages)
+
+        return job.id
+
+    def status(self, job_id: str) -> dict:
+        """Состояние задания или None, если задания нет."""
+
+        with self._changed:
+            job = self._jobs.get(job_id)
+            return job.status() if job else None
+
+    def log_lines(self, job_id: str) -> list:
+        """Полученные строки лога задания."""
+
+        with self._changed:
+            return list(self._jobs[job_id].log_lines)
+
+    def cancel(self, job_id: str) -> bool:
+        """Отмена задания. Ожидающее задание отменяется сразу, у выполняющегося исполнитель
+        завершает процесс 1С, и задание переходит в состояние cancelled по получении результата.
+
+        Returns:
+          bool: Задание отменено или отменяется
+        """
+
+        with self._changed:
+            job = self._jobs.get(job_id)
+
+            if job is None or job.state in JobStates.FINISHED:
+                return False
+
+            job.cancel_requested = True
+
+            if job.state == JobStates.QUEUED:
+                for queue in [self._unassigned] + [worker.pending for worker in self._workers.values()]:
+                    if job in queue:
+                        queue.remove(job)
+
+                job.error = 'Задание отменено'
+                self._finish(job, JobStates.CANCELLED)
+                return True
+
+            worker = self._workers.get(job.worker)
+
+        if worker is not None:
+            worker.connection.send({'type': 'cancel', 'job': job_id})
+
+        return True
+
+    def wait(self, job_id: str, timeout: float=None, token: CancellationToken=None) -> dict:
+        """Ожидание завершения задания.
+
+        Args:
+          job_id: str: Nдентификатор задания
+          timeout: float: Максимальное ожидание, сек. None - без ограничения (Default value = None)
+          token: CancellationToken: Токен отмены, его отмена отменяет задание (Default value = None)
+
+        Returns:
+          dict: Состояние задания
+
+        Raises:
+          TimeoutError: Задание не завершилось за timeout секунд
+          OperationCancelled: Токен отменен, задание отменяется
+        """
+
+        handle = token.register(self._notify) if token is not None else 0
+
+        try:
+            with self._changed:
+                job = self._jobs[job_id]
+
+                if not self._changed.wait_for(lambda: job.state in JobStates.FINISHED
+                                              or (token is not None and token.cancelled), timeout):
+                    raise TimeoutError(f'Задание {job_id} не завершилось за {timeout} сек')
+
+                status = job.status()
+        finally:
+            if token is not None:
+                token.unregister(handle)
+
+        if status['state'] not in JobStates.FINISHED:
+            self.cancel(job_id)
+            raise OperationCancelled(token.reason)
+
+        return status
+
+    def wait_for_workers(self, count: int, timeout: float=None) -> bool:
+        """Ожидание подключения count исполнителей.
+
+        Returns:
+          bool: Исполнители подключились
+        """
+
+        with self._changed:
+            return self._changed.wait_for(lambda: len(self._workers) >= count, timeout)
+
+    def workers(self) -> list:
+        """Подключенные исполнители: name, capacity, platforms, pending, running."""
+
+        with self._changed:
+            return [worker.info() for worker in self._workers.values()]
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def _start_thread(self, target, name: str, *args):
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _accept_loop(self):
+        """Прием подключений исполнителей."""
+
+        server = self._server
+
+        while self._server is not None:
+            try:
+                sock, address = server.accept()
+            except TimeoutError:
+                continue
+            except OSError:
+                break
+
+            sock.settimeout(None)
+            self._start_thread(self._serve_worker, 'coordinator-worker', sock, address)
+
+    def _serve_worker(self, sock: socket.socket, address: tuple):
+        """Обмен сообщениями с одним исполнителем."""
+
+        if self._ssl_context is not None:
+            try:
+                sock = self._ssl_context.wrap_socket(sock, server_side=True)
+            except OSError as ex:
+                logger().warning(f'Координатор. Отклонено подключение {address[0]}: {ex}')
+                sock.close()
+                return
+
+        connection = _Connection(sock)
+        nonce = secrets.token_hex(16)
+        connection.send({'type': 'challenge', 'nonce': nonce})
+        hello = connection.receive()
+
+        if (not hello or hello.get('type') != 'hello'
+                or not hmac.compare_digest(str(hello.get('auth', '')),
+                                           _sign(self._auth_token, 'worker', nonce))):
+            logger().warning(f'Координатор. Отклонено подключение {address[0]}: неверный токен')
+            connection.close()
+            return
+
+        connection.send({'type': 'welcome',
+                         'auth': _sign(self._auth_token, 'coordinator', str(hello.get('nonce', '')))})
+
+        with self._changed:
+            name = hello.get('name') or f'worker{len(self._workers) + 1}'
+
+            while name in self._workers:
+                name += '+'
+
+            worker = _WorkerState(name, connection, hello.get('capacity', 1), hello.get('platforms', []))
+            self._workers[name] = worker
+            self._changed.notify_all()
+            messages = self._dispatch()
+
+        logger().info(f'Координатор. Подключен исполнитель {name}: емкость {worker.capacity}, '
+                      f'платформы: {", ".join(worker.platforms) or "-"}')
+
+        self._send_all(messages)
+
+        while True:
+            message = connection.receive()
+
+            if message is None:
+                break
+
+            if message.get('type') == 'log':
+                self._receive_log(message)
+            elif message.get('type') == 'result':
+                self._receive_result(worker, message)
+            elif message.get('type') == 'stopping':
+                self._stop_worker(worker)
+
+        self._disconnect(worker)
+
+    def _receive_log(self, message: dict):
+        with self._changed:
+            job = self._jobs.get(message.get('job'))
+
+            if job is None:
+                return
+
+            job.log_lines.append(message['line'])
+
+        if self._on_log is not None:
+            self._on_log(job.id, message['line'])
+
+    def _receive_result(self, worker: _WorkerState, message: dict):
+        with self._changed:
+            job = worker.running.pop(message.get('job'), None)
+
+            if job is None:
+                pass
+            elif message.get('state') == JobStates.CANCELLED and not job.cancel_requested:
+                # исполнитель останавливается, процесс задания уже завершен
+                self._requeue(job, worker.name)
+            else:
+                job.result = message.get('result')
+                job.error = message.get('error', '')
+                self._finish(job, message.get('state', JobStates.FAILED))
+
+            messages = self._dispatch()
+
+        self._send_all(messages)
+
+    def _stop_worker(self, worker: _WorkerState):
+        """Исполнитель останавливается: новые задания ему не выдаются, его очередь передается другим."""
+
+        with self._changed:
+            worker.stopping = True
+            pending = list(worker.pending)
+            worker.pending.clear()
+
+            for job in pending:
+                self._assign(job)
+
+            messages = self._dispatch()
+
+        # задания, выданные до этого сообщения, исполнитель вернет как отмененные
+        self._send_all(messages + [(worker.connection, {'type': 'bye'})])
+
+    def _disconnect(self, worker: _WorkerState):
+        """Отключение исполнителя: его очередь возвращается сразу, выполнявшиеся задания -
+        через requeue_delay, когда исполнитель завершит их процессы."""
+
+        worker.connection.close()
+
+        with self._changed:
+            self._workers.pop(worker.name, None)
+            running = list(worker.running.values())
+            pending = list(worker.pending)
+            worker.running.clear()
+            worker.pending.clear()
+
+            for job in pending:
+                self._assign(job)
+
+            messages = self._dispatch()
+
+        logger().warning(f'Координатор. Отключен исполнитель {worker.name}, '
+                         f'возвращено заданий: {len(pending)}, выполнявшихся: {len(running)}')
+
+        self._send_all(messages)
+
+        if not running:
+            return
+
+        timer = threading.Timer(self._requeue_delay, self._requeue_running, (worker.name, running))
+        timer.daemon = True
+        timer.start()
+        self._timers.append(timer)
+
+    def _requeue_running(self, worker_name: str, running: list):
+        """Возврат в очередь заданий, выполнявшихся отключившимся исполнителем."""
+
+        with self._changed:
+            for job in running:
+                if job.state == JobStates.RUNNING and job.worker == worker_name:
+                    self._requeue(job, worker_name)
+
+            messages = self._dispatch()
+
+        self._send_all(messages)
+
+    def _requeue(self, job: _Job, worker_name: str):
+        """Возврат выданного задания в очередь или неуспех после max_attempts попыток.
+        Вызывается под блокировкой."""
+
+        if job.cancel_requested:
+            job.error = 'Задание отменено'
+            self._finish(job, JobStates.CANCELLED)
+            return
+
+        self.metrics['requeued'] += 1
+
+        if job.attempts >= self._max_attempts:
+            job.error = f'Исполнитель {worker_name} не выполнил задание, попыток: {job.attempts}'
+            self._finish(job, JobStates.FAILED)
+            return
+
+        job.state = JobStates.QUEUED
+        job.worker = ''
+        self._assign(job)
+
+    def _assign(self, job: _Job):
+        """Закрепление задания за наименее загруженным подходящим исполнителем."""
+
+        candidates = [worker for worker in self._workers.values() if worker.can_run(job)]
+
+        if candidates:
+            min(candidates, key=_WorkerState.load).pending.append(job)
+        else:
+            self._unassigned.append(job)
+
+    def _dispatch(self) -> list:
+        """Выдача заданий исполнителям со свободными местами. Вызывается под блокировкой.
+
+        Returns:
+          list: Сообщения (соединение, сообщение) для отправки вне блокировки
+        """
+
+        messages = []
+
+        for worker in self._workers.values():
+            while not worker.stopping and len(worker.running) < worker.capacity:
+                job = self._next_job(worker)
+
+                if job is None:
+                    break
+
+                platform_version = _match_version(job.platform_version, worker.platforms)
+                job.state = JobStates.RUNNING
+                job.worker = worker.name
+                job.attempts += 1
+                job.started = time.time()
+                worker.running[job.id] = job
+
+                messages.append((worker.connection, {'type': 'job', 'job': job.id, 'spec': job.spec,
+                                                     'platform_version': platform_version}))
+
+        return messages
+
+    def _next_job(self, worker: _WorkerState) -> _Job:
+        """Следующее задание исполнителя: из своей очереди, из нераспределенных
+        или с конца самой длинной очереди другого исполнителя."""
+
+        if worker.pending:
+            return worker.pending.popleft()
+
+        for job in self._unassigned:
+            if worker.can_run(job):
+                self._unassigned.remove(job)
+                return job
+
+        victims = sorted((other for other in self._workers.values() if other is not worker),
+                         key=lambda other: len(other.pending), reverse=True)
+
+        for victim in victims:
+            for job in reversed(victim.pending):
+                if worker.can_run(job):
+                    victim.pending.remove(job)
+                    self.metrics['stolen'] += 1
+                    return job
+
+        return None
+
+    def _finish(self, job: _Job, state: str):
+        """Завершение задания. Вызывается под блокировкой."""
+
+        job.state = state
+        job.finished = time.time()
+        self.metrics[state] += 1
+        self._changed.notify_all()
+
+    def _send_all(self, messages: list):
+        for connection, message in messages:
+            connection.send(message)
+
+
+class _WorkerLogHandler(logging.Handler):
+    """Передает записи логгера координатору как лог задания, выполняемого в текущем потоке.
+    Пароли задания (в том числе в параметрах запуска 1С) заменяются на MASK."""
+
+    def __init__(self, connection: _Connection):
+        super().__init__(logging.DEBUG)
+        self.setFormatter(logging.Formatter(logger_.LOG_FORMAT, logger_.DATE_FORMAT))
+        self._connection = connection
+        self._local = threading.local()
+
+    def bind(self, job_id: str, secret_values: list=()):
+        """Привязка текущего потока к заданию.
+
+        Args:
+          job_id: str: Nдентификатор задания. None - поток не выполняет задание
+          secret_values: list: Маскируемые значения (Default value = ())
+        """
+
+        self._local.job_id = job_id
+        self._local.secret_values = sorted(secret_values, key=len, reverse=True)
+
+    def emit(self, record):
+        job_id = getattr(self._local, 'job_id', None)
+
+        if job_id is None:
+            return
+
+        line = self.format(record)
+
+        for value in self._local.secret_values:
+            line = line.replace(value, MASK)
+
+        self._connection.send({'type': 'log', 'job': job_id, 'line': line})
+
+
+class Worker:
+    """Исполнитель заданий на агенте."""
+
+    def __init__(self, coordinator_address: tuple,
+                 auth_token: str,
+                 capacity: int=1,
+                 platforms: dict=None,
+                 name: str='',
+                 allowed_exenames: tuple=(),
+                 ssl_context=None,
+                 token: CancellationToken=None):
+        """
+        Args:
+          coordinator_address: tuple: Адрес координатора (хост, порт)
+          auth_token: str: Общий токен координатора и исполнителей
+          capacity: int: Количество одновременно выполняемых заданий (Default value = 1)
+          platforms: dict: Установленные платформы: версия -> полное имя 1cv8.
+                           None - задания выполняются с путем из задания (Default value = None)
+          name: str: Nмя исполнителя. '' - имя компьютера (Default value = '')
+          allowed_exenames: tuple: Nсполняемые файлы 1С, которые могут запускать задания,
+                                   кроме файлов platforms (Default value = ())
+          ssl_context: ssl.SSLContext: Контекст TLS клиента. None - без шифрования (Default value = None)
+          token: CancellationToken: Токен отмены, его отмена - остановка без ожидания (Default value = None)
+
+        Raises:
+          ValueError: Не задан токен или нет разрешенных исполняемых файлов
+        """
+
+        if not auth_token:
+            raise ValueError('Не задан токен координатора')
+
+        self._coordinator_address = tuple(coordinator_address)
+        self._auth_token = auth_token
+        self._capacity = capacity
+        self._platforms = dict(platforms or {})
+        self._name = name or socket.gethostname()
+        self._allowed_exenames = {_normalize_exename(exename)
+                                  for exename in list(self._platforms.values()) + list(allowed_exenames)}
+        self._ssl_context = ssl_context
+        self._token = token
+        self._connection = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self._job_tokens = {}
+        self._lock = threading.Lock()
+
+        if not self._allowed_exenames:
+            raise ValueError('Не задан список исполняемых файлов, разрешенных заданиям')
+
+    def run(self):
+        """Подключение к координатору и выполнение заданий до разрыва соединения или остановки.
+
+        Raises:
+          ConnectionError: Координатор не подтвердил токен
+        """
+
+        self._connection = connection = self._connect()
+
+        if self._stopping.is_set():
+            connection.send({'type': 'stopping'})
+
+        log_handler = _WorkerLogHandler(connection)
+
+        log = logger()
+        log.setLevel(logging.DEBUG)
+        log.addHandler(log_handler)
+
+        logger().info(f'Исполнитель {self._name} подключен к координатору '
+                      f'{self._coordinator_address[0]}:{self._coordinator_address[1]}')
+
+        executor = ThreadPoolExecutor(max_workers=self._capacity, thread_name_prefix='worker')
+        message = None
+        handle = (self._token.register(lambda: self.stop(wait=False))
+                  if self._token is not None else 0)
+
+        try:
+            while True:
+                message = connection.receive()
+
+                if message is None or message.get('type') == 'bye':
+                    break
+
+                if message.get('type') == 'cancel':
+                    with self._lock:
+                        token = self._job_tokens.get(message.get('job'))
+
+                    if token is not None:
+                        token.cancel('Задание отменено')
+
+                if message.get('type') != 'job':
+                    continue
+
+                if self._stopping.is_set():
+                    # задание выдано до остановки: координатор передаст его другому исполнителю
+                    connection.send({'type': 'result', 'job': message['job'], 'result': None,
+                                     'error': '', 'state': JobStates.CANCELLED})
+                    continue
+
+                token = CancellationToken()
+
+                with self._lock:
+                    self._job_tokens[message['job']] = token
+
+                executor.submit(self._run_job, connection, log_handler, message, token)
+        finally:
+            if self._token is not None:
+                self._token.unregister(handle)
+
+            if message is None or message.get('type') != 'bye':
+                # координатор вернет задания в очередь, поэтому их процессы 1С завершаются
+                self._cancel_jobs('Соединение с координатором разорвано')
+
+            executor.shutdown(wait=True)
+            connection.close()
+            log.removeHandler(log_handler)
+
+    def start(self):
+        """Запуск исполнителя в фоновом потоке."""
+
+        self._thread = threading.Thread(target=self.run, name=f'worker-{self._name}', daemon=True)
+        self._thread.start()
+
+        return self
+
+    def stop(self, wait: bool=True):
+        """Отключение от координатора. Координатор больше не выдает заданий
+        и передает очередь исполнителя другим исполнителям.
+
+        Args:
+          wait: bool: Дождаться завершения выполняющихся заданий. False - задания отменяются,
+                      их процессы 1С завершаются, а координатор выполняет их на других исполнителях (Default value = True)
+        """
+
+        self._stopping.set()
+
+        if not wait:
+            self._cancel_jobs('Исполнитель остановлен')
+
+        if self._connection is not None:
+            self._connection.send({'type': 'stopping'})
+
+        if wait and self._thread is not None:
+            self._thread.join()
+
+    def _connect(self) -> _Connection:
+        """Подключение к координатору и взаимная проверка токена."""
+
+        sock = socket.create_connection(self._coordinator_address)
+
+        if self._ssl_context is not None:
+            sock = self._ssl_context.wrap_socket(sock, server_hostname=self._coordinator_address[0])
+
+        connection = _Connection(sock)
+        challenge = connection.receive()
+        nonce = secrets.token_hex(16)
+
+        if challenge and challenge.get('type') == 'challenge':
+            connection.send({'type': 'hello', 'name': self._name, 'capacity': self._capacity,
+                             'platforms': sorted(self._platforms, key=version.parse), 'nonce': nonce,
+                             'auth': _sign(self._auth_token, 'worker', str(challenge.get('nonce', '')))})
+            welcome = connection.receive()
+        else:
+            welcome = None
+
+        if (not welcome or welcome.get('type') != 'welcome'
+                or not hmac.compare_digest(str(welcome.get('auth', '')),
+                                           _sign(self._auth_token, 'coordinator', nonce))):
+            connection.close()
+            raise ConnectionError(f'Координатор {self._coordinator_address[0]}:{self._coordinator_address[1]} '
+                                  f'не подтвердил токен')
+
+        return connection
+
+    def _cancel_jobs(self, reason: str):
+        with self._lock:
+            tokens = list(self._job_tokens.values())
+
+        for token in tokens:
+            token.cancel(reason)
+
+    def _run_job(self, connection: _Connection, log_handler: _WorkerLogHandler, message: dict,
+                 token: CancellationToken):
+        """Выполнение задания в потоке пула и отправка результата."""
+
+        job_id = message['job']
+        reply = {'type': 'result', 'job': job_id, 'result': None, 'error': ''}
+
+        log_handler.bind(job_id, _secret_values(message['spec']))
+
+        try:
+            spec = self._localize(message['spec'], message.get('platform_version'))
+            runner = jobs.create_runner(spec)
+
+            if _normalize_exename(runner._exename) not in self._allowed_exenames:
+                raise jobs.JobSpecError(f'Исполняемый файл не разрешен: {runner._exename}')
+
+            with logger_.job_context(job_id):
+                result = jobs.run_job(spec, token=token, runner=runner)
+
+            reply['result'] = result if isinstance(result, (bool, int, float, str)) else None
+            reply['state'] = JobStates.SUCCEEDED if result is not False else JobStates.FAILED
+
+        except OperationCancelled as ex:
+            logger().warning(f'Задание {job_id} отменено: {ex}')
+            reply['state'] = JobStates.CANCELLED
+
+        except Exception:
+            reply['error'] = traceback.format_exc()
+            logger().error(reply['error'])
+            reply['state'] = JobStates.FAILED
+
+        finally:
+            log_handler.bind(None)
+
+            with self._lock:
+                self._job_tokens.pop(job_id, None)
+
+        connection.send(reply)
+
+    def _localize(self, spec: dict, platform_version: str) -> dict:
+        """Задание с путем к платформе этого агента."""
+
+        if platform_version is None or platform_version not in self._platforms:
+            return spec
+
+        spec = copy.deepcopy(spec)
+        platform_params = spec.setdefault('settings', {}).setdefault('set_platform_params', {})
+        platform_params['exename'] = self._platforms[platform_version]
+        platform_params['platform_version'] = platform_version
+
+        return spec
+
+
+def _sign(auth_token: str, role: str, nonce: str) -> str:
+    """Подтверждение токена стороной role для случайного значения другой стороны."""
+
+    return hmac.new(auth_token.encode('utf-8'), f'{role}:{nonce}'.encode('utf-8'), 'sha256').hexdigest()
+
+def _secret_values(spec: dict) -> list:
+    """Пароли задания: непустые значения параметров SECRET_PARAMS."""
+
+    return [value for params in spec.get('settings', {}).values() if isinstance(params, dict)
+            for key, value in params.items()
+            if isinstance(value, str) and value and any(secret in key for secret in SECRET_PARAMS)]
+
+def _normalize_exename(exename: str) -> str:
+    return os.path.normcase(os.path.normpath(exename))
+
+def _match_version(required: str, platforms: list) -> str:
+    """Подходящая версия платформы исполнителя.
+
+    Args:
+      required: str: Нужная версия, полная или начало (8.3.22). '' - любая
+      platforms: list: Версии исполнителя
+
+    Returns:
+      str: Старшая подходящая версия, '' - исполнитель без списка версий и нужна любая,
+           None - подходящей версии нет
+    """
+
+    if not required:
+        return max(platforms, key=version.parse) if platforms else ''
+
+    prefix = required.split('.')
+    matches = [platform for platform in platforms if platform.split('.')[:len(prefix)] == prefix]
+
+    return max(matches, key=version.parse) if matches else None
+
+
+def main(argv: list=None):
+    """Точка входа исполнителя: python -m distributed"""
+
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m distributed',
+                                     description='Исполнитель распределенных заданий 1С')
+    parser.add_argument('--coordinator', required=True, help='Адрес координатора хост:порт')
+    parser.add_argument('--capacity', type=int, default=1)
+    parser.add_argument('--platform', action='append', default=[],
+                        help='Установленная платформа версия=путь к 1cv8, можно несколько')
+    parser.add_argument('--exename', action='append', default=[],
+                        help='Исполняемый файл 1С, который могут запускать задания, кроме --platform, можно несколько')
+    parser.add_argument('--token-file', default='',
+                        help=f'Файл общего токена координатора, если не задана переменная {TOKEN_ENV}')
+    parser.add_argument('--cafile', default='',
+                        help='Сертификат CA координатора для подключения по TLS')
+    parser.add_argument('--name', default='')
+    parser.add_argument('--log-file', default='')
+    args = parser.parse_args(argv)
+
+    host, _, port = args.coordinator.rpartition(':')
+    platforms = dict(platform.split('=', 1) for platform in args.platform)
+    auth_token = os.environ.get(TOKEN_ENV, '')
+
+    if not auth_token and args.token_file:
+        with open(args.token_file, encoding='utf-8') as file:
+            auth_token = file.read().strip()
+
+    if not auth_token:
+        parser.error(f'Не задан токен координатора: переменная {TOKEN_ENV} или --token-file')
+
+    if not platforms and not args.exename:
+        parser.error('Не заданы исполняемые файлы 1С: --platform или --exename')
+
+    ssl_context = None
+
+    if args.cafile:
+        import ssl
+        ssl_context = ssl.create_default_context(cafile=args.cafile)
+
+    logger_.init_logger(args.log_file)
+
+    # Ctrl+C и SIGTERM завершают процессы 1С выполняющихся заданий, координатор передает их другим
+    token = CancellationToken()
+
+    try:
+        with handle_signals(token):
+            while not token.cancelled:
+                try:
+                    Worker((host, int(port)), auth_token, args.capacity, platforms, args.name,
+                           args.exename, ssl_context, token).run()
+                except OSError as ex:
+                    logger().warning(f'Нет соединения с координатором {args.coordinator}: {ex}')
+
+                token.wait(RECONNECT_SECONDS)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
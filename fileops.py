@@ -0,0 +1,196 @@
+"""Служебные операции с файлами: блокировки и атомарная запись."""
+
+import os
+import time
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+__all__ = ['FileLock', 'FileLockTimeout', 'atomic_write', 'read_file_tail']
+
+LOCK_POLL_SECONDS = 0.05
+
+
+class FileLock:
+    """Рекомендательная (advisory) блокировка файла между процессами.
+
+    Блокируется отдельный файл-блокировка, а не сам файл данных,
+    т.к. файл данных может подменяться атомарной записью.
+
+    Пример:
+        with FileLock(file_name + '.lock'):
+            ...
+    """
+
+    def __init__(self, lock_file_name: str, exclusive: bool=True, timeout: float=None):
+        """
+        Args:
+          lock_file_name: str: Полное имя файла-блокировки. Создается при отсутствии
+          exclusive: bool: Монопольная блокировка, иначе разделяемая.
+                           На Windows блокировка всегда монопольная (Default value = True)
+          timeout: float: Максимальное время ожидания блокировки в секундах.
+                          None - ждать без ограничения (Default value = None)
+        """
+
+        self._lock_file_name = lock_file_name
+        self._exclusive = exclusive
+        self._timeout = timeout
+        self._fd = None
+
+    def acquire(self):
+        """Захват блокировки.
+
+        Raises:
+          FileLockTimeout: Блокировку не удалось получить за timeout секунд
+        """
+
+        fd = os.open(self._lock_file_name, os.O_RDWR | os.O_CREAT, 0o666)
+
+        deadline = None if self._timeout is None else time.monotonic() + self._timeout
+
+        while True:
+            if _try_lock(fd, self._exclusive):
+                break
+
+            if deadline is not None and time.monotonic() >= deadline:
+                os.close(fd)
+                raise FileLockTimeout(
+                    f'Не удалось получить блокировку файла {self._lock_file_name} '
+                    f'за {self._timeout} сек')
+
+            time.sleep(LOCK_POLL_SECONDS)
+
+        self._fd = fd
+
+    def release(self):
+        """Освобождение блокировки."""
+
+        if self._fd is None:
+            return
+
+        _unlock(self._fd)
+        os.close(self._fd)
+        self._fd = None
+
+    @property
+    def locked(self) -> bool:
+        """Блокировка захвачена этим объектом."""
+
+        return self._fd is not None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.release()
+
+
+class FileLockTimeout(Exception):
+    """Nсключение 'Не удалось получить блокировку файла'"""
+
+
+def atomic_write(file_name: str, data, encoding: str=None):
+    """Атомарная запись файла.
+    Данные пишутся во временный файл в том же каталоге, сбрасываются на диск
+    и затем временный файл переименовывается в целевой.
+    Читатели видят либо старое, либо новое содержимое целиком.
+
+    Args:
+      file_name: str: Полное имя файла
+      data: str | bytes: Записываемый текст или двоичные данные
+      encoding: str: Кодировка файла, для текста обязательна (Default value = None)
+    """
+
+    import tempfile
+
+    dir_name = os.path.dirname(os.path.abspath(file_name))
+    fd, temp_file_name = tempfile.mkstemp(prefix='.' + os.path.basename(file_name) + '.',
+                                          suffix='.tmp', dir=dir_name)
+
+    try:
+        if isinstance(data, bytes):
+            file = os.fdopen(fd, 'wb')
+        else:
+            file = os.fdopen(fd, 'w', encoding=encoding, newline='')
+
+        with file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temp_file_name, file_name)
+
+    except BaseException:
+        try:
+            os.unlink(temp_file_name)
+        except OSError:
+            pass
+        raise
+
+def read_file_tail(file_name: str, start_offset: int=0, max_bytes: int=64 * 1024) -> tuple:
+    """Чтение конца файла с ограничением памяти.
+    Читается не более max_bytes последних байт, и не раньше start_offset -
+    например, позиции, с которой файл начал дописываться текущим запуском.
+
+    Args:
+      file_name: str: Полное имя файла
+      start_offset: int: Позиция, раньше которой не читать (Default value = 0)
+      max_bytes: int: Максимальное количество читаемых байт (Default value = 64 * 1024)
+
+    Returns:
+      tuple: (прочитанные байты, начало файла было отброшено)
+    """
+
+    with open(file_name, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+
+        # Файл мог быть очищен после запоминания позиции
+        if start_offset > size:
+            start_offset = 0
+
+        begin = max(start_offset, size - max_bytes)
+
+        file.seek(begin)
+        data = file.read(size - begin)
+
+    return data, begin > start_offset
+
+def _try_lock(fd: int, exclusive: bool) -> bool:
+    """Попытка захватить блокировку без ожидания.
+
+    Args:
+      fd: int: Дескриптор файла-блокировки
+      exclusive: bool: Монопольная блокировка
+
+    Returns:
+      bool: Блокировка получена
+    """
+
+    try:
+        if fcntl:
+            fcntl.flock(fd, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+
+    except OSError:
+        return False
+
+    return True
+
+def _unlock(fd: int):
+    """Освобождение блокировки.
+
+    Args:
+      fd: int: Дескриптор файла-блокировки
+    """
+
+    if fcntl:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,182 @@
+"""Отпечатки конфигурации баз: пропуск повторной загрузки той же конфигурации.
+
+Одна и та же сборка раскатывается на десятки баз несколько раз в день, и load_cfg
+или update_from_repo загружают и реструктуризируют базу, даже если в ней уже ровно
+эта конфигурация. Для каждой базы хранится отпечаток последней успешной загрузки:
+SHA-256 файла .cf или хранилище и номер версии. Если отпечаток совпадает,
+загрузка пропускается с записью причины в лог.
+
+Где возможно дешево, отпечаток сверяется с самой базой: для файловой базы запоминаются
+время изменения и размер 1Cv8.1CD после загрузки. Если база с тех пор изменялась,
+отпечаток не считается достоверным и конфигурация загружается заново.
+Для файлового хранилища в отпечаток входят время изменения и размер файла хранилища,
+так что новая версия в хранилище делает отпечаток недействительным. Для серверного хранилища
+отпечаток не определяется и обновление не пропускается: последняя версия дешево не определяется,
+а база, подключенная к хранилищу, игнорирует номер версии и получает последнюю.
+
+Пример:
+    designer.set_fingerprint_params(r'D:\\1c\\fingerprints.json')
+    designer.load_cfg(r'D:\\build\\1.cf')                          # загрузка
+    designer.load_cfg(r'D:\\build\\1.cf')                          # пропуск
+    designer.load_cfg(r'D:\\build\\1.cf', ignore_fingerprint=True) # загрузка
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from fileops import FileLock, atomic_write
+from logger_ import logger
+
+__all__ = ['FingerprintStore', 'cf_fingerprint', 'repo_fingerprint']
+
+FILE_DB_NAME = '1Cv8.1CD'
+FILE_REPO_NAME = '1cv8ddb.1CD'
+READ_SIZE = 1024 * 1024
+
+
+class FingerprintStore:
+    """Файл отпечатков конфигурации баз: ключ базы -> отпечаток последней загрузки."""
+
+    def __init__(self, file_name: str):
+        """
+        Args:
+          file_name: str: Полное имя файла JSON. Создается при первой записи
+        """
+
+        self.file_name = file_name
+        self._lock_file_name = file_name + '.lock'
+
+    def get(self, infobase_key: str) -> dict:
+        """Отпечаток базы, None - нет."""
+
+        return self._read().get(infobase_key)
+
+    def is_current(self, infobase_key: str, fingerprint: dict, dir_: str='') -> bool:
+        """В базе уже загружена конфигурация с этим отпечатком.
+
+        Args:
+          infobase_key: str: Ключ базы
+          fingerprint: dict: Отпечаток загружаемой конфигурации
+          dir_: str: Каталог файловой базы для сверки с базой. '' - серверная база (Default value = '')
+
+        Returns:
+          bool: Загрузку можно пропустить
+        """
+
+        stored = self.get(infobase_key)
+
+        if stored is None or stored['kind'] != fingerprint['kind'] or stored['value'] != fingerprint['value']:
+            return False
+
+        if fingerprint['db_updated'] and not stored['db_updated']:
+            return False
+
+        if dir_ and stored.get('db_stamp') != _file_stamp(os.path.join(dir_, FILE_DB_NAME)):
+            logger().info(f'База {infobase_key} изменялась после загрузки конфигурации, '
+                          f'отпечаток не используется')
+            return False
+
+        return True
+
+    def record(self, infobase_key: str, fingerprint: dict, dir_: str=''):
+        """Запись отпечатка после успешной загрузки.
+
+        Args:
+          infobase_key: str: Ключ базы
+          fingerprint: dict: Отпечаток загруженной конфигурации
+          dir_: str: Каталог файловой базы. '' - серверная база (Default value = '')
+        """
+
+        stored = dict(fingerprint, recorded=time.time())
+
+        if dir_:
+            stored['db_stamp'] = _file_stamp(os.path.join(dir_, FILE_DB_NAME))
+
+        self._update(infobase_key, stored)
+
+    def forget(self, infobase_key: str):
+        """Удаление отпечатка: конфигурация базы изменилась и неизвестна."""
+
+        self._update(infobase_key, None)
+
+    def _read(self) -> dict:
+        try:
+            with open(self.file_name, encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger().warning(f'Файл отпечатков {self.file_name} поврежден и не используется')
+            return {}
+
+    def _update(self, infobase_key: str, fingerprint: dict):
+        """Изменение отпечатка базы под блокировкой файла: базы загружаются параллельно."""
+
+        with FileLock(self._lock_file_name):
+            fingerprints = self._read()
+
+            if fingerprint is None:
+                if fingerprints.pop(infobase_key, None) is None:
+                    return
+            else:
+                fingerprints[infobase_key] = fingerprint
+
+            atomic_write(self.file_name, json.dumps(fingerprints, ensure_ascii=False, indent=1),
+                         encoding='utf-8')
+
+
+def cf_fingerprint(file_name_cf: str, db_updated: bool=False) -> dict:
+    """Отпечаток файла конфигурации.
+
+    Args:
+      file_name_cf: str: Полное имя файла .cf
+      db_updated: bool: Загрузка с обновлением конфигурации базы данных (Default value = False)
+    """
+
+    sha256 = hashlib.sha256()
+
+    with open(file_name_cf, 'rb') as file:
+        while True:
+            block = file.read(READ_SIZE)
+
+            if not block:
+                break
+
+            sha256.update(block)
+
+    return {'kind': 'cf', 'value': sha256.hexdigest(), 'db_updated': db_updated}
+
+def repo_fingerprint(repo_dir: str, version_: int=0, db_updated: bool=False) -> dict:
+    """Отпечаток версии хранилища.
+
+    Args:
+      repo_dir: str: Каталог или адрес хранилища
+      version_: int: Номер версии. 0 или -1 - последняя (Default value = 0)
+      db_updated: bool: Обновление с обновлением конфигурации базы данных (Default value = False)
+
+    Returns:
+      dict: Отпечаток. None - серверное хранилище, отпечаток не определяется
+    """
+
+    stamp = _file_stamp(os.path.join(repo_dir, FILE_REPO_NAME))
+
+    # Для базы, подключенной к хранилищу, номер версии игнорируется и получается последняя версия:
+    # без времени изменения файла хранилища отпечаток с номером версии недостоверен
+    if stamp is None:
+        return None
+
+    value = f'{repo_dir}#{version_ if version_ > 0 else "latest"}:{stamp[0]}:{stamp[1]}'
+
+    return {'kind': 'repo', 'value': value, 'db_updated': db_updated}
+
+def _file_stamp(file_name: str) -> list:
+    """Время изменения (нс) и размер файла, None - файла нет."""
+
+    try:
+        stat = os.stat(file_name)
+    except OSError:
+        return None
+
+    return [stat.st_mtime_ns, stat.st_size]
@@ -0,0 +1,188 @@
+"""Классификация ошибок выполнения 1С и политика повторов.
+
+Текст файла /Out и код возврата платформы сопоставляются с каталогом сигнатур
+ошибок. Временные ошибки (база заблокирована, объекты захвачены, кластер занят,
+нет лицензии) имеет смысл повторить, постоянные - нет.
+
+Пример:
+    designer.set_retry_params(RetryPolicy(max_attempts=5))
+
+    DEFAULT_CATALOG.add('Моя ошибка', ErrorKinds.TRANSIENT, r'сервис .* недоступен')
+"""
+
+from enum import Enum
+import random
+import re
+import threading
+
+__all__ = ['ErrorKinds', 'ErrorCatalog', 'RetryPolicy', 'DEFAULT_CATALOG']
+
+
+class ErrorKinds(Enum):
+    """Вид ошибки.
+
+    Attributes:
+      TRANSIENT: str: Временная, повтор может быть успешным
+      PERMANENT: str: Постоянная, повтор бесполезен
+      UNKNOWN: str: Не опознана
+    """
+
+    TRANSIENT = 'transient'
+    PERMANENT = 'permanent'
+    UNKNOWN = 'unknown'
+
+
+class ErrorCatalog:
+    """Каталог сигнатур ошибок.
+    Сигнатуры проверяются в порядке добавления: ошибка относится к первой подошедшей
+    сигнатуре, где бы ни находилось ее совпадение в тексте. Постоянная ошибка важнее временной:
+    если текст подходит и к постоянной сигнатуре, берется первая из постоянных.
+    Выражения компилируются при добавлении.
+    """
+
+    def __init__(self, signatures: list=None):
+        """
+        Args:
+          signatures: list: Сигнатуры: кортежи (имя, вид ошибки, регулярное выражение) (Default value = None)
+        """
+
+        self._signatures = []
+        self._return_codes = {}
+        self._lock = threading.Lock()
+
+        for name, kind, pattern in signatures or []:
+            self.add(name, kind, pattern)
+
+    def add(self, name: str, kind: ErrorKinds, pattern: str):
+        """Добавление сигнатуры по тексту ошибки. Регистр не учитывается.
+
+        Args:
+          name: str: Nмя сигнатуры, выводится в лог
+          kind: ErrorKinds: Вид ошибки
+          pattern: str: Регулярное выражение для поиска в тексте /Out
+        """
+
+        regex = re.compile(pattern, re.IGNORECASE) # ошибка в выражении должна проявиться сразу
+
+        with self._lock:
+            # список заменяется целиком: classify читает его без блокировки
+            self._signatures = self._signatures + [(name, kind, regex)]
+
+    def add_return_code(self, return_code: int, name: str, kind: ErrorKinds):
+        """Добавление сигнатуры по коду возврата. Проверяется, если текст не опознан.
+
+        Args:
+          return_code: int: Код возврата платформы
+          name: str: Nмя сигнатуры
+          kind: ErrorKinds: Вид ошибки
+        """
+
+        with self._lock:
+            self._return_codes[return_code] = (name, kind)
+
+    def classify(self, return_code: int, text: str) -> tuple:
+        """Определение вида ошибки.
+
+        Args:
+          return_code: int: Код возврата платформы
+          text: str: Текст файла /Out
+
+        Returns:
+          tuple: (ErrorKinds, имя сигнатуры или '')
+        """
+
+        text = text or ''
+        found = None
+
+        for name, kind, regex in self._signatures:
+            if regex.search(text):
+                if kind == ErrorKinds.PERMANENT:
+                    return kind, name
+
+                found = found or (kind, name)
+
+        if found:
+            return found
+
+        name, kind = self._return_codes.get(return_code, ('', ErrorKinds.UNKNOWN))
+
+        return kind, name
+
+
+class RetryPolicy:
+    """Политика повторов: экспоненциальная задержка со случайным разбросом."""
+
+    def __init__(self, max_attempts: int=3,
+                 base_delay: float=10,
+                 max_delay: float=300,
+                 jitter: float=0.5,
+                 retry_unknown: bool=False):
+        """
+        Args:
+          max_attempts: int: Максимальное количество попыток, включая первую (Default value = 3)
+          base_delay: float: Задержка перед первым повтором, сек (Default value = 10)
+          max_delay: float: Максимальная задержка, сек (Default value = 300)
+          jitter: float: Доля случайного разброса задержки от 0 до 1 (Default value = 0.5)
+          retry_unknown: bool: Повторять неопознанные ошибки (Default value = False)
+        """
+
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_unknown = retry_unknown
+
+    def should_retry(self, kind: ErrorKinds, attempt: int) -> bool:
+        """Нужен ли повтор после неуспешной попытки.
+
+        Args:
+          kind: ErrorKinds: Вид ошибки
+          attempt: int: Номер выполненной попытки, начиная с 1
+
+        Returns:
+          bool: Повторять
+        """
+
+        if attempt >= self.max_attempts:
+            return False
+
+        return (kind == ErrorKinds.TRANSIENT
+                or (kind == ErrorKinds.UNKNOWN and self.retry_unknown))
+
+    def delay(self, attempt: int) -> float:
+        """Задержка перед повтором.
+
+        Args:
+          attempt: int: Номер выполненной попытки, начиная с 1
+
+        Returns:
+          float: Задержка, сек
+        """
+
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+
+        return delay * (1 - self.jitter * random.random())
+
+
+DEFAULT_CATALOG = ErrorCatalog([
+    ('База заблокирована', ErrorKinds.TRANSIENT,
+     r'(баз\w*|файл\w*|конфигураци\w*).{0,40}заблокирован|блокировк\w* (информационной )?базы|монопольн|'
+     r'(infobase|database|file) is locked|error locking|exclusive mode'),
+    ('Объекты захвачены в хранилище', ErrorKinds.TRANSIENT,
+     r'объект\w*.{0,80}захвачен|захвачен\w* (в хранилище|пользовател)|'
+     r'objects?.{0,80}(is|are|already) captured|captured (by|in the repository)'),
+    ('Кластер занят или недоступен', ErrorKinds.TRANSIENT,
+     r'кластер.{0,40}(занят|недоступ)|сервер.{0,40}(занят|недоступ)|'
+     r'server is busy|превышено время ожидания|время ожидания.{0,40}истекло|'
+     r'(connection|operation|request) timed out|timeout (expired|exceeded)'),
+    ('Нет лицензии', ErrorKinds.TRANSIENT,
+     r'не обнаружено свободной лицензии|лицензи.{0,40}не (получ|найден|обнаруж)|license not'),
+    ('Разрыв соединения', ErrorKinds.TRANSIENT,
+     r'соединение.{0,40}разорван|connection.{0,40}(lost|reset)'),
+    ('Ошибка аутентификации', ErrorKinds.PERMANENT,
+     r'идентификация пользователя не выполнена|неправильн.{0,20}(имя|пароль)|authentication failed'),
+    ('Неверный формат файла', ErrorKinds.PERMANENT,
+     r'неверный формат|неправильный формат|invalid format'),
+    ('Файл не найден', ErrorKinds.PERMANENT,
+     r'файл не (найден|обнаружен)|file not found'),
+])
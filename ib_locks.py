@@ -0,0 +1,252 @@
+"""Блокировки информационных баз между потоками и процессами.
+
+Несколько независимых скриптов на одном агенте работают с одними и теми же базами,
+и два конфигуратора на одной файловой базе падают после долгого ожидания.
+Менеджер блокировок (RunInfobase.set_ib_lock_params) захватывается каждой операцией
+перед запуском 1С по ключу базы (нормализованная строка соединения без учетных данных):
+- чтение (выгрузки, запуск предприятия) - разделяемая блокировка, такие операции идут вместе;
+- изменение (загрузка конфигурации и базы, обновление из хранилища) - монопольная.
+
+Блокировки - файлы в общем каталоге lock_dir (fcntl.flock, на Windows msvcrt),
+поэтому действуют между всеми процессами, использующими тот же каталог.
+На Windows msvcrt поддерживает только монопольные блокировки: разделяемые операции
+там не выполняются одновременно, а ждут друг друга как монопольные.
+Порядок справедливый: запрос захватывает вход (отдельный файл-блокировку базы) и держит его,
+пока ждет саму блокировку, поэтому ожидающая монопольная операция не обгоняется
+новыми разделяемыми; внутри процесса запросы к одной базе обслуживаются в порядке поступления.
+
+Повторный захват той же базы в том же потоке (вложенная операция) не ждет. Если поток держит
+разделяемую блокировку, а вложенной операции нужна монопольная (например, load_cfg внутри run),
+возбуждается InfobaseLockUpgrade: повышение блокировки привело бы к взаимоблокировке
+двух потоков с разделяемыми блокировками.
+
+Пример:
+    ib_locks = InfobaseLockManager(lock_dir=r'D:\\1c\\locks', timeout=3600)
+    designer.set_ib_lock_params(ib_locks)
+"""
+
+from collections import deque
+from contextlib import contextmanager
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from fileops import FileLock, FileLockTimeout
+from logger_ import logger
+
+__all__ = ['InfobaseLockManager', 'InfobaseLockTimeout', 'InfobaseLockUpgrade', 'SHARED_OPERATIONS']
+
+# Операции, которые могут выполняться одновременно друг с другом
+SHARED_OPERATIONS = ('dump_config_to_files', 'dump_repo_to_file', 'dump_ib', 'run')
+LOCK_DIR_NAME = 'ones_ib_locks'
+POLL_SECONDS = 0.5
+
+
+class InfobaseLockTimeout(Exception):
+    """Nсключение 'Блокировка базы не получена за отведенное время'"""
+
+
+class InfobaseLockUpgrade(Exception):
+    """Nсключение 'Вложенной операции нужна монопольная блокировка, а поток держит разделяемую'"""
+
+
+class _Turnstile:
+    """Очередь запросов к одной базе внутри процесса."""
+
+    def __init__(self):
+        self.waiting = deque()
+        self.changed = threading.Condition()
+
+
+class _Request:
+    """Запрос блокировки."""
+
+    def __init__(self, infobase_key: str, operation: str, exclusive: bool, timeout: float, token):
+        self.infobase_key = infobase_key
+        self.description = f'{operation or "операции"} ({"монопольная" if exclusive else "разделяемая"})'
+        self.timeout = timeout
+        self.token = token
+        self.start_time = time.monotonic()
+        self.deadline = None if timeout is None else self.start_time + timeout
+        self.waited = False
+
+    def remaining(self) -> float:
+        """Время одной попытки ожидания: до срока, но не больше POLL_SECONDS."""
+
+        if self.deadline is None:
+            return POLL_SECONDS
+
+        return max(0, min(POLL_SECONDS, self.deadline - time.monotonic()))
+
+
+class InfobaseLockManager:
+    """Менеджер блокировок баз. Один объект разделяется всеми потоками процесса."""
+
+    def __init__(self, lock_dir: str='', timeout: float=None,
+                 shared_operations: tuple=SHARED_OPERATIONS):
+        """
+        Args:
+          lock_dir: str: Общий каталог файлов блокировок. Создается при отсутствии.
+                         '' - каталог во временном каталоге ОС (Default value = '')
+          timeout: float: Максимальное ожидание блокировки, сек. None - без ограничения (Default value = None)
+          shared_operations: tuple: Операции с разделяемой блокировкой (Default value = SHARED_OPERATIONS)
+        """
+
+        self.lock_dir = lock_dir or os.path.join(tempfile.gettempdir(), LOCK_DIR_NAME)
+        self._timeout = timeout
+        self._shared_operations = shared_operations
+        self._turnstiles = {}
+        self._lock = threading.Lock()
+        self._held = threading.local()
+        self.metrics = {'acquired': 0, 'waited': 0, 'timeouts': 0,
+                        'wait_seconds': 0.0, 'max_wait_seconds': 0.0}
+
+        os.makedirs(self.lock_dir, exist_ok=True)
+
+    def is_exclusive(self, operation: str) -> bool:
+        """Операции нужна монопольная блокировка."""
+
+        return operation not in self._shared_operations
+
+    @contextmanager
+    def lock(self, infobase_key: str, operation: str='', timeout: float=None, token=None):
+        """Блокировка базы на время блока with.
+
+        Args:
+          infobase_key: str: Ключ базы (RunInfobase._infobase_key)
+          operation: str: Операция, определяет вид блокировки (Default value = '')
+          timeout: float: Максимальное ожидание. None - заданное в менеджере (Default value = None)
+          token: CancellationToken: Токен отмены, прерывает ожидание (Default value = None)
+
+        Raises:
+          InfobaseLockTimeout: Блокировка не получена за timeout секунд
+          InfobaseLockUpgrade: Поток держит разделяемую блокировку базы, а операции нужна монопольная
+          OperationCancelled: Ожидание отменено
+        """
+
+        held = self._held_keys()
+        exclusive = self.is_exclusive(operation)
+
+        if infobase_key in held:
+            # вложенная операция того же потока уже держит блокировку
+            if exclusive and not held[infobase_key][1]:
+                raise InfobaseLockUpgrade(f'Операции {operation} нужна монопольная блокировка базы '
+                                          f'{infobase_key}, а поток держит разделяемую')
+
+            held[infobase_key][0] += 1
+
+            try:
+                yield
+            finally:
+                held[infobase_key][0] -= 1
+
+            return
+
+        file_lock = self._acquire(infobase_key, operation, exclusive,
+                                  self._timeout if timeout is None else timeout, token)
+        held[infobase_key] = [1, exclusive]
+
+        try:
+            yield
+        finally:
+            del held[infobase_key]
+            file_lock.release()
+
+    def _acquire(self, infobase_key: str, operation: str, exclusive: bool,
+                 timeout: float, token) -> FileLock:
+        """Ожидание блокировки: очередь процесса, вход базы, затем сама блокировка."""
+
+        request = _Request(infobase_key, operation, exclusive, timeout, token)
+        name = hashlib.sha256(infobase_key.encode('utf-8')).hexdigest()[:32]
+        turnstile = self._turnstile(name)
+
+        with turnstile.changed:
+            turnstile.waiting.append(request)
+
+        try:
+            with turnstile.changed:
+                while turnstile.waiting[0] is not request:
+                    request.waited = True
+                    turnstile.changed.wait(request.remaining())
+                    self._check(request)
+
+            gate = self._wait_file_lock(os.path.join(self.lock_dir, name + '.gate'), True, request)
+
+            try:
+                file_lock = self._wait_file_lock(os.path.join(self.lock_dir, name + '.lock'),
+                                                 exclusive, request)
+            finally:
+                gate.release()
+        finally:
+            with turnstile.changed:
+                turnstile.waiting.remove(request)
+                turnstile.changed.notify_all()
+
+        wait_seconds = time.monotonic() - request.start_time
+
+        with self._lock:
+            self.metrics['acquired'] += 1
+            self.metrics['wait_seconds'] += wait_seconds
+            self.metrics['max_wait_seconds'] = max(self.metrics['max_wait_seconds'], wait_seconds)
+
+            if request.waited:
+                self.metrics['waited'] += 1
+
+        if request.waited:
+            logger().info(f'Блокировка базы {infobase_key} для {request.description} '
+                          f'получена через {wait_seconds:.0f} сек')
+
+        return file_lock
+
+    def _wait_file_lock(self, lock_file_name: str, exclusive: bool, request: '_Request') -> FileLock:
+        """Захват файла-блокировки короткими попытками с проверкой срока и отмены."""
+
+        logged = False
+        timeout = 0 # первая попытка без ожидания, чтобы учесть ожидание в метриках
+
+        while True:
+            if request.token is not None:
+                request.token.raise_if_cancelled()
+
+            file_lock = FileLock(lock_file_name, exclusive, timeout=timeout)
+            timeout = request.remaining()
+
+            try:
+                file_lock.acquire()
+                return file_lock
+            except FileLockTimeout:
+                request.waited = True
+
+            self._check(request)
+
+            if not logged:
+                logged = True
+                logger().info(f'База {request.infobase_key} заблокирована, '
+                              f'ожидание блокировки для {request.description}')
+
+    def _check(self, request: '_Request'):
+        """Проверка отмены и срока ожидания."""
+
+        if request.token is not None:
+            request.token.raise_if_cancelled()
+
+        if request.deadline is not None and time.monotonic() >= request.deadline:
+            with self._lock:
+                self.metrics['timeouts'] += 1
+
+            raise InfobaseLockTimeout(f'Блокировка базы {request.infobase_key} '
+                                      f'для {request.description} не получена за {request.timeout} сек')
+
+    def _turnstile(self, name: str) -> _Turnstile:
+        with self._lock:
+            return self._turnstiles.setdefault(name, _Turnstile())
+
+    def _held_keys(self) -> dict:
+        """Базы, заблокированные текущим потоком: ключ -> [глубина вложенности, монопольная]."""
+
+        if not hasattr(self._held, 'keys'):
+            self._held.keys = {}
+
+        return self._held.keys
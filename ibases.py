@@ -0,0 +1,425 @@
+"""Чтение и запись файла списка информационных баз 1С (ibases.v8i).
+
+В отличие от ConfigParser сохраняет порядок баз и параметров, неизвестные параметры,
+комментарии и переводы строк, допускает базы с одинаковыми именами
+и поддерживает индексы по имени, ID и строке соединения (Connect).
+"""
+
+from collections.abc import Iterator
+import re
+import sys
+
+from fileops import atomic_write
+
+__all__ = ['BaseList', 'BaseListEntry', 'BaseListFormatError', 'normalize_connect']
+
+ENCODING = 'utf_8_sig'
+
+_SECTION_RE = re.compile(r'^\s*\[(?P<name>.*)\]\s*$')
+_CONNECT_PAIR_RE = re.compile(r'''\s*(?P<key>[^=;]+?)\s*=\s*(?:"(?P<dq>(?:[^"]|"")*)"|'(?P<sq>(?:[^']|'')*)'|(?P<raw>[^;]*));?''')
+
+# Параметры строки соединения, однозначно определяющие расположение базы.
+# Прочие (Usr, Pwd, Locale и т.п.) на адрес базы не влияют.
+_CONNECT_TARGET_KEYS = ('file', 'srvr', 'ref', 'ws')
+# Путь Windows (диск или UNC): регистр не важен на любой ОС
+_WINDOWS_PATH_RE = re.compile(r'^(?:[a-z]:|[\\/]{2})', re.IGNORECASE)
+
+
+def normalize_connect(connect: str) -> str:
+    """Приводит строку соединения к виду, пригодному для сравнения.
+    Учитываются только параметры расположения базы (File, Srvr, Ref, ws),
+    регистр и вид кавычек не важны, разделители пути приводятся к '\\'.
+    Регистр пути файловой базы не важен только для путей Windows: на Linux /srv/Base и /srv/base - разные базы.
+
+    Подходит и для строк из ibases.v8i (File="D:\\base";),
+    и для строк /IBConnectionString (FILE='D:\\base';Usr='user';).
+
+    Args:
+      connect: str: Строка соединения
+
+    Returns:
+      str: Нормализованная строка, например file=d:\\base или srvr=server1;ref=base1
+    """
+
+    pairs = {}
+
+    for match in _CONNECT_PAIR_RE.finditer(connect):
+        key = match.group('key').strip().lower()
+
+        if key not in _CONNECT_TARGET_KEYS:
+            continue
+
+        if match.group('dq') is not None:
+            value = match.group('dq').replace('""', '"')
+        elif match.group('sq') is not None:
+            value = match.group('sq').replace("''", "'")
+        else:
+            value = match.group('raw')
+
+        value = value.strip()
+
+        if key != 'file' or sys.platform == 'win32' or _WINDOWS_PATH_RE.match(value):
+            value = value.lower()
+
+        if key == 'file':
+            value = value.replace('/', '\\').rstrip('\\')
+
+        pairs[key] = value
+
+    return ';'.join(f'{key}={pairs[key]}' for key in _CONNECT_TARGET_KEYS if key in pairs)
+
+
+class BaseListEntry:
+    """База в списке баз. Хранит строки секции как есть, с индексом параметров."""
+
+    def __init__(self, name: str, lines: list=None):
+        """
+        Args:
+          name: str: Nмя базы в списке (заголовок секции)
+          lines: list: Строки секции после заголовка, без переводов строк (Default value = None)
+        """
+
+        self.name = name
+        self._lines = lines if lines else []
+        self._reindex()
+
+    def get(self, key: str, default: str=None) -> str:
+        """Значение параметра без учета регистра имени.
+
+        Args:
+          key: str: Nмя параметра, например Connect
+          default: str: Значение, если параметра нет (Default value = None)
+
+        Returns:
+          str: Значение параметра
+        """
+
+        index = self._keys.get(key.lower())
+
+        if index is None:
+            return default
+
+        return self._lines[index].split('=', 1)[1]
+
+    def set(self, key: str, value: str) -> bool:
+        """Устанавливает значение параметра. Новый параметр добавляется в конец секции.
+
+        Args:
+          key: str: Nмя параметра
+          value: str: Значение параметра
+
+        Returns:
+          bool: Значение изменилось
+        """
+
+        index = self._keys.get(key.lower())
+
+        if index is None:
+            # Пустые строки в конце секции остаются после параметров
+            index = len(self._lines)
+            while index and not self._lines[index - 1].strip():
+                index -= 1
+
+            self._lines.insert(index, f'{key}={value}')
+            self._reindex()
+            return True
+
+        old_key, old_value = self._lines[index].split('=', 1)
+
+        if old_value == value:
+            return False
+
+        self._lines[index] = f'{old_key}={value}'
+        return True
+
+    def items(self) -> Iterator:
+        """Пары (параметр, значение) в порядке файла."""
+
+        for line in self._lines:
+            if _line_key(line) is not None:
+                key, value = line.split('=', 1)
+                yield key.strip(), value
+
+    @property
+    def id(self) -> str:
+        """Значение параметра ID."""
+
+        return self.get('ID', '')
+
+    @property
+    def connect(self) -> str:
+        """Значение параметра Connect."""
+
+        return self.get('Connect', '')
+
+    def _reindex(self):
+        """Перестроение индекса параметров."""
+
+        self._keys = {}
+
+        for index, line in enumerate(self._lines):
+            key = _line_key(line)
+            if key is not None:
+                self._keys.setdefault(key.lower(), index)
+
+
+class BaseList:
+    """Список информационных баз, прочитанный из ibases.v8i.
+
+    Пример:
+        base_list = BaseList.read(file_name)
+        entry = base_list.find_by_connect("File='D:\\base1';")
+        base_list.update(entry, {'Version': '8.3.18'})
+        base_list.write(file_name)
+    """
+
+    def __init__(self):
+        self._preamble = []
+        self._entries = {}
+        self._by_name = {}
+        self._by_id = {}
+        self._by_connect = {}
+        self._newline = '\r\n'
+        self.modified = False
+
+    @classmethod
+    def read(cls, file_name: str) -> 'BaseList':
+        """Чтение файла списка баз за один проход.
+
+        Args:
+          file_name: str: Полное имя файла списка баз 1С - ibases.v8i
+
+        Returns:
+          BaseList: Список баз
+        """
+
+        with open(file_name, 'r', encoding=ENCODING, newline='') as file:
+            return cls.parse(file)
+
+    @classmethod
+    def parse(cls, lines) -> 'BaseList':
+        """Разбор строк файла списка баз.
+
+        Args:
+          lines: Итерируемые строки файла, с переводами строк или без
+
+        Returns:
+          BaseList: Список баз
+
+        Raises:
+          BaseListFormatError: Параметр вне секции базы
+        """
+
+        base_list = cls()
+        newline_detected = False
+
+        name = None
+        section_lines = []
+
+        for line_number, line in enumerate(lines, 1):
+            if not newline_detected and line.endswith('\n'):
+                base_list._newline = '\r\n' if line.endswith('\r\n') else '\n'
+                newline_detected = True
+
+            line = line.rstrip('\r\n')
+            match = _SECTION_RE.match(line)
+
+            if match:
+                if name is not None:
+                    base_list._append(BaseListEntry(name, section_lines))
+
+                name = match.group('name')
+                section_lines = []
+
+            elif name is not None:
+                section_lines.append(line)
+
+            elif not line.strip() or _is_comment(line):
+                base_list._preamble.append(line)
+
+            else:
+                raise BaseListFormatError(
+                    f'Строка {line_number} находится вне секции базы: {line}')
+
+        if name is not None:
+            base_list._append(BaseListEntry(name, section_lines))
+
+        return base_list
+
+    def write(self, file_name: str):
+        """Атомарная запись списка баз в файл.
+
+        Args:
+          file_name: str: Полное имя файла списка баз 1С - ibases.v8i
+        """
+
+        atomic_write(file_name, self.dumps(), encoding=ENCODING)
+        self.modified = False
+
+    def dumps(self) -> str:
+        """Текст файла списка баз."""
+
+        lines = list(self._preamble)
+
+        for entry in self._entries.values():
+            lines.append(f'[{entry.name}]')
+            lines.extend(entry._lines)
+
+        if not lines:
+            return ''
+
+        return self._newline.join(lines) + self._newline
+
+    def __iter__(self) -> Iterator:
+        return iter(self._entries.values())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, name: str) -> BaseListEntry:
+        """Поиск базы по имени в списке. При одинаковых именах возвращается первая.
+
+        Args:
+          name: str: Nмя базы в списке
+
+        Returns:
+          BaseListEntry: База или None
+        """
+
+        entries = self._by_name.get(name)
+        return entries[0] if entries else None
+
+    def find_by_id(self, id_: str) -> BaseListEntry:
+        """Поиск базы по параметру ID. При одинаковых ID возвращается первая.
+
+        Args:
+          id_: str: Значение ID базы в списке
+
+        Returns:
+          BaseListEntry: База или None
+        """
+
+        entries = self._by_id.get(id_.lower())
+        return entries[0] if entries else None
+
+    def find_by_connect(self, connect: str) -> BaseListEntry:
+        """Поиск базы по строке соединения. Строки сравниваются в нормализованном виде,
+        см. normalize_connect. При одинаковых строках возвращается первая.
+
+        Args:
+          connect: str: Строка соединения
+
+        Returns:
+          BaseListEntry: База или None
+        """
+
+        entries = self._by_connect.get(normalize_connect(connect))
+        return entries[0] if entries else None
+
+    def add(self, name: str, parameters: dict) -> BaseListEntry:
+        """Добавление базы в конец списка.
+
+        Args:
+          name: str: Nмя базы в списке
+          parameters: dict: Параметры базы, например {'Connect': 'File="D:\\base1";', 'ID': '...'}
+
+        Returns:
+          BaseListEntry: Добавленная база
+        """
+
+        entry = BaseListEntry(name, [f'{key}={value}' for key, value in parameters.items()])
+        self._append(entry)
+        self.modified = True
+
+        return entry
+
+    def remove(self, entry: BaseListEntry):
+        """Удаление базы из списка.
+
+        Args:
+          entry: BaseListEntry: База из этого списка
+        """
+
+        del self._entries[id(entry)]
+        self._unindex(entry)
+        self.modified = True
+
+    def update(self, entry: BaseListEntry, parameters: dict) -> bool:
+        """Установка параметров базы с обновлением индексов.
+
+        Args:
+          entry: BaseListEntry: База из этого списка
+          parameters: dict: Устанавливаемые параметры {параметр: значение}
+
+        Returns:
+          bool: Хотя бы одно значение изменилось
+        """
+
+        self._unindex(entry)
+
+        changed = False
+        for key, value in parameters.items():
+            changed = entry.set(key, value) or changed
+
+        self._index(entry)
+        self.modified = self.modified or changed
+
+        return changed
+
+    def _append(self, entry: BaseListEntry):
+        """Добавление базы в список и индексы."""
+
+        self._entries[id(entry)] = entry
+        self._index(entry)
+
+    def _index(self, entry: BaseListEntry):
+        """Добавление базы в индексы. Базы с одинаковым ключом хранятся в порядке файла."""
+
+        for index, key in self._index_keys(entry):
+            entries = index.setdefault(key, [])
+            entries.append(entry)
+
+            if len(entries) > 1:
+                order = {id(item): number for number, item in enumerate(self._entries.values())}
+                entries.sort(key=lambda item: order[id(item)])
+
+    def _unindex(self, entry: BaseListEntry):
+        """Удаление базы из индексов."""
+
+        for index, key in self._index_keys(entry):
+            entries = index.get(key, [])
+            if entry in entries:
+                entries.remove(entry)
+            if not entries:
+                index.pop(key, None)
+
+    def _index_keys(self, entry: BaseListEntry) -> list:
+        """Nндексы и ключи базы в них: имя, ID и нормализованная строка соединения."""
+
+        keys = [(self._by_name, entry.name)]
+
+        if entry.id:
+            keys.append((self._by_id, entry.id.lower()))
+
+        if entry.connect:
+            keys.append((self._by_connect, normalize_connect(entry.connect)))
+
+        return keys
+
+
+class BaseListFormatError(Exception):
+    """Nсключение 'Неверный формат файла списка баз'"""
+
+
+def _is_comment(line: str) -> bool:
+    """Строка является комментарием."""
+
+    return line.lstrip().startswith((';', '#'))
+
+def _line_key(line: str) -> str:
+    """Nмя параметра в строке секции или None для пустых строк и комментариев."""
+
+    if '=' not in line or _is_comment(line):
+        return None
+
+    return line.split('=', 1)[0].strip()
@@ -0,0 +1,421 @@
+"""Долговременная очередь заданий 1С на SQLite.
+
+Задания (см. модуль jobs) хранятся в файле базы SQLite и переживают
+перезапуск агента. Поддерживаются приоритеты, повторы с задержкой и аренда:
+взятое задание выдается исполнителю на lease_seconds, исполнитель продлевает аренду,
+а задание упавшего исполнителя по истечении аренды снова попадает в очередь.
+Пока по базе выполняется задание, другие задания этой же базы не выдаются,
+поэтому два процесса 1cv8 к одной базе из очереди не запускаются.
+
+Пример:
+    queue = JobQueue(r'D:\\queue.db')
+    queue.put_runner(designer, 'load_cfg', priority=10, file_name_cf=r'D:\\1.cf')
+
+    worker = QueueWorker(queue)
+    worker.run_forever()
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+
+from ib_errors import ErrorKinds
+import jobs
+import logger_
+from logger_ import logger
+from preflight import BusyActions, InfobaseBusy
+
+__all__ = ['JobQueue', 'QueuedJob', 'QueueWorker', 'QueueStates']
+
+DEFAULT_LEASE_SECONDS = 600
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_DELAY_SECONDS = 30
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    spec TEXT NOT NULL,
+    infobase TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    not_before REAL NOT NULL DEFAULT 0,
+    lease_until REAL,
+    worker TEXT,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    finished REAL
+);
+
+-- Выборка следующего задания: только ожидающие, в порядке приоритета и постановки
+CREATE INDEX IF NOT EXISTS jobs_queued
+    ON jobs (priority DESC, id) WHERE state = 'queued';
+
+-- Проверка занятости базы и поиск просроченной аренды
+CREATE INDEX IF NOT EXISTS jobs_running_infobase
+    ON jobs (infobase) WHERE state = 'running';
+
+CREATE INDEX IF NOT EXISTS jobs_running_lease
+    ON jobs (lease_until) WHERE state = 'running';
+'''
+
+
+class QueueStates:
+    """Состояния задания в очереди."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+
+class QueuedJob:
+    """Задание, выданное исполнителю."""
+
+    def __init__(self, job_id: int, spec: dict, attempts: int, worker: str):
+        self.id = job_id
+        self.spec = spec
+        self.attempts = attempts
+        self.worker = worker
+
+
+class JobQueue:
+    """Очередь заданий в файле SQLite. Безопасна для нескольких потоков и процессов."""
+
+    def __init__(self, db_file_name: str,
+                 lease_seconds: float=DEFAULT_LEASE_SECONDS,
+                 retry_delay_seconds: float=DEFAULT_RETRY_DELAY_SECONDS):
+        """
+        Args:
+          db_file_name: str: Полное имя файла базы SQLite. Создается при отсутствии
+          lease_seconds: float: Срок аренды задания исполнителем (Default value = DEFAULT_LEASE_SECONDS)
+          retry_delay_seconds: float: Задержка перед повтором неуспешного задания.
+                                      Удваивается с каждой попыткой (Default value = DEFAULT_RETRY_DELAY_SECONDS)
+        """
+
+        self._db_file_name = db_file_name
+        self.lease_seconds = lease_seconds
+        self.retry_delay_seconds = retry_delay_seconds
+
+        connection = sqlite3.connect(db_file_name, timeout=30, isolation_level=None)
+
+        try:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(_SCHEMA)
+        finally:
+            connection.close()
+
+    def put(self, spec: dict,
+            priority: int=0,
+            max_attempts: int=DEFAULT_MAX_ATTEMPTS) -> int:
+        """Постановка задания в очередь.
+
+        Args:
+          spec: dict: Задание (см. модуль jobs)
+          priority: int: Приоритет, большее значение выдается раньше (Default value = 0)
+          max_attempts: int: Максимальное количество попыток выполнения (Default value = DEFAULT_MAX_ATTEMPTS)
+
+        Returns:
+          int: Nдентификатор задания
+        """
+
+        infobase = jobs.create_runner(spec)._infobase_key()
+
+        with self._connect() as connection:
+            cursor = connection.execute(
+                'INSERT INTO jobs (spec, infobase, priority, state, max_attempts, created) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (json.dumps(spec), infobase, priority, QueueStates.QUEUED, max_attempts, time.time()))
+
+            return cursor.lastrowid
+
+    def put_runner(self, runner, operation: str,
+                   priority: int=0,
+                   max_attempts: int=DEFAULT_MAX_ATTEMPTS,
+                   **kwargs) -> int:
+        """Постановка в очередь операции настроенного объекта запуска.
+
+        Args:
+          runner: RunInfobase: Объект CreationInfobase, Designer или Enterprise
+          operation: str: Nмя метода операции
+          priority: int: Приоритет (Default value = 0)
+          max_attempts: int: Максимальное количество попыток (Default value = DEFAULT_MAX_ATTEMPTS)
+          **kwargs: Параметры операции
+
+        Returns:
+          int: Nдентификатор задания
+        """
+
+        return self.put(jobs.job_from_runner(runner, operation, **kwargs), priority, max_attempts)
+
+    def take(self, worker: str) -> QueuedJob:
+        """Выдача следующего задания исполнителю.
+        Выдается задание с наибольшим приоритетом, у которого истекла задержка повтора
+        и по базе которого сейчас ничего не выполняется.
+
+        Args:
+          worker: str: Nдентификатор исполнителя
+
+        Returns:
+          QueuedJob: Задание или None, если выдать нечего
+        """
+
+        now = time.time()
+
+        with self._transaction() as connection:
+            self._recover_expired(connection, now)
+
+            row = connection.execute(
+                'SELECT id, spec, attempts FROM jobs AS queued '
+                "WHERE state = 'queued' AND not_before <= ? "
+                'AND NOT EXISTS (SELECT 1 FROM jobs AS running '
+                "                WHERE running.state = 'running' AND running.infobase = queued.infobase) "
+                'ORDER BY priority DESC, id LIMIT 1', (now,)).fetchone()
+
+            if row is None:
+                return None
+
+            job_id, spec, attempts = row
+
+            connection.execute(
+                'UPDATE jobs SET state = ?, attempts = attempts + 1, lease_until = ?, worker = ? '
+                'WHERE id = ?',
+                (QueueStates.RUNNING, now + self.lease_seconds, worker, job_id))
+
+        return QueuedJob(job_id, json.loads(spec), attempts + 1, worker)
+
+    def heartbeat(self, job: QueuedJob) -> bool:
+        """Продление аренды задания.
+
+        Returns:
+          bool: Аренда продлена. False - задание уже не принадлежит исполнителю
+        """
+
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND state = 'running'",
+                (time.time() + self.lease_seconds, job.id, job.worker))
+
+            return cursor.rowcount == 1
+
+    def complete(self, job: QueuedJob, result, error_kind: ErrorKinds=None):
+        """Завершение задания. Результат False считается неуспехом и приводит к повтору,
+        если попытки не исчерпаны и ошибка не постоянная.
+
+        Args:
+          job: QueuedJob: Задание
+          result: Результат операции
+          error_kind: ErrorKinds: Вид ошибки неуспешной операции (RunInfobase.last_error_kind).
+                                  Постоянная ошибка не повторяется (Default value = None)
+        """
+
+        if result is False:
+            if error_kind == ErrorKinds.PERMANENT:
+                self.fail(job, 'Операция завершилась неуспешно, ошибка постоянная', retry=False)
+            else:
+                self.fail(job, 'Операция завершилась неуспешно')
+            return
+
+        with self._connect() as connection:
+            connection.execute(
+                'UPDATE jobs SET state = ?, result = ?, finished = ?, lease_until = NULL '
+                'WHERE id = ? AND worker = ?',
+                (QueueStates.SUCCEEDED, json.dumps(result), time.time(), job.id, job.worker))
+
+    def fail(self, job: QueuedJob, error: str, retry: bool=True):
+        """Неуспешное завершение задания с повтором, если попытки не исчерпаны.
+
+        Args:
+          job: QueuedJob: Задание
+          error: str: Текст ошибки
+          retry: bool: Допускается повтор (Default value = True)
+        """
+
+        now = time.time()
+
+        with self._transaction() as connection:
+            row = connection.execute('SELECT attempts, max_attempts FROM jobs WHERE id = ? AND worker = ?',
+                                     (job.id, job.worker)).fetchone()
+
+            if row is None:
+                return
+
+            attempts, max_attempts = row
+
+            if retry and attempts < max_attempts:
+                delay = self.retry_delay_seconds * 2 ** (attempts - 1)
+                connection.execute(
+                    'UPDATE jobs SET state = ?, error = ?, not_before = ?, lease_until = NULL, worker = NULL '
+                    'WHERE id = ?', (QueueStates.QUEUED, error, now + delay, job.id))
+            else:
+                connection.execute(
+                    'UPDATE jobs SET state = ?, error = ?, finished = ?, lease_until = NULL '
+                    'WHERE id = ?', (QueueStates.FAILED, error, now, job.id))
+
+    def release(self, job: QueuedJob, delay_seconds: float=0):
+        """Возврат задания в очередь без расходования попытки.
+        Например, если база оказалась занята.
+
+        Args:
+          job: QueuedJob: Задание
+          delay_seconds: float: Задание не выдается указанное время (Default value = 0)
+        """
+
+        with self._connect() as connection:
+            connection.execute(
+                'UPDATE jobs SET state = ?, attempts = attempts - 1, not_before = ?, '
+                'lease_until = NULL, worker = NULL WHERE id = ? AND worker = ?',
+                (QueueStates.QUEUED, time.time() + delay_seconds, job.id, job.worker))
+
+    def status(self, job_id: int) -> dict:
+        """Состояние задания или None, если задания нет."""
+
+        with self._connect() as connection:
+            connection.row_factory = sqlite3.Row
+            row = connection.execute(
+                'SELECT id, infobase, priority, state, attempts, max_attempts, worker, result, error, '
+                'created, finished FROM jobs WHERE id = ?', (job_id,)).fetchone()
+
+        return dict(row) if row else None
+
+    def counts(self) -> dict:
+        """Количество заданий по состояниям."""
+
+        with self._connect() as connection:
+            return dict(connection.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state'))
+
+    def _recover_expired(self, connection, now: float):
+        """Возврат в очередь заданий с истекшей арендой (исполнитель упал или завис)."""
+
+        expired = connection.execute(
+            "SELECT id, attempts, max_attempts, worker FROM jobs "
+            "WHERE state = 'running' AND lease_until < ?", (now,)).fetchall()
+
+        for job_id, attempts, max_attempts, worker in expired:
+            logger().warning(f'Очередь заданий. Nстекла аренда задания {job_id} исполнителем {worker}')
+
+            if attempts < max_attempts:
+                connection.execute(
+                    'UPDATE jobs SET state = ?, lease_until = NULL, worker = NULL WHERE id = ?',
+                    (QueueStates.QUEUED, job_id))
+            else:
+                connection.execute(
+                    'UPDATE jobs SET state = ?, error = ?, finished = ?, lease_until = NULL WHERE id = ?',
+                    (QueueStates.FAILED, 'Nстекла аренда, попытки исчерпаны', now, job_id))
+
+    def _connect(self) -> '_Connection':
+        """Соединение с базой. Используется как контекстный менеджер транзакции."""
+
+        return _Connection(self._db_file_name)
+
+    def _transaction(self) -> '_Connection':
+        """Транзакция с немедленной блокировкой на запись."""
+
+        return _Connection(self._db_file_name, immediate=True)
+
+
+class _Connection:
+    """Соединение с базой SQLite на время одной транзакции."""
+
+    def __init__(self, db_file_name: str, immediate: bool=False):
+        self._connection = sqlite3.connect(db_file_name, timeout=30, isolation_level=None)
+        self._immediate = immediate
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._connection.execute('BEGIN IMMEDIATE' if self._immediate else 'BEGIN')
+        return self._connection
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        try:
+            if exc_type is None:
+                self._connection.execute('COMMIT')
+            else:
+                self._connection.execute('ROLLBACK')
+        finally:
+            self._connection.close()
+
+
+class QueueWorker:
+    """Nсполнитель заданий из очереди."""
+
+    def __init__(self, queue: JobQueue, worker: str='', poll_seconds: float=5,
+                 busy_delay_seconds: float=60):
+        """
+        Args:
+          queue: JobQueue: Очередь заданий
+          worker: str: Nдентификатор исполнителя. По умолчанию имя компьютера и PID (Default value = '')
+          poll_seconds: float: Пауза опроса пустой очереди (Default value = 5)
+          busy_delay_seconds: float: Через сколько повторить задание, если база занята (Default value = 60)
+        """
+
+        self._queue = queue
+        self.worker = worker or f'{socket.gethostname()}:{os.getpid()}'
+        self._poll_seconds = poll_seconds
+        self._busy_delay_seconds = busy_delay_seconds
+
+    def run_once(self) -> bool:
+        """Выполнение одного задания.
+
+        Returns:
+          bool: Задание было взято из очереди
+        """
+
+        job = self._queue.take(self.worker)
+
+        if job is None:
+            return False
+
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, stop_heartbeat), daemon=True)
+        heartbeat.start()
+
+        try:
+            with logger_.job_context(job.id):
+                runner = jobs.create_runner(job.spec)
+                result = jobs.run_job(job.spec, on_busy=BusyActions.RAISE, runner=runner)
+
+        except InfobaseBusy as ex:
+            logger().warning(f'Очередь заданий. Задание {job.id} возвращено в очередь: {ex}')
+            self._queue.release(job, self._busy_delay_seconds)
+
+        except Exception as ex:
+            error = traceback.format_exc()
+            logger().error(error)
+            # неверное задание не станет верным при повторе
+            self._queue.fail(job, error, retry=not isinstance(ex, jobs.JobSpecError))
+
+        else:
+            self._queue.complete(job, result, runner.last_error_kind)
+
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+
+        return True
+
+    def run_forever(self, stop: threading.Event=None):
+        """Выполнение заданий до установки события stop.
+
+        Args:
+          stop: threading.Event: Событие остановки (Default value = None)
+        """
+
+        stop = stop or threading.Event()
+
+        while not stop.is_set():
+            if not self.run_once():
+                stop.wait(self._poll_seconds)
+
+    def _heartbeat(self, job: QueuedJob, stop: threading.Event):
+        """Продление аренды, пока задание выполняется."""
+
+        while not stop.wait(self._queue.lease_seconds / 3):
+            if not self._queue.heartbeat(job):
+                logger().warning(f'Очередь заданий. Задание {job.id} больше не принадлежит исполнителю')
+                return
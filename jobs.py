@@ -0,0 +1,249 @@
+"""Описание операций 1С в виде сериализуемых заданий.
+
+Задание - словарь, который можно передать в JSON и по которому
+восстанавливается объект запуска (CreationInfobase, Designer, Enterprise):
+
+    {'class': 'Designer',
+     'init': {'dir_': 'D:\\base1'},
+     'settings': {'set_platform_params': {'exename': 'D:\\1cv8.exe'}},
+     'operation': 'load_cfg',
+     'args': {'file_name_cf': 'D:\\1.cf'}}
+
+Перечисления (ConfigDumpFormats и т.п.) в параметрах записываются как
+{'__enum__': 'ConfigDumpFormats', 'value': 'Plain'}.
+"""
+
+from enum import Enum
+
+import ones
+
+__all__ = ['job_from_runner', 'create_runner', 'run_job', 'JobSpecError']
+
+# Операции, разрешенные к выполнению через задания
+OPERATIONS = {
+    'CreationInfobase': ('create_base',),
+    'Designer': ('load_cfg', 'dump_config_to_files', 'dump_repo_to_file', 'update_from_repo',
+                 'create_repo', 'set_repo_label', 'dump_ib', 'restore_ib'),
+    'Enterprise': ('run',),
+}
+
+# Параметры конструктора: параметр -> атрибут объекта
+_INIT_ATTRIBUTES = {'dir_': '_dir', 'server': '_server', 'infobase': '_infobase'}
+
+# Установщики параметров: установщик -> {параметр: атрибут объекта}
+_COMMON_SETTINGS = {
+    'set_platform_params': {'exename': '_exename', 'platform_version': '_platform_version'},
+    'set_auth_params': {'user': '_user', 'password': '_password', 'use_os_auth': '_use_os_auth'},
+    'set_dialogs_settings': {'visible': '_visible',
+                             'disable_startup_messages': '_disable_startup_messages',
+                             'disable_startup_dialogs': '_disable_startup_dialogs'},
+    'set_log_ib_params': {'gen_ib_log_file_name': '_ib_log_file_name',
+                          'truncate_log_ib': '_truncate_log_ib',
+                          'result_file_name': '_result_file_name'},
+    'set_other_params': {'access_code': '_access_code', 'locale': '_locale',
+                         'other_params': '_other_params'},
+    'set_preflight_params': {'check': '_preflight_check', 'on_busy': '_preflight_on_busy'},
+}
+
+_CLASS_SETTINGS = {
+    'CreationInfobase': {
+        'set_file_db_params': {'file_db_format': '_file_db_format'},
+        'set_server_db_params': {'db_server_type': '_db_server_type',
+                                 'db_server_name': '_db_server_name',
+                                 'database': '_database',
+                                 'db_user': '_db_user',
+                                 'db_password': '_db_password',
+                                 'sql_year_offset': '_sql_year_offset',
+                                 'create_db_if_not_exist': '_create_db_if_not_exist'},
+        'set_claster_params': {'deny_scheduled_jobs': '_deny_scheduled_jobs',
+                               'cluster_administrator_user': '_cluster_administrator_user',
+                               'cluster_administrator_password': '_cluster_administrator_password'},
+    },
+    'Designer': {
+        'set_repo_params': {'dir_': '_repo_dir', 'user': '_repo_user', 'password': '_repo_password'},
+        'set_fingerprint_params': {'file_name': '_fingerprint_file_name'},
+    },
+    'Enterprise': {
+        'set_other_params': {'access_code': '_access_code', 'locale': '_locale',
+                             'other_params': '_other_params', 'launch_param': '_launch_param',
+                             'execute': '_execute'},
+    },
+}
+
+_ENUMS = {enum_class.__name__: enum_class for enum_class in (
+    ones.SupportRules, ones.SQLYearOffsets, ones.FileDBFormats,
+    ones.DBServerTypes, ones.ConfigDumpFormats, ones.BusyActions)}
+
+
+def job_from_runner(runner: ones.RunInfobase, operation: str, **kwargs) -> dict:
+    """Формирует задание по настроенному объекту запуска.
+
+    Args:
+      runner: RunInfobase: Настроенный объект CreationInfobase, Designer или Enterprise
+      operation: str: Nмя метода операции, например load_cfg
+      **kwargs: Параметры операции
+
+    Returns:
+      dict: Задание
+    """
+
+    class_name = type(runner).__name__
+    _check_operation(class_name, operation)
+
+    init = {param: getattr(runner, attribute) for param, attribute in _INIT_ATTRIBUTES.items()}
+
+    if class_name == 'Enterprise':
+        init['ws_connection_string'] = runner._ws_connection_string
+
+    settings = {}
+
+    for setter, attributes in _settings_of(class_name).items():
+        settings[setter] = {param: _dump_value(getattr(runner, attribute))
+                            for param, attribute in attributes.items()}
+
+    if class_name == 'Designer':
+        settings['set_update_db_cfg_params'] = dict(runner._update_db_cfg_params)
+
+    return {'class': class_name,
+            'init': init,
+            'settings': settings,
+            'operation': operation,
+            'args': {key: _dump_value(value) for key, value in kwargs.items()}}
+
+def create_runner(spec: dict) -> ones.RunInfobase:
+    """Создает и настраивает объект запуска по заданию.
+
+    Args:
+      spec: dict: Задание
+
+    Returns:
+      RunInfobase: Объект запуска
+
+    Raises:
+      JobSpecError: Неверное задание
+    """
+
+    if not isinstance(spec, dict):
+        raise JobSpecError(f'Задание должно быть словарем, получено: {type(spec).__name__}')
+
+    class_name = spec.get('class')
+    _check_operation(class_name, spec.get('operation'))
+
+    init = _check_dict(spec.get('init', {}), 'init')
+    settings = _check_dict(spec.get('settings', {}), 'settings')
+
+    try:
+        runner = getattr(ones, class_name)(**init)
+    except TypeError as ex:
+        raise JobSpecError(f'Недопустимые параметры init задания: {ex}') from ex
+
+    allowed_setters = set(_settings_of(class_name)) | {'set_update_db_cfg_params'}
+
+    for setter, params in settings.items():
+        if setter not in allowed_setters or not hasattr(runner, setter):
+            raise JobSpecError(f'Недопустимый параметр задания: {setter}')
+
+        params = _check_dict(params, setter)
+
+        try:
+            getattr(runner, setter)(**{key: _load_value(value) for key, value in params.items()})
+        except TypeError as ex:
+            raise JobSpecError(f'Недопустимые параметры {setter} задания: {ex}') from ex
+
+    return runner
+
+def run_job(spec: dict,
+            on_busy: ones.BusyActions=None,
+            admission: ones.AdmissionController=None,
+            single_flight: ones.SingleFlight=None,
+            token: ones.CancellationToken=None,
+            ib_locks: ones.InfobaseLockManager=None,
+            runner: ones.RunInfobase=None):
+    """Выполняет задание.
+
+    Args:
+      spec: dict: Задание
+      on_busy: BusyActions: Действие, если база занята, вместо заданного в задании.
+                            Например, исполнитель очереди возвращает задание в очередь (Default value = None)
+      admission: AdmissionController: Контроллер допуска запусков процесса (Default value = None)
+      single_flight: SingleFlight: Группа объединения одинаковых запусков процесса (Default value = None)
+      token: CancellationToken: Токен отмены задания (Default value = None)
+      ib_locks: InfobaseLockManager: Менеджер блокировок баз процесса (Default value = None)
+      runner: RunInfobase: Объект запуска, созданный create_runner(spec), если вызывающему
+                           нужны его свойства после выполнения (last_error_kind).
+                           None - создается (Default value = None)
+
+    Returns:
+      Результат операции (bool для операций RunInfobase)
+    """
+
+    if runner is None:
+        runner = create_runner(spec)
+
+    if on_busy is not None:
+        runner.set_preflight_params(check=runner._preflight_check, on_busy=on_busy,
+                                    session_query=runner._session_query)
+
+    if admission is not None:
+        runner.set_admission_params(admission)
+
+    if single_flight is not None:
+        runner.set_single_flight_params(single_flight)
+
+    if token is not None:
+        runner.set_cancellation_params(token)
+
+    if ib_locks is not None:
+        runner.set_ib_lock_params(ib_locks)
+
+    args = {key: _load_value(value) for key, value in spec.get('args', {}).items()}
+
+    return getattr(runner, spec['operation'])(**args)
+
+
+class JobSpecError(Exception):
+    """Nсключение 'Неверное задание'"""
+
+
+def _check_operation(class_name: str, operation: str):
+    """Проверка, что операция разрешена для класса."""
+
+    if operation not in OPERATIONS.get(class_name, ()):
+        raise JobSpecError(f'Недопустимая операция задания: {class_name}.{operation}')
+
+def _check_dict(value, name: str) -> dict:
+    """Проверка, что часть задания - словарь."""
+
+    if not isinstance(value, dict):
+        raise JobSpecError(f'Параметр задания {name} должен быть словарем, получено: {type(value).__name__}')
+
+    return value
+
+def _settings_of(class_name: str) -> dict:
+    """Установщики параметров класса."""
+
+    settings = dict(_COMMON_SETTINGS)
+    settings.update(_CLASS_SETTINGS.get(class_name, {}))
+
+    return settings
+
+def _dump_value(value):
+    """Значение параметра в виде, пригодном для JSON."""
+
+    if isinstance(value, Enum):
+        return {'__enum__': type(value).__name__, 'value': value.value}
+
+    return value
+
+def _load_value(value):
+    """Восстановление значения параметра из JSON."""
+
+    if isinstance(value, dict) and '__enum__' in value:
+        enum_class = _ENUMS.get(value['__enum__'])
+
+        if enum_class is None:
+            raise JobSpecError(f'Неизвестное перечисление: {value["__enum__"]}')
+
+        return enum_class(value['value'])
+
+    return value
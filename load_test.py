@@ -0,0 +1,395 @@
+"""Нагрузочное тестирование: одновременный запуск клиентов 1С:Предприятия.
+
+Клиенты запускаются по линейному профилю нарастания (например, 50 клиентов за 5 минут)
+с параметрами /C из заданного списка, удерживаются заданное время, после чего
+незавершившиеся клиенты останавливаются. По каждому клиенту собираются задержка старта,
+время ожидания в очереди, длительность и код возврата, в отчет попадают процентили.
+Время старта - момент создания процесса 1С: ожидание свободного места (max_parallel)
+и допуска (set_admission_params) учитывается как ожидание в очереди, а не как работа клиента.
+
+Количество одновременно работающих клиентов ограничивается параметром max_parallel
+(например, по числу лицензий) и лимитом процессов ОС. Если ОС отказывает в создании
+процесса из-за нехватки ресурсов, ограничение снижается до числа работающих клиентов,
+а запуск повторяется позже; с завершением каждого клиента ограничение снова растет на единицу.
+
+Клиенты запускаются через объект запуска (RunInfobase._subprocess_run), каждый в своем потоке,
+поэтому соблюдают контроллер допуска (set_admission_params) и токен отмены (модуль cancellation):
+отмена теста (Ctrl+C) и окончание удержания завершают клиентов вместе с их дочерними процессами.
+Если задан менеджер блокировок (set_ib_lock_params), тест держит разделяемую блокировку базы.
+
+Пример:
+    enterprise = Enterprise(server='server1', infobase='base1')
+    enterprise.set_platform_params(exename)
+    load_test = LoadTest(enterprise, clients=50, ramp_up_seconds=300, hold_seconds=600,
+                         launch_params=['Тест1', 'Тест2'], log_file_prefix=r'D:\\logs\\load')
+    load_test.run()
+    load_test.write_report(r'D:\\logs\\load.json')
+"""
+
+from collections import Counter, deque
+import contextlib
+import copy
+import errno
+import json
+import queue
+import threading
+import time
+
+from cancellation import CancellationToken, OperationCancelled, current_token
+from fileops import atomic_write
+from logger_ import logger
+from metrics import summarize
+from ones import Enterprise, GenInfobaseLogFileName
+
+__all__ = ['LoadTest', 'ClientResult']
+
+POLL_SECONDS = 0.05
+PROCESS_LIMIT_RESERVE = 64
+START_RETRY_SECONDS = 1
+START_ATTEMPTS = 5
+
+# Ошибки создания процесса из-за нехватки ресурсов ОС
+_LIMIT_ERRNOS = (errno.EAGAIN, errno.ENOMEM, errno.EMFILE, errno.ENFILE)
+
+
+class ClientResult:
+    """Результат одного клиента. Времена - секунды от начала теста."""
+
+    def __init__(self, number: int, launch_param: str, scheduled: float):
+        self.number = number
+        self.launch_param = launch_param
+        self.scheduled = scheduled
+        self.started = None
+        self.finished = None
+        self.return_code = None
+        self.terminated = False
+        self.log_file_name = ''
+        self.error = ''
+        self.start_attempts = 0
+        self.retry_at = 0
+        self.start_error = None
+
+    @property
+    def start_latency(self) -> float:
+        """Задержка создания процесса относительно запланированного запуска."""
+
+        return None if self.started is None else self.started - self.scheduled
+
+    @property
+    def queue_delay(self) -> float:
+        """Ожидание в очереди: от готовности к запуску (по плану или после повтора)
+        до создания процесса, т.е. ожидание места по max_parallel и допуска."""
+
+        return None if self.started is None else max(0, self.started - max(self.scheduled, self.retry_at))
+
+    @property
+    def duration(self) -> float:
+        """Длительность работы клиента."""
+
+        return None if self.finished is None or self.started is None else self.finished - self.started
+
+    def as_dict(self) -> dict:
+        return {'number': self.number,
+                'launch_param': self.launch_param,
+                'scheduled': self.scheduled,
+                'start_latency': self.start_latency,
+                'queue_delay': self.queue_delay,
+                'duration': self.duration,
+                'return_code': self.return_code,
+                'terminated': self.terminated,
+                'log_file_name': self.log_file_name,
+                'error': self.error}
+
+
+class LoadTest:
+    """Запуск множества клиентов 1С:Предприятия по профилю нарастания."""
+
+    def __init__(self, enterprise: Enterprise,
+                 clients: int,
+                 ramp_up_seconds: float=0,
+                 hold_seconds: float=None,
+                 launch_params: list=None,
+                 log_file_prefix: str='',
+                 max_parallel: int=None):
+        """
+        Args:
+          enterprise: Enterprise: Настроенный объект запуска, общий для всех клиентов
+          clients: int: Количество клиентов
+          ramp_up_seconds: float: Время, за которое равномерно запускаются все клиенты (Default value = 0)
+          hold_seconds: float: Время удержания после нарастания, затем работающие клиенты
+                               останавливаются. None - ждать завершения всех клиентов (Default value = None)
+          launch_params: list: Параметры /C клиентов, назначаются по кругу.
+                               None - параметр из enterprise (Default value = None)
+          log_file_prefix: str: Префикс файлов /Out клиентов, у каждого клиента свой файл.
+                                '' - как задано в enterprise (Default value = '')
+          max_parallel: int: Максимальное число одновременно работающих клиентов,
+                             например по числу лицензий. None - без ограничения (Default value = None)
+        """
+
+        self._enterprise = enterprise
+        self._clients = clients
+        self._ramp_up_seconds = ramp_up_seconds
+        self._hold_seconds = hold_seconds
+        self._launch_params = launch_params
+        self._log_names = GenInfobaseLogFileName(log_file_prefix, reserve=True) if log_file_prefix else None
+        self._max_parallel = max_parallel
+        self._finished = queue.Queue()
+        self.results = []
+        self.peak_running = 0
+        self.parallel_limit = None
+
+    def run(self, token: CancellationToken=None) -> dict:
+        """Выполнение теста.
+
+        Args:
+          token: CancellationToken: Токен отмены теста. None - токен контекста cancel_scope (Default value = None)
+
+        Returns:
+          dict: Отчет (см. report)
+
+        Raises:
+          OperationCancelled: Тест отменен, работавшие клиенты завершены
+        """
+
+        token = token if token is not None else current_token()
+
+        # клиенты останавливаются дочерним токеном: по окончании удержания или с отменой теста
+        with self._ib_lock(token), CancellationToken(token) as stop_token:
+            return self._run(token, stop_token)
+
+    def _run(self, token: CancellationToken, stop_token: CancellationToken) -> dict:
+        """Выполнение теста под блокировкой базы."""
+
+        self.results = self._schedule()
+        self.parallel_limit = self._parallel_limit()
+        self.peak_running = 0
+        limit = self.parallel_limit
+
+        logger().info(f'Нагрузочный тест. Клиентов: {self._clients}, '
+                      f'нарастание: {self._ramp_up_seconds} сек, удержание: {self._hold_seconds} сек, '
+                      f'одновременно не более: {self.parallel_limit}')
+
+        pending = deque(self.results)
+        running = {}
+        start_time = time.monotonic()
+        deadline = (None if self._hold_seconds is None
+                    else self._ramp_up_seconds + self._hold_seconds)
+
+        while pending or running:
+            now = time.monotonic() - start_time
+
+            self._collect_finished(running, pending, limit, now)
+
+            if stop_token.cancelled or (deadline is not None and now >= deadline):
+                self._stop_clients(running, stop_token, 'Окончание удержания')
+
+                for result in pending:
+                    result.error = 'Не запущен до окончания теста'
+                break
+
+            while (pending and len(running) < self.parallel_limit
+                   and pending[0].scheduled <= now and pending[0].retry_at <= now):
+                result = pending.popleft()
+                self._start_client(result, running, stop_token, start_time)
+                self.peak_running = max(self.peak_running, len(running))
+
+            stop_token.wait(POLL_SECONDS)
+
+        if token is not None:
+            token.raise_if_cancelled()
+
+        report = self.report()
+
+        logger().info(f'Нагрузочный тест завершен. Запущено: {report["started"]}, '
+                      f'успешно: {report["succeeded"]}, неуспешно: {report["failed"]}, '
+                      f'остановлено: {report["terminated"]}, '
+                      f'задержка старта p95: {_format_seconds(report["start_latency"]["p95"])}, '
+                      f'ожидание в очереди p95: {_format_seconds(report["queue_delay"]["p95"])}, '
+                      f'длительность p95: {_format_seconds(report["duration"]["p95"])}')
+
+        return report
+
+    def report(self) -> dict:
+        """Отчет по результатам теста.
+
+        Returns:
+          dict: Сводка по клиентам, кодам возврата, задержке старта, ожиданию в очереди и длительности
+        """
+
+        started = [result for result in self.results if result.started is not None]
+        finished = [result for result in started if result.finished is not None]
+
+        return {'clients': len(self.results),
+                'started': len(started),
+                'not_started': len(self.results) - len(started),
+                'succeeded': sum(1 for result in finished
+                                 if result.return_code == 0 and not result.terminated),
+                'failed': sum(1 for result in finished
+                              if result.return_code != 0 and not result.terminated),
+                'terminated': sum(1 for result in started if result.terminated),
+                'parallel_limit': self.parallel_limit,
+                'peak_running': self.peak_running,
+                'exit_codes': {str(code): count for code, count in
+                               Counter(result.return_code for result in finished
+                                       if not result.terminated).items()},
+                'start_latency': summarize([result.start_latency for result in started]),
+                'queue_delay': summarize([result.queue_delay for result in started]),
+                'duration': summarize([result.duration for result in finished
+                                       if not result.terminated]),
+                'details': [result.as_dict() for result in self.results]}
+
+    def write_report(self, file_name: str):
+        """Запись отчета в файл JSON.
+
+        Args:
+          file_name: str: Полное имя файла отчета
+        """
+
+        atomic_write(file_name, json.dumps(self.report(), ensure_ascii=False, indent=2),
+                     encoding='utf-8')
+
+    def _schedule(self) -> list:
+        """Клиенты с запланированным временем запуска."""
+
+        results = []
+
+        for number in range(self._clients):
+            launch_param = (self._launch_params[number % len(self._launch_params)]
+                            if self._launch_params else self._enterprise._launch_param)
+            scheduled = self._ramp_up_seconds * number / self._clients
+            results.append(ClientResult(number + 1, launch_param, scheduled))
+
+        return results
+
+    def _parallel_limit(self) -> int:
+        """Ограничение одновременно работающих клиентов с учетом лимита процессов ОС."""
+
+        limit = min(self._max_parallel or self._clients, self._clients)
+        process_limit = _process_limit()
+
+        if process_limit is not None and process_limit < limit:
+            logger().warning(f'Нагрузочный тест. Число одновременных клиентов ограничено '
+                             f'лимитом процессов ОС: {process_limit}')
+            limit = process_limit
+
+        return max(1, limit)
+
+    def _ib_lock(self, token: CancellationToken):
+        """Разделяемая блокировка базы на время теста, если задан менеджер блокировок."""
+
+        ib_locks = self._enterprise._ib_locks
+
+        if ib_locks is None:
+            return contextlib.nullcontext()
+
+        return ib_locks.lock(self._enterprise._infobase_key(), 'run', token=token)
+
+    def _start_client(self, result: ClientResult, running: dict,
+                      stop_token: CancellationToken, start_time: float):
+        """Запуск клиента в отдельном потоке."""
+
+        client = copy.copy(self._enterprise)
+        client._launch_param = result.launch_param
+        client.set_cancellation_params(stop_token)
+
+        if self._log_names and not result.log_file_name:
+            result.log_file_name = self._log_names.another_file_name()
+
+        if result.log_file_name:
+            client._ib_log_file_name = result.log_file_name
+
+        result.start_attempts += 1
+
+        thread = threading.Thread(target=self._run_client, args=(client, result, start_time),
+                                  name=f'load-client-{result.number}', daemon=True)
+        running[result] = thread
+        thread.start()
+
+        logger().debug(f'Нагрузочный тест. Клиент {result.number} запускается, /C {result.launch_param}')
+
+    def _run_client(self, client: Enterprise, result: ClientResult, start_time: float):
+        """Работа клиента (поток клиента): запуск с допуском и ожидание завершения."""
+
+        try:
+            result.return_code = client._subprocess_run(client.command_line())
+        except OperationCancelled:
+            if client.last_started is None:
+                result.error = 'Не запущен до окончания теста' # отменен при ожидании допуска
+            else:
+                result.terminated = True
+        except OSError as ex:
+            result.start_error = ex
+        except Exception as ex: # например, AdmissionTimeout
+            result.start_error = ex
+        finally:
+            if client.last_started is not None:
+                result.started = client.last_started - start_time
+
+            if result.start_error is None:
+                result.finished = time.monotonic() - start_time
+
+            self._finished.put(result)
+
+    def _collect_finished(self, running: dict, pending: deque, limit: int, now: float, retry: bool=True):
+        """Учет завершившихся клиентов и клиентов, которые не удалось запустить."""
+
+        while True:
+            try:
+                result = self._finished.get_nowait()
+            except queue.Empty:
+                return
+
+            running.pop(result).join()
+            ex, result.start_error = result.start_error, None
+
+            if ex is None:
+                if self.parallel_limit < limit:
+                    # ресурсы ОС освобождаются: ограничение постепенно возвращается
+                    self.parallel_limit += 1
+                continue
+
+            result.started = None
+
+            if (retry and isinstance(ex, OSError) and ex.errno in _LIMIT_ERRNOS
+                    and result.start_attempts < START_ATTEMPTS):
+                # ОС исчерпала ресурсы: больше клиентов одновременно не запускаем
+                self.parallel_limit = max(1, len(running))
+                result.retry_at = now + START_RETRY_SECONDS
+                pending.appendleft(result)
+
+                logger().warning(f'Нагрузочный тест. Клиент {result.number} не запущен: {ex}. '
+                                 f'Одновременно не более: {self.parallel_limit}')
+                continue
+
+            result.error = str(ex)
+            logger().error(f'Нагрузочный тест. Клиент {result.number} не запущен: {ex}')
+
+    def _stop_clients(self, running: dict, stop_token: CancellationToken, reason: str):
+        """Остановка работающих клиентов: завершение их процессов и ожидание потоков."""
+
+        stop_token.cancel(reason)
+
+        for thread in list(running.values()):
+            thread.join()
+
+        self._collect_finished(running, deque(), 0, 0, retry=False)
+
+
+def _process_limit() -> int:
+    """Сколько процессов еще можно создать по лимиту ОС (RLIMIT_NPROC), None - без ограничения.
+    Лимит считается на пользователя, поэтому часть оставляется под уже работающие процессы.
+    """
+
+    try:
+        import resource
+        soft_limit, _ = resource.getrlimit(resource.RLIMIT_NPROC)
+    except (ImportError, AttributeError, ValueError, OSError): # Windows
+        return None
+
+    if soft_limit == resource.RLIM_INFINITY:
+        return None
+
+    return max(1, soft_limit - PROCESS_LIMIT_RESERVE)
+
+def _format_seconds(value: float) -> str:
+    return '-' if value is None else f'{value:.2f} сек'
@@ -0,0 +1,213 @@
+"""Хранение логов: сжатие старых файлов и удаление по возрасту и общему размеру.
+
+Обрабатываются файлы /Out платформы 1С и логи скриптов в каталоге логов.
+Обработка выполняется разово (run_once) или периодически в фоновом потоке (start/stop).
+Файлы, открытые обработчиками логгера текущего процесса, и файлы, изменявшиеся
+позже min_idle_seconds назад (их может дописывать другой процесс), не сжимаются и не удаляются.
+
+Пример:
+    retention = LogRetention(params.log_dir, compress_after_days=1, delete_after_days=30,
+                             max_total_bytes=10 * 1024 ** 3)
+    retention.start()
+"""
+
+import fnmatch
+import gzip
+import os
+import shutil
+import threading
+import time
+
+import logger_
+from logger_ import logger
+
+__all__ = ['LogRetention']
+
+COMPRESSED_SUFFIX = '.gz'
+SECONDS_IN_DAY = 24 * 60 * 60
+
+
+class LogRetention:
+    """Сжатие и удаление старых логов в каталоге."""
+
+    def __init__(self, log_dir: str,
+                 patterns: tuple=('*.log',),
+                 compress_after_days: float=1,
+                 delete_after_days: float=30,
+                 max_total_bytes: int=None,
+                 interval_seconds: float=3600,
+                 min_idle_seconds: float=3600):
+        """
+        Args:
+          log_dir: str: Каталог логов
+          patterns: tuple: Шаблоны имен обрабатываемых файлов (Default value = ('*.log',))
+          compress_after_days: float: Сжимать файлы старше указанного числа дней.
+                                      None - не сжимать (Default value = 1)
+          delete_after_days: float: Удалять файлы старше указанного числа дней.
+                                    None - не удалять по возрасту (Default value = 30)
+          max_total_bytes: int: Общий размер файлов, при превышении которого удаляются самые старые.
+                                None - без ограничения (Default value = None)
+          interval_seconds: float: Период обработки в фоновом потоке (Default value = 3600)
+          min_idle_seconds: float: Файл, изменявшийся позже указанного числа секунд назад,
+                                   считается используемым и не обрабатывается (Default value = 3600)
+        """
+
+        self._log_dir = log_dir
+        self._patterns = tuple(patterns) + tuple(pattern + COMPRESSED_SUFFIX for pattern in patterns)
+        self._compress_after_days = compress_after_days
+        self._delete_after_days = delete_after_days
+        self._max_total_bytes = max_total_bytes
+        self._interval_seconds = interval_seconds
+        self._min_idle_seconds = min_idle_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self) -> dict:
+        """Одна обработка каталога.
+        Файлы, которые заняты другим процессом или используются (см. описание модуля),
+        пропускаются до следующей обработки, но учитываются в общем размере.
+
+        Returns:
+          dict: Статистика: compressed, deleted, freed_bytes, total_bytes
+        """
+
+        now = time.time()
+        stats = {'compressed': 0, 'deleted': 0, 'freed_bytes': 0, 'total_bytes': 0}
+        files = []
+        active_files = logger_.active_log_files()
+        in_use_bytes = 0
+
+        # Список берется заранее: сжатые файлы появляются в том же каталоге
+        for entry in list(self._scan()):
+            stat = entry.stat()
+
+            if (now - stat.st_mtime < self._min_idle_seconds
+                    or os.path.normcase(os.path.abspath(entry.path)) in active_files):
+                in_use_bytes += stat.st_size
+                continue
+
+            age_days = (now - stat.st_mtime) / SECONDS_IN_DAY
+
+            if self._delete_after_days is not None and age_days > self._delete_after_days:
+                if self._remove(entry.path):
+                    stats['deleted'] += 1
+                    stats['freed_bytes'] += stat.st_size
+                    continue
+
+            if (self._compress_after_days is not None
+                    and age_days > self._compress_after_days
+                    and not entry.name.endswith(COMPRESSED_SUFFIX)):
+                compressed_file_name = self._compress(entry.path, stat)
+
+                if compressed_file_name:
+                    stats['compressed'] += 1
+                    stats['freed_bytes'] += stat.st_size
+                    files.append((stat.st_mtime, compressed_file_name,
+                                  os.path.getsize(compressed_file_name)))
+                    continue
+
+            files.append((stat.st_mtime, entry.path, stat.st_size))
+
+        total_bytes = in_use_bytes + sum(size for _, _, size in files)
+
+        if self._max_total_bytes is not None and total_bytes > self._max_total_bytes:
+            for _, file_name, size in sorted(files):
+                if total_bytes <= self._max_total_bytes:
+                    break
+
+                if self._remove(file_name):
+                    total_bytes -= size
+                    stats['deleted'] += 1
+                    stats['freed_bytes'] += size
+
+        stats['total_bytes'] = total_bytes
+
+        if stats['compressed'] or stats['deleted']:
+            logger().info(f'Хранение логов {self._log_dir}. Сжато: {stats["compressed"]}, '
+                          f'удалено: {stats["deleted"]}, освобождено байт: {stats["freed_bytes"]}')
+
+        return stats
+
+    def start(self):
+        """Запуск периодической обработки в фоновом потоке."""
+
+        if self._thread is not None:
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='log-retention', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float=None):
+        """Остановка фонового потока.
+
+        Args:
+          timeout: float: Время ожидания завершения текущей обработки (Default value = None)
+        """
+
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        """Цикл фонового потока."""
+
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as ex:
+                logger().error(f'Хранение логов {self._log_dir}. Ошибка: {ex}')
+
+            self._stop.wait(self._interval_seconds)
+
+    def _scan(self):
+        """Файлы каталога, подходящие под шаблоны."""
+
+        with os.scandir(self._log_dir) as entries:
+            for entry in entries:
+                if (entry.is_file(follow_symlinks=False)
+                        and any(fnmatch.fnmatch(entry.name, pattern) for pattern in self._patterns)):
+                    yield entry
+
+    def _compress(self, file_name: str, stat) -> str:
+        """Сжатие файла в .gz с сохранением времени изменения и удаление исходного.
+
+        Returns:
+          str: Nмя сжатого файла или '', если сжать не удалось
+        """
+
+        compressed_file_name = file_name + COMPRESSED_SUFFIX
+        temp_file_name = compressed_file_name + '.tmp'
+
+        try:
+            with open(file_name, 'rb') as source, gzip.open(temp_file_name, 'wb') as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+
+            os.utime(temp_file_name, (stat.st_atime, stat.st_mtime))
+            os.replace(temp_file_name, compressed_file_name)
+            os.unlink(file_name)
+
+        except OSError as ex:
+            logger().debug(f'Хранение логов. Не удалось сжать {file_name}: {ex}')
+
+            for name in (temp_file_name, compressed_file_name):
+                if os.path.exists(name) and os.path.exists(file_name):
+                    self._remove(name)
+
+            return ''
+
+        return compressed_file_name
+
+    def _remove(self, file_name: str) -> bool:
+        """Удаление файла. Занятый файл не удаляется."""
+
+        try:
+            os.unlink(file_name)
+        except OSError as ex:
+            logger().debug(f'Хранение логов. Не удалось удалить {file_name}: {ex}')
+            return False
+
+        return True
@@ -1,16 +1,27 @@
 """Логирование скриптов и функций работы с 1С."""
 
+from collections import OrderedDict
 from collections.abc import Callable
+from contextlib import contextmanager
+from contextvars import ContextVar
 from logging import INFO, DEBUG, Logger, getLogger, StreamHandler, FileHandler, Formatter
+from logging import Filter, Handler
+import atexit
 import math
+import os
+import threading
 import time
 import traceback
 
-__all__ = ['init_logger', 'logger']
+__all__ = ['init_logger', 'init_queue_logger', 'init_worker_logger', 'log_queue',
+           'flush_logger', 'shutdown_logger', 'job_context', 'current_operation',
+           'add_duration_listener', 'remove_duration_listener', 'active_log_files', 'logger']
 
 LOGGER_NAME = 'InformationBase1S'
 LOG_FORMAT = '%(asctime)s  %(levelname)-8s %(message)s'
 DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Сколько файлов заданий держится открытыми одновременно
+MAX_OPEN_JOB_FILES = 32
 
 def logger() -> Logger:
     """Получение логгера"""
@@ -36,6 +47,180 @@ def init_logger(log_file_name: str='') -> Logger:
 
     return log
 
+def init_queue_logger(log_file_name: str='', job_log_dir: str='') -> Logger:
+    """Nнициализация логгера с неблокирующей записью через очередь.
+    Записи из потоков и дочерних процессов попадают в одну очередь,
+    а в консоль и файлы их пишет один поток-писатель (QueueListener).
+    Дочерние процессы подключаются через init_worker_logger(log_queue()).
+
+    Args:
+      log_file_name: str: Nмя лог файла (Default value = '')
+      job_log_dir: str: Каталог логов заданий. Если задан, записи, сделанные внутри
+                        job_context(job_id), дополнительно пишутся в файл <job_id>.log (Default value = '')
+
+    Returns:
+      Logger: Логгер
+    """
+
+    global _queue_listener, _queue
+
+    # logging.handlers и multiprocessing заметно удлиняют запуск, поэтому импортируются здесь
+    from logging.handlers import QueueListener
+    import multiprocessing
+
+    shutdown_logger()
+
+    handlers = [_get_stream_handler()]
+
+    if log_file_name:
+        handlers.append(_get_file_handler(log_file_name))
+
+    if job_log_dir:
+        handlers.append(_JobFileHandler(job_log_dir))
+
+    _queue = multiprocessing.Queue(-1)
+    _queue_listener = QueueListener(_queue, *handlers, respect_handler_level=True)
+    _queue_listener.start()
+
+    log = getLogger(LOGGER_NAME)
+    log.setLevel(DEBUG)
+    log.addHandler(_get_queue_handler(_queue))
+
+    return log
+
+def init_worker_logger(queue) -> Logger:
+    """Nнициализация логгера в дочернем процессе: записи передаются в очередь основного процесса.
+
+    Args:
+      queue: Очередь, полученная в основном процессе через log_queue()
+
+    Returns:
+      Logger: Логгер
+    """
+
+    log = getLogger(LOGGER_NAME)
+    log.setLevel(DEBUG)
+
+    for handler in list(log.handlers):
+        log.removeHandler(handler)
+
+    log.addHandler(_get_queue_handler(queue))
+
+    return log
+
+def log_queue():
+    """Очередь записей лога для передачи в дочерние процессы или None, если очередь не используется."""
+
+    return _queue
+
+def flush_logger():
+    """Дожидается записи всех записей, находящихся в очереди."""
+
+    with _queue_lock:
+        if _queue_listener is not None:
+            # stop() обрабатывает все записи очереди до остановки писателя
+            _queue_listener.stop()
+            _queue_listener.start()
+
+    for handler in getLogger(LOGGER_NAME).handlers:
+        handler.flush()
+
+def shutdown_logger():
+    """Остановка писателя очереди с записью всех оставшихся записей и закрытием файлов."""
+
+    global _queue_listener, _queue
+
+    with _queue_lock:
+        if _queue_listener is None:
+            return
+
+        log = getLogger(LOGGER_NAME)
+
+        for handler in list(log.handlers):
+            if getattr(handler, 'queue', None) is _queue:
+                log.removeHandler(handler)
+
+        _queue_listener.stop()
+
+        for handler in _queue_listener.handlers:
+            handler.close()
+
+        _queue.close()
+        _queue_listener = None
+        _queue = None
+
+def active_log_files() -> set:
+    """Файлы, открытые на запись обработчиками логгера, в том числе писателем очереди.
+
+    Returns:
+      set: Полные имена файлов, нормализованные os.path.normcase
+    """
+
+    handlers = list(getLogger(LOGGER_NAME).handlers)
+
+    with _queue_lock:
+        if _queue_listener is not None:
+            handlers.extend(_queue_listener.handlers)
+
+    file_names = set()
+
+    for handler in handlers:
+        if isinstance(handler, FileHandler):
+            file_names.add(handler.baseFilename)
+        elif isinstance(handler, _JobFileHandler):
+            file_names.update(handler.open_file_names())
+
+    return {os.path.normcase(os.path.abspath(file_name)) for file_name in file_names}
+
+@contextmanager
+def job_context(job_id: str):
+    """Контекст задания: записи лога получают атрибут job_id
+    и при заданном job_log_dir попадают в отдельный файл задания.
+
+    Args:
+      job_id: str: Nдентификатор задания, используется в имени файла
+    """
+
+    token = _job_id.set(str(job_id))
+
+    try:
+        yield
+    finally:
+        _job_id.reset(token)
+
+def current_operation() -> str:
+    """Nмя выполняемой операции (функции с декоратором log_func) в текущем контексте, '' - нет."""
+
+    return _operation.get()
+
+def add_duration_listener(listener: Callable):
+    """Подписка на завершение функций с декоратором log_func.
+
+    Args:
+      listener: Callable: Функция (имя функции, позиционные аргументы, длительность в секундах,
+                          результат, исключение или None). Вызывается в потоке функции
+    """
+
+    with _listeners_lock:
+        if listener not in _duration_listeners:
+            _duration_listeners.append(listener)
+
+def remove_duration_listener(listener: Callable):
+    """Отмена подписки add_duration_listener."""
+
+    with _listeners_lock:
+        if listener in _duration_listeners:
+            _duration_listeners.remove(listener)
+
+def _notify_duration_listeners(name: str, args: tuple, seconds: float, result, error: Exception):
+    """Вызов подписчиков. Ошибка подписчика не влияет на результат функции."""
+
+    for listener in list(_duration_listeners):
+        try:
+            listener(name, args, seconds, result, error)
+        except Exception as ex:
+            logger().warning(f'{name}. Ошибка обработчика длительности: {ex}')
+
 def _get_file_handler(log_file_name: str) -> FileHandler:
     """Nнициализация записи логирования в файл
 
@@ -52,6 +237,24 @@ def _get_file_handler(log_file_name: str) -> FileHandler:
 
     return file_handler
 
+def _get_queue_handler(queue) -> Handler:
+    """Nнициализация передачи записей лога в очередь
+
+    Args:
+      queue: Очередь записей лога
+
+    Returns:
+      QueueHandler: Обработчик передачи в очередь
+    """
+
+    from logging.handlers import QueueHandler
+
+    queue_handler = QueueHandler(queue)
+    queue_handler.setLevel(DEBUG)
+    queue_handler.addFilter(_JobIdFilter())
+
+    return queue_handler
+
 def _get_stream_handler() -> StreamHandler:
     """Nнициализация записи логирования в файл"""
 
@@ -61,6 +264,80 @@ def _get_stream_handler() -> StreamHandler:
 
     return stream_handler
 
+class _JobIdFilter(Filter):
+    """Добавляет к записи лога идентификатор текущего задания."""
+
+    def filter(self, record) -> bool:
+        record.job_id = _job_id.get()
+        return True
+
+
+class _JobFileHandler(Handler):
+    """Пишет записи заданий в отдельные файлы <job_log_dir>/<job_id>.log.
+    Открытыми держатся файлы последних MAX_OPEN_JOB_FILES заданий, остальные закрываются
+    и при новой записи открываются снова на дозапись."""
+
+    def __init__(self, job_log_dir: str, max_open_files: int=MAX_OPEN_JOB_FILES):
+        super().__init__(DEBUG)
+        self.setFormatter(Formatter(LOG_FORMAT, DATE_FORMAT))
+        self._job_log_dir = job_log_dir
+        self._max_open_files = max_open_files
+        self._files = OrderedDict()
+
+    def emit(self, record):
+        job_id = getattr(record, 'job_id', '')
+
+        if not job_id:
+            return
+
+        try:
+            file = self._files.get(job_id)
+
+            if file is None:
+                file = open(os.path.join(self._job_log_dir, f'{job_id}.log'), 'a', encoding='utf-8')
+                self._files[job_id] = file
+
+                if len(self._files) > self._max_open_files:
+                    self._files.popitem(last=False)[1].close()
+            else:
+                self._files.move_to_end(job_id)
+
+            file.write(self.format(record) + '\n')
+
+        except Exception:
+            self.handleError(record)
+
+    def open_file_names(self) -> list:
+        """Файлы заданий, открытые в данный момент."""
+
+        with self.lock:
+            return [file.name for file in self._files.values()]
+
+    def flush(self):
+        with self.lock:
+            for file in self._files.values():
+                file.flush()
+
+    def close(self):
+        with self.lock:
+            for file in self._files.values():
+                file.close()
+
+            self._files = OrderedDict()
+
+        super().close()
+
+
+_job_id = ContextVar('job_id', default='')
+_operation = ContextVar('operation', default='')
+_queue = None
+_queue_listener = None
+_queue_lock = threading.RLock()
+_duration_listeners = []
+_listeners_lock = threading.Lock()
+
+atexit.register(shutdown_logger)
+
 def log_func(func: Callable) -> Callable:
     """Декоратор.
     Логирует у функции границы, длительность и т.п.
@@ -77,9 +354,20 @@ def log_func(func: Callable) -> Callable:
         log.info(f'{message_prefix}. Началось')
 
         start_time = time.monotonic()
-        func_result = func(*args, **kwargs)
+        token = _operation.set(func.__name__)
+
+        try:
+            func_result = func(*args, **kwargs)
+        except Exception as ex:
+            _notify_duration_listeners(func.__name__, args, time.monotonic() - start_time, None, ex)
+            raise
+        finally:
+            _operation.reset(token)
+
+        elapsed = time.monotonic() - start_time
+        _notify_duration_listeners(func.__name__, args, elapsed, func_result, None)
 
-        duration_seconds = math.ceil(time.monotonic() - start_time)
+        duration_seconds = math.ceil(elapsed)
         minutes, seconds = divmod(duration_seconds, 60)
 
         message = f'{message_prefix}. Выполнилось за {minutes}:{seconds:02} мин:сек'
@@ -110,6 +398,8 @@ def handle_and_log_exceptions(func: Callable) -> Callable:
             if log.hasHandlers():
                 # exc_info используется в тестах
                 log.error(traceback.format_exc(), exc_info=Exception)
+                # Стэк не должен потеряться, если процесс сразу завершится
+                flush_logger()
             else:
                 raise
 
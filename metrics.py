@@ -0,0 +1,51 @@
+"""Статистика по наборам измерений: процентили и сводка."""
+
+import math
+
+__all__ = ['percentile', 'summarize']
+
+DEFAULT_PERCENTS = (50, 90, 95, 99)
+
+
+def percentile(values: list, percent: float) -> float:
+    """Процентиль с линейной интерполяцией между соседними значениями.
+
+    Args:
+      values: list: Значения, порядок не важен
+      percent: float: Процентиль от 0 до 100
+
+    Returns:
+      float: Значение процентиля или None, если значений нет
+    """
+
+    if not values:
+        return None
+
+    values = sorted(values)
+    position = (len(values) - 1) * percent / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+def summarize(values: list, percents: tuple=DEFAULT_PERCENTS) -> dict:
+    """Сводка по значениям: количество, минимум, максимум, среднее и процентили.
+
+    Args:
+      values: list: Значения
+      percents: tuple: Вычисляемые процентили (Default value = (50, 90, 95, 99))
+
+    Returns:
+      dict: {'count': ..., 'min': ..., 'max': ..., 'mean': ..., 'p50': ..., ...}
+    """
+
+    values = sorted(values)
+    result = {'count': len(values),
+              'min': values[0] if values else None,
+              'max': values[-1] if values else None,
+              'mean': sum(values) / len(values) if values else None}
+
+    for percent in percents:
+        result[f'p{percent:g}'] = percentile(values, percent)
+
+    return result
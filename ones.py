@@ -1,16 +1,38 @@
 """"Библиотека работы с платформой 1С путем запуска через командную строку."""
 
 from enum import Enum
-from configparser import ConfigParser
-import subprocess
-from packaging import version
+import os
+import threading
+import time
 
+from fileops import FileLock, read_file_tail
 from logger_ import logger
 import logger_
+from preflight import BusyActions, InfobaseBusy, probe_file_infobase
 
 __all__ = ['CreationInfobase', 'Designer', 'Enterprise',
            'GenInfobaseLogFileName', 'set_base_parameters_in_list_file',
-           'SupportRules', 'SQLYearOffsets', 'FileDBFormats', 'DBServerTypes', 'ConfigDumpFormats']
+           'set_bases_parameters_in_list_file',
+           'SupportRules', 'SQLYearOffsets', 'FileDBFormats', 'DBServerTypes', 'ConfigDumpFormats',
+           'BusyActions', 'InfobaseBusy', 'AdmissionController', 'AdmissionTimeout',
+           'SingleFlight', 'CancellationToken', 'OperationCancelled',
+           'InfobaseLockManager', 'InfobaseLockTimeout', 'InfobaseLockUpgrade']
+
+# Классы модулей расширений, доступные как атрибуты модуля. Nмпортируются при первом обращении:
+# модули расширений (и subprocess, logging.handlers) заметно удлиняют запуск скриптов,
+# которым они не нужны.
+_LAZY_EXPORTS = {'AdmissionController': 'admission', 'AdmissionTimeout': 'admission',
+                 'SingleFlight': 'single_flight',
+                 'CancellationToken': 'cancellation', 'OperationCancelled': 'cancellation',
+                 'InfobaseLockManager': 'ib_locks', 'InfobaseLockTimeout': 'ib_locks',
+                 'InfobaseLockUpgrade': 'ib_locks'}
+
+
+# Сколько байт с конца файла /Out попадает в лог при ошибке
+IB_LOG_TAIL_BYTES = 64 * 1024
+
+# Общая для процесса блокировка выдачи имен файлов лога 1С
+_LOG_NAME_LOCK = threading.Lock()
 
 
 class SupportRules(Enum):
@@ -82,6 +104,9 @@ class ConfigDumpFormats(Enum):
 class RunInfobase:
     """Абстрактный класс по запуску 1С."""
 
+    # Запуску нужен монопольный доступ к базе, если операция не названа (см. _needs_exclusive)
+    _preflight_exclusive = False
+
     def __init__(self, 
                 dir_: str ='',
                 server: str='', infobase: str='',
@@ -98,11 +123,18 @@ class RunInfobase:
         self._server = server
         self._infobase = infobase
         self._ws_connection_string = ws_connection_string
+        self.last_started = None
         self.set_platform_params('')
         self.set_auth_params(user='')
         self.set_log_ib_params()
         self.set_dialogs_settings()
         self.set_other_params()
+        self.set_retry_params()
+        self.set_preflight_params()
+        self.set_admission_params()
+        self.set_single_flight_params()
+        self.set_cancellation_params()
+        self.set_ib_lock_params()
 
     def set_auth_params(self, user: str, password: str='', use_os_auth: bool=True):
         """Установка параметров авторизации.
@@ -174,21 +206,182 @@ class RunInfobase:
         self._locale = locale
         self._other_params = other_params if other_params else []
 
+    def set_retry_params(self, retry_policy: 'RetryPolicy'=None, error_catalog: 'ErrorCatalog'=None):
+        """Установка параметров повтора запуска при временных ошибках 1С.
+        После операции last_attempts - количество попыток, last_error_kind - вид ошибки
+        последней попытки (ErrorKinds, None - ошибки не было).
+
+        Args:
+          retry_policy: RetryPolicy: Политика повторов. Если не задана, запуск не повторяется (Default value = None)
+          error_catalog: ErrorCatalog: Каталог сигнатур ошибок (Default value = None - DEFAULT_CATALOG)
+        """
+
+        from ib_errors import DEFAULT_CATALOG
+
+        self._retry_policy = retry_policy
+        self._error_catalog = error_catalog if error_catalog else DEFAULT_CATALOG
+        self.last_attempts = 0
+        self.last_error_kind = None
+
+    def set_preflight_params(self, check: bool=False,
+                             on_busy: BusyActions=BusyActions.FAIL,
+                             session_query=None):
+        """Установка параметров проверки занятости базы перед запуском 1С.
+        Монопольный доступ нужен операциям, изменяющим базу; выгрузки и запуск предприятия
+        разделяют базу с другими сеансами (та же таблица операций, что в модуле ib_locks).
+        На Windows файловая база проверяется блокировкой только перед монопольными операциями,
+        для остальных - только по отказу в совместном доступе к файлу базы (см. модуль preflight).
+
+        Args:
+          check: bool: Проверять занятость базы (Default value = False)
+          on_busy: BusyActions: Действие, если база занята (Default value = BusyActions.FAIL)
+          session_query: Функция (объект запуска, нужен монопольный доступ) -> список описаний
+                         сеансов, мешающих запуску. Нужна для проверки серверной базы,
+                         например RacClient.session_query() (Default value = None)
+        """
+
+        self._preflight_check = check
+        self._preflight_on_busy = on_busy
+        self._session_query = session_query
+
+    def set_admission_params(self, controller: 'AdmissionController'=None):
+        """Установка контроллера допуска запусков по памяти, лицензиям и местам (см. модуль admission).
+        Один контроллер обычно разделяется всеми объектами запуска процесса.
+
+        Args:
+          controller: AdmissionController: Контроллер допуска. None - запуск без ожидания (Default value = None)
+        """
+
+        self._admission = controller
+
+    def set_single_flight_params(self, group: 'SingleFlight'=None):
+        """Установка объединения одинаковых одновременных запусков (см. модуль single_flight).
+        Вызов, совпавший с уже выполняющейся командой, не запускает 1С, а получает ее результат.
+
+        Args:
+          group: SingleFlight: Группа объединения. None - запуски не объединяются (Default value = None)
+        """
+
+        self._single_flight = group
+
+    def set_cancellation_params(self, token: 'CancellationToken'=None):
+        """Установка токена отмены (см. модуль cancellation). При отмене процесс 1С
+        завершается вместе с дочерними процессами, а операция - исключением OperationCancelled.
+
+        Args:
+          token: CancellationToken: Токен отмены. None - токен контекста cancel_scope (Default value = None)
+        """
+
+        self._cancellation_token = token
+
+    def set_ib_lock_params(self, manager: 'InfobaseLockManager'=None):
+        """Установка менеджера блокировок баз между потоками и процессами (см. модуль ib_locks).
+        Запуск 1С ждет блокировку базы: разделяемую для выгрузок, монопольную для изменений.
+
+        Args:
+          manager: InfobaseLockManager: Менеджер блокировок. None - база не блокируется (Default value = None)
+        """
+
+        self._ib_locks = manager
+
     def _subprocess_run(self, params: list):
         """Обертка для удобства мокирования.
+        Если задан контроллер допуска, запуск ждет допуска, а пиковая память процесса
+        уточняет оценку памяти операции. Время создания процесса (time.monotonic)
+        сохраняется в last_started, ожидание допуска в него не входит.
 
         Args:
           params: list: Параметры запуска согласно требования функции subprocess.run
 
         Returns:
           completed_process.returncode: Код возвращаемый фукцией subprocess.run
+
+        Raises:
+          OperationCancelled: Операция отменена (см. set_cancellation_params)
         """
 
-        completed_process = subprocess.run(params)
-        return completed_process.returncode
+        token = self._token()
+        self.last_started = None
+
+        if self._admission is not None:
+            from admission import run_process
+
+            with self._admission.admit(logger_.current_operation(), token) as ticket:
+                self.last_started = time.monotonic()
+                return_code, ticket.peak_memory = run_process(params, token)
+
+            return return_code
+
+        if token is None:
+            import subprocess
+
+            self.last_started = time.monotonic()
+            completed_process = subprocess.run(params)
+            return completed_process.returncode
+
+        from cancellation import start_process, watch_process
+
+        token.raise_if_cancelled()
+        process = start_process(params)
+        self.last_started = time.monotonic()
+
+        with watch_process(process, token):
+            return_code = process.wait()
+
+        return return_code
+
+    def _token(self) -> 'CancellationToken':
+        """Токен отмены операции: заданный объекту или токен контекста."""
+
+        from cancellation import current_token
+
+        return self._cancellation_token if self._cancellation_token is not None else current_token()
 
     def _execute_command(self, params: list) -> int:
         """Непосредственно запуск 1С.
+        Если задана группа объединения и такая же команда уже выполняется,
+        возвращается ее результат (см. set_single_flight_params).
+
+        Args:
+          params: list: Параметры запуска согласно требования функции subprocess.run
+
+        Returns:
+          bool: Успешно/неуспешно выполнение
+        """
+
+        self.last_attempts = 0
+        self.last_error_kind = None
+        self.last_skipped = False
+
+        if self._single_flight is None or not self._single_flight.covers(logger_.current_operation()):
+            return self._run_command(params)
+
+        return self._single_flight.run([self._exename] + params, lambda: self._run_command(params))
+
+    def _run_command(self, params: list) -> int:
+        """Запуск 1С под блокировкой базы, если задан менеджер блокировок (см. set_ib_lock_params).
+
+        Args:
+          params: list: Параметры запуска согласно требования функции subprocess.run
+
+        Returns:
+          bool: Успешно/неуспешно выполнение
+
+        Raises:
+          InfobaseLockTimeout: Блокировка базы не получена за отведенное время
+          InfobaseLockUpgrade: Изменение базы внутри разделяемой блокировки того же потока
+        """
+
+        if self._ib_locks is None:
+            return self._run_attempts(params)
+
+        with self._ib_locks.lock(self._infobase_key(), logger_.current_operation(), token=self._token()):
+            return self._run_attempts(params)
+
+    def _run_attempts(self, params: list) -> int:
+        """Запуск 1С.
+        При неуспехе ошибка классифицируется, и временные ошибки повторяются
+        согласно политике повторов (см. set_retry_params).
 
         Args:
           params: list: Параметры запуска согласно требования функции subprocess.run
@@ -197,24 +390,131 @@ class RunInfobase:
           bool: Успешно/неуспешно выполнение
         """
 
+        if not self._preflight():
+            return False
+
         params.insert(0, self._exename)
 
         logger().debug('Параметры запуска: ' + ' '.join(params))
 
-        return_code = self._subprocess_run(params)
-        result = (return_code == 0)
+        attempt = 0
+
+        while True:
+            attempt += 1
+
+            ib_log_start_offset = self._ib_log_file_size()
+
+            return_code = self._subprocess_run(params)
+            result = (return_code == 0)
+
+            if result:
+                break
+
+            content_file_log = self._log_1s_execution_error(return_code,
+                                                            self._ib_log_file_name,
+                                                            ib_log_start_offset)
+            error_kind, signature = self._error_catalog.classify(return_code, content_file_log)
+            self.last_error_kind = error_kind
+
+            if not (self._retry_policy and self._retry_policy.should_retry(error_kind, attempt)):
+                break
 
-        if not result:
-            self._log_1s_execution_error(return_code, self._ib_log_file_name)
+            delay = self._retry_policy.delay(attempt)
+
+            logger().warning(f'Ошибка {error_kind.value} ({signature}). '
+                             f'Повтор {attempt + 1} из {self._retry_policy.max_attempts} '
+                             f'через {delay:.0f} сек')
+
+            token = self._token()
+
+            if token is None:
+                time.sleep(delay)
+            elif token.wait(delay):
+                token.raise_if_cancelled()
+
+        self.last_attempts = attempt
+
+        if attempt > 1:
+            logger().info(f'Выполнено попыток: {attempt}')
 
         return result
 
-    def _log_1s_execution_error(self, return_code: int, gen_ib_log_file_name: str=''):
+    def _preflight(self) -> bool:
+        """Проверка занятости базы перед запуском 1С (см. set_preflight_params).
+
+        Returns:
+          bool: База свободна или проверка отключена
+
+        Raises:
+          InfobaseBusy: База занята и задано действие BusyActions.RAISE
+        """
+
+        if not self._preflight_check:
+            return True
+
+        if self._dir:
+            busy, holder = probe_file_infobase(self._dir, self._needs_exclusive())
+
+        elif self._server and self._session_query:
+            sessions = self._session_query(self, self._needs_exclusive())
+            busy, holder = bool(sessions), ', '.join(sessions)
+
+        else:
+            return True
+
+        if not busy:
+            return True
+
+        if self._preflight_on_busy == BusyActions.RAISE:
+            raise InfobaseBusy(self._infobase_key(), holder)
+
+        logger().error(f'Информационная база {self._infobase_key()} занята, запуск отменен. '
+                       f'Занята: {holder or "владелец неизвестен"}')
+
+        return False
+
+    def _needs_exclusive(self) -> bool:
+        """Нужен ли выполняемой операции монопольный доступ к базе: по таблице разделяемых
+        операций менеджера блокировок или ib_locks.SHARED_OPERATIONS. Для операции без имени - по классу."""
+
+        operation = logger_.current_operation()
+
+        if not operation:
+            return self._preflight_exclusive
+
+        if self._ib_locks is not None:
+            return self._ib_locks.is_exclusive(operation)
+
+        from ib_locks import SHARED_OPERATIONS
+
+        return operation not in SHARED_OPERATIONS
+
+    def _ib_log_file_size(self) -> int:
+        """Размер файла /Out перед запуском, если платформа будет дописывать в него (-NoTruncate).
+        Nначе 0: файл будет очищен платформой."""
+
+        if not self._ib_log_file_name or self._truncate_log_ib:
+            return 0
+
+        try:
+            return os.path.getsize(self._ib_log_file_name)
+        except OSError:
+            return 0
+
+    def _log_1s_execution_error(self, return_code: int,
+                                gen_ib_log_file_name: str='',
+                                start_offset: int=0) -> str:
         """Логирование ошибки выполнения 1С в том числе из лога создавамого платформой 1С.
+        Из лога 1С читается только записанное текущим запуском (начиная с start_offset),
+        и не более IB_LOG_TAIL_BYTES последних байт.
 
         Args:
           return_code: int: Результат возвращаемый платформой 1С после выполнения
           gen_ib_log_file_name: str: Полное имя файла для вывода служебных сообщений 1С (Default value = '')
+          start_offset: int: Размер файла лога 1С перед запуском (Default value = 0)
+
+        Returns:
+          str: Текст лога 1С, используется для классификации ошибки
         """
 
         content_file_log = ''
@@ -228,15 +528,20 @@ class RunInfobase:
             #
             # Nсточник:
             # https://dl04.1c.ru/content/Platform/8_3_18_1363/1cv8upd_8_3_18_1363.htm#a92fdc30-5e0a-11ea-8371-0050569f678a
-            if (not self._platform_version or
-             version.parse(self._platform_version) >= version.parse('8.3.18')):
+            if not self._platform_version:
                 version_encoding = 'utf_8_sig'
             else:
-                version_encoding = 'cp1251'
+                # packaging импортируется только здесь: импорт заметно удлиняет старт скриптов
+                from packaging import version
+
+                if version.parse(self._platform_version) >= version.parse('8.3.18'):
+                    version_encoding = 'utf_8_sig'
+                else:
+                    version_encoding = 'cp1251'
 
             try:
-                with open(gen_ib_log_file_name, 'r', encoding=version_encoding) as file:
-                    content_file_log = file.read().strip()
+                data, truncated = read_file_tail(gen_ib_log_file_name, start_offset, IB_LOG_TAIL_BYTES)
+                content_file_log = _decode_ib_log(data, version_encoding, truncated)
 
             except FileNotFoundError:
                 error_text = f'{error_prefix} не найден файл лога 1С: {gen_ib_log_file_name}'
@@ -251,6 +556,8 @@ class RunInfobase:
 
         logger().error(f'Код результата: {return_code}: {content_file_log} {error_text}')
 
+        return content_file_log
+
     def _ib_connection_string(self) -> str:
         """Возвращает строку соединения для параметра /IBConnectionString,
         который задает строку соединения с информационной базой."""
@@ -284,6 +591,15 @@ class RunInfobase:
 
         return ib_connection_string
 
+    def _infobase_key(self) -> str:
+        """Возвращает ключ информационной базы: нормализованную строку соединения
+        без учетных данных и прочих параметров. Одна и та же база дает один и тот же ключ.
+        """
+
+        from ibases import normalize_connect
+
+        return normalize_connect(self._ib_connection_string())
+
     def _common_run_parameters(self) -> list:
         """Возвращает список общих параметров запуска 1С."""
 
@@ -320,6 +636,33 @@ class RunInfobase:
         return params
 
 
+def _decode_ib_log(data: bytes, encoding: str, truncated: bool) -> str:
+    """Декодирование фрагмента лога 1С.
+
+    Args:
+      data: bytes: Прочитанные байты
+      encoding: str: Кодировка лога
+      truncated: bool: Начало лога отброшено
+
+    Returns:
+      str: Текст лога
+    """
+
+    if truncated and encoding == 'utf_8_sig':
+        # Фрагмент может начинаться с середины многобайтового символа
+        start = 0
+        while start < len(data) and start < 4 and 0x80 <= data[start] <= 0xBF:
+            start += 1
+        data = data[start:]
+
+    text = data.decode(encoding, errors='replace').strip()
+
+    if truncated:
+        text = '...' + text
+
+    return text
+
+
 class CreationInfobase(RunInfobase):
     """Создание информационной базы."""
 
@@ -471,6 +814,8 @@ class CreationInfobase(RunInfobase):
 class Designer(RunInfobase):
     """Работа с информационной базой из конфигуратора."""
 
+    _preflight_exclusive = True
+
     def __init__(self, dir_: str ='', server: str='', infobase: str=''):
         """
         Args:
@@ -482,23 +827,43 @@ class Designer(RunInfobase):
         super().__init__(dir_, server, infobase)
         self.set_repo_params(dir_='', user='')
         self.set_update_db_cfg_params()
+        self.set_fingerprint_params()
 
     @logger_.log_func
-    def load_cfg(self, file_name_cf: str) -> bool:
+    def load_cfg(self, file_name_cf: str, ignore_fingerprint: bool=False) -> bool:
         """Загрузка конфигурации из файла.
+        Если заданы отпечатки (см. set_fingerprint_params) и в базу уже загружен этот файл,
+        загрузка пропускается.
 
         Args:
           file_name_cf: str: имя cf или cfe файла
+          ignore_fingerprint: bool: Загрузить, даже если файл уже загружен (Default value = False)
 
         Returns:
           bool: Успешно/неуспешно
         """
 
+        fingerprint = None
+
+        if self._fingerprints:
+            from fingerprints import cf_fingerprint
+
+            try:
+                fingerprint = cf_fingerprint(file_name_cf)
+            except OSError as ex:
+                # файл не читается: загрузка запускается и завершается неуспешно обычным образом
+                logger().warning(f'Не удалось вычислить отпечаток {file_name_cf}. Ошибка: {ex}')
+
+        if self._is_loaded(fingerprint, ignore_fingerprint, f'Конфигурация {file_name_cf}'):
+            return True
+
         params = self._common_run_parameters()
         params.append(f'/LoadCfg {file_name_cf}')
 
         result = self._execute_command(params)
 
+        self._store_fingerprint(fingerprint, result)
+
         return result
 
     @logger_.log_func
@@ -560,13 +925,54 @@ class Designer(RunInfobase):
 
         return result
 
+    @logger_.log_func
+    def dump_ib(self, file_name_dt: str) -> bool:
+        """Выгрузка информационной базы в файл.
+
+        Args:
+          file_name_dt: str: Nмя dt файла
+
+        Returns:
+          bool: Успешно/неуспешно
+        """
+
+        params = self._common_run_parameters()
+        params.append(f'/DumpIB {file_name_dt}')
+
+        result = self._execute_command(params)
+
+        return result
+
+    @logger_.log_func
+    def restore_ib(self, file_name_dt: str) -> bool:
+        """Загрузка информационной базы из файла.
+
+        Args:
+          file_name_dt: str: Nмя dt файла
+
+        Returns:
+          bool: Успешно/неуспешно
+        """
+
+        params = self._common_run_parameters()
+        params.append(f'/RestoreIB {file_name_dt}')
+
+        result = self._execute_command(params)
+
+        self._store_fingerprint(None, result)
+
+        return result
+
     @logger_.log_func
     def update_from_repo(self,
                          version_: int = 0,
                          revised: bool = False,
                          force: bool = False,
-                         objects: str = '') -> bool:
+                         objects: str = '',
+                         ignore_fingerprint: bool = False) -> bool:
         """Обновление конфигурации из хранилища.
+        Если заданы отпечатки (см. set_fingerprint_params) и эта версия хранилища уже загружена,
+        обновление пропускается. Обновление части объектов (objects) не пропускается.
 
         Args:
           version_: int: Номер версии в хранилище конфигурации. В том случае, если конфигурация подключена к хранилищу,
@@ -585,11 +991,23 @@ class Designer(RunInfobase):
                         в противном случае участвует вся конфигурация. 
                         Описание формата файла см. здесь https://its.1c.ru/db/v8310doc#bookmark:adm:TI000000698
                         (Default value = '')
+          ignore_fingerprint: bool: Обновить, даже если версия уже загружена (Default value = False)
 
         Returns:
           bool: Успешно/неуспешно
         """
 
+        fingerprint = None
+
+        if self._fingerprints and not objects:
+            from fingerprints import repo_fingerprint
+
+            fingerprint = repo_fingerprint(self._repo_dir, version_,
+                                           self._update_db_cfg_params['update_db_cfg'])
+
+        if self._is_loaded(fingerprint, ignore_fingerprint, f'Версия хранилища {version_ or "последняя"}'):
+            return True
+
         params = self._common_run_parameters()
 
         params.append('/ConfigurationRepositoryUpdateCfg')
@@ -614,6 +1032,8 @@ class Designer(RunInfobase):
 
         result = self._execute_command(params)
 
+        self._store_fingerprint(fingerprint, result)
+
         return result
 
     @logger_.log_func
@@ -709,6 +1129,52 @@ class Designer(RunInfobase):
 
         self._update_db_cfg_params = {'update_db_cfg': update_db_cfg, 'server': server}
 
+    def set_fingerprint_params(self, file_name: str=''):
+        """Установка файла отпечатков конфигурации баз (см. модуль fingerprints).
+        Загрузка конфигурации, которая уже загружена в базу, пропускается,
+        после операции last_skipped - загрузка пропущена.
+
+        Args:
+          file_name: str: Файл отпечатков, обычно общий для всех баз. '' - отпечатки не используются (Default value = '')
+        """
+
+        self._fingerprint_file_name = file_name
+        self._fingerprints = None
+        self.last_skipped = False
+
+        if file_name:
+            from fingerprints import FingerprintStore
+
+            self._fingerprints = FingerprintStore(file_name)
+
+    def _is_loaded(self, fingerprint: dict, ignore_fingerprint: bool, description: str) -> bool:
+        """Конфигурация с отпечатком уже загружена в базу, загрузку можно пропустить."""
+
+        self.last_skipped = False
+
+        if fingerprint is None or ignore_fingerprint:
+            return False
+
+        if not self._fingerprints.is_current(self._infobase_key(), fingerprint, self._dir):
+            return False
+
+        logger().info(f'{description} уже загружена в базу {self._infobase_key()}, загрузка пропущена')
+        self.last_skipped = True
+
+        return True
+
+    def _store_fingerprint(self, fingerprint: dict, result: bool):
+        """Запись отпечатка после загрузки. Если загрузка неуспешна или отпечаток неизвестен,
+        прежний отпечаток удаляется: конфигурация базы могла измениться."""
+
+        if self._fingerprints is None:
+            return
+
+        if result and fingerprint is not None:
+            self._fingerprints.record(self._infobase_key(), fingerprint, self._dir)
+        else:
+            self._fingerprints.forget(self._infobase_key())
+
     def _common_run_parameters(self) -> list:
         """Возвращает список общих параметров работы с базой из конфгуратора."""
 
@@ -758,11 +1224,22 @@ class Enterprise(RunInfobase):
 
         return result
 
+    def command_line(self) -> list:
+        """Возвращает параметры запуска 1С вместе с исполняемым файлом, без запуска.
+        Нужно для запуска клиентов в обход run, например при нагрузочном тестировании.
+        """
+
+        params = self._common_run_parameters()
+        params.insert(0, self._exename)
+
+        return params
+
     def set_other_params(self, 
                         access_code: str = '', 
                         locale: str = '', 
                         other_params: list = None, 
-                        launch_param: str = ''):
+                        launch_param: str = '',
+                        execute: str = ''):
         """Установка прочих параметров.
 
         Args:
@@ -771,10 +1248,12 @@ class Enterprise(RunInfobase):
           locale: str: Язык (страна), который будет использован при открытии или создании информационной базы (Default value = '')
           other_params: list: Произвольные параметры, которые будут использованы в коммандной строке запуска 1С (Default value = None)
           launch_param: str: Параметр передаваемый в прикладное решение (Default value = '')
+          execute: str: Внешняя обработка (.epf), которая будет выполнена сразу после запуска (Default value = '')
         """
 
         super().set_other_params(access_code, locale, other_params)
         self._launch_param = launch_param
+        self._execute = execute
 
     def _common_run_parameters(self) -> list:
         """Возвращает список общих параметров работы с базой в режиме предприятия."""
@@ -786,6 +1265,9 @@ class Enterprise(RunInfobase):
         params.insert(0, 'ENTERPRISE')
         params.insert(1, f'/IBConnectionString {self._ib_connection_string()}')
 
+        if self._execute:
+            params.append(f'/Execute {self._execute}')
+
         if self._launch_param:
             params.append(f'/C {self._launch_param}')
 
@@ -794,22 +1276,46 @@ class Enterprise(RunInfobase):
 class GenInfobaseLogFileName:
     """Формирование полного имени файла лога в который будет писать платформа 1С.
     Генерирует числовой постфикс для каждого последующего имени.
+
+    Nмена выдаются под общей для процесса блокировкой. При reserve=True имя резервируется
+    созданием пустого файла (монопольное создание), поэтому потоки и процессы с одним префиксом
+    получают разные имена.
     """
 
-    def __init__(self, full_log_ib_name_prefix: str):
+    def __init__(self, full_log_ib_name_prefix: str, reserve: bool=False):
         """
         Args:
           full_log_ib_name_prefix: str: Префикс полного имени файла лога. Например c:\temp\filename
+          reserve: bool: Резервировать имя созданием файла (Default value = False)
         """
 
         self._configurator_run_number = 0
         self._full_log_ib_name_prefix = full_log_ib_name_prefix
+        self._reserve = reserve
 
     def another_file_name(self) -> str:
         """Возвращает очередное имя файла лога."""
 
-        self._configurator_run_number += 1
-        return f'{self._full_log_ib_name_prefix}{self._configurator_run_number}.log'
+        with _LOG_NAME_LOCK:
+            while True:
+                self._configurator_run_number += 1
+                file_name = f'{self._full_log_ib_name_prefix}{self._configurator_run_number}.log'
+
+                if not self._reserve:
+                    return file_name
+
+                try:
+                    os.close(os.open(file_name, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                    return file_name
+
+                except FileExistsError:
+                    # Nмя занято другим процессом или предыдущим запуском
+                    continue
+
+                except OSError as ex:
+                    logger().warning(f'Не удалось зарезервировать имя файла лога 1С {file_name}. '
+                                     f'Ошибка: {ex}')
+                    return file_name
 
 
 @logger_.log_func
@@ -829,77 +1335,151 @@ def set_base_parameters_in_list_file(file_name_list_base: str,
       bool: Успешно/неуспешно выполнение
     """
 
-    config = ConfigParser()
+    base_parameters = {}
 
-    result = _read_base_list_file(config, file_name_list_base)
+    if additional_parameters:
+        base_parameters['AdditionalParameters'] = additional_parameters
 
-    result = (result and _write_base_list_file(config,
-                                               file_name_list_base,
-                                               base_name_in_the_list,
-                                               additional_parameters,
-                                               platform_version))
+    if platform_version:
+        base_parameters['Version'] = platform_version
 
-    return result
+    return _set_bases_parameters(file_name_list_base, {base_name_in_the_list: base_parameters})
 
-def _read_base_list_file(config: ConfigParser, file_name: str) -> bool:
-    """Читает файл списка информационных баз.
+@logger_.log_func
+def set_bases_parameters_in_list_file(file_name_list_base: str,
+                                      bases_parameters: dict,
+                                      by_connect: bool = False) -> bool:
+    """Устанавливает параметры сразу нескольких информационных баз в файле ibases.v8i
+    за одно чтение и одну запись файла.
+
+    На время изменения файл блокируется (рекомендательная блокировка на файле
+    file_name_list_base + '.lock'), запись атомарная. Если ни одно значение
+    не изменилось, файл не перезаписывается.
+    Если хотя бы одной базы нет в списке, файл не изменяется.
 
     Args:
-      config: ConfigParser: Парсер ini-файла
-      file_name: str: Полное имя файла списка баз 1С - ibases.v8i
+      file_name_list_base: str: Полное имя файла списка баз 1С - ibases.v8i
+      bases_parameters: dict: Параметры по базам: {имя базы в списке: {параметр: значение}}.
+                              Параметры указываются как в ibases.v8i, например
+                              {'base1': {'AdditionalParameters': '/C 1', 'Version': '8.3.18'}}
+      by_connect: bool: Базы указаны не именами, а строками соединения,
+                        например {"File='D:\\base1';": {...}} (Default value = False)
 
     Returns:
       bool: Успешно/неуспешно выполнение
     """
 
-    result = True
+    return _set_bases_parameters(file_name_list_base, bases_parameters, by_connect)
 
-    error_message = f'Не удалось прочитать файл {file_name}'
+def _set_bases_parameters(file_name_list_base: str,
+                          bases_parameters: dict,
+                          by_connect: bool = False) -> bool:
+    """Чтение, изменение и запись файла списка баз под блокировкой.
+
+    Args:
+      file_name_list_base: str: Полное имя файла списка баз 1С - ibases.v8i
+      bases_parameters: dict: Параметры по базам: {имя или строка соединения базы: {параметр: значение}}
+      by_connect: bool: Базы указаны строками соединения (Default value = False)
+
+    Returns:
+      bool: Успешно/неуспешно выполнение
+    """
+
+    lock = FileLock(file_name_list_base + '.lock')
 
     try:
-        config.read(file_name, encoding='utf_8_sig')
+        lock.acquire()
 
     except Exception as ex:
-        result = False
-        error_message = f'{error_message}. Ошибка: {ex}'
+        logger().error(f'Не удалось заблокировать файл {file_name_list_base}. Ошибка: {ex}')
+        return False
+
+    try:
+        base_list = _read_base_list_file(file_name_list_base)
 
-    if not result:
-        logger().error(error_message)
+        if base_list is None:
+            return False
 
-    return result
+        find_base = base_list.find_by_connect if by_connect else base_list.get
+        entries = {base: find_base(base) for base in bases_parameters}
+
+        missing_bases = [base for base, entry in entries.items() if entry is None]
+
+        if missing_bases:
+            logger().error(f'Не удалось записать файл {file_name_list_base}. '
+                           f'В списке нет баз: {", ".join(missing_bases)}')
+            return False
+
+        for base, base_parameters in bases_parameters.items():
+            base_list.update(entries[base], base_parameters)
 
-def _write_base_list_file(config: ConfigParser,
-                          file_name: str,
-                          base_name_in_the_list: str,
-                          additional_parameters: str= '',
-                          platform_version: str= '') -> bool:
-    """Записывает параметры в файл списка информационных баз.
+        if not base_list.modified:
+            logger().debug(f'Файл {file_name_list_base} не изменился, запись пропущена')
+            return True
+
+        return _write_base_list_file(base_list, file_name_list_base)
+
+    finally:
+        lock.release()
+
+def _read_base_list_file(file_name: str) -> 'BaseList':
+    """Читает файл списка информационных баз.
 
     Args:
-      config: ConfigParser: Парсер ini-файла
       file_name: str: Полное имя файла списка баз 1С - ibases.v8i
-      base_name_in_the_list: str: Nмя базы устанавливаемое в списке баз
-      additional_parameters: str: Строка для установки в поле "Дополнительные параметры запуска" у базы в списке баз (Default value = '')
-      platform_version: str: Строка для установки в поле "Версия 1С:Предприятие" у базы в списке баз (Default value = '')
 
     Returns:
-      bool: Успешно/неуспешно выполнение
+      BaseList: Список баз или None, если прочитать не удалось
     """
 
-    result = True
+    from ibases import BaseList
 
     try:
-        if additional_parameters:
-            config[base_name_in_the_list]['AdditionalParameters'] = additional_parameters
+        return BaseList.read(file_name)
+
+    except Exception as ex:
+        logger().error(f'Не удалось прочитать файл {file_name}. Ошибка: {ex}')
+
+    return None
+
+def _write_base_list_file(base_list: 'BaseList', file_name: str) -> bool:
+    """Атомарно записывает файл списка информационных баз.
+
+    Args:
+      base_list: BaseList: Список баз
+      file_name: str: Полное имя файла списка баз 1С - ibases.v8i
+
+    Returns:
+      bool: Успешно/неуспешно выполнение
+    """
 
-        if platform_version:
-            config[base_name_in_the_list]['Version'] = platform_version
+    result = True
 
-        with open(file_name, 'w', encoding='utf_8_sig') as configfile:
-            config.write(configfile, space_around_delimiters = False)
+    try:
+        base_list.write(file_name)
 
     except Exception as ex:
         result = False
         logger().error(f'Не удалось записать файл {file_name}. Ошибка: {ex}')
 
     return result
+
+def __getattr__(name: str):
+    """Ленивый импорт классов модулей расширений (см. _LAZY_EXPORTS)."""
+
+    module_name = _LAZY_EXPORTS.get(name)
+
+    if module_name is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    import importlib
+
+    return getattr(importlib.import_module(module_name), name)
+
+
+if __name__ == '__main__':
+    import sys
+    from cli import main
+
+    # модуль уже загружен как __main__: cli не импортирует его повторно
+    sys.exit(main(ones_module=sys.modules[__name__]))
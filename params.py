@@ -1,34 +1,44 @@
 """Формирует объект с параметрами считанными из ini-файла."""
 
-import configparser
 import datetime
+import hashlib
+import marshal
 import os
+import time
+
+from fileops import atomic_write
+
+# Версия формата файла кэша. Увеличивается при изменении структуры кэша.
+CACHE_FORMAT_VERSION = 1
+
+# Файл, измененный менее указанного числа секунд назад, не кэшируется:
+# на сетевых ресурсах точность времени изменения бывает грубой,
+# и изменение в ту же секунду без изменения размера осталось бы незамеченным.
+CACHE_MIN_AGE_SECONDS = 2
 
 class Params:
     """Создает объект с атрибутами созданными из параметров файла ini"""
 
     def __init__(self, ini_file_name: str,
                 script_full_file_name: str,
-                params_required_version: str):
+                params_required_version: str,
+                cache_dir: str = ''):
         """
         Args:
             ini_file_name: str: Полное имя считываемого ini-файла
             script_full_file_name: str: Полное имя файла модуля для на основании которго формируемися имя файла лога.
             params_required_version: str: Ожидаемая версия ini-файла. Nспользуется для проверки.
+            cache_dir: str: Каталог кэша разобранных ini-файлов. Если не задан, кэш не используется.
+                            (Default value = '')
         """
 
-        config = configparser.ConfigParser()
-        if not config.read(ini_file_name, encoding = 'cp1251'):
-            raise CouldNotReadParametersFile(
-                  f'Не удалось прочитать файл параметров {ini_file_name}')
-
-        for section in config.items():
-            for key_value in section[1].items():
-                param_name = key_value[0]
-                if section[0] != 'common':
-                    param_name = section[0] +'_'+ param_name
+        if cache_dir:
+            params = _load_params_cached(ini_file_name, cache_dir)
+        else:
+            params = _load_params(ini_file_name)
 
-                setattr(self, param_name, key_value[1])
+        for param_name, value in params.items():
+            setattr(self, param_name, value)
 
         if self.ini_version != params_required_version:
             raise WrongParametersFileVersion(
@@ -48,3 +58,106 @@ class CouldNotReadParametersFile(Exception):
 
 class WrongParametersFileVersion(Exception):
     """Nсключение 'Неверная версия файла параметров'"""
+
+
+def invalidate_params_cache(ini_file_name: str, cache_dir: str):
+    """Удаляет кэш ini-файла. Следующее чтение разберет ini-файл заново.
+
+    Args:
+      ini_file_name: str: Полное имя ini-файла
+      cache_dir: str: Каталог кэша
+    """
+
+    try:
+        os.unlink(_cache_file_name(ini_file_name, cache_dir))
+    except FileNotFoundError:
+        pass
+
+def _load_params(ini_file_name: str) -> dict:
+    """Разбор ini-файла.
+
+    Args:
+      ini_file_name: str: Полное имя ini-файла
+
+    Returns:
+      dict: Параметры {имя атрибута: значение}. Nмя атрибута - имя параметра для секции common,
+            для прочих секций - секция_параметр
+    """
+
+    import configparser
+
+    config = configparser.ConfigParser()
+    if not config.read(ini_file_name, encoding = 'cp1251'):
+        raise CouldNotReadParametersFile(
+              f'Не удалось прочитать файл параметров {ini_file_name}')
+
+    params = {}
+
+    for section in config.items():
+        for key_value in section[1].items():
+            param_name = key_value[0]
+            if section[0] != 'common':
+                param_name = section[0] +'_'+ param_name
+
+            params[param_name] = key_value[1]
+
+    return params
+
+def _load_params_cached(ini_file_name: str, cache_dir: str) -> dict:
+    """Чтение параметров из кэша. Если кэш отсутствует или устарел,
+    ini-файл разбирается и кэш перезаписывается.
+    Кэш считается актуальным при совпадении пути, времени изменения и размера ini-файла.
+
+    Args:
+      ini_file_name: str: Полное имя ini-файла
+      cache_dir: str: Каталог кэша
+
+    Returns:
+      dict: Параметры {имя атрибута: значение}
+    """
+
+    try:
+        stat = os.stat(ini_file_name)
+    except OSError as ex:
+        raise CouldNotReadParametersFile(
+              f'Не удалось прочитать файл параметров {ini_file_name}') from ex
+
+    key = (CACHE_FORMAT_VERSION, os.path.abspath(ini_file_name), stat.st_mtime_ns, stat.st_size)
+    cache_file_name = _cache_file_name(ini_file_name, cache_dir)
+
+    try:
+        with open(cache_file_name, 'rb') as file:
+            cache = marshal.load(file)
+
+        if cache['key'] == key:
+            return cache['params']
+
+    except Exception:
+        # Нет кэша, кэш поврежден или другого формата - просто разбираем ini-файл
+        pass
+
+    params = _load_params(ini_file_name)
+
+    if time.time() - stat.st_mtime >= CACHE_MIN_AGE_SECONDS:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            atomic_write(cache_file_name, marshal.dumps({'key': key, 'params': params}))
+        except OSError:
+            # Кэш необязателен: недоступность каталога кэша не мешает работе
+            pass
+
+    return params
+
+def _cache_file_name(ini_file_name: str, cache_dir: str) -> str:
+    """Полное имя файла кэша для ini-файла.
+
+    Args:
+      ini_file_name: str: Полное имя ini-файла
+      cache_dir: str: Каталог кэша
+
+    Returns:
+      str: Полное имя файла кэша
+    """
+
+    path_hash = hashlib.sha1(os.path.abspath(ini_file_name).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f'{path_hash}.params')
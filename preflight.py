@@ -0,0 +1,174 @@
+"""Предварительная проверка занятости информационной базы перед запуском 1С.
+
+Если файловая база открыта монопольно или в ней работает конфигуратор, новый запуск 1С
+ждет собственного таймаута и завершается с невнятной ошибкой. Проверка до запуска позволяет
+сразу отказаться от запуска или вернуть задание в очередь.
+
+Файловая база: пробуется неблокирующая блокировка файла базы 1Cv8.1CD и файла
+блокировок 1Cv8.1CL, монопольная для операций конфигуратора и разделяемая для предприятия.
+На Linux владелец блокировки определяется по /proc/locks.
+На Windows блокировки файлов только монопольные (msvcrt.locking, как в fileops.FileLock),
+поэтому блокировкой проверяется только монопольный запуск; для запуска предприятия
+база считается занятой, только если файл базы открыт 1С без совместного доступа.
+Серверная база: вызывается необязательная функция запроса сеансов (например, RacClient.session_query).
+"""
+
+from enum import Enum
+import os
+import sys
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+__all__ = ['BusyActions', 'InfobaseBusy', 'probe_file_infobase']
+
+FILE_DB_NAMES = ('1Cv8.1CD', '1Cv8.1CL')
+
+
+class BusyActions(Enum):
+    """Действие, если база занята.
+
+    Attributes:
+      FAIL: str: Запуск считается неуспешным, операция возвращает False
+      RAISE: str: Nсключение InfobaseBusy, например для возврата задания в очередь
+    """
+
+    FAIL = 'fail'
+    RAISE = 'raise'
+
+
+class InfobaseBusy(Exception):
+    """Nсключение 'Nнформационная база занята'"""
+
+    def __init__(self, infobase: str, holder: str=''):
+        """
+        Args:
+          infobase: str: Ключ базы
+          holder: str: Кто занял базу, если известно (Default value = '')
+        """
+
+        self.infobase = infobase
+        self.holder = holder
+
+        super().__init__(f'Информационная база {infobase} занята' + (f': {holder}' if holder else ''))
+
+
+def probe_file_infobase(dir_: str, exclusive: bool) -> tuple:
+    """Проверка занятости файловой базы.
+
+    Args:
+      dir_: str: Каталог файловой базы
+      exclusive: bool: Нужен монопольный доступ (конфигуратор), иначе разделяемый (предприятие)
+
+    Returns:
+      tuple: (занята, владелец блокировки или '')
+    """
+
+    for name in FILE_DB_NAMES:
+        file_name = os.path.join(dir_, name)
+
+        if not os.path.exists(file_name):
+            continue
+
+        if _probe_lock(file_name, exclusive):
+            return True, ', '.join(lock_holders(file_name))
+
+    return False, ''
+
+def lock_holders(file_name: str) -> list:
+    """Процессы, держащие блокировки файла. Определяются только на Linux.
+
+    Returns:
+      list: Описания процессов вида 'PID 123 (1cv8)'
+    """
+
+    try:
+        stat = os.stat(file_name)
+        with open('/proc/locks', encoding='ascii') as file:
+            lines = file.readlines()
+    except OSError:
+        return []
+
+    device = f'{os.major(stat.st_dev):02x}:{os.minor(stat.st_dev):02x}'
+    holders = []
+
+    for line in lines:
+        fields = [field for field in line.split() if field != '->']
+
+        # 1: POSIX  ADVISORY  WRITE 12345 08:01:1234567 0 EOF
+        if len(fields) < 6:
+            continue
+
+        pid = fields[4]
+        lock_device, _, inode = fields[5].rpartition(':')
+
+        if inode != str(stat.st_ino) or lock_device != device or pid == str(os.getpid()):
+            continue
+
+        holder = f'PID {pid}'
+
+        try:
+            with open(f'/proc/{pid}/comm', encoding='utf-8') as file:
+                holder += f' ({file.read().strip()})'
+        except OSError:
+            pass
+
+        if holder not in holders:
+            holders.append(holder)
+
+    return holders
+
+def _probe_lock(file_name: str, exclusive: bool) -> bool:
+    """Пробная блокировка файла, сразу снимается.
+
+    Returns:
+      bool: Файл заблокирован другим процессом
+    """
+
+    try:
+        fd = os.open(file_name, os.O_RDWR if exclusive else os.O_RDONLY)
+    except PermissionError:
+        # На Windows файл, открытый 1С без совместного доступа, не открывается
+        return sys.platform == 'win32'
+    except OSError:
+        return False
+
+    try:
+        if fcntl is None:
+            return exclusive and _probe_windows_lock(fd)
+
+        # 1С может использовать как блокировки POSIX, так и flock, они независимы
+        for lock in (fcntl.lockf, fcntl.flock):
+            try:
+                lock(fd, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB)
+            except OSError:
+                return True
+
+            lock(fd, fcntl.LOCK_UN)
+
+        return False
+
+    finally:
+        os.close(fd)
+
+def _probe_windows_lock(fd: int) -> bool:
+    """Пробная монопольная блокировка первого байта файла на Windows, сразу снимается.
+
+    Returns:
+      bool: Файл заблокирован другим процессом
+    """
+
+    os.lseek(fd, 0, os.SEEK_SET)
+
+    try:
+        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return True
+
+    os.lseek(fd, 0, os.SEEK_SET)
+    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+    return False
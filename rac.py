@@ -0,0 +1,369 @@
+"""Управление информационными базами кластера через утилиту администрирования rac.
+
+Серверные базы создаются, перечисляются и удаляются командами rac к сервису ras,
+без запуска клиента 1С (1cv8 CREATEINFOBASE). Параметры базы берутся из настроенного
+объекта CreationInfobase (set_server_db_params, set_claster_params).
+
+Пример:
+    creation = CreationInfobase(server='server1', infobase='base1')
+    creation.set_server_db_params(DBServerTypes.POSTGRE_SQL, 'db1', 'base1', create_db_if_not_exist=True)
+
+    rac = RacClient(r'C:\\Program Files\\1cv8\\8.3.18.1363\\bin\\rac.exe', 'server1:1545')
+    rac.create_infobase(creation)
+    rac.create_infobases([creation2, creation3], max_workers=4)
+
+Безопасность: rac принимает пароли (--cluster-pwd, --db-pwd, --infobase-pwd) только
+в командной строке, других способов передачи у утилиты нет. В логе пароли маскируются,
+но на время работы rac они видны в списке процессов всем пользователям компьютера.
+Запускайте rac на компьютере без посторонних пользователей или скрывайте чужие процессы
+средствами ОС (Linux: hidepid для /proc), а администратору кластера давайте отдельную
+учетную запись без прочих прав.
+
+Команды rac выполняются с токеном отмены (модуль cancellation): при отмене процесс rac завершается.
+"""
+
+import subprocess
+import threading
+
+from batch import run_batch
+from cancellation import CancellationToken, current_token, start_process, watch_process
+from logger_ import logger
+from ones import CreationInfobase
+
+__all__ = ['RacClient', 'RacError', 'parse_output']
+
+DEFAULT_RAS_ADDRESS = 'localhost:1545'
+DEFAULT_LOCALE = 'ru'
+
+# Параметры с паролями, значения которых не выводятся в лог
+_SECRET_PARAMS = ('--cluster-pwd=', '--db-pwd=', '--infobase-pwd=')
+
+
+class RacError(Exception):
+    """Nсключение 'Ошибка выполнения rac'"""
+
+
+class RacClient:
+    """Клиент утилиты rac."""
+
+    def __init__(self, exename,
+                 ras_address: str=DEFAULT_RAS_ADDRESS,
+                 cluster: str='',
+                 cluster_user: str='',
+                 cluster_password: str='',
+                 encoding: str=None,
+                 token: CancellationToken=None):
+        """
+        Args:
+          exename: str | list: Полное имя rac или команда списком (например, интерпретатор и скрипт)
+          ras_address: str: Адрес сервиса ras, хост:порт (Default value = 'localhost:1545')
+          cluster: str: Nдентификатор кластера. '' - первый кластер сервера (Default value = '')
+          cluster_user: str: Администратор кластера (Default value = '')
+          cluster_password: str: Пароль администратора кластера. Виден в списке процессов
+                                 на время работы rac, см. описание модуля (Default value = '')
+          encoding: str: Кодировка вывода rac. None - кодировка ОС по умолчанию (Default value = None)
+          token: CancellationToken: Токен отмены. None - токен контекста cancel_scope (Default value = None)
+        """
+
+        self._exename = [exename] if isinstance(exename, str) else list(exename)
+        self._ras_address = ras_address
+        self._cluster = cluster
+        self._cluster_user = cluster_user
+        self._cluster_password = cluster_password
+        self._encoding = encoding
+        self._token = token
+        self._lock = threading.Lock()
+
+    def cluster_list(self) -> list:
+        """Кластеры сервера.
+
+        Returns:
+          list: Словари свойств кластеров (cluster, host, port, name, ...)
+        """
+
+        return self._run(['cluster', 'list'])
+
+    def cluster_id(self) -> str:
+        """Nдентификатор кластера. Если не задан, берется первый кластер сервера."""
+
+        with self._lock:
+            if not self._cluster:
+                clusters = self.cluster_list()
+
+                if not clusters:
+                    raise RacError(f'На сервере {self._ras_address} нет кластеров')
+
+                self._cluster = clusters[0]['cluster']
+
+            return self._cluster
+
+    def infobase_list(self) -> list:
+        """Информационные базы кластера.
+
+        Returns:
+          list: Словари свойств баз (infobase, name, descr)
+        """
+
+        return self._run(['infobase', *self._cluster_params(), 'summary', 'list'])
+
+    def find_infobase(self, name: str) -> dict:
+        """Поиск базы по имени без учета регистра, None - база не найдена."""
+
+        name = name.lower()
+
+        for infobase in self.infobase_list():
+            if infobase.get('name', '').lower() == name:
+                return infobase
+
+        return None
+
+    def create_infobase(self, creation: CreationInfobase) -> str:
+        """Создание серверной базы по параметрам объекта CreationInfobase.
+        Пароль пользователя СУБД передается rac в командной строке (см. описание модуля).
+
+        Args:
+          creation: CreationInfobase: Настроенный объект создания серверной базы
+
+        Returns:
+          str: Nдентификатор созданной базы
+
+        Raises:
+          RacError: Ошибка выполнения rac или база не серверная
+        """
+
+        if not creation._infobase or creation._db_server_type is None:
+            raise RacError('Через rac создаются только серверные базы с заданным сервером баз данных')
+
+        params = ['infobase', *self._cluster_params(creation), 'create',
+                  f'--name={creation._infobase}',
+                  f'--dbms={creation._db_server_type.value}',
+                  f'--db-server={creation._db_server_name}',
+                  f'--db-name={creation._database}',
+                  f'--locale={creation._locale or DEFAULT_LOCALE}']
+
+        if creation._db_user:
+            params.append(f'--db-user={creation._db_user}')
+
+        if creation._db_password:
+            params.append(f'--db-pwd={creation._db_password}')
+
+        if creation._sql_year_offset is not None:
+            params.append(f'--date-offset={creation._sql_year_offset.value}')
+
+        if creation._create_db_if_not_exist:
+            params.append('--create-database')
+
+        if creation._deny_scheduled_jobs:
+            params.append('--scheduled-jobs-deny=on')
+
+        output = self._run(params)
+
+        if not output or 'infobase' not in output[0]:
+            raise RacError(f'rac не вернул идентификатор базы {creation._infobase}')
+
+        logger().info(f'Создана база {creation._infobase} на {self._ras_address}')
+
+        return output[0]['infobase']
+
+    def create_infobases(self, creations: list, max_workers: int=4) -> list:
+        """Параллельное создание серверных баз.
+
+        Args:
+          creations: list: Настроенные объекты CreationInfobase
+          max_workers: int: Количество баз, создаваемых одновременно (Default value = 4)
+
+        Returns:
+          list: TaskResult (см. модуль batch) в порядке баз, в value - идентификатор базы
+        """
+
+        self.cluster_id() # один запрос списка кластеров до параллельного создания
+
+        tasks = [(creation._infobase, lambda creation=creation: self.create_infobase(creation))
+                 for creation in creations]
+
+        results = run_batch(tasks, max_workers, self._token)
+
+        for result in results:
+            if not result.succeeded:
+                logger().error(f'Не удалось создать базу {result.name}. {result.error}')
+
+        return results
+
+    def drop_infobase(self, name: str,
+                      drop_database: bool=False,
+                      clear_database: bool=False,
+                      user: str='',
+                      password: str='') -> bool:
+        """Удаление базы из кластера.
+
+        Args:
+          name: str: Nмя базы
+          drop_database: bool: Удалить базу данных на сервере СУБД (Default value = False)
+          clear_database: bool: Очистить базу данных на сервере СУБД (Default value = False)
+          user: str: Администратор базы (Default value = '')
+          password: str: Пароль администратора базы (Default value = '')
+
+        Returns:
+          bool: База удалена. False - базы нет в кластере
+        """
+
+        infobase = self.find_infobase(name)
+
+        if infobase is None:
+            logger().warning(f'База {name} не найдена на {self._ras_address}')
+            return False
+
+        params = ['infobase', *self._cluster_params(), 'drop', f'--infobase={infobase["infobase"]}']
+
+        if user:
+            params.append(f'--infobase-user={user}')
+
+        if password:
+            params.append(f'--infobase-pwd={password}')
+
+        if drop_database:
+            params.append('--drop-database')
+        elif clear_database:
+            params.append('--clear-database')
+
+        self._run(params)
+
+        logger().info(f'Удалена база {name} на {self._ras_address}')
+
+        return True
+
+    def session_list(self, name: str) -> list:
+        """Сеансы базы.
+
+        Args:
+          name: str: Nмя базы
+
+        Returns:
+          list: Словари свойств сеансов (session, user-name, host, app-id, ...).
+                Пустой список, если базы нет в кластере
+        """
+
+        infobase = self.find_infobase(name)
+
+        if infobase is None:
+            return []
+
+        return self._run(['session', *self._cluster_params(), 'list',
+                          f'--infobase={infobase["infobase"]}'])
+
+    def session_query(self):
+        """Функция запроса сеансов для проверки занятости серверной базы перед запуском 1С.
+
+        Пример:
+            designer.set_preflight_params(check=True, session_query=rac.session_query())
+
+        Returns:
+          Функция (объект запуска, нужен монопольный доступ) -> список описаний сеансов.
+          Для запуска без монопольного доступа сеансы не мешают, список пуст
+        """
+
+        def query(runner, exclusive: bool) -> list:
+            if not exclusive:
+                return []
+
+            return [f'{session.get("user-name", "")} ({session.get("app-id", "")}, '
+                    f'{session.get("host", "")})'
+                    for session in self.session_list(runner._infobase)]
+
+        return query
+
+    def _cluster_params(self, creation: CreationInfobase=None) -> list:
+        """Параметры кластера и его администратора."""
+
+        user = self._cluster_user or (creation._cluster_administrator_user if creation else '')
+        password = (self._cluster_password
+                    or (creation._cluster_administrator_password if creation else ''))
+
+        params = [f'--cluster={self.cluster_id()}']
+
+        if user:
+            params.append(f'--cluster-user={user}')
+
+        if password:
+            params.append(f'--cluster-pwd={password}')
+
+        return params
+
+    def _run(self, params: list) -> list:
+        """Запуск rac и разбор вывода.
+
+        Returns:
+          list: Словари свойств объектов из вывода
+
+        Raises:
+          RacError: rac завершился с ошибкой
+          OperationCancelled: Токен отменен
+        """
+
+        command = self._exename + [self._ras_address] + params
+        token = self._token if self._token is not None else current_token()
+
+        logger().debug('Параметры запуска rac: ' + ' '.join(_mask_secrets(command)))
+
+        if token is None:
+            completed_process = subprocess.run(command, capture_output=True, text=True,
+                                               encoding=self._encoding)
+            return_code = completed_process.returncode
+            stdout, stderr = completed_process.stdout, completed_process.stderr
+        else:
+            token.raise_if_cancelled()
+            process = start_process(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                    text=True, encoding=self._encoding)
+
+            with watch_process(process, token):
+                stdout, stderr = process.communicate()
+
+            return_code = process.returncode
+
+        if return_code != 0:
+            raise RacError(f'Ошибка rac {" ".join(_mask_secrets(params))}. '
+                           f'Код возврата: {return_code}. '
+                           f'{stderr.strip() or stdout.strip()}')
+
+        return parse_output(stdout)
+
+
+def parse_output(text: str) -> list:
+    """Разбор вывода rac: блоки строк 'ключ : значение', разделенные пустой строкой.
+
+    Args:
+      text: str: Вывод rac
+
+    Returns:
+      list: Словари по блокам
+    """
+
+    objects = []
+    current = {}
+
+    for line in text.splitlines():
+        key, separator, value = line.partition(':')
+
+        if not separator:
+            if current:
+                objects.append(current)
+                current = {}
+            continue
+
+        value = value.strip()
+
+        if len(value) >= 2 and value[0] == value[-1] == '"':
+            value = value[1:-1].replace('""', '"')
+
+        current[key.strip()] = value
+
+    if current:
+        objects.append(current)
+
+    return objects
+
+def _mask_secrets(params: list) -> list:
+    """Параметры с замененными паролями."""
+
+    return [param.split('=', 1)[0] + '=***' if param.startswith(_SECRET_PARAMS) else param
+            for param in params]
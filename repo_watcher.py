@@ -0,0 +1,241 @@
+"""Отслеживание изменений хранилищ конфигурации без запуска конфигуратора.
+
+Периодический update_from_repo по многим базам почти всегда ничего не загружает,
+но каждый раз стоит полного запуска конфигуратора. Наблюдатель дешево проверяет
+хранилища пробами и вызывает обработчики, только когда в хранилище появилась новая версия:
+- файловое хранилище: время изменения и размер файла 1cv8ddb.1CD (os.stat);
+- другое хранилище: любая функция без параметров, возвращающая признак версии
+  (например, номер последней версии из отчета или веб-сервиса).
+
+Несколько помещений в хранилище подряд объединяются: обработчики вызываются,
+когда признак версии не меняется debounce_seconds, но не позже max_delay_seconds
+после первого изменения.
+
+Пример:
+    watcher = RepoWatcher(poll_seconds=10, debounce_seconds=60)
+    watcher.add(r'D:\\repo', enqueue_updates(queue, designers))
+    watcher.start()
+"""
+
+import os
+import threading
+import time
+
+from logger_ import logger
+
+__all__ = ['RepoWatcher', 'file_repo_probe', 'enqueue_updates']
+
+FILE_REPO_NAME = '1cv8ddb.1CD'
+POLL_SECONDS = 10
+DEBOUNCE_SECONDS = 60
+
+
+class _WatchedRepo:
+    """Отслеживаемое хранилище."""
+
+    def __init__(self, repo: str, probe, callbacks: list):
+        self.repo = repo
+        self.probe = probe
+        self.callbacks = callbacks
+        self.token = None
+        self.initialized = False
+        self.first_change = None
+        self.last_change = None
+
+
+class RepoWatcher:
+    """Наблюдатель за хранилищами конфигурации."""
+
+    def __init__(self, poll_seconds: float=POLL_SECONDS,
+                 debounce_seconds: float=DEBOUNCE_SECONDS,
+                 max_delay_seconds: float=None):
+        """
+        Args:
+          poll_seconds: float: Период проверки хранилищ (Default value = 10)
+          debounce_seconds: float: Сколько секунд хранилище не должно меняться перед вызовом обработчиков (Default value = 60)
+          max_delay_seconds: float: Максимальная задержка вызова после первого изменения.
+                                    None - пять debounce_seconds (Default value = None)
+        """
+
+        self._poll_seconds = poll_seconds
+        self._debounce_seconds = debounce_seconds
+        self._max_delay_seconds = (max_delay_seconds if max_delay_seconds is not None
+                                   else debounce_seconds * 5)
+        self._repos = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.metrics = {'polls': 0, 'changes': 0, 'triggers': 0, 'errors': 0}
+
+    def add(self, repo: str, callback, probe=None):
+        """Отслеживание хранилища. Повторный вызов для того же хранилища добавляет обработчик.
+
+        Args:
+          repo: str: Каталог или адрес хранилища
+          callback: Функция (хранилище, признак версии), вызывается при появлении новой версии
+          probe: Функция без параметров -> признак версии, None - версия неизвестна.
+                 None - проба файлового хранилища (Default value = None)
+        """
+
+        with self._lock:
+            watched = self._repos.get(repo)
+
+            if watched is None:
+                self._repos[repo] = _WatchedRepo(repo, probe or file_repo_probe(repo), [callback])
+            else:
+                watched.callbacks.append(callback)
+
+    def remove(self, repo: str):
+        """Прекращение отслеживания хранилища."""
+
+        with self._lock:
+            self._repos.pop(repo, None)
+
+    def poll_once(self, now: float=None) -> list:
+        """Одна проверка всех хранилищ.
+
+        Args:
+          now: float: Текущее время time.monotonic(). None - текущее (Default value = None)
+
+        Returns:
+          list: Хранилища, для которых вызваны обработчики
+        """
+
+        now = time.monotonic() if now is None else now
+        triggered = []
+
+        with self._lock:
+            repos = list(self._repos.values())
+
+        for watched in repos:
+            if self._poll_repo(watched, now):
+                triggered.append(watched.repo)
+
+        self.metrics['polls'] += 1
+
+        return triggered
+
+    def start(self):
+        """Запуск проверок в фоновом потоке."""
+
+        if self._thread is not None:
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='repo-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float=None):
+        """Остановка фонового потока.
+
+        Args:
+          timeout: float: Время ожидания завершения текущей проверки (Default value = None)
+        """
+
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        """Цикл фонового потока."""
+
+        while not self._stop.is_set():
+            self.poll_once()
+            self._stop.wait(self._poll_seconds)
+
+    def _poll_repo(self, watched: _WatchedRepo, now: float) -> bool:
+        """Проверка хранилища.
+
+        Returns:
+          bool: Вызваны обработчики
+        """
+
+        try:
+            token = watched.probe()
+        except Exception as ex:
+            self.metrics['errors'] += 1
+            logger().error(f'Хранилище {watched.repo}. Ошибка проверки: {ex}')
+            return False
+
+        if token is None:
+            return False
+
+        if not watched.initialized:
+            # первое значение - исходное состояние, а не изменение
+            watched.initialized = True
+            watched.token = token
+            return False
+
+        if token != watched.token:
+            watched.token = token
+            watched.last_change = now
+            self.metrics['changes'] += 1
+
+            if watched.first_change is None:
+                watched.first_change = now
+                logger().debug(f'Хранилище {watched.repo} изменилось, ожидание окончания помещений')
+
+        if watched.first_change is None:
+            return False
+
+        if (now - watched.last_change < self._debounce_seconds
+                and now - watched.first_change < self._max_delay_seconds):
+            return False
+
+        watched.first_change = watched.last_change = None
+        self.metrics['triggers'] += 1
+
+        logger().info(f'Хранилище {watched.repo}. Новая версия')
+
+        for callback in list(watched.callbacks):
+            try:
+                callback(watched.repo, token)
+            except Exception as ex:
+                self.metrics['errors'] += 1
+                logger().error(f'Хранилище {watched.repo}. Ошибка обработчика: {ex}')
+
+        return True
+
+
+def file_repo_probe(repo_dir: str):
+    """Проба файлового хранилища: время изменения и размер файла хранилища.
+
+    Returns:
+      Функция без параметров -> (время изменения в нс, размер) или None, если файла нет
+    """
+
+    file_name = os.path.join(repo_dir, FILE_REPO_NAME)
+
+    def probe():
+        try:
+            stat = os.stat(file_name)
+        except FileNotFoundError:
+            return None
+
+        return stat.st_mtime_ns, stat.st_size
+
+    return probe
+
+def enqueue_updates(queue, designers: list, priority: int=0, **kwargs):
+    """Обработчик, ставящий в очередь обновление баз из хранилища.
+
+    Args:
+      queue: JobQueue: Очередь заданий
+      designers: list: Настроенные объекты Designer (с параметрами хранилища)
+      priority: int: Приоритет заданий (Default value = 0)
+      **kwargs: Параметры update_from_repo
+
+    Returns:
+      Функция (хранилище, признак версии)
+    """
+
+    def callback(repo: str, token):
+        for designer in designers:
+            job_id = queue.put_runner(designer, 'update_from_repo', priority=priority, **kwargs)
+            logger().info(f'Хранилище {repo}. Поставлено обновление базы '
+                          f'{designer._infobase_key()}, задание {job_id}')
+
+    return callback
@@ -0,0 +1,598 @@
+"""Долгоживущий сервис выполнения заданий 1С по локальному HTTP.
+
+Сервис принимает задания (см. модуль jobs), выполняет их общим пулом потоков
+и позволяет узнавать состояние, отменять задания и читать лог задания
+по мере выполнения. Отмена выполняющегося задания завершает процесс 1С (см. модуль cancellation),
+сигналы SIGINT/SIGTERM отменяют все задания и останавливают сервис. Один процесс обслуживает все задания, поэтому кэши,
+блокировки и счетчики общие.
+
+Запросы к HTTP API требуют заголовок Authorization: Bearer <токен>: задание запускает
+процесс от имени пользователя сервиса. Токен берется из переменной окружения ONES_SERVICE_TOKEN
+или из файла --token-file (создается со случайным токеном и доступом только для владельца).
+Задания могут запускать только исполняемые файлы 1С из списка --exename.
+Завершенные задания хранятся ограниченное время и в ограниченном количестве,
+лог задания - последние max_log_lines строк.
+
+Запуск: python -m service --port 8765 --workers 4 --exename /opt/1cv8/x86_64/8.3.22.1709/1cv8
+
+HTTP API (JSON):
+    POST /jobs                  - постановка задания, ответ {"id": ...}
+    GET  /jobs/<id>             - состояние задания
+    POST /jobs/<id>/cancel      - отмена задания
+    GET  /jobs/<id>/log         - лог задания, отдается потоком до завершения задания
+    GET  /metrics               - счетчики сервиса
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import hmac
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+import traceback
+import urllib.request
+
+from admission import AdmissionController
+from cancellation import CancellationToken, OperationCancelled, handle_signals
+from ib_locks import InfobaseLockManager
+import jobs
+import logger_
+from logger_ import logger
+from single_flight import SingleFlight
+
+__all__ = ['JobService', 'JobStates', 'ServiceClient', 'serve', 'read_token']
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+LOG_POLL_SECONDS = 0.2
+MAX_FINISHED_JOBS = 1000
+FINISHED_TTL_SECONDS = 24 * 60 * 60
+MAX_LOG_LINES = 10000
+TOKEN_ENV = 'ONES_SERVICE_TOKEN'
+
+
+class JobStates:
+    """Состояния задания."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class _Job:
+    """Задание в сервисе."""
+
+    def __init__(self, job_id: str, spec: dict, token: CancellationToken, max_log_lines: int):
+        self.id = job_id
+        self.spec = spec
+        self.token = token
+        self.state = JobStates.QUEUED
+        self.result = None
+        self.error = ''
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.log_lines = deque(maxlen=max_log_lines)
+        self.log_count = 0 # всего строк, включая вытесненные из log_lines
+        self.future = None
+        self.changed = threading.Condition()
+
+    def status(self) -> dict:
+        """Состояние задания для ответа клиенту."""
+
+        return {'id': self.id,
+                'state': self.state,
+                'operation': f'{self.spec.get("class")}.{self.spec.get("operation")}',
+                'result': self.result,
+                'error': self.error,
+                'submitted': self.submitted,
+                'started': self.started,
+                'finished': self.finished}
+
+
+class _JobLogHandler(logging.Handler):
+    """Направляет записи логгера в лог задания, выполняемого в текущем потоке."""
+
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.setFormatter(logging.Formatter(logger_.LOG_FORMAT, logger_.DATE_FORMAT))
+        self._local = threading.local()
+
+    def bind(self, job: _Job):
+        """Привязка текущего потока к заданию."""
+
+        self._local.job = job
+
+    def emit(self, record):
+        job = getattr(self._local, 'job', None)
+
+        if job is None:
+            return
+
+        with job.changed:
+            job.log_lines.append(self.format(record))
+            job.log_count += 1
+            job.changed.notify_all()
+
+
+class JobService:
+    """Выполнение заданий общим пулом потоков."""
+
+    def __init__(self, max_workers: int=4,
+                 admission: AdmissionController=None,
+                 single_flight: SingleFlight=None,
+                 ib_locks: InfobaseLockManager=None,
+                 allowed_exenames: tuple=None,
+                 max_finished_jobs: int=MAX_FINISHED_JOBS,
+                 finished_ttl_seconds: float=FINISHED_TTL_SECONDS,
+                 max_log_lines: int=MAX_LOG_LINES):
+        """
+        Args:
+          max_workers: int: Количество одновременно выполняемых заданий (Default value = 4)
+          admission: AdmissionController: Контроллер допуска запусков 1С по памяти и лицензиям.
+                                          None - запуски не ограничиваются (Default value = None)
+          single_flight: SingleFlight: Группа объединения одинаковых одновременных запусков.
+                                       None - не объединяются (Default value = None)
+          ib_locks: InfobaseLockManager: Менеджер блокировок баз между процессами.
+                                         None - базы не блокируются (Default value = None)
+          allowed_exenames: tuple: Nсполняемые файлы 1С, которые могут запускать задания.
+                                   None - любые, только для заданий из своего процесса:
+                                   create_server требует список (Default value = None)
+          max_finished_jobs: int: Сколько завершенных заданий хранится (Default value = 1000)
+          finished_ttl_seconds: float: Сколько хранится завершенное задание, сек (Default value = сутки)
+          max_log_lines: int: Сколько последних строк лога задания хранится (Default value = 10000)
+        """
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._finished = deque()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._log_handler = _JobLogHandler()
+        self._admission = admission
+        self._single_flight = single_flight
+        self._ib_locks = ib_locks
+        self.allowed_exenames = (None if allowed_exenames is None
+                                 else {_normalize_exename(exename) for exename in allowed_exenames})
+        self._max_finished_jobs = max_finished_jobs
+        self._finished_ttl_seconds = finished_ttl_seconds
+        self._max_log_lines = max_log_lines
+        self.token = CancellationToken()
+        self.metrics = {'submitted': 0, 'succeeded': 0, 'failed': 0, 'cancelled': 0}
+
+        # уровень задается только обработчику: в лог задания попадает то, что пропускает логгер
+        logger().addHandler(self._log_handler)
+
+    def submit(self, spec: dict) -> str:
+        """Постановка задания в очередь.
+
+        Args:
+          spec: dict: Задание (см. модуль jobs)
+
+        Returns:
+          str: Nдентификатор задания
+
+        Raises:
+          JobSpecError: Неверное задание или исполняемый файл не разрешен
+        """
+
+        runner = jobs.create_runner(spec) # проверка задания до постановки в очередь
+
+        if (self.allowed_exenames is not None
+                and _normalize_exename(runner._exename) not in self.allowed_exenames):
+            raise jobs.JobSpecError(f'Исполняемый файл не разрешен: {runner._exename}')
+
+        # задание регистрируется до запуска, а cancel видит его уже с future
+        with self._lock:
+            job = _Job(str(next(self._ids)), spec, self.token.child(), self._max_log_lines)
+            self._jobs[job.id] = job
+            self.metrics['submitted'] += 1
+            self._evict()
+            job.future = self._executor.submit(self._run, job)
+
+        return job.id
+
+    def status(self, job_id: str) -> dict:
+        """Состояние задания или None, если задания нет."""
+
+        job = self._jobs.get(job_id)
+        return job.status() if job else None
+
+    def cancel(self, job_id: str) -> bool:
+        """Отмена задания. Ожидающее задание отменяется сразу, у выполняющегося
+        завершается процесс 1С, и задание переходит в состояние cancelled по завершении.
+
+        Returns:
+          bool: Задание отменено или отменяется
+        """
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+
+        if job is None or job.state in JobStates.FINISHED:
+            return False
+
+        job.token.cancel('Задание отменено')
+
+        if job.future.cancel():
+            self._finish(job, JobStates.CANCELLED)
+
+        return True
+
+    def cancel_all(self, reason: str='Сервис останавливается'):
+        """Отмена всех ожидающих и выполняющихся заданий."""
+
+        self.token.cancel(reason)
+
+        with self._lock:
+            jobs_ = list(self._jobs.values())
+
+        for job in jobs_:
+            if job.state not in JobStates.FINISHED and job.future.cancel():
+                self._finish(job, JobStates.CANCELLED)
+
+    def log_lines(self, job_id: str, offset: int=0, timeout: float=None) -> tuple:
+        """Строки лога задания начиная со строки номер offset.
+        Если новых строк нет и задание не завершено, ждет их не дольше timeout секунд.
+        Строки, вытесненные из лога (см. max_log_lines), пропускаются.
+
+        Returns:
+          tuple: (строки, номер следующей строки, задание завершено).
+                 Задания нет (или оно уже удалено) - ([], offset, True)
+        """
+
+        job = self._jobs.get(job_id)
+
+        if job is None:
+            return [], offset, True
+
+        with job.changed:
+            if job.log_count <= offset and job.state not in JobStates.FINISHED:
+                job.changed.wait(timeout)
+
+            first = job.log_count - len(job.log_lines)
+            lines = list(itertools.islice(job.log_lines, max(0, offset - first), None))
+
+            return lines, job.log_count, job.state in JobStates.FINISHED
+
+    def shutdown(self, wait: bool=True):
+        """Остановка пула потоков."""
+
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        logger().removeHandler(self._log_handler)
+
+    def _run(self, job: _Job):
+        """Выполнение задания в потоке пула."""
+
+        self._log_handler.bind(job)
+
+        with job.changed:
+            job.state = JobStates.RUNNING
+            job.started = time.time()
+
+        try:
+            with logger_.job_context(job.id):
+                job.result = jobs.run_job(job.spec, admission=self._admission,
+                                          single_flight=self._single_flight, token=job.token,
+                                          ib_locks=self._ib_locks)
+
+            state = JobStates.SUCCEEDED if job.result is not False else JobStates.FAILED
+
+        except OperationCancelled as ex:
+            job.error = str(ex)
+            logger().warning(f'Задание {job.id} отменено: {ex}')
+            state = JobStates.CANCELLED
+
+        except Exception:
+            job.error = traceback.format_exc()
+            logger().error(job.error)
+            state = JobStates.FAILED
+
+        finally:
+            self._log_handler.bind(None)
+
+        self._finish(job, state)
+
+    def _finish(self, job: _Job, state: str):
+        """Завершение задания."""
+
+        job.token.close()
+
+        with job.changed:
+            if job.state in JobStates.FINISHED:
+                return # отменено одновременно cancel и cancel_all
+
+            job.state = state
+            job.finished = time.time()
+            job.changed.notify_all()
+
+        with self._lock:
+            self.metrics[state] += 1
+            self._finished.append(job)
+            self._evict()
+
+    def _evict(self):
+        """Удаление старых завершенных заданий сверх количества и срока хранения.
+        Вызывается под self._lock."""
+
+        expired = time.time() - self._finished_ttl_seconds
+
+        while self._finished and (len(self._finished) > self._max_finished_jobs
+                                  or self._finished[0].finished < expired):
+            self._jobs.pop(self._finished.popleft().id, None)
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """Обработчик HTTP-запросов к сервису."""
+
+    service = None
+    auth_token = ''
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+
+        parts = self.path.strip('/').split('/')
+
+        if parts == ['jobs']:
+            length = int(self.headers.get('Content-Length', 0))
+
+            try:
+                job_id = self.service.submit(json.loads(self.rfile.read(length)))
+            except (ValueError, jobs.JobSpecError) as ex:
+                self._send_json(400, {'error': str(ex)})
+                return
+
+            self._send_json(201, {'id': job_id})
+
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'cancel':
+            self._send_json(200, {'cancelled': self.service.cancel(parts[1])})
+
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+
+        parts = self.path.strip('/').split('/')
+
+        if parts == ['metrics']:
+            self._send_json(200, self.service.metrics)
+
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            status = self.service.status(parts[1])
+            self._send_json(200 if status else 404, status or {'error': 'not found'})
+
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'log':
+            self._stream_log(parts[1])
+
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def _authorized(self) -> bool:
+        """Проверка токена запроса. Без токена отвечает 401."""
+
+        expected = f'Bearer {self.auth_token}'.encode('utf-8')
+
+        if hmac.compare_digest(self.headers.get('Authorization', '').encode('utf-8'), expected):
+            return True
+
+        self._send_json(401, {'error': 'unauthorized'})
+        return False
+
+    def log_message(self, format, *args):
+        logger().debug('Сервис заданий: ' + format % args)
+
+    def _stream_log(self, job_id: str):
+        """Отдача лога задания потоком до завершения задания."""
+
+        if self.service.status(job_id) is None:
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        offset = 0
+        finished = False
+
+        while not finished:
+            lines, offset, finished = self.service.log_lines(job_id, offset, LOG_POLL_SECONDS)
+
+            for line in lines:
+                self.wfile.write((line + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+        self.close_connection = True
+
+    def _send_json(self, code: int, data):
+        """Отправка ответа в JSON."""
+
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def create_server(service: JobService,
+                  auth_token: str,
+                  host: str=DEFAULT_HOST,
+                  port: int=DEFAULT_PORT) -> ThreadingHTTPServer:
+    """Создает HTTP-сервер сервиса заданий. Порт 0 - любой свободный.
+
+    Args:
+      service: JobService: Сервис заданий со списком разрешенных исполняемых файлов
+      auth_token: str: Токен, который клиенты передают в заголовке Authorization
+      host: str: Адрес. По умолчанию только локальный (Default value = DEFAULT_HOST)
+      port: int: Порт (Default value = DEFAULT_PORT)
+
+    Returns:
+      ThreadingHTTPServer: Сервер, адрес в server_address
+
+    Raises:
+      ValueError: Не задан токен или список разрешенных исполняемых файлов
+    """
+
+    if not auth_token:
+        raise ValueError('Не задан токен сервиса заданий')
+
+    if service.allowed_exenames is None:
+        raise ValueError('Не задан список исполняемых файлов, разрешенных заданиям')
+
+    handler = type('RequestHandler', (_RequestHandler,), {'service': service, 'auth_token': auth_token})
+    return ThreadingHTTPServer((host, port), handler)
+
+def serve(auth_token: str, allowed_exenames: tuple,
+          host: str=DEFAULT_HOST, port: int=DEFAULT_PORT, max_workers: int=4):
+    """Запуск сервиса заданий до прерывания (Ctrl+C, SIGTERM).
+    Прерывание отменяет выполняющиеся задания и завершает их процессы 1С.
+
+    Args:
+      auth_token: str: Токен клиентов (см. create_server)
+      allowed_exenames: tuple: Nсполняемые файлы 1С, которые могут запускать задания
+      host: str: Адрес (Default value = DEFAULT_HOST)
+      port: int: Порт (Default value = DEFAULT_PORT)
+      max_workers: int: Количество одновременно выполняемых заданий (Default value = 4)
+    """
+
+    service = JobService(max_workers, allowed_exenames=allowed_exenames)
+    server = create_server(service, auth_token, host, port)
+
+    logger().info(f'Сервис заданий запущен: http://{host}:{server.server_address[1]}')
+
+    # serve_forever работает в этом потоке, поэтому остановка - из другого
+    service.token.register(lambda: threading.Thread(target=server.shutdown, daemon=True).start())
+
+    try:
+        with handle_signals(service.token):
+            server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.cancel_all()
+        server.server_close()
+        service.shutdown()
+
+
+class ServiceClient:
+    """Клиент сервиса заданий."""
+
+    def __init__(self, auth_token: str, url: str=f'http://{DEFAULT_HOST}:{DEFAULT_PORT}'):
+        """
+        Args:
+          auth_token: str: Токен сервиса (см. read_token)
+          url: str: Адрес сервиса (Default value = 'http://127.0.0.1:8765')
+        """
+
+        self._auth_token = auth_token
+        self._url = url.rstrip('/')
+
+    def submit(self, spec: dict) -> str:
+        """Постановка задания, возвращает его идентификатор."""
+
+        return self._request('POST', '/jobs', spec)['id']
+
+    def status(self, job_id: str) -> dict:
+        """Состояние задания."""
+
+        return self._request('GET', f'/jobs/{job_id}')
+
+    def cancel(self, job_id: str) -> bool:
+        """Отмена задания."""
+
+        return self._request('POST', f'/jobs/{job_id}/cancel', {})['cancelled']
+
+    def iter_log(self, job_id: str):
+        """Строки лога задания по мере их появления, до завершения задания."""
+
+        request = urllib.request.Request(f'{self._url}/jobs/{job_id}/log', headers=self._headers())
+
+        with urllib.request.urlopen(request) as response:
+            for line in response:
+                yield line.decode('utf-8').rstrip('\n')
+
+    def _request(self, method: str, path: str, data: dict=None) -> dict:
+        """HTTP-запрос к сервису."""
+
+        body = None if data is None else json.dumps(data).encode('utf-8')
+        request = urllib.request.Request(self._url + path, data=body, method=method,
+                                         headers=dict(self._headers(), **{'Content-Type': 'application/json'}))
+
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+
+    def _headers(self) -> dict:
+        return {'Authorization': f'Bearer {self._auth_token}'}
+
+
+def read_token(token_file_name: str='') -> str:
+    """Токен сервиса: из переменной окружения ONES_SERVICE_TOKEN или из файла.
+    Если файла нет, он создается со случайным токеном и доступом только для владельца.
+
+    Args:
+      token_file_name: str: Файл токена. '' - только переменная окружения (Default value = '')
+
+    Returns:
+      str: Токен или '', если не задан
+    """
+
+    token = os.environ.get(TOKEN_ENV, '')
+
+    if token or not token_file_name:
+        return token
+
+    try:
+        descriptor = os.open(token_file_name, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(token_file_name, encoding='utf-8') as file:
+            return file.read().strip()
+
+    token = secrets.token_urlsafe(32)
+
+    with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+        file.write(token)
+
+    return token
+
+def _normalize_exename(exename: str) -> str:
+    return os.path.normcase(os.path.normpath(exename))
+
+
+def main(argv: list=None):
+    """Точка входа: python -m service"""
+
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m service',
+                                     description='Сервис выполнения заданий 1С')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--exename', action='append', required=True,
+                        help='Исполняемый файл 1С, разрешенный заданиям. Можно указать несколько раз')
+    parser.add_argument('--token-file', default=os.path.join(os.path.expanduser('~'), '.ones_service_token'),
+                        help=f'Файл токена клиентов, если не задана переменная {TOKEN_ENV}')
+    parser.add_argument('--log-file', default='')
+    args = parser.parse_args(argv)
+
+    logger_.init_logger(args.log_file)
+    serve(read_token(args.token_file), args.exename, args.host, args.port, args.workers)
+
+
+if __name__ == '__main__':
+    main()
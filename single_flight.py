@@ -0,0 +1,187 @@
+"""Объединение одинаковых одновременных запусков 1С (single flight).
+
+Несколько конвейеров часто одновременно запрашивают одно и то же: выгрузку одной версии
+хранилища (dump_repo_to_file), выгрузку одной базы в файлы (dump_config_to_files).
+Если такая же команда уже выполняется, следующий вызов не запускает 1С,
+а дожидается выполняющейся команды и получает ее результат.
+
+Команды сравниваются по исполняемому файлу и параметрам запуска без /Out, -NoTruncate
+и /DumpResult: у каждого вызова свой файл лога, но выполняется одно и то же.
+Файл /Out и /DumpResult заполняются только у вызова, который запустил 1С.
+
+В пределах процесса вызовы объединяются по ключу команды, между процессами - через
+файл-блокировку в каталоге lock_dir: процесс, запустивший 1С, держит блокировку
+и записывает результат в файл, остальные ждут блокировку и читают результат.
+
+Пример:
+    single_flight = SingleFlight(lock_dir=r'D:\\1c\\flights')
+    designer.set_single_flight_params(single_flight)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from fileops import FileLock, FileLockTimeout, atomic_write
+from logger_ import logger
+
+__all__ = ['SingleFlight', 'command_key']
+
+# Операции, которые по умолчанию объединяются: они только читают базу или хранилище
+DEFAULT_OPERATIONS = ('dump_config_to_files', 'dump_repo_to_file', 'dump_ib')
+
+# Начала параметров, которые не входят в ключ команды
+_IGNORED_PARAMS = ('/Out ', '/DumpResult ', '-NoTruncate')
+
+
+class _Flight:
+    """Выполняющаяся команда."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Группа объединения запусков. Один объект разделяется всеми объектами запуска процесса."""
+
+    def __init__(self, lock_dir: str='', operations: tuple=DEFAULT_OPERATIONS):
+        """
+        Args:
+          lock_dir: str: Каталог файлов блокировок и результатов для объединения между процессами.
+                         '' - только в пределах процесса (Default value = '')
+          operations: tuple: Объединяемые операции (имена методов). None - все (Default value = DEFAULT_OPERATIONS)
+        """
+
+        self._lock_dir = lock_dir
+        self._operations = operations
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.metrics = {'executed': 0, 'joined': 0}
+
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def covers(self, operation: str) -> bool:
+        """Объединяются ли запуски операции."""
+
+        return self._operations is None or operation in self._operations
+
+    def run(self, params: list, func):
+        """Выполнение команды или присоединение к такой же выполняющейся команде.
+
+        Args:
+          params: list: Исполняемый файл и параметры запуска
+          func: Функция без параметров, выполняющая команду. Результат должен сериализоваться в JSON
+
+        Returns:
+          Результат func своего или объединенного вызова
+        """
+
+        key = command_key(params)
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            logger().info('Такая же команда уже выполняется, ожидается ее результат')
+            flight.done.wait()
+
+            with self._lock:
+                self.metrics['joined'] += 1
+
+            if flight.error is not None:
+                raise flight.error
+
+            return flight.result
+
+        try:
+            flight.result = self._run_across_processes(key, func)
+        except BaseException as ex:
+            flight.error = ex
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+            flight.done.set()
+
+        return flight.result
+
+    def _run_across_processes(self, key: str, func):
+        """Выполнение команды с объединением между процессами через файл-блокировку."""
+
+        if not self._lock_dir:
+            return self._execute(func, '')
+
+        lock_file_name = os.path.join(self._lock_dir, key + '.lock')
+        result_file_name = os.path.join(self._lock_dir, key + '.result')
+        waiting_since = time.time()
+
+        try:
+            with FileLock(lock_file_name, timeout=0):
+                return self._execute(func, result_file_name)
+        except FileLockTimeout:
+            pass
+
+        logger().info('Такая же команда уже выполняется другим процессом, ожидается ее результат')
+
+        with FileLock(lock_file_name):
+            flight_result = _read_result(result_file_name, waiting_since)
+
+            if flight_result is None:
+                # другой процесс завершился без результата, команда выполняется заново
+                return self._execute(func, result_file_name)
+
+            with self._lock:
+                self.metrics['joined'] += 1
+
+            return flight_result['result']
+
+    def _execute(self, func, result_file_name: str):
+        """Выполнение команды и запись результата для других процессов."""
+
+        with self._lock:
+            self.metrics['executed'] += 1
+
+        result = func()
+
+        if result_file_name:
+            atomic_write(result_file_name, json.dumps({'result': result, 'finished': time.time()}),
+                         encoding='utf-8')
+
+        return result
+
+
+def command_key(params: list) -> str:
+    """Ключ команды: хэш параметров запуска без параметров файлов лога и результата.
+
+    Args:
+      params: list: Исполняемый файл и параметры запуска
+
+    Returns:
+      str: Ключ
+    """
+
+    normalized = [param.strip() for param in params
+                  if not param.strip().startswith(_IGNORED_PARAMS)]
+
+    return hashlib.sha256(json.dumps(normalized, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def _read_result(file_name: str, finished_after: float) -> dict:
+    """Результат команды, завершенной не раньше finished_after. None - результата нет."""
+
+    try:
+        with open(file_name, encoding='utf-8') as file:
+            flight_result = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    return flight_result if flight_result.get('finished', 0) >= finished_after else None
@@ -0,0 +1,245 @@
+"""Временные файловые базы для заданий-тестов.
+
+Задания в стиле модульных тестов создают одноразовую файловую базу, работают с ней
+пару минут и оставляют ее на медленном диске. Временная база создается в блоке with
+и удаляется по выходе из него, в том числе при исключении и отмене операции:
+каталог базы удаляется, а запись базы - из списка баз ibases.v8i.
+
+База размещается в памяти (tmpfs, /dev/shm), если оценка ее размера помещается
+в бюджет памяти с учетом других временных баз процесса и в свободное место tmpfs,
+иначе - на диске. Оценка размера задается явно или по размеру шаблона (.cf, .dt).
+
+Пример:
+    temp_bases = TempInfobases(exename, ram_budget_bytes=4 * GB)
+
+    with temp_bases.create(template=r'D:\\build\\1.cf') as base:
+        base.designer.update_from_repo()
+        base.enterprise.run()
+"""
+
+from contextlib import contextmanager
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from fileops import FileLock
+from ibases import BaseList
+from logger_ import logger
+from ones import CreationInfobase, Designer, Enterprise
+
+__all__ = ['TempInfobases', 'TempInfobase', 'TempInfobaseError', 'default_base_list_file']
+
+MB = 1024 ** 2
+GB = 1024 ** 3
+RAM_DIR = '/dev/shm'
+RAM_BUDGET_BYTES = 2 * GB
+EMPTY_BASE_BYTES = 64 * MB
+# Во сколько раз база больше сжатого шаблона (.cf, .dt)
+TEMPLATE_EXPANSION = 4
+REMOVE_ATTEMPTS = 5
+REMOVE_DELAY_SECONDS = 1
+
+
+class TempInfobaseError(Exception):
+    """Nсключение 'Временная база не создана'"""
+
+
+class TempInfobase:
+    """Созданная временная база."""
+
+    def __init__(self, dir_: str, in_memory: bool, size_estimate: int,
+                 designer: Designer, enterprise: Enterprise):
+        self.dir = dir_
+        self.in_memory = in_memory
+        self.size_estimate = size_estimate
+        self.designer = designer
+        self.enterprise = enterprise
+
+
+class TempInfobases:
+    """Создание временных баз с учетом бюджета памяти. Один объект разделяется потоками процесса."""
+
+    def __init__(self, exename: str, platform_version: str='',
+                 ram_budget_bytes: int=RAM_BUDGET_BYTES,
+                 ram_dir: str=None, disk_dir: str='',
+                 base_list_file: str=None, configure=None):
+        """
+        Args:
+          exename: str: Полное имя исполняемого файла 1С
+          platform_version: str: Версия платформы (Default value = '')
+          ram_budget_bytes: int: Сколько памяти могут занять все временные базы в tmpfs.
+                                 0 - базы создаются только на диске (Default value = 2 Гб)
+          ram_dir: str: Каталог tmpfs. None - /dev/shm, если есть (Default value = None)
+          disk_dir: str: Каталог временных баз на диске. '' - временный каталог ОС (Default value = '')
+          base_list_file: str: Файл списка баз, из которого удаляются временные базы.
+                               None - список пользователя по умолчанию, '' - не используется (Default value = None)
+          configure: Функция (объект запуска), вызывается для объектов создания базы, Designer
+                     и Enterprise: параметры лога, авторизации и т.п. (Default value = None)
+        """
+
+        self._exename = exename
+        self._platform_version = platform_version
+        self._ram_budget_bytes = ram_budget_bytes
+        self._ram_dir = RAM_DIR if ram_dir is None and os.path.isdir(RAM_DIR) else (ram_dir or '')
+        self._disk_dir = disk_dir or tempfile.gettempdir()
+        self._base_list_file = default_base_list_file() if base_list_file is None else base_list_file
+        self._configure = configure
+        self._ram_reserved = 0
+        self._lock = threading.Lock()
+        self._numbers = itertools.count(1)
+        self.metrics = {'ram': 0, 'disk': 0, 'removed': 0, 'remove_errors': 0}
+
+    @contextmanager
+    def create(self, template: str='', size_estimate_bytes: int=None, list_name: str=''):
+        """Временная база на время блока with.
+
+        Args:
+          template: str: Шаблон базы: файл конфигурации (.cf) или выгрузки (.dt). '' - пустая база (Default value = '')
+          size_estimate_bytes: int: Оценка размера базы. None - по размеру шаблона (Default value = None)
+          list_name: str: Nмя базы в списке баз. '' - база в список не добавляется (Default value = '')
+
+        Yields:
+          TempInfobase: База с объектами designer и enterprise
+
+        Raises:
+          TempInfobaseError: База не создана
+        """
+
+        size_estimate = (self.estimate_size(template) if size_estimate_bytes is None
+                         else size_estimate_bytes)
+        in_memory = self._reserve_ram(size_estimate)
+
+        try:
+            parent_dir = self._ram_dir if in_memory else self._disk_dir
+            dir_ = tempfile.mkdtemp(prefix=f'ib{os.getpid()}_{next(self._numbers)}_', dir=parent_dir)
+
+            try:
+                logger().info(f'Временная база {dir_} ({"в памяти" if in_memory else "на диске"}, '
+                              f'оценка {size_estimate // MB} Мб)')
+
+                creation = self._runner(CreationInfobase, dir_)
+
+                if not creation.create_base(list_name, template):
+                    raise TempInfobaseError(f'Временная база {dir_} не создана')
+
+                self.metrics['ram' if in_memory else 'disk'] += 1
+
+                yield TempInfobase(dir_, in_memory, size_estimate,
+                                   self._runner(Designer, dir_), self._runner(Enterprise, dir_))
+            finally:
+                self._remove(dir_)
+        finally:
+            if in_memory:
+                with self._lock:
+                    self._ram_reserved -= size_estimate
+
+    def estimate_size(self, template: str='') -> int:
+        """Оценка размера базы, байт: по размеру шаблона или размер пустой базы."""
+
+        if not template:
+            return EMPTY_BASE_BYTES
+
+        try:
+            return max(EMPTY_BASE_BYTES, os.path.getsize(template) * TEMPLATE_EXPANSION)
+        except OSError:
+            return EMPTY_BASE_BYTES
+
+    def ram_reserved(self) -> int:
+        """Сколько памяти зарезервировано под текущие временные базы, байт."""
+
+        with self._lock:
+            return self._ram_reserved
+
+    def _reserve_ram(self, size_estimate: int) -> bool:
+        """Резервирование памяти под базу.
+
+        Returns:
+          bool: База размещается в памяти
+        """
+
+        if not self._ram_dir:
+            return False
+
+        try:
+            free = shutil.disk_usage(self._ram_dir).free
+        except OSError:
+            return False
+
+        with self._lock:
+            if (self._ram_reserved + size_estimate > self._ram_budget_bytes
+                    or size_estimate > free):
+                return False
+
+            self._ram_reserved += size_estimate
+
+        return True
+
+    def _runner(self, class_, dir_: str):
+        """Объект запуска, привязанный к временной базе."""
+
+        runner = class_(dir_)
+        runner.set_platform_params(self._exename, self._platform_version)
+
+        if self._configure is not None:
+            self._configure(runner)
+
+        return runner
+
+    def _remove(self, dir_: str):
+        """Удаление базы: записи в списке баз и каталога. Ошибки записываются в лог,
+        чтобы не заменить исключение блока with."""
+
+        if self._base_list_file:
+            self._remove_from_list(dir_)
+
+        # файлы базы могут быть еще заняты только что завершенным процессом 1С (Windows)
+        for attempt in range(1, REMOVE_ATTEMPTS + 1):
+            try:
+                shutil.rmtree(dir_)
+                break
+            except FileNotFoundError:
+                break
+            except OSError as ex:
+                if attempt == REMOVE_ATTEMPTS:
+                    self.metrics['remove_errors'] += 1
+                    logger().error(f'Временная база {dir_} не удалена: {ex}')
+                    return
+
+                time.sleep(REMOVE_DELAY_SECONDS)
+
+        self.metrics['removed'] += 1
+        logger().info(f'Временная база {dir_} удалена')
+
+    def _remove_from_list(self, dir_: str):
+        """Удаление базы из списка баз, если она туда попала."""
+
+        if not os.path.exists(self._base_list_file):
+            return
+
+        try:
+            with FileLock(self._base_list_file + '.lock'):
+                base_list = BaseList.read(self._base_list_file)
+                entry = base_list.find_by_connect(f'File="{dir_}";')
+
+                if entry is None:
+                    return
+
+                base_list.remove(entry)
+                base_list.write(self._base_list_file)
+
+        except Exception as ex:
+            self.metrics['remove_errors'] += 1
+            logger().error(f'Временная база {dir_} не удалена из списка {self._base_list_file}: {ex}')
+
+
+def default_base_list_file() -> str:
+    """Файл списка баз текущего пользователя (ibases.v8i)."""
+
+    if sys.platform == 'win32':
+        return os.path.join(os.environ.get('APPDATA', ''), '1C', '1CEStart', 'ibases.v8i')
+
+    return os.path.join(os.path.expanduser('~'), '.1C', '1cestart', 'ibases.v8i')
@@ -0,0 +1,149 @@
+"""Тесты модуля admission"""
+
+import sys
+import threading
+import time
+import pytest
+from unittest.mock import patch
+
+from admission import GB, AdmissionController, AdmissionTimeout, free_memory, run_process
+from ones import Designer
+
+def run_parallel(controller: AdmissionController, operations: list, seconds: float=0.1) -> int:
+    """Одновременные запуски через контроллер.
+
+    Returns:
+      int: Максимальное количество одновременно допущенных запусков
+    """
+
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def launch(operation):
+        with controller.admit(operation):
+            with lock:
+                running.append(operation)
+                peak.append(len(running))
+            time.sleep(seconds)
+            with lock:
+                running.remove(operation)
+
+    threads = [threading.Thread(target=launch, args=(operation,)) for operation in operations]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    return max(peak)
+
+class TestAdmissionController():
+    """Проверка класса AdmissionController."""
+
+    def test_slots(self):
+        """Одновременно допускается не больше slots запусков."""
+
+        controller = AdmissionController(slots=2, poll_seconds=0.01, memory_probe=lambda: None)
+
+        assert run_parallel(controller, ['load_cfg'] * 5) == 2
+        assert controller.metrics['admitted'] == 5
+        assert controller.metrics['delayed'] == 3
+        assert controller.state() == {'running': 0, 'waiting': 0, 'reserved_bytes': 0}
+
+    def test_licenses(self):
+        """Создание базы не занимает лицензию."""
+
+        controller = AdmissionController(licenses=1, poll_seconds=0.01, memory_probe=lambda: None)
+
+        assert run_parallel(controller, ['load_cfg', 'load_cfg']) == 1
+        assert run_parallel(controller, ['load_cfg', 'create_base', 'create_base']) == 3
+
+    def test_memory(self):
+        """Запуск ждет, пока хватает памяти на оценку с запасом."""
+
+        controller = AdmissionController(memory_reserve_bytes=1 * GB, default_estimate_bytes=2 * GB,
+                                         poll_seconds=0.01, memory_probe=lambda: 4 * GB)
+
+        # 4 Гб свободно, 2 Гб набирает первый запуск: второму не хватает 2 + 1 Гб
+        assert run_parallel(controller, ['load_cfg', 'load_cfg']) == 1
+
+        controller = AdmissionController(memory_reserve_bytes=1 * GB, default_estimate_bytes=2 * GB,
+                                         poll_seconds=0.01, memory_probe=lambda: 6 * GB)
+
+        assert run_parallel(controller, ['load_cfg', 'load_cfg', 'load_cfg']) == 2
+
+    def test_ramp(self):
+        """Процесс, набравший память, учитывается только в свободной памяти."""
+
+        controller = AdmissionController(memory_reserve_bytes=1 * GB, default_estimate_bytes=2 * GB,
+                                         ramp_seconds=0, poll_seconds=0.01,
+                                         memory_probe=lambda: 4 * GB)
+
+        assert run_parallel(controller, ['load_cfg', 'load_cfg']) == 2
+
+    def test_single_launch_always_admitted(self):
+        """Единственный запуск допускается, даже если оценка больше свободной памяти."""
+
+        controller = AdmissionController(memory_probe=lambda: 1 * GB)
+
+        with controller.admit('load_cfg'):
+            assert controller.state()['running'] == 1
+
+    def test_timeout(self):
+        """Запуск, не допущенный за timeout, завершается исключением."""
+
+        controller = AdmissionController(slots=1, timeout=0.05, poll_seconds=0.01)
+
+        with controller.admit('load_cfg'):
+            with pytest.raises(AdmissionTimeout, match='заняты все места'):
+                with controller.admit('update_from_repo'):
+                    pass
+
+        assert controller.metrics['timeouts'] == 1
+        assert controller.state()['waiting'] == 0
+
+    def test_estimates(self, tmp_path):
+        """Оценка растет до нового пика сразу, снижается плавно и сохраняется в файл."""
+
+        estimates_file = str(tmp_path / 'memory.json')
+        controller = AdmissionController(estimates_file=estimates_file, memory_probe=lambda: None)
+
+        for peak_memory in (3 * GB, 5 * GB, 1 * GB):
+            with controller.admit('load_cfg') as ticket:
+                ticket.peak_memory = peak_memory
+
+        assert controller.estimate('load_cfg') == int(5 * GB * 0.7 + 1 * GB * 0.3)
+        assert controller.estimate('dump_ib') == 2 * GB
+        assert AdmissionController(estimates_file=estimates_file).estimates() == controller.estimates()
+
+    def test_designer(self):
+        """Запуск конфигуратора через контроллер уточняет оценку операции."""
+
+        controller = AdmissionController(memory_probe=lambda: None)
+
+        designer = Designer(r'D:\R')
+        designer.set_platform_params(r'D:\1cv8.exe')
+        designer.set_admission_params(controller)
+
+        with patch('admission.run_process', return_value=(0, 3 * GB)) as mock:
+            assert designer.load_cfg(r'D:\1.cf')
+
+        assert mock.call_args[0][0][0] == r'D:\1cv8.exe'
+        assert controller.estimates() == {'load_cfg': 3 * GB}
+
+def test_run_process():
+    """Код возврата и пиковая память процесса."""
+
+    return_code, peak_memory = run_process(
+        [sys.executable, '-c', 'import sys; data = bytearray(64 * 1024 ** 2); sys.exit(3)'])
+
+    assert return_code == 3
+    assert peak_memory is None or peak_memory >= 64 * 1024 ** 2
+
+def test_free_memory():
+    """Свободная память определяется на Linux и Windows."""
+
+    memory = free_memory()
+
+    assert memory is None or memory > 0
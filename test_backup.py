@@ -0,0 +1,134 @@
+"""Тесты модуля backup"""
+
+import gzip
+import hashlib
+import os
+import pytest
+from unittest.mock import patch
+
+from backup import BackupError, backup_ib, compress_file, decompress_file, restore_ib
+from ones import Designer
+
+@pytest.fixture
+def data():
+    """Сжимаемые данные на несколько блоков."""
+
+    return os.urandom(1000) * 300 + b'end'
+
+class TestCompressFile():
+    """Проверка функций compress_file и decompress_file."""
+
+    def test_round_trip(self, tmp_path, data):
+        """Сжатие блоками в несколько членов gzip и распаковка с проверкой контрольной суммы."""
+
+        source = tmp_path / 'base.dt'
+        source.write_bytes(data)
+        target = tmp_path / 'base.dt.gz'
+
+        stats = compress_file(str(source), str(target), workers=3, block_size=10000)
+
+        assert gzip.decompress(target.read_bytes()) == data
+        assert stats['source_bytes'] == len(data)
+        assert stats['target_bytes'] == target.stat().st_size
+        assert stats['ratio'] > 5
+        assert stats['sha256'] == hashlib.sha256(data).hexdigest()
+        assert (tmp_path / 'base.dt.gz.sha256').read_text().startswith(stats['sha256'])
+
+        restored = tmp_path / 'restored.dt'
+        stats = decompress_file(str(target), str(restored))
+
+        assert restored.read_bytes() == data
+        assert stats['source_bytes'] == len(data)
+
+    def test_checksum_mismatch(self, tmp_path, data):
+        """Несовпадение контрольной суммы."""
+
+        source = tmp_path / 'base.dt'
+        source.write_bytes(data)
+        target = tmp_path / 'base.dt.gz'
+
+        compress_file(str(source), str(target))
+        (tmp_path / 'base.dt.gz.sha256').write_text('0' * 64 + ' *base.dt\n')
+
+        with pytest.raises(BackupError):
+            decompress_file(str(target), str(tmp_path / 'restored.dt'))
+
+        assert not (tmp_path / 'restored.dt').exists()
+
+class TestBackupIb():
+    """Проверка функций backup_ib и restore_ib."""
+
+    def test_success(self, tmp_path, data):
+        """Выгрузка сжимается, несжатый файл удаляется, загрузка идет из распакованного файла."""
+
+        restored = []
+
+        def execute_command(params):
+            command, file_name = params[-1].split(' ', 1)
+
+            if command == '/DumpIB':
+                with open(file_name, 'wb') as file:
+                    file.write(data)
+            else:
+                with open(file_name, 'rb') as file:
+                    restored.append(file.read())
+
+            return True
+
+        designer = Designer(dir_=str(tmp_path / 'base'))
+        file_name_gz = str(tmp_path / 'base.dt.gz')
+
+        with patch('ones.RunInfobase._execute_command', side_effect=execute_command):
+            stats = backup_ib(designer, file_name_gz)
+
+            assert stats['source_bytes'] == len(data)
+            assert sorted(os.listdir(tmp_path)) == ['base.dt.gz', 'base.dt.gz.sha256']
+
+            assert restore_ib(designer, file_name_gz)
+
+        assert restored == [data]
+        assert sorted(os.listdir(tmp_path)) == ['base.dt.gz', 'base.dt.gz.sha256']
+
+    def test_dump_failed(self, tmp_path):
+        """Неуспешная выгрузка."""
+
+        designer = Designer(dir_=str(tmp_path / 'base'))
+
+        with patch('ones.RunInfobase._execute_command', return_value=False):
+            assert backup_ib(designer, str(tmp_path / 'base.dt.gz')) is None
+
+        assert not os.listdir(tmp_path)
+
+    @pytest.mark.parametrize('keep_dt', [False, True])
+    def test_existing_dt(self, tmp_path, keep_dt):
+        """Неуспешная выгрузка не удаляет существующий файл .dt с тем же именем."""
+
+        designer = Designer(dir_=str(tmp_path / 'base'))
+        (tmp_path / 'base.dt').write_bytes(b'old')
+
+        with patch('ones.RunInfobase._execute_command', return_value=False):
+            assert backup_ib(designer, str(tmp_path / 'base.dt.gz'), keep_dt=keep_dt) is None
+
+        assert os.listdir(tmp_path) == ['base.dt']
+        assert (tmp_path / 'base.dt').read_bytes() == b'old'
+
+    def test_existing_dt_success(self, tmp_path, data):
+        """Без keep_dt выгрузка идет во временный файл, существующий .dt остается."""
+
+        def execute_command(params):
+            file_name = params[-1].split(' ', 1)[1]
+
+            with open(file_name, 'wb') as file:
+                file.write(data)
+
+            return True
+
+        designer = Designer(dir_=str(tmp_path / 'base'))
+        (tmp_path / 'base.dt').write_bytes(b'old')
+
+        with patch('ones.RunInfobase._execute_command', side_effect=execute_command):
+            assert backup_ib(designer, str(tmp_path / 'base.dt.gz'))['source_bytes'] == len(data)
+
+        assert sorted(os.listdir(tmp_path)) == ['base.dt', 'base.dt.gz', 'base.dt.gz.sha256']
+        assert (tmp_path / 'base.dt').read_bytes() == b'old'
+        assert (tmp_path / 'base.dt.gz.sha256').read_text().endswith(' *base.dt\n')
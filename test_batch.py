@@ -0,0 +1,156 @@
+"""Тесты модуля batch"""
+
+import threading
+import time
+import pytest
+from testfixtures import LogCapture
+from unittest.mock import patch
+
+from batch import run_batch, run_processor, summarize_batch
+from cancellation import CancellationToken, current_token
+from ones import Enterprise
+
+class TestRunBatch():
+    """Проверка функции run_batch."""
+
+    def test_success(self):
+        """Результаты в порядке задач, исключение не прерывает пакет."""
+
+        def fail():
+            raise ValueError('ошибка')
+
+        results = run_batch([('1', lambda: True), ('2', fail), ('3', lambda: False), ('4', lambda: 5)])
+
+        assert [result.succeeded for result in results] == [True, False, False, True]
+        assert 'ValueError' in results[1].error
+        assert results[3].value == 5
+
+        summary = summarize_batch(results)
+
+        assert summary['failed'] == 2
+        assert summary['failures'] == ['2', '3']
+        assert summary['duration']['count'] == 4
+
+    def test_max_workers(self):
+        """Одновременно выполняется не больше max_workers задач."""
+
+        lock = threading.Lock()
+        running = [0, 0] # текущее, максимум
+
+        def task():
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+
+        run_batch([(str(number), task) for number in range(6)], max_workers=2)
+
+        assert running[1] == 2
+
+    def test_cancel(self):
+        """После отмены не начавшиеся задачи не запускаются, а задачи видят токен пакета."""
+
+        token = CancellationToken()
+        calls = []
+
+        def task():
+            calls.append(current_token() is token)
+            token.cancel('остановка конвейера')
+
+        results = run_batch([(str(number), task) for number in range(3)], max_workers=1, token=token)
+
+        assert calls == [True]
+        assert [result.succeeded for result in results] == [True, False, False]
+        assert results[1].error == 'Отменено: остановка конвейера'
+
+class TestRunProcessor():
+    """Проверка функции run_processor."""
+
+    @pytest.fixture
+    def enterprises(self):
+        enterprises = []
+
+        for infobase in ('base1', 'base2', 'base3'):
+            enterprise = Enterprise(server='server1', infobase=infobase)
+            enterprise.set_other_params(access_code='123')
+            enterprises.append(enterprise)
+
+        return enterprises
+
+    def test_success(self, enterprises, tmp_path):
+        """Обработка выполняется на всех базах, результаты собираются из файлов."""
+
+        calls = []
+
+        def execute_command(params):
+            calls.append(params)
+            launch_param = next(param for param in params if param.startswith('/C '))
+            result_file_name = launch_param.split('Результат=')[1]
+
+            if 'base2' in params[1]:
+                return False
+
+            if 'base1' in params[1]:
+                with open(result_file_name, 'w', encoding='utf-8') as file:
+                    file.write('OK')
+
+            return True
+
+        with patch('ones.RunInfobase._execute_command', side_effect=execute_command):
+            results = run_processor(enterprises, r'D:\1.epf', launch_param='Результат={result_file}',
+                                    result_dir=str(tmp_path), max_workers=2,
+                                    log_file_prefix=str(tmp_path / 'log'))
+
+        assert len(calls) == 3
+        assert all(r'/Execute D:\1.epf' in params and '/UC 123' in params for params in calls)
+        assert len({next(param for param in params if param.startswith('/Out')) for params in calls}) == 3
+
+        assert results[0].succeeded
+        assert results[0].output == 'OK'
+        assert not results[1].succeeded
+        assert not results[2].succeeded
+        assert results[2].error == 'Обработка не записала файл результата'
+        assert results[0].name == 'srvr=server1;ref=base1'
+        assert enterprises[0]._execute == ''
+
+    def test_run_dirs(self, enterprises, tmp_path):
+        """Одновременные запуски с общим каталогом результатов пишут в разные файлы."""
+
+        result_file_names = []
+
+        def execute_command(params):
+            launch_param = next(param for param in params if param.startswith('/C '))
+            result_file_names.append(launch_param.split('Результат=')[1])
+
+            with open(result_file_names[-1], 'w', encoding='utf-8') as file:
+                file.write(params[1])
+
+            return True
+
+        with patch('ones.RunInfobase._execute_command', side_effect=execute_command):
+            results1 = run_processor(enterprises[:1], r'D:\1.epf', launch_param='Результат={result_file}',
+                                     result_dir=str(tmp_path))
+            results2 = run_processor(enterprises[1:2], r'D:\1.epf', launch_param='Результат={result_file}',
+                                     result_dir=str(tmp_path))
+
+        assert len(set(result_file_names)) == 2
+        assert 'base1' in results1[0].output
+        assert 'base2' in results2[0].output
+
+    def test_password_not_logged(self, enterprises):
+        """Пароль базы не попадает в лог и сводку неуспешных задач."""
+
+        for enterprise in enterprises:
+            enterprise.set_auth_params(user='admin', password='secret123', use_os_auth=False)
+
+        with LogCapture() as logs, \
+             patch('ones.RunInfobase._execute_command', return_value=False):
+            results = run_processor(enterprises, r'D:\1.epf')
+
+        summary = summarize_batch(results)
+
+        assert summary['failed'] == 3
+        assert not any('secret123' in name or 'admin' in name for name in summary['failures'])
+        assert not any('secret123' in record.getMessage() for record in logs.records)
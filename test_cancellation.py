@@ -0,0 +1,238 @@
+"""Тесты модуля cancellation"""
+
+import os
+import signal
+import sys
+import threading
+import time
+import pytest
+from unittest.mock import patch
+
+from cancellation import (CancellationToken, OperationCancelled, cancel_scope, current_token,
+                          handle_signals, run_process, start_process)
+from ones import Designer
+
+posix_only = pytest.mark.skipif(sys.platform == 'win32', reason='Группы процессов POSIX')
+
+# Процесс с дочерним процессом; имя файла для pid дочернего процесса - в параметре
+TREE_SCRIPT = '''
+import subprocess, sys, time
+child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+with open(sys.argv[1], 'w') as file:
+    file.write(str(child.pid))
+time.sleep(60)
+'''
+
+# Процесс, игнорирующий штатное завершение; имя файла готовности - в параметре
+STUBBORN_SCRIPT = '''
+import signal, sys, time
+signal.signal(signal.SIGTERM, signal.SIG_IGN)
+open(sys.argv[1], 'w').close()
+time.sleep(60)
+'''
+
+def is_alive(pid: int) -> bool:
+    """Процесс существует и не завершен (зомби считается завершенным)."""
+
+    try:
+        with open(f'/proc/{pid}/stat') as file:
+            return file.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+def cancel_later(token: CancellationToken, seconds: float=0.3):
+    threading.Timer(seconds, token.cancel, args=('тест',)).start()
+
+class TestCancellationToken():
+    """Проверка класса CancellationToken."""
+
+    def test_cancel(self):
+        token = CancellationToken()
+        calls = []
+
+        handle = token.register(lambda: calls.append(1))
+        token.register(lambda: calls.append(2))
+        token.unregister(handle)
+
+        token.raise_if_cancelled()
+        token.cancel('остановка')
+        token.cancel('повтор')
+
+        assert calls == [2]
+        assert token.reason == 'остановка'
+
+        with pytest.raises(OperationCancelled, match='остановка'):
+            token.raise_if_cancelled()
+
+        token.register(lambda: calls.append(3))
+
+        assert calls == [2, 3]
+
+    def test_child(self):
+        """Отмена родителя отменяет дочерний токен, но не наоборот."""
+
+        parent = CancellationToken()
+        child1 = parent.child()
+        child2 = parent.child()
+
+        child1.cancel()
+
+        assert not parent.cancelled
+
+        parent.cancel('сервис')
+
+        assert child2.cancelled
+        assert child2.reason == 'сервис'
+
+    def test_close(self):
+        """Закрытый дочерний токен отключается от родителя."""
+
+        parent = CancellationToken()
+
+        with parent.child() as child:
+            assert len(parent._callbacks) == 1
+
+        assert parent._callbacks == {}
+
+        parent.cancel()
+
+        assert not child.cancelled
+
+    def test_wait(self):
+        token = CancellationToken()
+
+        assert not token.wait(0.01)
+
+        cancel_later(token, 0.05)
+
+        assert token.wait(5)
+
+    def test_scope(self):
+        token = CancellationToken()
+
+        with cancel_scope(token):
+            assert current_token() is token
+
+        assert current_token() is None
+
+@posix_only
+class TestRunProcess():
+    """Завершение процессов при отмене."""
+
+    def test_success(self):
+        assert run_process([sys.executable, '-c', 'raise SystemExit(3)'], CancellationToken()) == 3
+
+    def test_process_tree(self, tmp_path):
+        """Отмена завершает процесс вместе с дочерним за ограниченное время."""
+
+        pid_file = tmp_path / 'child.pid'
+        token = CancellationToken()
+
+        def cancel_when_started():
+            while not pid_file.exists() or not pid_file.read_text():
+                time.sleep(0.05)
+            token.cancel('тест')
+
+        threading.Thread(target=cancel_when_started, daemon=True).start()
+        start_time = time.monotonic()
+
+        with pytest.raises(OperationCancelled):
+            run_process([sys.executable, '-c', TREE_SCRIPT, str(pid_file)], token)
+
+        assert time.monotonic() - start_time < 10
+
+        child_pid = int(pid_file.read_text())
+
+        for _ in range(50):
+            if not is_alive(child_pid):
+                break
+            time.sleep(0.1)
+
+        assert not is_alive(child_pid)
+
+    def test_force(self, tmp_path):
+        """Процесс, не завершившийся штатно, завершается принудительно после grace_seconds."""
+
+        ready_file = tmp_path / 'ready'
+        token = CancellationToken()
+
+        def cancel_when_ready():
+            while not ready_file.exists():
+                time.sleep(0.05)
+            token.cancel('тест')
+
+        threading.Thread(target=cancel_when_ready, daemon=True).start()
+        start_time = time.monotonic()
+
+        with pytest.raises(OperationCancelled):
+            run_process([sys.executable, '-c', STUBBORN_SCRIPT, str(ready_file)], token, grace_seconds=0.5)
+
+        assert time.monotonic() - start_time < 10
+
+    def test_cancelled_before_start(self):
+        token = CancellationToken()
+        token.cancel()
+
+        with patch('cancellation.start_process') as mock, pytest.raises(OperationCancelled):
+            run_process([sys.executable, '-c', 'pass'], token)
+
+        assert not mock.called
+
+@posix_only
+def test_handle_signals():
+    """Сигнал отменяет токен, после блока прежний обработчик восстанавливается."""
+
+    token = CancellationToken()
+    previous = signal.getsignal(signal.SIGTERM)
+
+    with handle_signals(token):
+        os.kill(os.getpid(), signal.SIGTERM)
+
+        assert token.wait(5)
+        assert token.reason == 'Сигнал SIGTERM'
+
+    assert signal.getsignal(signal.SIGTERM) is previous
+
+@posix_only
+def test_signal_during_lock():
+    """Сигнал, пришедший, пока основной поток держит блокировку токена, не приводит к взаимоблокировке."""
+
+    token = CancellationToken()
+
+    with handle_signals(token):
+        with token._lock:
+            os.kill(os.getpid(), signal.SIGTERM)
+            time.sleep(0.1)
+
+        assert token.wait(5)
+
+@posix_only
+class TestDesigner():
+    """Отмена операции конфигуратора."""
+
+    def designer(self, token: CancellationToken=None) -> Designer:
+        designer = Designer(r'D:\R')
+        designer.set_platform_params(r'D:\1cv8.exe')
+        designer.set_cancellation_params(token)
+        return designer
+
+    def sleeping_process(self, params):
+        return start_process([sys.executable, '-c', 'import time; time.sleep(60)'])
+
+    def test_token(self):
+        token = CancellationToken()
+        cancel_later(token)
+
+        with patch('cancellation.start_process', side_effect=self.sleeping_process), \
+                pytest.raises(OperationCancelled):
+            self.designer(token).load_cfg(r'D:\1.cf')
+
+    def test_scope(self):
+        """Без токена объекта используется токен контекста."""
+
+        token = CancellationToken()
+        cancel_later(token)
+
+        with patch('cancellation.start_process', side_effect=self.sleeping_process), \
+                cancel_scope(token), pytest.raises(OperationCancelled):
+            self.designer().load_cfg(r'D:\1.cf')
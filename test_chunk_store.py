@@ -0,0 +1,113 @@
+"""Тесты модуля chunk_store"""
+
+import io
+import os
+import pytest
+
+from chunk_store import ChunkStore, ChunkStoreError, iter_chunks
+
+CHUNKING = {'min_chunk_size': 1024, 'max_chunk_size': 16 * 1024, 'anchor_bits': 12}
+
+@pytest.fixture
+def data():
+    return os.urandom(200 * 1024)
+
+@pytest.fixture
+def store(tmp_path):
+    return ChunkStore(str(tmp_path / 'archive'), **CHUNKING)
+
+class TestIterChunks():
+    """Проверка функции iter_chunks."""
+
+    def test_boundaries(self, data):
+        """Фрагменты в пределах размеров, вставка данных меняет только соседние фрагменты."""
+
+        chunks = list(iter_chunks(io.BytesIO(data), 1024, 16 * 1024, 12))
+
+        assert b''.join(chunks) == data
+        assert all(1024 <= len(chunk) <= 16 * 1024 for chunk in chunks[:-1])
+
+        changed = data[:50000] + b'insert' + data[50000:]
+        changed_chunks = list(iter_chunks(io.BytesIO(changed), 1024, 16 * 1024, 12))
+
+        assert len(set(changed_chunks) - set(chunks)) <= 2
+
+    def test_uniform(self):
+        """Однородные данные делятся по максимальному размеру."""
+
+        chunks = list(iter_chunks(io.BytesIO(bytes(40 * 1024)), 1024, 16 * 1024, 12))
+
+        assert [len(chunk) for chunk in chunks] == [16 * 1024, 16 * 1024, 8 * 1024]
+
+class TestChunkStore():
+    """Проверка класса ChunkStore."""
+
+    def test_dedup(self, store, data, tmp_path):
+        """Повторяющиеся фрагменты хранятся один раз, файлы собираются без изменений."""
+
+        file1 = tmp_path / '1.dt'
+        file1.write_bytes(data)
+        file2 = tmp_path / '2.dt'
+        file2.write_bytes(data[:100000] + b'new' + data[100000:])
+
+        stats1 = store.put('base1/1.dt', str(file1))
+        stats2 = store.put('base1/2.dt', str(file2))
+
+        assert stats1['new_chunks'] == stats1['chunks']
+        assert stats2['new_chunks'] <= 2
+
+        assert store.names() == ['base1/1.dt', 'base1/2.dt']
+
+        with store.materialize('base1/2.dt', str(tmp_path)) as file_name:
+            assert file_name.endswith('.dt')
+            assert open(file_name, 'rb').read() == file2.read_bytes()
+
+        assert not os.path.exists(file_name)
+
+        stats = store.stats()
+
+        assert stats['logical_bytes'] == 2 * len(data) + 3
+        assert stats['dedup_ratio'] > 1.8
+
+    def test_gc(self, store, data, tmp_path):
+        """Сборка мусора удаляет только фрагменты удаленных файлов."""
+
+        file1 = tmp_path / '1.dt'
+        file1.write_bytes(data)
+        file2 = tmp_path / '2.dt'
+        file2.write_bytes(os.urandom(50 * 1024))
+
+        store.put('1.dt', str(file1))
+        store.put('2.dt', str(file2))
+
+        assert store.delete('2.dt')
+        assert not store.delete('2.dt')
+
+        result = store.gc()
+
+        assert result['freed_bytes'] == 50 * 1024
+        assert store.stats()['stored_bytes'] == len(data)
+
+        target = tmp_path / 'restored.dt'
+        store.get('1.dt', str(target))
+
+        assert target.read_bytes() == data
+
+    def test_missing(self, store, tmp_path):
+        """Нет файла или фрагмента."""
+
+        with pytest.raises(ChunkStoreError):
+            store.get('1.dt', str(tmp_path / 'restored.dt'))
+
+        file1 = tmp_path / '1.dt'
+        file1.write_bytes(os.urandom(10 * 1024))
+        store.put('1.dt', str(file1))
+
+        for dir_entry in os.scandir(tmp_path / 'archive' / 'chunks'):
+            for entry in os.scandir(dir_entry.path):
+                os.remove(entry.path)
+
+        with pytest.raises(ChunkStoreError):
+            store.get('1.dt', str(tmp_path / 'restored.dt'))
+
+        assert not (tmp_path / 'restored.dt').exists()
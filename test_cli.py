@@ -0,0 +1,129 @@
+"""Тесты модуля cli"""
+
+import os
+import subprocess
+import sys
+import time
+import pytest
+from unittest.mock import patch
+
+import cli
+
+@pytest.fixture
+def common_args():
+    """Общие параметры командной строки."""
+
+    return ['--exename', r'D:\1cv8.exe', '--dir', r'D:\R']
+
+class TestMain():
+    """Проверка функции main."""
+
+    @pytest.fixture(autouse=True)
+    def no_init_logger(self):
+        """Глобальный логгер в тестах не настраивается."""
+
+        with patch('logger_.init_logger'):
+            yield
+
+    @pytest.mark.parametrize('return_value, expected_code', [(True, 0), (False, 1)])
+    def test_load(self, common_args, return_value, expected_code):
+        """Загрузка конфигурации, все варианты результата."""
+
+        with patch('ones.RunInfobase._execute_command') as mock:
+            mock.return_value = return_value
+            code = cli.main(common_args + ['load', r'D:\1.cf'])
+
+            assert code == expected_code
+            assert mock.call_args.args[0][0] == 'DESIGNER'
+            assert mock.call_args.args[0][-1] == r'/LoadCfg D:\1.cf'
+
+    def test_load_fingerprints(self, common_args, tmp_path):
+        """Повторная загрузка того же файла пропускается по отпечатку."""
+
+        file_name_cf = tmp_path / '1.cf'
+        file_name_cf.write_bytes(b'cf')
+        args = common_args + ['load', str(file_name_cf), '--fingerprints', str(tmp_path / 'f.json')]
+
+        with patch('ones.RunInfobase._execute_command', return_value=True) as mock:
+            assert cli.main(args) == 0
+            assert cli.main(args) == 0
+            assert cli.main(args + ['--ignore-fingerprint']) == 0
+
+            assert mock.call_count == 2
+
+    def test_update(self, common_args):
+        """Обновление из хранилища с параметрами хранилища."""
+
+        with patch('ones.RunInfobase._execute_command') as mock:
+            cli.main(common_args + ['update', '--repo-dir', r'D:\repo', '--repo-user', 'u',
+                                    '--version', '5', '--update-db-cfg'])
+
+            params = mock.call_args.args[0]
+
+            assert r'/ConfigurationRepositoryF D:\repo' in params
+            assert '-v 5' in params
+            assert '/UpdateDBCfg' in params
+
+    def test_dump_ib(self, common_args):
+        """Выгрузка информационной базы."""
+
+        with patch('ones.RunInfobase._execute_command') as mock:
+            cli.main(common_args + ['dump-ib', r'D:\1.dt'])
+
+            assert mock.call_args.args[0][-1] == r'/DumpIB D:\1.dt'
+
+    def test_run(self, common_args):
+        """Запуск предприятия с параметром /C."""
+
+        with patch('ones.RunInfobase._execute_command') as mock:
+            cli.main(common_args + ['run', '--launch-param', 'W', '--execute', r'D:\1.epf'])
+
+            assert mock.call_args.args[0][0] == 'ENTERPRISE'
+            assert mock.call_args.args[0][-2:] == [r'/Execute D:\1.epf', '/C W']
+
+class TestStartup():
+    """Проверка времени старта и отложенных импортов."""
+
+    def run_python(self, args):
+        """Запуск интерпретатора в каталоге модулей."""
+
+        return subprocess.run([sys.executable] + args,
+                              cwd=os.path.dirname(os.path.abspath(cli.__file__)),
+                              capture_output=True, text=True)
+
+    @pytest.mark.parametrize('module_name', ['packaging', 'subprocess', 'admission', 'cancellation',
+                                             'single_flight', 'ib_errors', 'ib_locks', 'ibases',
+                                             'fingerprints', 'hashlib', 'logging.handlers'])
+    def test_lazy_imports(self, module_name):
+        """Nмпорт ones не загружает модули, нужные только при выполнении операций."""
+
+        completed_process = self.run_python(['-c', f"import ones, sys; print('{module_name}' in sys.modules)"])
+
+        assert completed_process.stdout.strip() == 'False'
+
+    def test_lazy_exports(self):
+        """Классы модулей расширений доступны как атрибуты ones."""
+
+        completed_process = self.run_python(['-c', "from ones import SingleFlight; print(SingleFlight.__module__)"])
+
+        assert completed_process.stdout.strip() == 'single_flight'
+
+    def test_main_module(self):
+        """python -m ones не загружает модуль ones второй раз."""
+
+        completed_process = self.run_python(
+            ['-c', "import runpy, sys; sys.argv = ['ones', '--exename', 'none', '--dir', '.', 'create']; "
+                   "import cli; cli._run_command = lambda args, ones_module: print(ones_module.__name__, "
+                   "'ones' in sys.modules) or True; runpy.run_module('ones', run_name='__main__')"])
+
+        assert completed_process.stdout.strip() == '__main__ False'
+
+    def test_budget(self):
+        """Вывод справки укладывается в бюджет времени старта."""
+
+        start_time = time.monotonic()
+        completed_process = self.run_python(['-m', 'ones', '--help'])
+        duration = time.monotonic() - start_time
+
+        assert completed_process.returncode == 0
+        assert duration < cli.STARTUP_BUDGET_SECONDS
@@ -0,0 +1,333 @@
+"""Тесты модуля distributed"""
+
+import threading
+import time
+import pytest
+from unittest.mock import patch
+
+from cancellation import CancellationToken, OperationCancelled
+import ones
+from distributed import MASK, Coordinator, Worker, _match_version
+from service import JobStates
+
+PLATFORM_18 = '8.3.18.1363'
+PLATFORM_22 = '8.3.22.1709'
+AUTH_TOKEN = 'secret'
+EXENAME = r'D:\1cv8.exe'
+
+def load_cfg_spec(file_name_cf: str=r'D:\1.cf', platform_version: str='') -> dict:
+    """Задание загрузки конфигурации."""
+
+    return {'class': 'Designer',
+            'init': {'dir_': r'D:\R'},
+            'settings': {'set_platform_params': {'exename': EXENAME,
+                                                 'platform_version': platform_version}},
+            'operation': 'load_cfg',
+            'args': {'file_name_cf': file_name_cf}}
+
+@pytest.fixture
+def coordinator():
+    """Координатор на свободном локальном порту."""
+
+    coordinator = Coordinator(AUTH_TOKEN, port=0, requeue_delay=0.2)
+    coordinator.start()
+
+    yield coordinator
+
+    coordinator.stop()
+
+@pytest.fixture
+def start_worker(coordinator):
+    """Запуск исполнителей, подключенных к координатору."""
+
+    workers = []
+
+    def start(name: str, capacity: int=1, platforms: dict=None) -> Worker:
+        worker = Worker(coordinator.address, AUTH_TOKEN, capacity, platforms, name, (EXENAME,)).start()
+        workers.append(worker)
+        assert coordinator.wait_for_workers(len(workers), timeout=5)
+        return worker
+
+    yield start
+
+    for worker in workers:
+        worker.stop(wait=False)
+
+def execute_command(runner, params):
+    """Выполнение 1С: задания с файлом slow.cf выполняются дольше."""
+
+    if any('slow' in str(param) for param in params):
+        time.sleep(0.3)
+
+    return True
+
+class TestMatchVersion():
+    """Проверка выбора версии платформы."""
+
+    @pytest.mark.parametrize('required, expected',
+        [('', PLATFORM_22), ('8.3.18', PLATFORM_18), (PLATFORM_22, PLATFORM_22),
+         ('8.3.2', None), ('8.3.23', None)])
+    def test_match(self, required, expected):
+        assert _match_version(required, [PLATFORM_18, PLATFORM_22]) == expected
+
+    def test_no_platforms(self):
+        assert _match_version('', []) == ''
+        assert _match_version('8.3.22', []) is None
+
+class TestCoordinator():
+    """Проверка координатора с исполнителями на localhost."""
+
+    def test_run_and_log(self, coordinator, start_worker):
+        """Задание выполняется исполнителем, лог и результат возвращаются координатору."""
+
+        start_worker('agent1')
+
+        with patch.object(ones.RunInfobase, '_execute_command', autospec=True, return_value=True):
+            job_id = coordinator.submit(load_cfg_spec())
+            status = coordinator.wait(job_id, timeout=5)
+
+        assert status['state'] == JobStates.SUCCEEDED
+        assert status['result'] is True
+        assert status['worker'] == 'agent1'
+        assert any('load_cfg. Началось' in line for line in coordinator.log_lines(job_id))
+        assert coordinator.metrics['succeeded'] == 1
+
+    def test_failure(self, coordinator, start_worker):
+        """Неуспех и исключение операции."""
+
+        start_worker('agent1')
+
+        with patch.object(ones.RunInfobase, '_execute_command', autospec=True,
+                          side_effect=[False, RuntimeError('ошибка 1С')]):
+            status1 = coordinator.wait(coordinator.submit(load_cfg_spec()), timeout=5)
+            status2 = coordinator.wait(coordinator.submit(load_cfg_spec()), timeout=5)
+
+        assert status1['state'] == JobStates.FAILED
+        assert status2['state'] == JobStates.FAILED
+        assert 'ошибка 1С' in status2['error']
+
+    def test_platform_version(self, coordinator, start_worker):
+        """Задание выполняется на исполнителе с нужной версией и его путем к платформе."""
+
+        start_worker('agent18', platforms={PLATFORM_18: '/opt/18/1cv8'})
+        start_worker('agent22', platforms={PLATFORM_22: '/opt/22/1cv8'})
+
+        exenames = []
+
+        def execute(runner, params):
+            exenames.append(runner._exename)
+            return True
+
+        with patch.object(ones.RunInfobase, '_execute_command', autospec=True, side_effect=execute):
+            job_ids = [coordinator.submit(load_cfg_spec(platform_version='8.3.22')) for _ in range(3)]
+            statuses = [coordinator.wait(job_id, timeout=5) for job_id in job_ids]
+
+        assert {status['worker'] for status in statuses} == {'agent22'}
+        assert exenames == ['/opt/22/1cv8'] * 3
+
+    def test_waits_for_compatible_worker(self, coordinator, start_worker):
+        """Задание ждет подключения исполнителя с нужной версией."""
+
+        start_worker('agent18', platforms={PLATFORM_18: '/opt/18/1cv8'})
+
+        with patch.object(ones.RunInfobase, '_execute_command', autospec=True, return_value=True):
+            job_id = coordinator.submit(load_cfg_spec(platform_version=PLATFORM_22))
+            time.sleep(0.2)
+
+            assert coordinator.status(job_id)['state'] == JobStates.QUEUED
+
+            start_worker('agent22', platforms={PLATFORM_22: '/opt/22/1cv8'})
+            status = coordinator.wait(job_id, timeout=5)
+
+        assert status['worker'] == 'agent22'
+
+    def test_work_stealing(self, coordinator, start_worker):
+        """Исполнитель с быстрыми заданиями забирает задания из очереди занятого исполнителя."""
+
+        start_worker('agent1')
+        start_worker('agent2')
+
+        with patch.object(ones.RunInfobase, '_execute_command', autospec=True,
+                          side_effect=execute_command):
+            job_ids = [coordinator.submit(load_cfg_spec(r'D:\slow.cf' if number % 2 else r'D:\fast.cf'))
+                       for number in range(8)]
+            statuses = [coordinator.wait(job_id, timeout=10) for job_id in job_ids]
+
+        assert all(status['state'] == JobStates.SUCCEEDED for status in statuses)
+        assert coordinator.metrics['stolen'] > 0
+        assert {status['worker'] for status in statuses} == {'agent1', 'agent2'}
+
+    def test_worker_disconnect(self, coordinator, start_worker):
+        """Задание отключившегося исполнителя выполняет другой исполнитель."""
+
+        started = threading.Event()
+        cancelled = threading.Event()
+
+        def execute(runner, params):
+            if runner._exename == '/agent1/1cv8':
+                started.set()
+                runner._token().wait(5)
+                cancelled.set()
+                runner._token().raise_if_cancelled()
+
+            return True
+
+        agent1 = start_worker('agent1', platforms={PLATFORM_22: '/agent1/1cv8'})
+
+        with patch.object(ones.RunInfobase, '_execute_command', autospec=True, side_effect=execute):
+            job_id = coordinator.submit(load_cfg_spec())
+            assert started.wait(5)
+
+            start_worker('agent2', platforms={PLATFORM_22: '/agent2/1cv8'})
+            agent1.stop(wait=False)
+
+            status = coordinator.wait(job_id, timeout=5)
+
+        assert cancelled.is_set()
+        assert status['state'] == JobStates.SUCCEEDED
+        assert status['worker'] == 'agent2'
+        assert status['attempts'] == 2
+        assert coordinator.metrics['requeued'] == 1
+
+    def test_connection_lost(self, coordinator, start_worker):
+        """Исполнитель, потерявший соединение, отменяет задание, а координатор возвращает его
+        в очередь только через requeue_delay."""
+
+        started = threading.Event()
+        cancelled = threading.Event()
+
+        def execute(runner, params):
+            if runner._exename == '/agent1/1cv8':
+                started.set()
+                runner._token().wait(5)
+                cancelled.set()
+                runner._token().raise_if_cancelled()
+
+            return True
+
+        agent1 = start_worker('agent1', platforms={PLATFORM_22: '/agent1/1cv8'})
+
+        with patch.object(ones.RunInfobase, '_execute_command', autospec=True, side_effect=execute):
+            job_id = coordinator.submit(load_cfg_spec())
+            assert started.wait(5)
+
+            start_worker('agent2', platforms={PLATFORM_22: '/agent2/1cv8'})
+            agent1._connection.close()
+
+            assert cancelled.wait(5)
+            assert coordinator.status(job_id)['worker'] == 'agent1'
+
+            status = coordinator.wait(job_id, timeout=5)
+
+        assert status['worker'] == 'agent2'
+
+    def test_cancel(self, coordinator, start_worker):
+        """Отмена ожидающего задания и выполняющегося: процесс завершается на исполнителе."""
+
+        started = threading.Event()
+
+        def execute(runner, params):
+            started.set()
+            runner._token().wait(5)
+            runner._token().raise_if_cancelled()
+            return True
+
+        start_worker('agent1')
+
+        with patch.object(ones.RunInfobase, '_execute_command', autospec=True, side_effect=execute):
+            job_id1 = coordinator.submit(load_cfg_spec())
+            job_id2 = coordinator.submit(load_cfg_spec())
+            assert started.wait(5)
+
+            assert coordinator.cancel(job_id2)
+            assert coordinator.status(job_id2)['state'] == JobStates.CANCELLED
+
+            token = CancellationToken()
+            cancel_later = threading.Timer(0.1, token.cancel)
+            cancel_later.start()
+
+            with pytest.raises(OperationCancelled):
+                coordinator.wait(job_id1, timeout=5, token=token)
+
+            status = coordinator.wait(job_id1, timeout=5)
+
+        assert status['state'] == JobStates.CANCELLED
+        assert coordinator.metrics['cancelled'] == 2
+        assert coordinator.metrics['requeued'] == 0
+
+    def test_worker_token(self, coordinator):
+        """Отмена токена исполнителя останавливает его и отменяет его задания."""
+
+        started = threading.Event()
+        token = CancellationToken()
+
+        def execute(runner, params):
+            started.set()
+            runner._token().wait(5)
+            runner._token().raise_if_cancelled()
+            return True
+
+        worker = Worker(coordinator.address, AUTH_TOKEN, allowed_exenames=(EXENAME,), token=token).start()
+        assert coordinator.wait_for_workers(1, timeout=5)
+
+        with patch.object(ones.RunInfobase, '_execute_command', autospec=True, side_effect=execute):
+            job_id = coordinator.submit(load_cfg_spec())
+            assert started.wait(5)
+
+            token.cancel()
+            worker._thread.join(5)
+
+        assert not worker._thread.is_alive()
+        assert coordinator.status(job_id)['state'] == JobStates.QUEUED
+
+    def test_auth(self, coordinator):
+        """Исполнитель с другим токеном не подключается, координатор с другим токеном не принимается."""
+
+        with pytest.raises(ConnectionError):
+            Worker(coordinator.address, 'wrong', allowed_exenames=(EXENAME,)).run()
+
+        assert coordinator.workers() == []
+
+        with pytest.raises(ValueError):
+            Coordinator('')
+
+        with pytest.raises(ValueError):
+            Worker(coordinator.address, AUTH_TOKEN)
+
+    def test_exename_not_allowed(self, coordinator, start_worker):
+        """Исполнитель не запускает исполняемые файлы вне своего списка."""
+
+        start_worker('agent1')
+        spec = load_cfg_spec()
+        spec['settings']['set_platform_params']['exename'] = '/tmp/evil'
+
+        with patch.object(ones.RunInfobase, '_execute_command', autospec=True) as mock:
+            status = coordinator.wait(coordinator.submit(spec), timeout=5)
+
+        assert not mock.called
+        assert status['state'] == JobStates.FAILED
+        assert 'не разрешен' in status['error']
+
+    def test_secrets_masked(self, coordinator, start_worker):
+        """Пароли задания не попадают в лог, передаваемый координатору."""
+
+        start_worker('agent1')
+        spec = load_cfg_spec()
+        spec['settings']['set_auth_params'] = {'user': 'admin', 'password': 'p@ss', 'use_os_auth': False}
+
+        with patch('ones.RunInfobase._subprocess_run', return_value=0):
+            job_id = coordinator.submit(spec)
+            coordinator.wait(job_id, timeout=5)
+
+        lines = coordinator.log_lines(job_id)
+
+        assert any(MASK in line for line in lines)
+        assert not any('p@ss' in line for line in lines)
+
+    def test_workers(self, coordinator, start_worker):
+        """Сведения об исполнителях."""
+
+        start_worker('agent1', capacity=2, platforms={PLATFORM_22: '/opt/22/1cv8'})
+
+        assert coordinator.workers() == [{'name': 'agent1', 'capacity': 2, 'platforms': [PLATFORM_22],
+                                          'pending': 0, 'running': 0}]
@@ -0,0 +1,59 @@
+"""Тесты модуля fileops"""
+
+import os
+import pytest
+
+from fileops import FileLock, FileLockTimeout, atomic_write, read_file_tail
+
+class TestFileLock():
+    """Проверка класса FileLock."""
+
+    def test_success(self, tmp_path):
+        """Захват и освобождение блокировки."""
+
+        lock_file_name = str(tmp_path / 'f.lock')
+
+        with FileLock(lock_file_name) as lock:
+            assert lock.locked
+
+        assert not lock.locked
+
+    def test_timeout(self, tmp_path):
+        """Повторная монопольная блокировка не получается за отведенное время."""
+
+        lock_file_name = str(tmp_path / 'f.lock')
+
+        with FileLock(lock_file_name):
+            with pytest.raises(FileLockTimeout):
+                FileLock(lock_file_name, timeout=0.1).acquire()
+
+class TestAtomicWrite():
+    """Проверка функции atomic_write."""
+
+    def test_success(self, tmp_path):
+        """Файл заменяется целиком, временные файлы не остаются."""
+
+        file = tmp_path / 'f.txt'
+        file.write_text('old')
+
+        atomic_write(str(file), 'новый', encoding='utf_8_sig')
+
+        assert file.read_text(encoding='utf_8_sig') == 'новый'
+        assert os.listdir(tmp_path) == ['f.txt']
+
+class TestReadFileTail():
+    """Проверка функции read_file_tail."""
+
+    @pytest.mark.parametrize('start_offset, max_bytes, expected_value',
+        [(0, 100, (b'0123456789', False)),
+         (0, 4, (b'6789', True)),
+         (7, 100, (b'789', False)),
+         (3, 4, (b'6789', True)),
+         (20, 100, (b'0123456789', False))])
+    def test_success(self, tmp_path, start_offset, max_bytes, expected_value):
+        """Чтение с учетом начальной позиции и ограничения размера."""
+
+        file = tmp_path / 'f.log'
+        file.write_bytes(b'0123456789')
+
+        assert read_file_tail(str(file), start_offset, max_bytes) == expected_value
@@ -0,0 +1,191 @@
+"""Тесты модуля fingerprints"""
+
+import os
+import pytest
+from unittest.mock import patch
+
+from fingerprints import FingerprintStore, cf_fingerprint, repo_fingerprint
+from ones import Designer
+
+@pytest.fixture
+def file_base(tmp_path):
+    """Каталог файловой базы с файлом 1Cv8.1CD."""
+
+    dir_ = tmp_path / 'base'
+    dir_.mkdir()
+    (dir_ / '1Cv8.1CD').write_bytes(b'base')
+
+    return str(dir_)
+
+@pytest.fixture
+def cf(tmp_path):
+    """Файл конфигурации."""
+
+    file_name = tmp_path / '1.cf'
+    file_name.write_bytes(b'configuration 1')
+
+    return str(file_name)
+
+@pytest.fixture
+def designer(tmp_path, file_base):
+    """Конфигуратор файловой базы с файлом отпечатков."""
+
+    designer = Designer(file_base)
+    designer.set_platform_params(r'D:\1cv8.exe')
+    designer.set_fingerprint_params(str(tmp_path / 'fingerprints.json'))
+
+    return designer
+
+class TestFingerprint():
+    """Проверка отпечатков файла и хранилища."""
+
+    def test_cf(self, cf, tmp_path):
+        other = tmp_path / '2.cf'
+        other.write_bytes(b'configuration 2')
+
+        assert cf_fingerprint(cf) == cf_fingerprint(cf)
+        assert cf_fingerprint(cf)['value'] != cf_fingerprint(str(other))['value']
+
+    def test_server_repo(self):
+        """Отпечаток серверного хранилища не определяется, в том числе для заданной версии:
+        база, подключенная к хранилищу, получает последнюю версию."""
+
+        assert repo_fingerprint('tcp://server/repo') is None
+        assert repo_fingerprint('tcp://server/repo', 5) is None
+
+    def test_file_repo(self, tmp_path):
+        """Новая версия в файловом хранилище меняет отпечаток."""
+
+        repo_file = tmp_path / '1cv8ddb.1CD'
+        repo_file.write_bytes(b'1')
+        fingerprint1 = repo_fingerprint(str(tmp_path))
+
+        repo_file.write_bytes(b'12')
+
+        assert fingerprint1['value'] != repo_fingerprint(str(tmp_path))['value']
+
+class TestFingerprintStore():
+    """Проверка класса FingerprintStore."""
+
+    def test_record_and_forget(self, tmp_path, cf):
+        store = FingerprintStore(str(tmp_path / 'fingerprints.json'))
+        fingerprint = cf_fingerprint(cf)
+
+        assert not store.is_current('base1', fingerprint)
+
+        store.record('base1', fingerprint)
+
+        assert store.is_current('base1', fingerprint)
+        assert not store.is_current('base2', fingerprint)
+        assert not store.is_current('base1', dict(fingerprint, db_updated=True))
+
+        store.forget('base1')
+
+        assert store.get('base1') is None
+
+class TestDesigner():
+    """Пропуск повторной загрузки конфигуратором."""
+
+    def test_load_cfg(self, designer, cf):
+        """Тот же файл не загружается повторно, если не задано ignore_fingerprint."""
+
+        with patch('ones.RunInfobase._execute_command', return_value=True) as mock:
+            assert designer.load_cfg(cf)
+            assert designer.load_cfg(cf)
+            assert mock.call_count == 1
+
+            assert designer.load_cfg(cf, ignore_fingerprint=True)
+            assert mock.call_count == 2
+
+    def test_changed_cf(self, designer, cf):
+        with patch('ones.RunInfobase._execute_command', return_value=True) as mock:
+            designer.load_cfg(cf)
+
+            with open(cf, 'wb') as file:
+                file.write(b'configuration 2')
+
+            designer.load_cfg(cf)
+
+            assert mock.call_count == 2
+
+    def test_failure(self, designer, cf):
+        """Неуспешная загрузка удаляет отпечаток."""
+
+        with patch('ones.RunInfobase._execute_command', side_effect=[True, False, True]) as mock:
+            designer.load_cfg(cf)
+            designer.load_cfg(cf, ignore_fingerprint=True)
+            designer.load_cfg(cf)
+
+            assert mock.call_count == 3
+
+    def test_missing_cf(self, designer, cf, tmp_path):
+        """Отсутствующий файл не вызывает исключения: загрузка неуспешна, отпечаток удаляется."""
+
+        with patch('ones.RunInfobase._execute_command', side_effect=[True, False]) as mock:
+            assert designer.load_cfg(cf)
+            assert not designer.load_cfg(str(tmp_path / 'missing.cf'))
+
+            assert mock.call_count == 2
+            assert not designer._fingerprints.is_current(designer._infobase_key(),
+                                                         cf_fingerprint(cf), designer._dir)
+
+    def test_base_changed(self, designer, cf, file_base):
+        """Файловая база, изменившаяся после загрузки, загружается заново."""
+
+        with patch('ones.RunInfobase._execute_command', return_value=True) as mock:
+            designer.load_cfg(cf)
+
+            with open(os.path.join(file_base, '1Cv8.1CD'), 'ab') as file:
+                file.write(b'changed')
+
+            designer.load_cfg(cf)
+
+            assert mock.call_count == 2
+
+    def test_restore_ib(self, designer, cf):
+        """После загрузки информационной базы отпечаток недействителен."""
+
+        with patch('ones.RunInfobase._execute_command', return_value=True) as mock:
+            designer.load_cfg(cf)
+            designer.restore_ib(r'D:\1.dt')
+            designer.load_cfg(cf)
+
+            assert mock.call_count == 3
+
+    def test_update_from_repo(self, designer, tmp_path):
+        """Та же версия хранилища не загружается повторно, кроме обновления части объектов,
+        обновления с реструктуризацией после обновления без нее и новой версии в хранилище."""
+
+        repo_file = tmp_path / 'repo' / '1cv8ddb.1CD'
+        repo_file.parent.mkdir()
+        repo_file.write_bytes(b'1')
+        designer.set_repo_params(str(repo_file.parent), 'user')
+
+        with patch('ones.RunInfobase._execute_command', return_value=True) as mock:
+            designer.update_from_repo(5)
+            designer.update_from_repo(5)
+            assert mock.call_count == 1
+
+            designer.update_from_repo(5, objects=r'D:\objects.xml')
+            designer.update_from_repo(5)
+            assert mock.call_count == 3
+
+            designer.set_update_db_cfg_params(update_db_cfg=True)
+            designer.update_from_repo(5)
+            designer.update_from_repo(5)
+            assert mock.call_count == 4
+
+            repo_file.write_bytes(b'12')
+            designer.update_from_repo(5)
+            assert mock.call_count == 5
+
+    def test_server_repo(self, designer):
+        """Обновление из серверного хранилища не пропускается."""
+
+        designer.set_repo_params(r'tcp://server/repo', 'user')
+
+        with patch('ones.RunInfobase._execute_command', return_value=True) as mock:
+            designer.update_from_repo(5)
+            designer.update_from_repo(5)
+
+        assert mock.call_count == 2
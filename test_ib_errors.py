@@ -0,0 +1,83 @@
+"""Тесты модуля ib_errors"""
+
+import pytest
+
+from ib_errors import DEFAULT_CATALOG, ErrorCatalog, ErrorKinds, RetryPolicy
+
+class TestErrorCatalog():
+    """Проверка класса ErrorCatalog."""
+
+    @pytest.mark.parametrize('text, expected_kind',
+        [('Ошибка: информационная база заблокирована для монопольного доступа', ErrorKinds.TRANSIENT),
+         ('Объект Справочник.Товары захвачен пользователем Иванов', ErrorKinds.TRANSIENT),
+         ('Не обнаружено свободной лицензии!', ErrorKinds.TRANSIENT),
+         ('Идентификация пользователя не выполнена', ErrorKinds.PERMANENT),
+         ('Ошибка блокировки информационной базы для конфигурирования', ErrorKinds.TRANSIENT),
+         ('Database is locked', ErrorKinds.TRANSIENT),
+         ('Идентификация пользователя не выполнена. Превышено время ожидания', ErrorKinds.PERMANENT),
+         ('Объекты уже захвачены в хранилище', ErrorKinds.TRANSIENT),
+         ('Object Catalog.Goods is captured by user Ivanov', ErrorKinds.TRANSIENT),
+         ('Ресурс захвачен', ErrorKinds.UNKNOWN),
+         ('Captured output is empty', ErrorKinds.UNKNOWN),
+         ('Пользователь заблокирован', ErrorKinds.UNKNOWN),
+         ('Неверное значение параметра SessionTimeout', ErrorKinds.UNKNOWN),
+         ('Что-то пошло не так', ErrorKinds.UNKNOWN),
+         ('', ErrorKinds.UNKNOWN)])
+    def test_default(self, text, expected_kind):
+        """Классификация типовых ошибок каталогом по умолчанию."""
+
+        kind, _ = DEFAULT_CATALOG.classify(1, text)
+
+        assert kind == expected_kind
+
+    def test_extend(self):
+        """Добавление сигнатур по тексту и коду возврата."""
+
+        catalog = ErrorCatalog([('Первая', ErrorKinds.PERMANENT, r'ошибка1')])
+        catalog.add('Вторая', ErrorKinds.TRANSIENT, r'ошибка2')
+        catalog.add_return_code(101, 'Код 101', ErrorKinds.TRANSIENT)
+
+        assert catalog.classify(1, 'ОШИБКА2') == (ErrorKinds.TRANSIENT, 'Вторая')
+        assert catalog.classify(1, 'ошибка1 ошибка2') == (ErrorKinds.PERMANENT, 'Первая')
+        assert catalog.classify(1, 'ошибка2 ошибка1') == (ErrorKinds.PERMANENT, 'Первая')
+        assert catalog.classify(101, 'прочее') == (ErrorKinds.TRANSIENT, 'Код 101')
+
+    def test_permanent_first(self):
+        """Постоянная сигнатура важнее временной, добавленной раньше."""
+
+        catalog = ErrorCatalog([('Временная', ErrorKinds.TRANSIENT, r'ожидани'),
+                                ('Постоянная', ErrorKinds.PERMANENT, r'пароль')])
+
+        assert catalog.classify(1, 'Время ожидания истекло') == (ErrorKinds.TRANSIENT, 'Временная')
+        assert catalog.classify(1, 'Неверный пароль, время ожидания истекло') == (ErrorKinds.PERMANENT, 'Постоянная')
+
+    def test_wrong_pattern(self):
+        """Ошибка в регулярном выражении проявляется при добавлении."""
+
+        with pytest.raises(Exception):
+            ErrorCatalog().add('Плохая', ErrorKinds.TRANSIENT, r'(')
+
+class TestRetryPolicy():
+    """Проверка класса RetryPolicy."""
+
+    @pytest.mark.parametrize('kind, attempt, retry_unknown, expected_value',
+        [(ErrorKinds.TRANSIENT, 1, False, True),
+         (ErrorKinds.TRANSIENT, 3, False, False),
+         (ErrorKinds.PERMANENT, 1, True, False),
+         (ErrorKinds.UNKNOWN, 1, False, False),
+         (ErrorKinds.UNKNOWN, 1, True, True)])
+    def test_should_retry(self, kind, attempt, retry_unknown, expected_value):
+        """Решение о повторе."""
+
+        policy = RetryPolicy(max_attempts=3, retry_unknown=retry_unknown)
+
+        assert policy.should_retry(kind, attempt) == expected_value
+
+    def test_delay(self):
+        """Экспоненциальная задержка с разбросом и ограничением."""
+
+        policy = RetryPolicy(base_delay=10, max_delay=25, jitter=0.5)
+
+        assert 5 <= policy.delay(1) <= 10
+        assert 10 <= policy.delay(2) <= 20
+        assert 12.5 <= policy.delay(5) <= 25
@@ -0,0 +1,218 @@
+"""Тесты модуля ib_locks"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+import pytest
+from unittest.mock import patch
+
+from cancellation import CancellationToken, OperationCancelled
+from ib_locks import InfobaseLockManager, InfobaseLockTimeout, InfobaseLockUpgrade
+from ones import Designer
+
+KEY = "file='d:\\base1';"
+
+# Процесс, держащий монопольную блокировку базы, пока не закрыт stdin
+HOLDER_SCRIPT = '''
+import sys
+from ib_locks import InfobaseLockManager
+with InfobaseLockManager(sys.argv[1]).lock(sys.argv[2], 'load_cfg'):
+    print('locked', flush=True)
+    sys.stdin.read()
+'''
+
+@pytest.fixture
+def manager(tmp_path):
+    return InfobaseLockManager(str(tmp_path / 'locks'))
+
+def start_thread(target) -> threading.Thread:
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+class TestInfobaseLockManager():
+    """Проверка класса InfobaseLockManager."""
+
+    def test_shared(self, manager):
+        """Разделяемые операции выполняются одновременно."""
+
+        inside = threading.Barrier(2, timeout=5)
+
+        def dump():
+            with manager.lock(KEY, 'dump_ib', timeout=5):
+                inside.wait()
+
+        threads = [start_thread(dump) for _ in range(2)]
+
+        for thread in threads:
+            thread.join(5)
+
+        assert not inside.broken
+        assert manager.metrics['acquired'] == 2
+
+    def test_timeout(self, manager):
+        """Монопольная блокировка не дает получить другую за timeout."""
+
+        errors = []
+
+        def dump():
+            try:
+                with manager.lock(KEY, 'dump_ib', timeout=0.2):
+                    pass
+            except InfobaseLockTimeout as ex:
+                errors.append(ex)
+
+        with manager.lock(KEY, 'load_cfg'):
+            start_thread(dump).join(5)
+
+        assert len(errors) == 1
+        assert manager.metrics['timeouts'] == 1
+
+        with manager.lock(KEY, 'dump_ib', timeout=0):
+            pass
+
+    def test_other_infobase(self, manager):
+        with manager.lock(KEY, 'load_cfg'), manager.lock("file='d:\\base2';", 'load_cfg', timeout=0):
+            pass
+
+    def test_nested(self, manager):
+        """Вложенная операция того же потока не ждет блокировку."""
+
+        with manager.lock(KEY, 'load_cfg'):
+            with manager.lock(KEY, 'update_from_repo', timeout=0):
+                pass
+
+        assert manager.metrics['acquired'] == 1
+
+    def test_nested_upgrade(self, manager):
+        """Вложенная монопольная операция внутри разделяемой не выполняется, обратное допустимо."""
+
+        with manager.lock(KEY, 'run'):
+            with manager.lock(KEY, 'dump_ib', timeout=0):
+                pass
+
+            with pytest.raises(InfobaseLockUpgrade):
+                with manager.lock(KEY, 'load_cfg', timeout=0):
+                    pass
+
+        with manager.lock(KEY, 'load_cfg'):
+            with manager.lock(KEY, 'dump_ib', timeout=0):
+                pass
+
+    def test_fair_order(self, manager):
+        """Ожидающая монопольная операция не обгоняется новой разделяемой."""
+
+        order = []
+        release = threading.Event()
+
+        def reader1():
+            with manager.lock(KEY, 'dump_ib'):
+                order.append('reader1')
+                release.wait(5)
+
+        def writer():
+            with manager.lock(KEY, 'load_cfg'):
+                order.append('writer')
+
+        def reader2():
+            with manager.lock(KEY, 'dump_ib'):
+                order.append('reader2')
+
+        threads = [start_thread(reader1)]
+
+        while not order:
+            time.sleep(0.01)
+
+        threads.append(start_thread(writer))
+        time.sleep(0.2)
+        threads.append(start_thread(reader2))
+        time.sleep(0.2)
+
+        assert order == ['reader1']
+
+        release.set()
+
+        for thread in threads:
+            thread.join(5)
+
+        assert order == ['reader1', 'writer', 'reader2']
+        assert manager.metrics['waited'] == 2
+        assert manager.metrics['max_wait_seconds'] > 0.2
+
+    def test_cancel(self, manager):
+        token = CancellationToken()
+        threading.Timer(0.2, token.cancel).start()
+
+        with manager.lock(KEY, 'load_cfg'):
+            result = []
+
+            def wait():
+                try:
+                    with manager.lock(KEY, 'load_cfg', token=token):
+                        pass
+                except OperationCancelled as ex:
+                    result.append(ex)
+
+            start_thread(wait).join(5)
+
+        assert len(result) == 1
+
+    def test_processes(self, manager):
+        """Блокировка действует между процессами."""
+
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+        holder = subprocess.Popen([sys.executable, '-c', HOLDER_SCRIPT, manager.lock_dir, KEY],
+                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, env=env)
+
+        try:
+            assert holder.stdout.readline().strip() == 'locked'
+
+            with pytest.raises(InfobaseLockTimeout):
+                with manager.lock(KEY, 'dump_ib', timeout=0.2):
+                    pass
+        finally:
+            holder.communicate('', timeout=10)
+
+        with manager.lock(KEY, 'dump_ib', timeout=5):
+            pass
+
+class TestDesigner():
+    """Блокировка базы операциями конфигуратора."""
+
+    @pytest.mark.parametrize('operation, args, expected_max',
+        [('load_cfg', (r'D:\1.cf',), 1),
+         ('dump_ib', (r'D:\1.dt',), 2)])
+    def test_operations(self, manager, operation, args, expected_max):
+        """Изменения одной базы выполняются по очереди, выгрузки - одновременно."""
+
+        lock = threading.Lock()
+        running = [0, 0] # текущее, максимум
+
+        def run_attempts(params):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.2)
+            with lock:
+                running[0] -= 1
+            return True
+
+        designers = []
+
+        for user in ('user1', 'user2'):
+            designer = Designer(r'D:\base1')
+            designer.set_platform_params(r'D:\1cv8.exe')
+            designer.set_auth_params(user)
+            designer.set_ib_lock_params(manager)
+            designers.append(designer)
+
+        with patch('ones.RunInfobase._run_attempts', side_effect=run_attempts):
+            threads = [start_thread(lambda designer=designer: getattr(designer, operation)(*args))
+                       for designer in designers]
+
+            for thread in threads:
+                thread.join(5)
+
+        assert running[1] == expected_max
@@ -0,0 +1,132 @@
+"""Тесты модуля ibases"""
+
+import pytest
+from unittest.mock import patch
+
+from ibases import BaseList, BaseListFormatError, normalize_connect
+
+@pytest.fixture
+def base_list_text():
+    """Текст файла списка баз с комментарием и неизвестным параметром."""
+
+    return ('[base1]\r\n'
+            'Connect=File="D:\\Bases\\1\\";\r\n'
+            'ID=0A1B\r\n'
+            'UnknownKey=value1\r\n'
+            '; комментарий\r\n'
+            '\r\n'
+            '[base2]\r\n'
+            'Connect=Srvr="server1";Ref="Base2";\r\n'
+            'ID=0C2D\r\n')
+
+@pytest.fixture
+def base_list_file_name(tmp_path, base_list_text):
+    """Nмя файла списка баз."""
+
+    file = tmp_path / 'ibases.v8i'
+    file.write_bytes(base_list_text.encode('utf_8_sig'))
+
+    return str(file)
+
+class TestNormalizeConnect():
+    """Проверка функции normalize_connect."""
+
+    @pytest.mark.parametrize('connect, expected_value',
+        [('File="D:\\Bases\\1\\";', 'file=d:\\bases\\1'),
+         ("FILE='d:/bases/1';Usr='user1';Pwd='password1';", 'file=d:\\bases\\1'),
+         ('Srvr="Server1";Ref="Base2";', 'srvr=server1;ref=base2'),
+         ("Ref='base2';Srvr='server1';Locale=ru_RU;", 'srvr=server1;ref=base2')])
+    def test_success(self, connect, expected_value):
+        """Разные способы записи одной строки соединения."""
+
+        with patch('sys.platform', 'win32'):
+            assert normalize_connect(connect) == expected_value
+
+    def test_file_case(self):
+        """Регистр пути файловой базы учитывается вне Windows, регистр сервера и базы - нет."""
+
+        with patch('sys.platform', 'linux'):
+            assert normalize_connect('File="/srv/Base";') != normalize_connect('File="/srv/base";')
+            assert normalize_connect('Srvr="Server1";Ref="Base2";') == 'srvr=server1;ref=base2'
+
+        with patch('sys.platform', 'win32'):
+            assert normalize_connect('File="/srv/Base";') == normalize_connect('File="/srv/base";')
+
+class TestBaseList():
+    """Проверка класса BaseList."""
+
+    def test_round_trip(self, base_list_file_name, base_list_text):
+        """Файл без изменений записывается байт в байт."""
+
+        base_list = BaseList.read(base_list_file_name)
+
+        assert base_list.dumps() == base_list_text
+
+    def test_lookup(self, base_list_file_name):
+        """Поиск по имени, ID и строке соединения."""
+
+        base_list = BaseList.read(base_list_file_name)
+
+        assert base_list.get('base1').get('UnknownKey') == 'value1'
+        assert base_list.find_by_id('0c2d').name == 'base2'
+        assert base_list.find_by_connect("Srvr='SERVER1';Ref='base2';").name == 'base2'
+        assert base_list.get('base3') is None
+
+    def test_update(self, base_list_file_name):
+        """Изменение параметров с сохранением порядка и обновлением индексов."""
+
+        base_list = BaseList.read(base_list_file_name)
+        entry = base_list.get('base1')
+
+        assert base_list.update(entry, {'Connect': 'File="D:\\Bases\\3";', 'Version': '8.3.18'})
+        assert base_list.modified
+        assert base_list.find_by_connect('File="D:\\Bases\\1";') is None
+        assert base_list.find_by_connect("FILE='D:\\Bases\\3';") is entry
+        assert list(entry.items()) == [('Connect', 'File="D:\\Bases\\3";'),
+                                       ('ID', '0A1B'),
+                                       ('UnknownKey', 'value1'),
+                                       ('Version', '8.3.18')]
+
+        assert not base_list.update(entry, {'version': '8.3.18'})
+
+    def test_add_remove(self, base_list_file_name):
+        """Добавление и удаление баз с записью в файл."""
+
+        base_list = BaseList.read(base_list_file_name)
+        base_list.remove(base_list.get('base1'))
+        base_list.add('base3', {'Connect': 'File="D:\\3";', 'ID': '0E3F'})
+        base_list.write(base_list_file_name)
+
+        base_list = BaseList.read(base_list_file_name)
+
+        assert [entry.name for entry in base_list] == ['base2', 'base3']
+        assert base_list.find_by_id('0A1B') is None
+        assert base_list.find_by_id('0E3F').connect == 'File="D:\\3";'
+
+    def test_duplicates(self):
+        """Базы с одинаковыми именем, ID и строкой соединения находятся после удаления
+        и изменения одной из них, порядок одноименных баз сохраняется."""
+
+        base_list = BaseList()
+        entry1 = base_list.add('base', {'Connect': 'File="D:\\1";', 'ID': '0A1B'})
+        entry2 = base_list.add('base', {'Connect': 'File="D:\\1";', 'ID': '0A1B'})
+
+        base_list.update(entry1, {'Version': '8.3.18'})
+
+        assert base_list.get('base') is entry1
+
+        base_list.update(entry1, {'Connect': 'File="D:\\2";', 'ID': '0C2D'})
+
+        assert base_list.find_by_id('0a1b') is entry2
+        assert base_list.find_by_connect('File="D:\\1";') is entry2
+
+        base_list.remove(entry2)
+
+        assert base_list.find_by_id('0A1B') is None
+        assert base_list.find_by_connect('File="D:\\2";') is entry1
+
+    def test_format_error(self):
+        """Параметр вне секции базы."""
+
+        with pytest.raises(BaseListFormatError):
+            BaseList.parse(['Connect=File="D:\\1";'])
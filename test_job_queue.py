@@ -0,0 +1,147 @@
+"""Тесты модуля job_queue"""
+
+import pytest
+from unittest.mock import patch
+
+from ib_errors import ErrorKinds
+from job_queue import JobQueue, QueueStates, QueueWorker
+import ones
+from ones import Designer
+
+def load_cfg_spec(dir_):
+    """Задание загрузки конфигурации в файловую базу."""
+
+    return {'class': 'Designer',
+            'init': {'dir_': dir_},
+            'operation': 'load_cfg',
+            'args': {'file_name_cf': r'D:\1.cf'}}
+
+@pytest.fixture
+def queue(tmp_path):
+    """Пустая очередь заданий."""
+
+    return JobQueue(str(tmp_path / 'queue.db'), lease_seconds=60, retry_delay_seconds=0)
+
+class TestJobQueue():
+    """Проверка класса JobQueue."""
+
+    def test_priority(self, queue):
+        """Задания выдаются по приоритету, затем по порядку постановки."""
+
+        job_id1 = queue.put(load_cfg_spec(r'D:\1'))
+        job_id2 = queue.put(load_cfg_spec(r'D:\2'), priority=5)
+        job_id3 = queue.put(load_cfg_spec(r'D:\3'))
+
+        assert [queue.take('w').id for _ in range(3)] == [job_id2, job_id1, job_id3]
+        assert queue.take('w') is None
+
+    def test_same_infobase(self, queue):
+        """Пока по базе выполняется задание, другое задание этой базы не выдается."""
+
+        queue.put(load_cfg_spec(r'D:\1'))
+        queue.put(load_cfg_spec('d:/1/'))
+
+        job = queue.take('w1')
+
+        assert queue.take('w2') is None
+
+        queue.complete(job, True)
+
+        assert queue.take('w2') is not None
+
+    def test_lease_expired(self, tmp_path):
+        """Задание упавшего исполнителя снова выдается после истечения аренды."""
+
+        queue = JobQueue(str(tmp_path / 'queue.db'), lease_seconds=-1)
+        job_id = queue.put(load_cfg_spec(r'D:\1'))
+
+        queue.take('w1')
+        job = queue.take('w2')
+
+        assert job.id == job_id
+        assert job.attempts == 2
+
+    def test_retry(self, queue):
+        """Неуспешное задание повторяется, пока не исчерпаны попытки."""
+
+        job_id = queue.put(load_cfg_spec(r'D:\1'), max_attempts=2)
+
+        queue.complete(queue.take('w'), False)
+        assert queue.status(job_id)['state'] == QueueStates.QUEUED
+
+        queue.fail(queue.take('w'), 'error1')
+        assert queue.status(job_id)['state'] == QueueStates.FAILED
+        assert queue.status(job_id)['error'] == 'error1'
+
+    def test_permanent(self, queue):
+        """Постоянная ошибка не повторяется, даже если попытки не исчерпаны."""
+
+        job_id = queue.put(load_cfg_spec(r'D:\1'), max_attempts=3)
+
+        queue.complete(queue.take('w'), False, ErrorKinds.PERMANENT)
+
+        assert queue.status(job_id)['state'] == QueueStates.FAILED
+        assert queue.status(job_id)['attempts'] == 1
+
+    def test_release(self, queue):
+        """Возврат задания без расходования попытки."""
+
+        job_id = queue.put(load_cfg_spec(r'D:\1'))
+
+        queue.release(queue.take('w'))
+
+        assert queue.status(job_id)['attempts'] == 0
+        assert queue.take('w').id == job_id
+
+class TestQueueWorker():
+    """Проверка класса QueueWorker."""
+
+    def test_run_once(self, queue):
+        """Выполнение задания, поставленного по объекту Designer."""
+
+        designer = Designer(dir_=r'D:\1')
+        job_id = queue.put_runner(designer, 'load_cfg', file_name_cf=r'D:\1.cf')
+
+        with patch('ones.RunInfobase._execute_command') as mock:
+            mock.return_value = True
+
+            assert QueueWorker(queue, 'w').run_once()
+            assert not QueueWorker(queue, 'w').run_once()
+
+        assert queue.status(job_id)['state'] == QueueStates.SUCCEEDED
+        assert queue.counts() == {QueueStates.SUCCEEDED: 1}
+
+    def test_busy(self, queue, tmp_path):
+        """Задание по занятой базе возвращается в очередь без расходования попытки."""
+
+        designer = Designer(dir_=str(tmp_path))
+        designer.set_preflight_params(check=True)
+        job_id = queue.put_runner(designer, 'load_cfg', file_name_cf=r'D:\1.cf')
+
+        with patch('ones.probe_file_infobase') as mock_probe, \
+             patch('ones.RunInfobase._subprocess_run') as mock:
+            mock_probe.return_value = (True, '')
+
+            assert QueueWorker(queue, 'w', busy_delay_seconds=60).run_once()
+            assert not QueueWorker(queue, 'w').run_once()
+            assert not mock.called
+
+        status = queue.status(job_id)
+
+        assert status['state'] == QueueStates.QUEUED
+        assert status['attempts'] == 0
+
+    def test_permanent(self, queue):
+        """Исполнитель передает очереди вид ошибки операции."""
+
+        job_id = queue.put(load_cfg_spec(r'D:\1'))
+
+        def execute_command(runner, params):
+            runner.last_error_kind = ErrorKinds.PERMANENT
+            return False
+
+        with patch.object(ones.RunInfobase, '_execute_command', autospec=True,
+                          side_effect=execute_command):
+            assert QueueWorker(queue, 'w').run_once()
+
+        assert queue.status(job_id)['state'] == QueueStates.FAILED
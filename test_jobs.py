@@ -0,0 +1,75 @@
+"""Тесты модуля jobs"""
+
+import json
+import pytest
+from unittest.mock import patch
+
+import jobs
+from ones import ConfigDumpFormats, CreationInfobase, DBServerTypes, Designer
+
+class TestJobFromRunner():
+    """Проверка функций job_from_runner и create_runner."""
+
+    def test_round_trip(self):
+        """Объект, восстановленный из задания, формирует те же параметры запуска."""
+
+        # setUp
+        designer = Designer(dir_=r'D:\R')
+        designer.set_platform_params(r'D:\1cv8.exe', '8.3.18.1363')
+        designer.set_auth_params(user='user1', password='password1')
+        designer.set_repo_params(dir_=r'D:\repo', user='repo_user1')
+        designer.set_update_db_cfg_params(update_db_cfg=True)
+
+        # test
+        spec = json.loads(json.dumps(jobs.job_from_runner(designer, 'dump_config_to_files',
+                                                          dir_=r'D:\dump',
+                                                          format_=ConfigDumpFormats.PLAIN)))
+
+        runner = jobs.create_runner(spec)
+
+        assert runner._common_run_parameters() == designer._common_run_parameters()
+        assert runner._update_db_cfg_params == designer._update_db_cfg_params
+
+        with patch('ones.RunInfobase._execute_command') as mock:
+            mock.return_value = True
+
+            assert jobs.run_job(spec)
+            assert '-Format Plain' in mock.call_args.args[0]
+
+    def test_creation_infobase(self):
+        """Параметры серверной базы с перечислениями."""
+
+        creation_infobase = CreationInfobase(server='server1', infobase='base1')
+        creation_infobase.set_server_db_params(db_server_type=DBServerTypes.POSTGRE_SQL,
+                                               db_server_name='db1', database='base1')
+
+        spec = json.loads(json.dumps(jobs.job_from_runner(creation_infobase, 'create_base')))
+
+        runner = jobs.create_runner(spec)
+
+        assert runner._ib_connection_string() == creation_infobase._ib_connection_string()
+
+    def test_wrong_operation(self):
+        """Неразрешенная операция."""
+
+        with pytest.raises(jobs.JobSpecError):
+            jobs.create_runner({'class': 'Designer', 'operation': '_execute_command'})
+
+    def test_wrong_setter(self):
+        """Неразрешенный установщик параметров."""
+
+        with pytest.raises(jobs.JobSpecError):
+            jobs.create_runner({'class': 'Designer', 'operation': 'load_cfg',
+                                'settings': {'_subprocess_run': {}}})
+
+    @pytest.mark.parametrize('spec_part', [
+        {'init': {'bogus': 1}},
+        {'init': 'text'},
+        {'settings': []},
+        {'settings': {'set_platform_params': 'text'}},
+        {'settings': {'set_platform_params': {'bogus': 1}}}])
+    def test_malformed_spec(self, spec_part):
+        """Неверные init и settings приводят к JobSpecError."""
+
+        with pytest.raises(jobs.JobSpecError):
+            jobs.create_runner({'class': 'Designer', 'operation': 'load_cfg', **spec_part})
@@ -0,0 +1,139 @@
+"""Тесты модуля load_test"""
+
+import errno
+import json
+import stat
+import sys
+import threading
+import pytest
+from unittest.mock import patch
+
+import cancellation
+from admission import AdmissionController
+from cancellation import CancellationToken, OperationCancelled
+from load_test import LoadTest
+from ones import Enterprise
+
+# Клиент-заглушка: параметр /C задает время работы и код возврата, например '/C 0.1 3'
+FAKE_CLIENT = f'''#!{sys.executable}
+import sys, time
+
+for param in sys.argv[1:]:
+    if param.startswith('/C '):
+        seconds, code = param[3:].split()
+        time.sleep(float(seconds))
+        sys.exit(int(code))
+'''
+
+@pytest.fixture
+def enterprise(tmp_path):
+    """Объект запуска с клиентом-заглушкой."""
+
+    if sys.platform == 'win32':
+        pytest.skip('Клиент-заглушка запускается как скрипт POSIX')
+
+    exename = tmp_path / 'fake_1cv8'
+    exename.write_text(FAKE_CLIENT)
+    exename.chmod(exename.stat().st_mode | stat.S_IEXEC)
+
+    enterprise = Enterprise(dir_=str(tmp_path / 'base'))
+    enterprise.set_platform_params(str(exename))
+
+    return enterprise
+
+class TestLoadTest():
+    """Проверка класса LoadTest."""
+
+    def test_success(self, enterprise, tmp_path):
+        """Все клиенты запускаются по профилю, коды возврата и длительности попадают в отчет."""
+
+        test = LoadTest(enterprise, clients=4, ramp_up_seconds=0.3,
+                        launch_params=['0.1 0', '0.1 3'], log_file_prefix=str(tmp_path / 'client'))
+
+        report = test.run()
+
+        assert report['started'] == 4
+        assert report['succeeded'] == 2
+        assert report['failed'] == 2
+        assert report['exit_codes'] == {'0': 2, '3': 2}
+        assert report['duration']['count'] == 4
+        assert report['duration']['min'] >= 0.1
+        assert [detail['scheduled'] for detail in report['details']] == pytest.approx([0, 0.075, 0.15, 0.225])
+        assert len({detail['log_file_name'] for detail in report['details']}) == 4
+
+        report_file_name = str(tmp_path / 'report.json')
+        test.write_report(report_file_name)
+
+        with open(report_file_name, encoding='utf-8') as file:
+            assert json.load(file)['started'] == 4
+
+    def test_max_parallel(self, enterprise):
+        """Одновременно работает не больше max_parallel клиентов."""
+
+        test = LoadTest(enterprise, clients=4, launch_params=['0.2 0'], max_parallel=2)
+
+        report = test.run()
+
+        assert report['succeeded'] == 4
+        assert report['peak_running'] == 2
+        assert report['start_latency']['max'] >= 0.2
+
+    def test_admission_delay(self, enterprise):
+        """Ожидание допуска учитывается как ожидание в очереди, а не как длительность работы."""
+
+        enterprise.set_admission_params(AdmissionController(slots=1, poll_seconds=0.05,
+                                                            memory_probe=lambda: None))
+        test = LoadTest(enterprise, clients=2, launch_params=['0.5 0'])
+
+        report = test.run()
+
+        assert report['succeeded'] == 2
+        assert report['queue_delay']['max'] >= 0.45
+        assert report['start_latency']['max'] >= 0.45
+        assert report['duration']['max'] < 0.9
+
+    def test_hold(self, enterprise):
+        """Клиенты, работающие после удержания, останавливаются."""
+
+        test = LoadTest(enterprise, clients=2, hold_seconds=0.3, launch_params=['30 0'])
+
+        report = test.run()
+
+        assert report['terminated'] == 2
+        assert report['duration']['count'] == 0
+
+    def test_process_limit(self, enterprise):
+        """При нехватке ресурсов ОС ограничение снижается, а запуск повторяется."""
+
+        start_process = cancellation.start_process
+        calls = []
+
+        def fake_start_process(params):
+            calls.append(1)
+
+            if len(calls) == 2:
+                raise OSError(errno.EAGAIN, 'Resource temporarily unavailable')
+
+            return start_process(params)
+
+        test = LoadTest(enterprise, clients=2, launch_params=['0.2 0'])
+
+        with patch('cancellation.start_process', side_effect=fake_start_process), \
+             patch('load_test.START_RETRY_SECONDS', 0.1):
+            report = test.run()
+
+        assert report['succeeded'] == 2
+        assert test.parallel_limit == 2 # ограничение вернулось после завершения клиентов
+        assert len(calls) == 3
+
+    def test_cancel(self, enterprise):
+        """Отмена теста завершает работающих клиентов."""
+
+        token = CancellationToken()
+        test = LoadTest(enterprise, clients=2, launch_params=['30 0'])
+        threading.Timer(0.3, token.cancel).start()
+
+        with pytest.raises(OperationCancelled):
+            test.run(token)
+
+        assert all(result.terminated for result in test.results)
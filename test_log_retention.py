@@ -0,0 +1,88 @@
+"""Тесты модуля log_retention"""
+
+import gzip
+import os
+import time
+import pytest
+
+from log_retention import LogRetention, SECONDS_IN_DAY
+import logger_
+
+def create_log(log_dir, name, age_days, size=100):
+    """Создает файл лога заданного возраста."""
+
+    file = log_dir / name
+    file.write_bytes(b'a' * size)
+
+    mtime = time.time() - age_days * SECONDS_IN_DAY
+    os.utime(file, (mtime, mtime))
+
+    return file
+
+class TestLogRetention():
+    """Проверка класса LogRetention."""
+
+    def test_compress_and_delete(self, tmp_path):
+        """Старые файлы сжимаются, очень старые удаляются, прочие не трогаются."""
+
+        create_log(tmp_path, 'new.IB1.log', 0)
+        create_log(tmp_path, 'old.IB1.log', 2)
+        create_log(tmp_path, 'ancient.log', 40)
+        create_log(tmp_path, 'other.txt', 40)
+
+        stats = LogRetention(str(tmp_path), compress_after_days=1, delete_after_days=30).run_once()
+
+        assert sorted(os.listdir(tmp_path)) == ['new.IB1.log', 'old.IB1.log.gz', 'other.txt']
+        assert gzip.decompress((tmp_path / 'old.IB1.log.gz').read_bytes()) == b'a' * 100
+        assert stats['compressed'] == 1
+        assert stats['deleted'] == 1
+
+    def test_total_size(self, tmp_path):
+        """При превышении общего размера удаляются самые старые файлы."""
+
+        create_log(tmp_path, '1.log', 3)
+        create_log(tmp_path, '2.log', 2)
+        create_log(tmp_path, '3.log', 1)
+
+        stats = LogRetention(str(tmp_path), compress_after_days=None, delete_after_days=None,
+                             max_total_bytes=250).run_once()
+
+        assert sorted(os.listdir(tmp_path)) == ['2.log', '3.log']
+        assert stats['total_bytes'] == 200
+
+    def test_in_use(self, tmp_path):
+        """Файл лога текущего процесса и недавно измененный файл не сжимаются и не удаляются."""
+
+        active_file = create_log(tmp_path, 'script.log', 2)
+        create_log(tmp_path, 'writing.log', 0)
+        handler = logger_._get_file_handler(str(active_file))
+        log = logger_.logger()
+        log.addHandler(handler)
+
+        try:
+            os.utime(active_file, (time.time() - 2 * SECONDS_IN_DAY,) * 2)
+
+            stats = LogRetention(str(tmp_path), compress_after_days=1, max_total_bytes=0).run_once()
+
+        finally:
+            log.removeHandler(handler)
+            handler.close()
+
+        assert sorted(os.listdir(tmp_path)) == ['script.log', 'writing.log']
+        assert stats['total_bytes'] == 200
+
+    def test_background(self, tmp_path):
+        """Фоновый поток выполняет обработку и останавливается."""
+
+        create_log(tmp_path, 'ancient.log', 40)
+
+        retention = LogRetention(str(tmp_path), interval_seconds=0.05)
+        retention.start()
+
+        deadline = time.monotonic() + 5
+        while os.listdir(tmp_path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        retention.stop(timeout=5)
+
+        assert not os.listdir(tmp_path)
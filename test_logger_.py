@@ -1,6 +1,8 @@
 """Тесты модуля logger_"""
 
 from logging import DEBUG, StreamHandler, FileHandler
+from logging.handlers import QueueHandler
+import multiprocessing
 import pytest
 
 from logger_ import init_logger, Logger
@@ -110,8 +112,131 @@ class TestLogFunc():
 
             assert logs.records[1].msg[-msg_len:] == msg_log_end
 
+    def test_current_operation(self):
+        """Nмя операции доступно внутри функции и сбрасывается после нее."""
+
+        assert self.for_test_current_operation() == 'for_test_current_operation'
+        assert logger_.current_operation() == ''
+
+    def test_duration_listener(self):
+        """Подписчик получает имя, аргументы, длительность, результат и исключение."""
+
+        calls = []
+
+        def listener(name, args, seconds, result, error):
+            calls.append((name, args[1:], seconds >= 0, result, type(error)))
+
+        logger_.add_duration_listener(listener)
+
+        try:
+            self.for_test_log_func(False)
+
+            with pytest.raises(RuntimeError):
+                self.for_test_raise()
+        finally:
+            logger_.remove_duration_listener(listener)
+
+        self.for_test_log_func(True)
+
+        assert calls == [('for_test_log_func', (False,), True, False, type(None)),
+                         ('for_test_raise', (), True, None, RuntimeError)]
+
     @logger_.log_func
     def for_test_log_func(self, func_result=None):
         """"Вызываемая функция при тестировании"""
 
         return func_result
+
+    @logger_.log_func
+    def for_test_raise(self):
+        """"Вызываемая функция с исключением"""
+
+        raise RuntimeError('ошибка')
+
+    @logger_.log_func
+    def for_test_current_operation(self):
+        """"Возвращает имя текущей операции"""
+
+        return logger_.current_operation()
+
+def log_from_worker(queue, message):
+    """Запись лога из дочернего процесса."""
+
+    logger_.init_worker_logger(queue)
+
+    with logger_.job_context('job2'):
+        logger_.logger().info(message)
+
+class TestQueueLogger():
+    """"Проверка логирования через очередь."""
+
+    def test_success(self, tmp_path):
+        """Записи из основного и дочернего процессов попадают в общий файл и файлы заданий."""
+
+        log_file = tmp_path / 'script.log'
+        job_log_dir = tmp_path / 'jobs'
+        job_log_dir.mkdir()
+
+        logger_.init_queue_logger(str(log_file), str(job_log_dir))
+
+        try:
+            log = logger_.logger()
+            log.info('main1')
+
+            with logger_.job_context('job1'):
+                log.info('job1 message')
+
+            process = multiprocessing.Process(
+                target=log_from_worker, args=(logger_.log_queue(), 'worker message'))
+            process.start()
+            process.join(30)
+
+        finally:
+            logger_.shutdown_logger()
+
+        content = log_file.read_text(encoding='utf-8')
+
+        assert 'main1' in content
+        assert 'job1 message' in content
+        assert 'worker message' in content
+        assert 'job1 message' in (job_log_dir / 'job1.log').read_text(encoding='utf-8')
+        assert 'worker message' in (job_log_dir / 'job2.log').read_text(encoding='utf-8')
+        assert not any(isinstance(handler, QueueHandler) for handler in log.handlers)
+
+    def test_job_files_lru(self, tmp_path):
+        """Открытыми остаются файлы последних заданий, закрытый файл дописывается."""
+
+        handler = logger_._JobFileHandler(str(tmp_path), max_open_files=2)
+
+        try:
+            for job_id in ('job1', 'job2', 'job3', 'job1'):
+                record = logger_.logger().makeRecord('test', DEBUG, __file__, 0, job_id, (), None)
+                record.job_id = job_id
+                handler.handle(record)
+
+            assert list(handler._files) == ['job3', 'job1']
+
+        finally:
+            handler.close()
+
+        assert (tmp_path / 'job1.log').read_text(encoding='utf-8').count('job1') == 2
+
+    def test_flush_on_exception(self, tmp_path):
+        """Стэк исключения записан в файл сразу после handle_and_log_exceptions."""
+
+        log_file = tmp_path / 'script.log'
+        logger_.init_queue_logger(str(log_file))
+
+        try:
+            self.for_exception()
+
+            assert 'ZeroDivisionError' in log_file.read_text(encoding='utf-8')
+
+        finally:
+            logger_.shutdown_logger()
+
+    @logger_.handle_and_log_exceptions
+    def for_exception(self):
+        """Для проверки исключений"""
+
+        return 1 / 0
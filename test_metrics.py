@@ -0,0 +1,34 @@
+"""Тесты модуля metrics"""
+
+import pytest
+
+from metrics import percentile, summarize
+
+class TestPercentile():
+    """Проверка функции percentile."""
+
+    @pytest.mark.parametrize('percent, expected_value', [(0, 1), (50, 3), (100, 5), (25, 2), (90, 4.6)])
+    def test_success(self, percent, expected_value):
+        """Процентили с интерполяцией."""
+
+        assert percentile([5, 1, 4, 2, 3], percent) == pytest.approx(expected_value)
+
+    def test_empty(self):
+        """Нет значений."""
+
+        assert percentile([], 50) is None
+
+class TestSummarize():
+    """Проверка функции summarize."""
+
+    def test_success(self):
+        """Сводка по значениям."""
+
+        actual_value = summarize([3, 1, 2], percents=(50,))
+
+        assert actual_value == {'count': 3, 'min': 1, 'max': 3, 'mean': 2, 'p50': 2}
+
+    def test_empty(self):
+        """Сводка без значений."""
+
+        assert summarize([])['p95'] is None
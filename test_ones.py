@@ -2,14 +2,18 @@
 
 from collections import namedtuple
 from configparser import ConfigParser
+import os
 import pytest
 from testfixtures import LogCapture
 from unittest.mock import patch
 
 import  ones
 from ones import CreationInfobase, Designer, Enterprise, GenInfobaseLogFileName
-from ones import set_base_parameters_in_list_file, SupportRules, SQLYearOffsets
+from ones import set_base_parameters_in_list_file, set_bases_parameters_in_list_file
+from ones import SupportRules, SQLYearOffsets
 from ones import FileDBFormats, DBServerTypes, ConfigDumpFormats
+from ib_errors import RetryPolicy
+from ibases import BaseList
 
 @pytest.fixture
 def filebase_dir():
@@ -101,6 +105,21 @@ class TestAnotherFileName():
         assert file_name1 == f'{prefix}1.log'
         assert file_name2 == f'{prefix}2.log'
 
+    def test_unique(self, tmp_path):
+        """Генераторы с одним префиксом, как в разных процессах, не выдают одинаковых имен."""
+
+        prefix = str(tmp_path / 'R')
+
+        gen_ib_log_file_name1 = GenInfobaseLogFileName(prefix, reserve=True)
+        gen_ib_log_file_name2 = GenInfobaseLogFileName(prefix, reserve=True)
+
+        file_names = [gen_ib_log_file_name1.another_file_name(),
+                      gen_ib_log_file_name2.another_file_name(),
+                      gen_ib_log_file_name1.another_file_name()]
+
+        assert file_names == [f'{prefix}1.log', f'{prefix}2.log', f'{prefix}3.log']
+        assert all(os.path.exists(file_name) for file_name in file_names)
+
 
 class TestIbConnectionStringDesigner():
     """Проверка функции Designer._ib_connection_string"""
@@ -148,6 +167,20 @@ class TestIbConnectionStringDesigner():
 
         assert actual_value == expected_value
 
+class TestInfobaseKey():
+    """Проверка функции RunInfobase._infobase_key"""
+
+    def test_without_credentials(self, serverbase_addr, auth_params):
+        """Учетные данные не влияют на ключ базы."""
+
+        designer = Designer(server = serverbase_addr.server, infobase = serverbase_addr.infobase)
+        enterprise = Enterprise(server = serverbase_addr.server.upper(),
+                                infobase = serverbase_addr.infobase)
+        enterprise.set_auth_params(user = auth_params.user, password = auth_params.password)
+
+        assert designer._infobase_key() == enterprise._infobase_key()
+        assert auth_params.user not in enterprise._infobase_key()
+
 class TestIbConnectionStringCreationInfobase():
     """Проверка функции CreationInfobase._ib_connection_string"""
 
@@ -288,6 +321,29 @@ class TestLog1sExecutionError():
 
         assert logs.records[0].msg == msg
 
+    def test_tail(self, tmp_path):
+        """Читается только дописанное текущим запуском и не более IB_LOG_TAIL_BYTES."""
+
+        # setUp
+        old_content = 'старое' * 100
+        new_content = 'ф' * ones.IB_LOG_TAIL_BYTES
+
+        ib_log_file = tmp_path / 'file1.log'
+        ib_log_file.write_text(old_content, 'utf_8_sig')
+        start_offset = ib_log_file.stat().st_size
+
+        with open(ib_log_file, 'a', encoding='utf_8') as file:
+            file.write(new_content)
+
+        designer_ = Designer()
+
+        # test
+        with LogCapture() as logs:
+            content_file_log = designer_._log_1s_execution_error(1, str(ib_log_file), start_offset)
+
+        assert content_file_log == '...' + 'ф' * (ones.IB_LOG_TAIL_BYTES // 2)
+        assert 'старое' not in logs.records[0].msg
+
 
 class TestWriteBaseListFile():
     """Проверка функции _write_base_list_file"""
@@ -298,41 +354,36 @@ class TestWriteBaseListFile():
         """Проверка успешного выполнения"""
 
         # Записали, проверили что факт записи успешен
-        config = ConfigParser()
-        config.read(empty_base_list_file_name, __class__.encoding)
+        base_list = BaseList.read(empty_base_list_file_name)
         base_name =  'base1'
         additional_parameters = '/C 1'
         version_ = '8.1'
 
-        func_result = ones._write_base_list_file(config,
-                                                                empty_base_list_file_name,
-                                                                base_name,
-                                                                additional_parameters,
-                                                                version_)
+        base_list.update(base_list.get(base_name), {'AdditionalParameters': additional_parameters,
+                                                    'Version': version_})
+
+        func_result = ones._write_base_list_file(base_list, empty_base_list_file_name)
 
         assert func_result
 
         # Прочитали записанное, проверили, что записалось то что нужно
+        config = ConfigParser()
         config.read(empty_base_list_file_name, __class__.encoding)
 
         assert config[base_name]['AdditionalParameters'] == additional_parameters
         assert config[base_name]['Version'] == version_
 
-    def test_error(self, empty_base_list_file_name):
+    def test_error(self, tmp_path):
         """Проверка неуспешного выполнения.
-        Попытка записи файла без инициализации структуры конфига.
+        Попытка записи файла в несуществующий каталог.
         """
 
-        config = ConfigParser()
+        file_name = str(tmp_path / 'nonexistent_dir' / 'ibases.v8i')
 
         with LogCapture() as logs:
-            func_result = ones._write_base_list_file(config,
-                                                                    empty_base_list_file_name,
-                                                                    base_name_in_the_list = 'a',
-                                                                    additional_parameters = 'b',
-                                                                    platform_version = 'c')
+            func_result = ones._write_base_list_file(BaseList(), file_name)
 
-        msg = f'Не удалось записать файл {empty_base_list_file_name}'
+        msg = f'Не удалось записать файл {file_name}'
         msg_len = len(msg)
 
         assert not func_result
@@ -343,29 +394,25 @@ class TestReadBaseListFile():
 
     def test_success(self, empty_base_list_file_name):
         """Проверка успешного выполнения.
-        Проверка, что файл прочитался как ini.
+        Проверка, что файл прочитался как список баз.
         """
 
-        config = ConfigParser()
-        func_result = ones._read_base_list_file(config, empty_base_list_file_name)
+        base_list = ones._read_base_list_file(empty_base_list_file_name)
 
-        assert func_result
-        assert config.sections()[0] == 'base1'
+        assert [entry.name for entry in base_list] == ['base1']
 
     def test_error(self, name_nonini_file):
         """Проверка неуспешного выполнения.
         Попытка чтения файла неверного формата.
         """
 
-        config = ConfigParser()
-
         with LogCapture() as logs:
-            func_result = ones._read_base_list_file(config, name_nonini_file)
+            base_list = ones._read_base_list_file(name_nonini_file)
 
         msg = f'Не удалось прочитать файл {name_nonini_file}'
         msg_len = len(msg)
 
-        assert not func_result
+        assert base_list is None
         assert logs.records[0].msg[:msg_len] == msg
 
 
@@ -409,6 +456,82 @@ class TestSetBaseParametersInListFile():
 
         assert not func_result
 
+class TestSetBasesParametersInListFile():
+    """Проверка функции set_bases_parameters_in_list_file"""
+
+    encoding = 'utf_8_sig'
+
+    @pytest.fixture
+    def base_list_file_name(self, tmp_path):
+        """Nмя файла списка баз с двумя базами"""
+
+        file = tmp_path / 'ibases.v8i'
+        file.write_text('[base1]\nConnect=File="D:\\1";\nVersion=\n\n'
+                        '[base2]\nConnect=File="D:\\2";\nVersion=\n',
+                        encoding=__class__.encoding)
+
+        return str(file)
+
+    def test_success(self, base_list_file_name):
+        """Проверка изменения нескольких баз за один вызов"""
+
+        func_result = set_bases_parameters_in_list_file(base_list_file_name,
+            {'base1': {'Version': '8.3.18', 'AdditionalParameters': '/C 1'},
+             'base2': {'Version': '8.3.19'}})
+
+        assert func_result
+
+        config = ConfigParser()
+        config.optionxform = str
+        config.read(base_list_file_name, __class__.encoding)
+
+        assert config['base1']['Version'] == '8.3.18'
+        assert config['base1']['AdditionalParameters'] == '/C 1'
+        assert config['base1']['Connect'] == 'File="D:\\1";'
+        assert config['base2']['Version'] == '8.3.19'
+
+    def test_by_connect(self, base_list_file_name):
+        """Поиск базы по строке соединения"""
+
+        func_result = set_bases_parameters_in_list_file(base_list_file_name,
+            {"FILE='d:/2';Usr='user1';": {'Version': '8.3.18'}},
+            by_connect = True)
+
+        config = ConfigParser()
+        config.read(base_list_file_name, __class__.encoding)
+
+        assert func_result
+        assert config['base2']['Version'] == '8.3.18'
+        assert config['base1']['Version'] == ''
+
+    def test_not_changed(self, base_list_file_name):
+        """Файл не перезаписывается, если значения не изменились"""
+
+        with patch('ones._write_base_list_file') as mock:
+            func_result = set_bases_parameters_in_list_file(base_list_file_name,
+                                                            {'base1': {'Version': ''}})
+
+            assert func_result
+            assert not mock.called
+
+    def test_missing_base(self, base_list_file_name):
+        """Если одной из баз нет в списке, файл не изменяется"""
+
+        with open(base_list_file_name, encoding=__class__.encoding) as file:
+            content_before = file.read()
+
+        with LogCapture() as logs:
+            func_result = set_bases_parameters_in_list_file(base_list_file_name,
+                {'base1': {'Version': '8.3.18'},
+                 'base3': {'Version': '8.3.18'}})
+
+        with open(base_list_file_name, encoding=__class__.encoding) as file:
+            content_after = file.read()
+
+        assert not func_result
+        assert content_before == content_after
+        assert 'base3' in logs.records[-2].msg
+
 class TestCommonRunParametersRunInfobase():
     """Проверка функции RunInfobase._common_run_parameters"""
 
@@ -542,6 +665,27 @@ class TestCommonRunParametersEnterprise():
 
         assert actual_value == expected_value
 
+    def test_execute(self, filebase_dir):
+        """С внешней обработкой"""
+
+        # setUp
+        enterprise = Enterprise(dir_=filebase_dir)
+
+        enterprise.set_dialogs_settings(disable_startup_messages = False,
+                                        disable_startup_dialogs = False)
+
+        enterprise.set_other_params(launch_param = 'W', execute = r'D:\1.epf')
+
+        expected_value = ["ENTERPRISE",
+                        f"/IBConnectionString FILE='{filebase_dir}';",
+                        r"/Execute D:\1.epf",
+                        "/C W"]
+
+        # test
+        actual_value = enterprise._common_run_parameters()
+
+        assert actual_value == expected_value
+
 class TestCommonRunParametersDesigner():
     """Проверка функции Designer._common_run_parameters"""
 
@@ -609,6 +753,30 @@ class TestLoadCfg():
             assert actual_result == expected_result
             assert mock.call_args.args[0] == expected_params
 
+class TestDumpRestoreIb():
+    """Проверка функций Designer.dump_ib и Designer.restore_ib."""
+
+    @pytest.mark.parametrize('method, command', [('dump_ib', '/DumpIB'), ('restore_ib', '/RestoreIB')])
+    def test_all(self, filebase_dir, method, command):
+        """Проверка корректности формируемых параметров."""
+
+        # setUp
+        file_name_dt = r'D:\1.dt'
+
+        designer = Designer(dir_=filebase_dir)
+        designer.set_dialogs_settings(disable_startup_dialogs=False, disable_startup_messages=False)
+
+        expected_params = ["DESIGNER",
+                          f"/IBConnectionString FILE='{filebase_dir}';",
+                          f"{command} {file_name_dt}"]
+
+        # test
+        with patch('ones.RunInfobase._execute_command') as mock:
+            mock.return_value = True
+
+            assert getattr(designer, method)(file_name_dt)
+            assert mock.call_args.args[0] == expected_params
+
 class TestDumpConfigToFiles():
     """Проверка функции Designer.dump_config_to_files."""
 
@@ -732,6 +900,18 @@ class TestRunEnterprise():
 
             assert actual_result == expected_result
 
+    def test_command_line(self, filebase_dir):
+        """Командная строка клиента без запуска."""
+
+        enterprise = Enterprise(dir_=filebase_dir)
+        enterprise.set_platform_params(r'D:\1cv8.exe')
+        enterprise.set_other_params(launch_param='W')
+
+        actual_value = enterprise.command_line()
+
+        assert actual_value[0] == r'D:\1cv8.exe'
+        assert actual_value[1:] == enterprise._common_run_parameters()
+
 class TestUpdateFromRepo():
     """Проверка функции Designer.update_from_repo."""
 
@@ -958,3 +1138,93 @@ class TestExecuteCommand():
             actual_result = run_infobase._execute_command(params=[])
 
             assert actual_result == expected_result
+
+    def test_retry(self):
+        """Повтор при временной ошибке."""
+
+        # setUp
+        run_infobase = ones.RunInfobase()
+        run_infobase.set_retry_params(RetryPolicy(max_attempts=3))
+
+        # test
+        with patch('ones.RunInfobase._subprocess_run') as mock, \
+             patch('ones.RunInfobase._log_1s_execution_error') as mock_log, \
+             patch('ones.time.sleep') as mock_sleep:
+            mock.side_effect = [1, 1, 0]
+            mock_log.return_value = 'База заблокирована'
+
+            actual_result = run_infobase._execute_command(params=[])
+
+        assert actual_result
+        assert run_infobase.last_attempts == 3
+        assert mock_sleep.call_count == 2
+
+    def test_no_retry_permanent(self):
+        """Постоянная ошибка не повторяется."""
+
+        # setUp
+        run_infobase = ones.RunInfobase()
+        run_infobase.set_retry_params(RetryPolicy(max_attempts=3))
+
+        # test
+        with patch('ones.RunInfobase._subprocess_run') as mock, \
+             patch('ones.RunInfobase._log_1s_execution_error') as mock_log:
+            mock.return_value = 1
+            mock_log.return_value = 'Идентификация пользователя не выполнена'
+
+            actual_result = run_infobase._execute_command(params=[])
+
+        assert not actual_result
+        assert run_infobase.last_attempts == 1
+
+class TestPreflight():
+    """Проверка функции RunInfobase._preflight."""
+
+    def test_file_base_busy(self, tmp_path):
+        """Занятая файловая база: 1С не запускается."""
+
+        # setUp
+        designer = Designer(dir_=str(tmp_path))
+        designer.set_preflight_params(check=True)
+
+        # test
+        with patch('ones.probe_file_infobase') as mock_probe, \
+             patch('ones.RunInfobase._subprocess_run') as mock:
+            mock_probe.return_value = (True, 'PID 1 (1cv8)')
+
+            assert not designer._execute_command([])
+            assert not mock.called
+            assert mock_probe.call_args.args == (str(tmp_path), True)
+
+            designer.set_preflight_params(check=True, on_busy=ones.BusyActions.RAISE)
+
+            with pytest.raises(ones.InfobaseBusy, match='PID 1'):
+                designer._execute_command([])
+
+            designer.set_preflight_params(check=False)
+            mock.return_value = 0
+
+            assert designer._execute_command([])
+
+    def test_server_base(self):
+        """Серверная база проверяется функцией запроса сеансов."""
+
+        # setUp
+        calls = []
+
+        def session_query(runner, exclusive):
+            calls.append(exclusive)
+            return ['user1 (Designer, host1)'] if exclusive else []
+
+        designer = Designer(server='server1', infobase='base1')
+        designer.set_preflight_params(check=True, session_query=session_query)
+        enterprise = Enterprise(server='server1', infobase='base1')
+        enterprise.set_preflight_params(check=True, session_query=session_query)
+
+        # test
+        with patch('ones.RunInfobase._subprocess_run') as mock:
+            mock.return_value = 0
+
+            assert not designer._execute_command([])
+            assert enterprise._execute_command([])
+            assert calls == [True, False]
@@ -1,9 +1,13 @@
 """Тесты модуля params"""
 
 import configparser
+import os
+import time
+from unittest.mock import patch
 import pytest
 
 from params import Params, WrongParametersFileVersion, CouldNotReadParametersFile
+from params import invalidate_params_cache
 
 @pytest.fixture
 def ini_file_name(tmp_path, log_dir, ini_version1):
@@ -91,3 +95,75 @@ class TestParams():
             Params(ini_file_name = name_nonexistent_file,
                 script_full_file_name = r'D:\scriptname',
                 params_required_version = ini_version2)
+
+class TestParamsCache():
+    """Проверка кэша разобранных ini-файлов"""
+
+    @pytest.fixture
+    def old_ini_file_name(self, ini_file_name):
+        """ini-файл, измененный достаточно давно для кэширования"""
+
+        mtime = time.time() - 60
+        os.utime(ini_file_name, (mtime, mtime))
+
+        return ini_file_name
+
+    def create_params(self, ini_file_name, cache_dir, ini_version):
+        """Создание объекта параметров с кэшем"""
+
+        return Params(ini_file_name = ini_file_name,
+                      script_full_file_name = r'D:\scriptname',
+                      params_required_version = ini_version,
+                      cache_dir = str(cache_dir))
+
+    def test_cache_hit(self, old_ini_file_name, tmp_path, ini_version1):
+        """Повторное чтение берется из кэша без разбора ini-файла."""
+
+        cache_dir = tmp_path / 'cache'
+        self.create_params(old_ini_file_name, cache_dir, ini_version1)
+
+        assert len(os.listdir(cache_dir)) == 1
+
+        with patch('params._load_params') as mock:
+            params = self.create_params(old_ini_file_name, cache_dir, ini_version1)
+
+            assert not mock.called
+
+        assert params.param1 == 'value1'
+        assert params.base_param2 == 'value2'
+
+    def test_stale(self, old_ini_file_name, tmp_path, ini_version1):
+        """Nзменение ini-файла делает кэш устаревшим."""
+
+        cache_dir = tmp_path / 'cache'
+        self.create_params(old_ini_file_name, cache_dir, ini_version1)
+
+        with open(old_ini_file_name, 'a', encoding = 'cp1251') as config_file:
+            config_file.write('param3 = value3\n')
+
+        params = self.create_params(old_ini_file_name, cache_dir, ini_version1)
+
+        assert params.base_param3 == 'value3'
+
+    def test_fresh_file_not_cached(self, ini_file_name, tmp_path, ini_version1):
+        """Только что измененный ini-файл не кэшируется."""
+
+        cache_dir = tmp_path / 'cache'
+        self.create_params(ini_file_name, cache_dir, ini_version1)
+
+        assert not cache_dir.exists() or not os.listdir(cache_dir)
+
+    def test_corrupted_and_invalidate(self, old_ini_file_name, tmp_path, ini_version1):
+        """Поврежденный кэш игнорируется, удаление кэша работает."""
+
+        cache_dir = tmp_path / 'cache'
+        self.create_params(old_ini_file_name, cache_dir, ini_version1)
+
+        cache_file = cache_dir / os.listdir(cache_dir)[0]
+        cache_file.write_bytes(b'-')
+
+        params = self.create_params(old_ini_file_name, cache_dir, ini_version1)
+        assert params.param1 == 'value1'
+
+        invalidate_params_cache(old_ini_file_name, str(cache_dir))
+        assert not os.listdir(cache_dir)
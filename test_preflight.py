@@ -0,0 +1,87 @@
+"""Тесты модуля preflight"""
+
+import subprocess
+import sys
+import pytest
+from unittest.mock import MagicMock, patch
+
+from preflight import probe_file_infobase
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason='Блокировки fcntl')
+
+# Процесс, который держит блокировку файла, пока не закрыт stdin
+HOLDER = '''
+import fcntl, sys
+file = open(sys.argv[1], 'r+b')
+fcntl.lockf(file, fcntl.LOCK_EX if sys.argv[2] == 'ex' else fcntl.LOCK_SH)
+print('locked', flush=True)
+sys.stdin.read()
+'''
+
+@pytest.fixture
+def hold_lock(tmp_path):
+    """Запуск процесса, держащего блокировку файла базы."""
+
+    processes = []
+
+    def hold(mode: str):
+        process = subprocess.Popen([sys.executable, '-c', HOLDER, str(tmp_path / '1Cv8.1CD'), mode],
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        assert process.stdout.readline().strip() == 'locked'
+        processes.append(process)
+        return process
+
+    (tmp_path / '1Cv8.1CD').write_bytes(b'1CD')
+
+    yield hold
+
+    for process in processes:
+        process.stdin.close()
+        process.wait()
+
+class TestProbeFileInfobase():
+    """Проверка функции probe_file_infobase."""
+
+    def test_free(self, tmp_path):
+        """Нет файлов базы или они не заблокированы."""
+
+        assert probe_file_infobase(str(tmp_path), True) == (False, '')
+
+        (tmp_path / '1Cv8.1CD').write_bytes(b'1CD')
+
+        assert probe_file_infobase(str(tmp_path), True) == (False, '')
+
+    def test_exclusive(self, tmp_path, hold_lock):
+        """Монопольная блокировка мешает любому запуску, владелец определяется."""
+
+        process = hold_lock('ex')
+
+        busy, holder = probe_file_infobase(str(tmp_path), False)
+
+        assert busy
+        if sys.platform.startswith('linux'):
+            assert f'PID {process.pid}' in holder
+
+    def test_shared(self, tmp_path, hold_lock):
+        """Разделяемая блокировка мешает только монопольному запуску."""
+
+        hold_lock('sh')
+
+        assert not probe_file_infobase(str(tmp_path), False)[0]
+        assert probe_file_infobase(str(tmp_path), True)[0]
+
+    @pytest.mark.parametrize('exclusive, locked, expected_busy',
+        [(True, True, True), (True, False, False), (False, True, False)])
+    def test_windows(self, tmp_path, exclusive, locked, expected_busy):
+        """На Windows монопольный запуск проверяется блокировкой msvcrt, разделяемый - нет."""
+
+        (tmp_path / '1Cv8.1CD').write_bytes(b'1CD')
+        msvcrt = MagicMock()
+
+        if locked:
+            msvcrt.locking.side_effect = OSError('locked')
+
+        with patch('preflight.fcntl', None), patch('preflight.msvcrt', msvcrt, create=True):
+            assert probe_file_infobase(str(tmp_path), exclusive)[0] == expected_busy
+
+        assert msvcrt.locking.called == exclusive
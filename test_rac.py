@@ -0,0 +1,184 @@
+"""Тесты модуля rac"""
+
+import json
+import os
+import sys
+import pytest
+
+from cancellation import CancellationToken, OperationCancelled, cancel_scope
+import fileops
+
+from ones import CreationInfobase, DBServerTypes, Designer, SQLYearOffsets
+from rac import RacClient, RacError, parse_output
+
+# Заглушка rac: хранит базы в файле состояния, вызовы пишет в журнал
+FAKE_RAC = r'''
+import json, sys, uuid
+
+state_file_name, sys.path[0], args = sys.argv[1], sys.argv[2], sys.argv[4:]
+
+from fileops import FileLock
+
+lock = FileLock(state_file_name + '.lock')
+lock.acquire()
+
+with open(state_file_name, encoding='utf-8') as file:
+    state = json.load(file)
+
+state['calls'].append(args)
+options = dict(arg[2:].split('=', 1) for arg in args if arg.startswith('--') and '=' in arg)
+exit_code = 0
+
+if args[:2] == ['cluster', 'list']:
+    print('cluster : c1\nhost    : server1\nport    : 1541\nname    : "Главный кластер"\n')
+
+elif args[0] == 'infobase' and options.get('cluster') != 'c1':
+    print('Кластер не найден', file=sys.stderr)
+    exit_code = 1
+
+elif args[-2:] == ['summary', 'list']:
+    for infobase_id, name in state['infobases'].items():
+        print(f'infobase : {infobase_id}\nname     : {name}\ndescr    :\n')
+
+elif 'create' in args:
+    if options['name'] in state['infobases'].values():
+        print('Информационная база уже существует', file=sys.stderr)
+        exit_code = 1
+    else:
+        infobase_id = str(uuid.uuid4())
+        state['infobases'][infobase_id] = options['name']
+        print(f'infobase : {infobase_id}')
+
+elif args[0] == 'session':
+    if state['infobases'].get(options['infobase']) == 'base1':
+        print('session   : s1\nuser-name : user1\nhost      : host1\napp-id    : Designer\n')
+
+elif 'drop' in args:
+    del state['infobases'][options['infobase']]
+
+with open(state_file_name, 'w', encoding='utf-8') as file:
+    json.dump(state, file)
+
+lock.release()
+sys.exit(exit_code)
+'''
+
+@pytest.fixture
+def state_file(tmp_path):
+    """Файл состояния заглушки rac."""
+
+    state_file = tmp_path / 'state.json'
+    state_file.write_text(json.dumps({'infobases': {}, 'calls': []}), encoding='utf-8')
+
+    return state_file
+
+@pytest.fixture
+def rac(tmp_path, state_file):
+    """Клиент, работающий с заглушкой rac."""
+
+    script = tmp_path / 'rac.py'
+    script.write_text(FAKE_RAC, encoding='utf-8')
+
+    modules_dir = os.path.dirname(os.path.abspath(fileops.__file__))
+
+    return RacClient([sys.executable, str(script), str(state_file), modules_dir], 'server1:1545',
+                     encoding='utf-8')
+
+def creation_infobase(name: str) -> CreationInfobase:
+    creation = CreationInfobase(server='server1', infobase=name)
+    creation.set_server_db_params(db_server_type=DBServerTypes.POSTGRE_SQL, db_server_name='db1',
+                                  database=name, db_user='postgres', db_password='secret',
+                                  sql_year_offset=SQLYearOffsets.TWO_THOUSAND,
+                                  create_db_if_not_exist=True)
+    creation.set_claster_params(deny_scheduled_jobs=True, cluster_administrator_user='admin')
+
+    return creation
+
+def calls(state_file) -> list:
+    return json.loads(state_file.read_text(encoding='utf-8'))['calls']
+
+class TestParseOutput():
+    """Проверка функции parse_output."""
+
+    def test_success(self):
+        """Блоки разделены пустыми строками, кавычки снимаются."""
+
+        text = 'cluster : c1\nname    : "Кластер ""1"""\n\ncluster : c2\nhost    : srv:1541\n'
+
+        assert parse_output(text) == [{'cluster': 'c1', 'name': 'Кластер "1"'},
+                                      {'cluster': 'c2', 'host': 'srv:1541'}]
+
+class TestRacClient():
+    """Проверка класса RacClient."""
+
+    def test_create_list_drop(self, rac, state_file):
+        """Создание, поиск и удаление базы."""
+
+        infobase_id = rac.create_infobase(creation_infobase('base1'))
+
+        assert rac.infobase_list() == [{'infobase': infobase_id, 'name': 'base1', 'descr': ''}]
+        assert rac.find_infobase('BASE1')['infobase'] == infobase_id
+
+        create_args = calls(state_file)[1]
+
+        assert create_args[:3] == ['infobase', '--cluster=c1', '--cluster-user=admin']
+        assert {'--dbms=PostgreSQL', '--db-server=db1', '--db-name=base1', '--locale=ru',
+                '--db-user=postgres', '--db-pwd=secret', '--date-offset=2000',
+                '--create-database', '--scheduled-jobs-deny=on'} <= set(create_args)
+
+        assert rac.drop_infobase('base1', drop_database=True)
+        assert '--drop-database' in calls(state_file)[-1]
+        assert rac.infobase_list() == []
+        assert not rac.drop_infobase('base1')
+
+    def test_error(self, rac):
+        """Ошибка rac передается исключением с текстом ошибки."""
+
+        rac.create_infobase(creation_infobase('base1'))
+
+        with pytest.raises(RacError, match='уже существует'):
+            rac.create_infobase(creation_infobase('base1'))
+
+    def test_file_base(self, rac):
+        """Файловая база через rac не создается."""
+
+        with pytest.raises(RacError):
+            rac.create_infobase(CreationInfobase(dir_='/tmp/base'))
+
+    def test_create_infobases(self, rac, state_file):
+        """Параллельное создание: список кластеров запрашивается один раз, ошибки не прерывают пакет."""
+
+        rac.create_infobase(creation_infobase('base2'))
+
+        results = rac.create_infobases([creation_infobase(f'base{number}') for number in range(1, 6)],
+                                       max_workers=3)
+
+        assert [result.succeeded for result in results] == [True, False, True, True, True]
+        assert sorted(infobase['name'] for infobase in rac.infobase_list()) == \
+            ['base1', 'base2', 'base3', 'base4', 'base5']
+        assert [args[:2] for args in calls(state_file)].count(['cluster', 'list']) == 1
+
+    def test_session_query(self, rac):
+        """Сеансы базы мешают только монопольному запуску."""
+
+        rac.create_infobase(creation_infobase('base1'))
+        rac.create_infobase(creation_infobase('base2'))
+
+        query = rac.session_query()
+
+        assert query(Designer(server='server1', infobase='base1'), True) == ['user1 (Designer, host1)']
+        assert query(Designer(server='server1', infobase='base1'), False) == []
+        assert query(Designer(server='server1', infobase='base2'), True) == []
+
+    def test_cancellation(self, rac):
+        """С токеном отмены rac работает как обычно, после отмены не запускается."""
+
+        token = CancellationToken()
+
+        with cancel_scope(token):
+            assert rac.cluster_list()[0]['cluster'] == 'c1'
+
+            token.cancel()
+
+            with pytest.raises(OperationCancelled):
+                rac.cluster_list()
@@ -0,0 +1,142 @@
+"""Тесты модуля repo_watcher"""
+
+import threading
+import time
+import pytest
+
+from job_queue import JobQueue
+from ones import Designer
+from repo_watcher import RepoWatcher, enqueue_updates, file_repo_probe
+
+class FakeProbe:
+    """Проба с задаваемым признаком версии."""
+
+    def __init__(self, token=1):
+        self.token = token
+
+    def __call__(self):
+        if isinstance(self.token, Exception):
+            raise self.token
+
+        return self.token
+
+@pytest.fixture
+def calls():
+    return []
+
+@pytest.fixture
+def probe():
+    return FakeProbe()
+
+@pytest.fixture
+def watcher(probe, calls):
+    """Наблюдатель за одним хранилищем с пробой FakeProbe."""
+
+    watcher = RepoWatcher(debounce_seconds=60, max_delay_seconds=100)
+    watcher.add('repo1', lambda repo, token: calls.append((repo, token)), probe)
+    watcher.poll_once(now=0)
+
+    return watcher
+
+class TestRepoWatcher():
+    """Проверка класса RepoWatcher."""
+
+    def test_no_change(self, watcher, calls):
+        """Исходное состояние и неизменное хранилище не вызывают обработчики."""
+
+        assert watcher.poll_once(now=100) == []
+        assert calls == []
+
+    def test_debounce(self, watcher, probe, calls):
+        """Несколько изменений подряд дают один вызов после затишья."""
+
+        probe.token = 2
+        assert watcher.poll_once(now=10) == []
+
+        probe.token = 3
+        assert watcher.poll_once(now=20) == []
+        assert watcher.poll_once(now=79) == []
+        assert watcher.poll_once(now=81) == ['repo1']
+        assert watcher.poll_once(now=200) == []
+
+        assert calls == [('repo1', 3)]
+        assert watcher.metrics['changes'] == 2
+        assert watcher.metrics['triggers'] == 1
+
+    def test_max_delay(self, watcher, probe, calls):
+        """Непрерывные изменения не откладывают вызов дольше max_delay_seconds."""
+
+        for now in range(10, 130, 10):
+            probe.token = now
+            watcher.poll_once(now=now)
+
+        assert calls == [('repo1', 110)]
+
+    def test_errors(self, watcher, probe, calls):
+        """Ошибка пробы или обработчика не прерывает наблюдение."""
+
+        def failing_callback(repo, token):
+            raise RuntimeError('ошибка обработчика')
+
+        watcher.add('repo1', failing_callback)
+
+        probe.token = RuntimeError('нет связи')
+        watcher.poll_once(now=10)
+
+        probe.token = 2
+        watcher.poll_once(now=20)
+        watcher.poll_once(now=90)
+
+        assert calls == [('repo1', 2)]
+        assert watcher.metrics['errors'] == 2
+
+    def test_background(self, tmp_path):
+        """Изменение файлового хранилища в фоновом потоке."""
+
+        repo_file = tmp_path / '1cv8ddb.1CD'
+        repo_file.write_bytes(b'1')
+        changed = threading.Event()
+
+        watcher = RepoWatcher(poll_seconds=0.01, debounce_seconds=0)
+        watcher.add(str(tmp_path), lambda repo, token: changed.set())
+        watcher.start()
+
+        try:
+            while watcher.metrics['polls'] == 0:
+                time.sleep(0.01)
+
+            repo_file.write_bytes(b'12')
+
+            assert changed.wait(5)
+        finally:
+            watcher.stop(5)
+
+def test_file_repo_probe(tmp_path):
+    probe = file_repo_probe(str(tmp_path))
+
+    assert probe() is None
+
+    (tmp_path / '1cv8ddb.1CD').write_bytes(b'1')
+
+    assert probe()[1] == 1
+
+def test_enqueue_updates(tmp_path):
+    """Обработчик ставит обновление каждой базы в очередь."""
+
+    queue = JobQueue(str(tmp_path / 'queue.db'))
+    designers = []
+
+    for infobase in ('base1', 'base2'):
+        designer = Designer(server='server1', infobase=infobase)
+        designer.set_platform_params(r'D:\1cv8.exe')
+        designer.set_repo_params(r'D:\repo', 'user')
+        designers.append(designer)
+
+    enqueue_updates(queue, designers, priority=5, force=True)(r'D:\repo', (1, 1))
+
+    assert queue.counts() == {'queued': 2}
+
+    job = queue.take('worker1')
+
+    assert job.spec['operation'] == 'update_from_repo'
+    assert job.spec['args'] == {'force': True}
@@ -0,0 +1,243 @@
+"""Тесты модуля service"""
+
+import json
+import logging
+import threading
+import urllib.error
+import urllib.request
+import pytest
+from unittest.mock import patch
+
+import jobs
+from logger_ import logger
+import ones
+import service
+from service import JobService, JobStates, ServiceClient
+
+EXENAME = r'D:\1cv8.exe'
+TOKEN = 'secret'
+
+@pytest.fixture(autouse=True)
+def debug_logger():
+    """Лог задания получает записи, которые пропускает логгер."""
+
+    log = logger()
+    level = log.level
+    log.setLevel(logging.DEBUG)
+
+    yield
+
+    log.setLevel(level)
+
+@pytest.fixture
+def load_cfg_spec():
+    """Задание загрузки конфигурации."""
+
+    return {'class': 'Designer',
+            'init': {'dir_': r'D:\R'},
+            'settings': {'set_platform_params': {'exename': r'D:\1cv8.exe'}},
+            'operation': 'load_cfg',
+            'args': {'file_name_cf': r'D:\1.cf'}}
+
+@pytest.fixture
+def job_service():
+    """Сервис заданий с одним потоком."""
+
+    job_service = JobService(max_workers=1, allowed_exenames=(EXENAME,))
+
+    yield job_service
+
+    job_service.shutdown()
+
+class TestJobService():
+    """Проверка класса JobService."""
+
+    @pytest.mark.parametrize('return_value, expected_state',
+        [(True, JobStates.SUCCEEDED), (False, JobStates.FAILED)])
+    def test_run(self, job_service, load_cfg_spec, return_value, expected_state):
+        """Выполнение задания, состояние и лог."""
+
+        with patch('ones.RunInfobase._execute_command') as mock:
+            mock.return_value = return_value
+
+            job_id = job_service.submit(load_cfg_spec)
+            job_service._jobs[job_id].future.result(timeout=5)
+
+        status = job_service.status(job_id)
+        lines, offset, finished = job_service.log_lines(job_id)
+
+        assert status['state'] == expected_state
+        assert finished
+        assert 'load_cfg. Началось' in lines[0]
+        assert offset == len(lines)
+        assert job_service.metrics[expected_state] == 1
+
+    def test_exename_not_allowed(self, job_service, load_cfg_spec):
+        """Задание с исполняемым файлом не из списка не принимается."""
+
+        load_cfg_spec['settings']['set_platform_params']['exename'] = '/bin/sh'
+
+        with pytest.raises(jobs.JobSpecError, match='/bin/sh'):
+            job_service.submit(load_cfg_spec)
+
+        assert job_service.metrics['submitted'] == 0
+
+    def test_evict(self, load_cfg_spec):
+        """Хранятся только последние завершенные задания и последние строки их лога."""
+
+        job_service = JobService(max_workers=1, max_finished_jobs=2, max_log_lines=1)
+
+        try:
+            with patch('ones.RunInfobase._execute_command', return_value=True):
+                job_ids = [job_service.submit(load_cfg_spec) for _ in range(3)]
+
+                for job_id in job_ids:
+                    job_service._jobs[job_id].future.result(timeout=5)
+
+            lines, offset, finished = job_service.log_lines(job_ids[2])
+
+            assert job_service.status(job_ids[0]) is None
+            assert job_service.status(job_ids[2])['state'] == JobStates.SUCCEEDED
+            assert len(lines) == 1 and offset > 1 and finished
+            assert job_service.log_lines(job_ids[2], offset) == ([], offset, True)
+            # токены завершенных заданий отключены от токена сервиса
+            assert job_service.token._callbacks == {}
+
+        finally:
+            job_service.shutdown()
+
+    def test_cancel(self, job_service, load_cfg_spec):
+        """Отмена ожидающего задания."""
+
+        started = threading.Event()
+        release = threading.Event()
+
+        def execute_command(params):
+            started.set()
+            release.wait(5)
+            return True
+
+        with patch('ones.RunInfobase._execute_command', side_effect=execute_command):
+            job_id1 = job_service.submit(load_cfg_spec)
+            job_id2 = job_service.submit(load_cfg_spec)
+            started.wait(5)
+
+            assert job_service.cancel(job_id2)
+
+            release.set()
+            job_service._jobs[job_id1].future.result(timeout=5)
+
+        assert job_service.status(job_id1)['state'] == JobStates.SUCCEEDED
+        assert job_service.status(job_id2)['state'] == JobStates.CANCELLED
+
+    def test_cancel_running(self, job_service, load_cfg_spec):
+        """Отмена выполняющегося задания и всех заданий сервиса."""
+
+        started = threading.Semaphore(0)
+
+        def execute_command(runner, params):
+            started.release()
+            runner._token().wait(5)
+            runner._token().raise_if_cancelled()
+            return True
+
+        with patch.object(ones.RunInfobase, '_execute_command', autospec=True,
+                          side_effect=execute_command):
+            job_id1 = job_service.submit(load_cfg_spec)
+            job_id2 = job_service.submit(load_cfg_spec)
+
+            assert started.acquire(timeout=5)
+            assert job_service.cancel(job_id1)
+            job_service._jobs[job_id1].future.result(timeout=5)
+
+            assert started.acquire(timeout=5)
+            job_service.cancel_all()
+            job_service._jobs[job_id2].future.result(timeout=5)
+
+        assert job_service.status(job_id1)['state'] == JobStates.CANCELLED
+        assert job_service.status(job_id2)['state'] == JobStates.CANCELLED
+        assert not job_service.cancel(job_id1)
+        assert job_service.metrics['cancelled'] == 2
+
+class TestHttp():
+    """Проверка HTTP API через ServiceClient."""
+
+    def test_submit_and_log(self, job_service, load_cfg_spec):
+        """Постановка задания, чтение лога потоком и состояния."""
+
+        server = service.create_server(job_service, TOKEN, port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        try:
+            client = ServiceClient(TOKEN, f'http://127.0.0.1:{server.server_address[1]}')
+
+            with patch('ones.RunInfobase._execute_command') as mock:
+                mock.return_value = True
+
+                job_id = client.submit(load_cfg_spec)
+                lines = list(client.iter_log(job_id))
+
+            assert client.status(job_id)['state'] == JobStates.SUCCEEDED
+            assert any('load_cfg. Выполнилось' in line for line in lines)
+            assert not client.cancel(job_id)
+
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    @pytest.mark.parametrize('token, body, expected_code',
+        [('wrong', {}, 401), (TOKEN, [], 400), (TOKEN, 'text', 400),
+         (TOKEN, {'class': 'Designer', 'operation': 'load_cfg', 'init': {'bogus': 1}}, 400),
+         (TOKEN, {'class': 'Designer', 'operation': 'load_cfg', 'init': 'text'}, 400),
+         (TOKEN, {'class': 'Designer', 'operation': 'load_cfg', 'settings': []}, 400),
+         (TOKEN, {'class': 'Designer', 'operation': 'load_cfg',
+                  'settings': {'set_platform_params': 'text'}}, 400),
+         (TOKEN, {'class': 'Designer', 'operation': 'load_cfg',
+                  'settings': {'set_platform_params': {'bogus': 1}}}, 400)])
+    def test_bad_request(self, job_service, token, body, expected_code):
+        """Запрос без верного токена и неверные задания отклоняются."""
+
+        server = service.create_server(job_service, TOKEN, port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        try:
+            request = urllib.request.Request(f'http://127.0.0.1:{server.server_address[1]}/jobs',
+                                             data=json.dumps(body).encode('utf-8'), method='POST',
+                                             headers={'Authorization': f'Bearer {token}'})
+
+            with pytest.raises(urllib.error.HTTPError) as ex_info:
+                urllib.request.urlopen(request)
+
+            assert ex_info.value.code == expected_code
+
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_create_server(self):
+        """Сервер не создается без токена и без списка исполняемых файлов."""
+
+        for job_service, token in ((JobService(max_workers=1), TOKEN),
+                                   (JobService(max_workers=1, allowed_exenames=(EXENAME,)), '')):
+            try:
+                with pytest.raises(ValueError):
+                    service.create_server(job_service, token, port=0)
+            finally:
+                job_service.shutdown()
+
+def test_read_token(tmp_path, monkeypatch):
+    """Токен создается в файле один раз, переменная окружения имеет приоритет."""
+
+    monkeypatch.delenv(service.TOKEN_ENV, raising=False)
+    token_file_name = str(tmp_path / 'token')
+
+    token = service.read_token(token_file_name)
+
+    assert len(token) > 20
+    assert service.read_token(token_file_name) == token
+
+    monkeypatch.setenv(service.TOKEN_ENV, 'env')
+
+    assert service.read_token(token_file_name) == 'env'
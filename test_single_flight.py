@@ -0,0 +1,180 @@
+"""Тесты модуля single_flight"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import pytest
+from unittest.mock import patch
+
+from fileops import FileLock
+from ones import Designer
+from single_flight import SingleFlight, command_key
+
+def run_threads(count: int, func) -> list:
+    """Одновременный вызов func(номер потока) в count потоках.
+
+    Returns:
+      list: Результаты или исключения в порядке потоков
+    """
+
+    results = [None] * count
+
+    def target(number):
+        try:
+            results[number] = func(number)
+        except Exception as ex:
+            results[number] = ex
+
+    threads = [threading.Thread(target=target, args=(number,)) for number in range(count)]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    return results
+
+class CountingCommand:
+    """Команда, считающая свои выполнения."""
+
+    def __init__(self, result=True, seconds: float=0.2):
+        self.calls = 0
+        self.result = result
+        self.seconds = seconds
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+
+        time.sleep(self.seconds)
+
+        if isinstance(self.result, Exception):
+            raise self.result
+
+        return self.result
+
+PROCESS_SCRIPT = '''
+import json, sys, time
+from single_flight import SingleFlight
+
+def command():
+    with open(sys.argv[2], 'a') as file:
+        file.write('call\\n')
+    time.sleep(1.5)
+    return True
+
+print(json.dumps(SingleFlight(lock_dir=sys.argv[1]).run(['1cv8', 'DESIGNER', '/DumpIB 1.dt'], command)))
+'''
+
+class TestCommandKey():
+    """Проверка ключа команды."""
+
+    def test_ignored_params(self):
+        """Файлы лога и результата не входят в ключ."""
+
+        assert (command_key(['1cv8', 'DESIGNER', '/Out 1.log', '-NoTruncate', '/LoadCfg 1.cf'])
+                == command_key(['1cv8', 'DESIGNER', '/Out 2.log', '/DumpResult 2.txt', '/LoadCfg 1.cf']))
+
+    def test_different_commands(self):
+        assert command_key(['1cv8', '/LoadCfg 1.cf']) != command_key(['1cv8', '/LoadCfg 2.cf'])
+        assert command_key(['1cv8', '/LoadCfg 1.cf']) != command_key(['1cv9', '/LoadCfg 1.cf'])
+
+class TestSingleFlight():
+    """Проверка класса SingleFlight."""
+
+    def test_threads(self):
+        """Одновременные одинаковые вызовы выполняют команду один раз."""
+
+        single_flight = SingleFlight()
+        command = CountingCommand()
+
+        results = run_threads(5, lambda _: single_flight.run(['1cv8', '/DumpIB 1.dt'], command))
+
+        assert results == [True] * 5
+        assert command.calls == 1
+        assert single_flight.metrics == {'executed': 1, 'joined': 4}
+
+    def test_sequential(self):
+        """Последовательные вызовы не объединяются."""
+
+        single_flight = SingleFlight()
+        command = CountingCommand(seconds=0)
+
+        single_flight.run(['1cv8', '/DumpIB 1.dt'], command)
+        single_flight.run(['1cv8', '/DumpIB 1.dt'], command)
+
+        assert command.calls == 2
+
+    def test_error(self):
+        """Исключение команды получают все объединенные вызовы."""
+
+        single_flight = SingleFlight()
+        command = CountingCommand(result=RuntimeError('ошибка 1С'))
+
+        results = run_threads(3, lambda _: single_flight.run(['1cv8', '/DumpIB 1.dt'], command))
+
+        assert command.calls == 1
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    def test_processes(self, tmp_path):
+        """Одновременные одинаковые вызовы в разных процессах выполняют команду один раз."""
+
+        lock_dir = str(tmp_path / 'flights')
+        calls_file = str(tmp_path / 'calls.txt')
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+
+        processes = [subprocess.Popen([sys.executable, '-c', PROCESS_SCRIPT, lock_dir, calls_file],
+                                      stdout=subprocess.PIPE, text=True, env=env)
+                     for _ in range(3)]
+        outputs = [process.communicate(timeout=30)[0] for process in processes]
+
+        assert [json.loads(output) for output in outputs] == [True] * 3
+
+        with open(calls_file) as file:
+            assert file.read().count('call') == 1
+
+    def test_process_without_result(self, tmp_path):
+        """Если другой процесс завершился без результата, команда выполняется заново."""
+
+        lock_dir = str(tmp_path / 'flights')
+        single_flight = SingleFlight(lock_dir=lock_dir)
+        params = ['1cv8', '/DumpIB 1.dt']
+        command = CountingCommand(seconds=0)
+
+        lock = FileLock(os.path.join(lock_dir, command_key(params) + '.lock'))
+        lock.acquire()
+        threading.Timer(0.2, lock.release).start()
+
+        assert single_flight.run(params, command) is True
+        assert command.calls == 1
+        assert single_flight.metrics == {'executed': 1, 'joined': 0}
+
+class TestDesigner():
+    """Объединение запусков конфигуратора."""
+
+    def designer(self, single_flight: SingleFlight, log_file_name: str) -> Designer:
+        designer = Designer(r'D:\R')
+        designer.set_platform_params(r'D:\1cv8.exe')
+        designer.set_log_ib_params(log_file_name)
+        designer.set_single_flight_params(single_flight)
+        return designer
+
+    @pytest.mark.parametrize('operation, args, expected_calls',
+        [('dump_repo_to_file', (r'D:\1.cf', '15'), 1),
+         ('load_cfg', (r'D:\1.cf',), 3)])
+    def test_operations(self, operation, args, expected_calls):
+        """Объединяются только операции из списка группы, несмотря на разные файлы /Out."""
+
+        single_flight = SingleFlight()
+        command = CountingCommand(result=0)
+        designers = [self.designer(single_flight, rf'D:\{number}.log') for number in range(3)]
+
+        with patch('ones.RunInfobase._subprocess_run', side_effect=lambda params: command()):
+            results = run_threads(3, lambda number: getattr(designers[number], operation)(*args))
+
+        assert results == [True] * 3
+        assert command.calls == expected_calls
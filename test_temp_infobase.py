@@ -0,0 +1,120 @@
+"""Тесты модуля temp_infobase"""
+
+import os
+import pytest
+from unittest.mock import patch
+
+from ibases import BaseList
+from temp_infobase import MB, TempInfobaseError, TempInfobases
+
+BASE_LIST = '[Постоянная]\r\nConnect=File="D:\\base1";\r\n'
+
+@pytest.fixture
+def dirs(tmp_path):
+    """Каталоги памяти и диска."""
+
+    ram_dir = tmp_path / 'shm'
+    disk_dir = tmp_path / 'disk'
+    ram_dir.mkdir()
+    disk_dir.mkdir()
+
+    return str(ram_dir), str(disk_dir)
+
+@pytest.fixture
+def base_list_file(tmp_path):
+    file_name = tmp_path / 'ibases.v8i'
+    file_name.write_text(BASE_LIST, encoding='utf_8_sig')
+
+    return str(file_name)
+
+@pytest.fixture
+def temp_bases(dirs, base_list_file):
+    ram_dir, disk_dir = dirs
+
+    return TempInfobases(r'D:\1cv8.exe', '8.3.22', ram_budget_bytes=100 * MB,
+                         ram_dir=ram_dir, disk_dir=disk_dir, base_list_file=base_list_file)
+
+def create_base(base_list_file: str, result: bool=True):
+    """Nмитация создания базы платформой: файл базы и запись в списке баз."""
+
+    def execute_command(runner, params):
+        with open(os.path.join(runner._dir, '1Cv8.1CD'), 'wb') as file:
+            file.write(b'base')
+
+        base_list = BaseList.read(base_list_file)
+        base_list.add('Временная', {'Connect': f'File="{runner._dir}";'})
+        base_list.write(base_list_file)
+
+        return result
+
+    return patch('ones.RunInfobase._execute_command', autospec=True, side_effect=execute_command)
+
+class TestTempInfobases():
+    """Проверка класса TempInfobases."""
+
+    def test_ram(self, temp_bases, dirs, base_list_file):
+        """База в памяти, объекты запуска привязаны к ней, после блока база удалена."""
+
+        with create_base(base_list_file):
+            with temp_bases.create(list_name='Временная') as base:
+                assert base.in_memory
+                assert os.path.dirname(base.dir) == dirs[0]
+                assert os.path.exists(os.path.join(base.dir, '1Cv8.1CD'))
+                assert base.designer._dir == base.dir
+                assert base.enterprise._exename == r'D:\1cv8.exe'
+                assert base.designer._platform_version == '8.3.22'
+                assert temp_bases.ram_reserved() == base.size_estimate
+
+        assert not os.path.exists(base.dir)
+        assert temp_bases.ram_reserved() == 0
+        assert [entry.name for entry in BaseList.read(base_list_file)] == ['Постоянная']
+
+    def test_budget(self, temp_bases, dirs, base_list_file, tmp_path):
+        """База, не помещающаяся в бюджет с учетом других баз, создается на диске."""
+
+        template = tmp_path / '1.cf'
+        template.write_bytes(b'0' * (20 * MB))
+
+        with create_base(base_list_file):
+            with temp_bases.create() as base1, temp_bases.create(str(template)) as base2:
+                assert base1.in_memory
+                assert base2.size_estimate == 80 * MB
+                assert not base2.in_memory
+                assert os.path.dirname(base2.dir) == dirs[1]
+
+            with temp_bases.create(size_estimate_bytes=100 * MB) as base3:
+                assert base3.in_memory
+
+        assert temp_bases.metrics['ram'] == 2
+        assert temp_bases.metrics['disk'] == 1
+
+    def test_exception(self, temp_bases, base_list_file):
+        """Nсключение в блоке не мешает удалению базы."""
+
+        with create_base(base_list_file), pytest.raises(RuntimeError):
+            with temp_bases.create() as base:
+                raise RuntimeError('ошибка теста')
+
+        assert not os.path.exists(base.dir)
+        assert len(BaseList.read(base_list_file)) == 1
+        assert temp_bases.ram_reserved() == 0
+
+    def test_create_failure(self, temp_bases, dirs, base_list_file):
+        with create_base(base_list_file, result=False), pytest.raises(TempInfobaseError):
+            with temp_bases.create():
+                pass
+
+        assert os.listdir(dirs[0]) == []
+        assert len(BaseList.read(base_list_file)) == 1
+
+    def test_configure(self, dirs, base_list_file):
+        """Общие параметры применяются ко всем объектам запуска."""
+
+        configured = []
+        temp_bases = TempInfobases(r'D:\1cv8.exe', ram_dir=dirs[0], base_list_file=base_list_file,
+                                   configure=lambda runner: configured.append(type(runner).__name__))
+
+        with create_base(base_list_file), temp_bases.create():
+            pass
+
+        assert configured == ['CreationInfobase', 'Designer', 'Enterprise']
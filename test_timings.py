@@ -0,0 +1,145 @@
+"""Тесты модуля timings"""
+
+import pytest
+from unittest.mock import patch
+
+from ones import Designer
+from timings import DAY_SECONDS, TimingDB, TimingResults, main
+
+NOW = 100 * DAY_SECONDS
+
+@pytest.fixture
+def timing_db(tmp_path):
+    return TimingDB(str(tmp_path / 'timings.db'))
+
+def fill(timing_db: TimingDB, operation: str, seconds: list, start: float, infobase: str='base1'):
+    """Запись длительностей с интервалом в час начиная с start."""
+
+    for number, value in enumerate(seconds):
+        timing_db.record(operation, value, infobase=infobase, finished=start + number * 3600)
+
+class TestTimingDB():
+    """Проверка класса TimingDB."""
+
+    def test_query(self, timing_db):
+        timing_db.record('load_cfg', 10, infobase='base1', platform_version='8.3.22', finished=1)
+        timing_db.record('dump_ib', 20, TimingResults.FAILED, infobase='base2', finished=2)
+
+        assert [row['operation'] for row in timing_db.query()] == ['load_cfg', 'dump_ib']
+        assert timing_db.query(infobase='base1')[0]['platform_version'] == '8.3.22'
+        assert timing_db.query(since=2) == timing_db.query(result=TimingResults.FAILED)
+
+    def test_report(self, timing_db):
+        """Процентили успешных операций по окнам, неуспешные считаются отдельно."""
+
+        fill(timing_db, 'load_cfg', [1, 2, 3, 4], 0)
+        fill(timing_db, 'load_cfg', [10, 20], DAY_SECONDS)
+        timing_db.record('load_cfg', 100, TimingResults.ERROR, infobase='base1', finished=DAY_SECONDS + 1)
+        timing_db.record('load_cfg', 0, TimingResults.SKIPPED, infobase='base1', finished=DAY_SECONDS + 2)
+
+        report = timing_db.report(DAY_SECONDS)
+
+        assert [(row['window_start'], row['count'], row['p50'], row['failures'], row['skipped'])
+                for row in report] == [(0, 4, 2.5, 0, 0), (DAY_SECONDS, 2, 15, 1, 1)]
+
+    def test_regression(self, timing_db):
+        """Замедление медианы больше допустимого обнаруживается, в пределах допустимого - нет."""
+
+        fill(timing_db, 'load_cfg', [10] * 10, NOW - 20 * DAY_SECONDS)
+        fill(timing_db, 'load_cfg', [13] * 5, NOW - DAY_SECONDS)
+        fill(timing_db, 'dump_ib', [10] * 10, NOW - 20 * DAY_SECONDS)
+        fill(timing_db, 'dump_ib', [11] * 5, NOW - DAY_SECONDS)
+
+        regressions = timing_db.check_regressions(margin=0.2, now=NOW)
+
+        assert [(row['operation'], row['infobase'], row['ratio']) for row in regressions] \
+            == [('load_cfg', 'base1', 1.3)]
+        assert timing_db.check_regressions(margin=0.5, now=NOW) == []
+
+    def test_skipped_not_compared(self, timing_db):
+        """Пропущенные загрузки не снижают медиану."""
+
+        fill(timing_db, 'load_cfg', [10] * 5, NOW - 20 * DAY_SECONDS)
+        fill(timing_db, 'load_cfg', [13] * 5, NOW - DAY_SECONDS)
+
+        for number in range(10):
+            timing_db.record('load_cfg', 0, TimingResults.SKIPPED, infobase='base1',
+                             finished=NOW - 20 * DAY_SECONDS + number)
+
+        assert len(timing_db.check_regressions(margin=0.2, now=NOW)) == 1
+
+    def test_min_samples(self, timing_db):
+        """Без достаточного числа записей операция не сравнивается."""
+
+        fill(timing_db, 'load_cfg', [10] * 10, NOW - 20 * DAY_SECONDS)
+        fill(timing_db, 'load_cfg', [30] * 2, NOW - DAY_SECONDS)
+
+        assert timing_db.check_regressions(now=NOW) == []
+        assert len(timing_db.check_regressions(min_samples=2, now=NOW)) == 1
+
+    def test_by_infobase(self, timing_db):
+        """Сравнение по всем базам вместе."""
+
+        fill(timing_db, 'load_cfg', [10] * 5, NOW - 20 * DAY_SECONDS, 'base1')
+        fill(timing_db, 'load_cfg', [30] * 5, NOW - DAY_SECONDS, 'base2')
+
+        assert timing_db.check_regressions(now=NOW) == []
+        assert timing_db.check_regressions(by_infobase=False, now=NOW)[0]['recent_median'] == 30
+
+    def test_attach(self, timing_db, tmp_path):
+        """Операции объектов работы с базой записываются через log_func."""
+
+        designer = Designer(r'D:\R')
+        designer.set_platform_params(r'D:\1cv8.exe', '8.3.22')
+        timing_db.attach()
+
+        try:
+            with patch('ones.RunInfobase._execute_command', side_effect=[True, False, RuntimeError]):
+                designer.load_cfg(r'D:\1.cf')
+                designer.load_cfg(r'D:\1.cf')
+
+                with pytest.raises(RuntimeError):
+                    designer.load_cfg(r'D:\1.cf')
+        finally:
+            timing_db.detach()
+
+        with patch('ones.RunInfobase._execute_command', return_value=True):
+            designer.load_cfg(r'D:\1.cf')
+
+        rows = timing_db.query()
+
+        # загрузка, пропущенная по отпечатку
+        designer.set_fingerprint_params(str(tmp_path / 'fingerprints.json'))
+        timing_db.attach()
+
+        try:
+            with patch('ones.RunInfobase._execute_command', return_value=True), \
+                 patch('fingerprints.cf_fingerprint', return_value={'kind': 'cf', 'value': '1', 'db_updated': False}):
+                designer.load_cfg(r'D:\1.cf')
+                designer.load_cfg(r'D:\1.cf')
+        finally:
+            timing_db.detach()
+
+        assert [row['result'] for row in timing_db.query()[len(rows):]] \
+            == [TimingResults.SUCCEEDED, TimingResults.SKIPPED]
+
+        assert [row['result'] for row in rows] \
+            == [TimingResults.SUCCEEDED, TimingResults.FAILED, TimingResults.ERROR]
+        assert rows[0]['operation'] == 'load_cfg'
+        assert rows[0]['infobase'] == designer._infobase_key()
+        assert rows[0]['platform_version'] == '8.3.22'
+
+def test_main(tmp_path, capsys):
+    """Код возврата проверки регрессий для CI."""
+
+    db_file_name = str(tmp_path / 'timings.db')
+    timing_db = TimingDB(db_file_name)
+    fill(timing_db, 'load_cfg', [10] * 5, 10 * DAY_SECONDS)
+
+    assert main(['check', '--db', db_file_name]) == 0
+
+    with patch('time.time', return_value=40 * DAY_SECONDS):
+        fill(timing_db, 'load_cfg', [20] * 5, 39 * DAY_SECONDS)
+
+        assert main(['check', '--db', db_file_name]) == 1
+        assert 'load_cfg' in capsys.readouterr().out
@@ -0,0 +1,340 @@
+"""История длительности операций с базами и поиск регрессий производительности.
+
+log_func пишет длительность операции в лог, но не сохраняет ее. База длительностей
+(файл SQLite) получает каждое завершение функции с декоратором log_func у объектов
+работы с базой: операцию, ключ базы, версию платформы, длительность и результат.
+
+Загрузки, пропущенные по отпечатку конфигурации (см. модуль fingerprints), записываются
+с результатом TimingResults.SKIPPED и не входят в процентили и проверку регрессий.
+
+По истории строятся отчеты с процентилями по окнам времени, а проверка регрессий
+сравнивает медиану последних запусков каждой операции с медианой предшествующего
+базового периода. Проверка возвращает операции, замедлившиеся больше заданной доли,
+и используется как шаг CI: python -m timings check завершается с кодом 1 при регрессии.
+
+Пример:
+    timing_db = TimingDB(r'D:\\1c\\timings.db')
+    timing_db.attach()
+    designer.load_cfg(r'D:\\build\\1.cf')
+    timing_db.check_regressions(margin=0.2)
+"""
+
+import sqlite3
+import time
+
+import logger_
+from logger_ import logger
+from metrics import DEFAULT_PERCENTS, percentile, summarize
+
+__all__ = ['TimingDB', 'TimingResults']
+
+DAY_SECONDS = 24 * 60 * 60
+RECENT_SECONDS = 7 * DAY_SECONDS
+BASELINE_SECONDS = 30 * DAY_SECONDS
+REGRESSION_MARGIN = 0.2
+MIN_SAMPLES = 5
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS timings (
+    id INTEGER PRIMARY KEY,
+    finished REAL NOT NULL,
+    operation TEXT NOT NULL,
+    infobase TEXT NOT NULL,
+    platform_version TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    result TEXT NOT NULL
+);
+
+-- Выборка операции за период
+CREATE INDEX IF NOT EXISTS timings_operation
+    ON timings (operation, finished);
+'''
+
+
+class TimingResults:
+    """Результаты операции."""
+
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    ERROR = 'error'
+    # Загрузка пропущена: конфигурация уже загружена (отпечатки)
+    SKIPPED = 'skipped'
+
+
+class TimingDB:
+    """База длительностей операций в файле SQLite. Безопасна для нескольких потоков и процессов."""
+
+    def __init__(self, db_file_name: str):
+        """
+        Args:
+          db_file_name: str: Полное имя файла базы SQLite. Создается при отсутствии
+        """
+
+        self._db_file_name = db_file_name
+
+        connection = self._connect()
+
+        try:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(_SCHEMA)
+        finally:
+            connection.close()
+
+    def attach(self):
+        """Запись длительностей всех операций с базами, выполняемых через log_func."""
+
+        logger_.add_duration_listener(self._on_duration)
+
+    def detach(self):
+        """Прекращение записи длительностей."""
+
+        logger_.remove_duration_listener(self._on_duration)
+
+    def record(self, operation: str, seconds: float, result: str=TimingResults.SUCCEEDED,
+               infobase: str='', platform_version: str='', finished: float=None):
+        """Запись длительности операции.
+
+        Args:
+          operation: str: Nмя операции
+          seconds: float: Длительность в секундах
+          result: str: Результат, значение TimingResults (Default value = TimingResults.SUCCEEDED)
+          infobase: str: Ключ базы (Default value = '')
+          platform_version: str: Версия платформы (Default value = '')
+          finished: float: Время завершения time.time(). None - текущее (Default value = None)
+        """
+
+        finished = time.time() if finished is None else finished
+        connection = self._connect()
+
+        try:
+            connection.execute(
+                'INSERT INTO timings (finished, operation, infobase, platform_version, seconds, result) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (finished, operation, infobase, platform_version, seconds, result))
+        finally:
+            connection.close()
+
+    def query(self, operation: str='', infobase: str='', since: float=None, until: float=None,
+              result: str=None) -> list:
+        """Записи длительностей в порядке завершения.
+
+        Args:
+          operation: str: Отбор по операции, '' - все (Default value = '')
+          infobase: str: Отбор по ключу базы, '' - все (Default value = '')
+          since: float: Начало периода time.time() включительно. None - без ограничения (Default value = None)
+          until: float: Конец периода time.time(), не включая. None - без ограничения (Default value = None)
+          result: str: Отбор по результату. None - все (Default value = None)
+
+        Returns:
+          list: Записи dict с ключами finished, operation, infobase, platform_version, seconds, result
+        """
+
+        conditions = []
+        values = []
+
+        for column, value in (('operation = ?', operation), ('infobase = ?', infobase)):
+            if value:
+                conditions.append(column)
+                values.append(value)
+
+        for column, value in (('finished >= ?', since), ('finished < ?', until), ('result = ?', result)):
+            if value is not None:
+                conditions.append(column)
+                values.append(value)
+
+        text = 'SELECT finished, operation, infobase, platform_version, seconds, result FROM timings'
+
+        if conditions:
+            text += ' WHERE ' + ' AND '.join(conditions)
+
+        connection = self._connect()
+
+        try:
+            rows = connection.execute(text + ' ORDER BY finished, id', values).fetchall()
+        finally:
+            connection.close()
+
+        return [{'finished': finished, 'operation': operation_, 'infobase': infobase_,
+                 'platform_version': platform_version, 'seconds': seconds, 'result': result_}
+                for finished, operation_, infobase_, platform_version, seconds, result_ in rows]
+
+    def report(self, window_seconds: float=DAY_SECONDS, since: float=None, until: float=None,
+               operation: str='', infobase: str='', percents: tuple=DEFAULT_PERCENTS) -> list:
+        """Сводка длительностей успешных операций по окнам времени. Пропущенные операции
+        считаются отдельно и в процентили не входят.
+
+        Args:
+          window_seconds: float: Длина окна (Default value = сутки)
+          since: float: Начало периода. None - с первой записи (Default value = None)
+          until: float: Конец периода. None - без ограничения (Default value = None)
+          operation: str: Отбор по операции, '' - все (Default value = '')
+          infobase: str: Отбор по ключу базы, '' - все (Default value = '')
+          percents: tuple: Вычисляемые процентили (Default value = (50, 90, 95, 99))
+
+        Returns:
+          list: dict с ключами window_start, operation, infobase, platform_version, failures, skipped
+                и сводкой metrics.summarize, по окнам и операциям
+        """
+
+        rows = self.query(operation, infobase, since, until)
+
+        if not rows:
+            return []
+
+        start = rows[0]['finished'] if since is None else since
+        groups = {}
+
+        for row in rows:
+            window_start = start + (row['finished'] - start) // window_seconds * window_seconds
+            key = (window_start, row['operation'], row['infobase'], row['platform_version'])
+            group = groups.setdefault(key, {'seconds': [], 'failures': 0, 'skipped': 0})
+
+            if row['result'] == TimingResults.SUCCEEDED:
+                group['seconds'].append(row['seconds'])
+            elif row['result'] == TimingResults.SKIPPED:
+                group['skipped'] += 1
+            else:
+                group['failures'] += 1
+
+        return [dict({'window_start': window_start, 'operation': operation_, 'infobase': infobase_,
+                      'platform_version': platform_version, 'failures': group['failures'],
+                      'skipped': group['skipped']},
+                     **summarize(group['seconds'], percents))
+                for (window_start, operation_, infobase_, platform_version), group in sorted(groups.items())]
+
+    def check_regressions(self, recent_seconds: float=RECENT_SECONDS,
+                          baseline_seconds: float=BASELINE_SECONDS,
+                          margin: float=REGRESSION_MARGIN, min_samples: int=MIN_SAMPLES,
+                          by_infobase: bool=True, now: float=None) -> list:
+        """Операции, медиана длительности которых в последнем периоде превышает
+        медиану базового периода больше чем на margin. Учитываются только успешные операции,
+        пропущенные по отпечатку не учитываются.
+
+        Args:
+          recent_seconds: float: Длина последнего периода (Default value = неделя)
+          baseline_seconds: float: Длина базового периода, предшествующего последнему (Default value = 30 дней)
+          margin: float: Допустимое замедление, доля медианы базового периода (Default value = 0.2)
+          min_samples: int: Минимум записей в каждом периоде для сравнения (Default value = 5)
+          by_infobase: bool: Сравнивать каждую базу отдельно, иначе операцию по всем базам (Default value = True)
+          now: float: Текущее время time.time(). None - текущее (Default value = None)
+
+        Returns:
+          list: dict с ключами operation, infobase, baseline_median, recent_median, ratio,
+                baseline_count, recent_count
+        """
+
+        now = time.time() if now is None else now
+        recent_start = now - recent_seconds
+        samples = {}
+
+        for row in self.query(since=recent_start - baseline_seconds, until=now,
+                              result=TimingResults.SUCCEEDED):
+            key = (row['operation'], row['infobase'] if by_infobase else '')
+            period = 'recent' if row['finished'] >= recent_start else 'baseline'
+            samples.setdefault(key, {'baseline': [], 'recent': []})[period].append(row['seconds'])
+
+        regressions = []
+
+        for (operation, infobase), periods in sorted(samples.items()):
+            if len(periods['baseline']) < min_samples or len(periods['recent']) < min_samples:
+                continue
+
+            baseline_median = percentile(periods['baseline'], 50)
+            recent_median = percentile(periods['recent'], 50)
+
+            if recent_median <= baseline_median * (1 + margin):
+                continue
+
+            regressions.append({'operation': operation, 'infobase': infobase,
+                                'baseline_median': baseline_median, 'recent_median': recent_median,
+                                'ratio': recent_median / baseline_median if baseline_median else None,
+                                'baseline_count': len(periods['baseline']),
+                                'recent_count': len(periods['recent'])})
+
+        return regressions
+
+    def _on_duration(self, name: str, args: tuple, seconds: float, result, error: Exception):
+        """Обработчик log_func: записываются только методы объектов работы с базой."""
+
+        runner = args[0] if args else None
+
+        if not hasattr(runner, '_infobase_key'):
+            return
+
+        if error is not None:
+            result_ = TimingResults.ERROR
+        elif result is False:
+            result_ = TimingResults.FAILED
+        elif getattr(runner, 'last_skipped', False):
+            result_ = TimingResults.SKIPPED
+        else:
+            result_ = TimingResults.SUCCEEDED
+
+        try:
+            self.record(name, seconds, result_, runner._infobase_key(),
+                        getattr(runner, '_platform_version', ''))
+        except sqlite3.Error as ex:
+            logger().warning(f'{name}. Длительность не записана в {self._db_file_name}: {ex}')
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._db_file_name, timeout=30, isolation_level=None)
+
+
+def main(argv: list=None) -> int:
+    """Точка входа проверки регрессий: python -m timings check"""
+
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m timings',
+                                     description='Длительности операций 1С')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    check_parser = subparsers.add_parser('check', help='Проверка регрессий, код 1 при замедлении')
+    check_parser.add_argument('--db', required=True, help='Файл базы длительностей')
+    check_parser.add_argument('--recent-days', type=float, default=RECENT_SECONDS / DAY_SECONDS)
+    check_parser.add_argument('--baseline-days', type=float, default=BASELINE_SECONDS / DAY_SECONDS)
+    check_parser.add_argument('--margin', type=float, default=REGRESSION_MARGIN,
+                              help='Допустимое замедление медианы, доля')
+    check_parser.add_argument('--min-samples', type=int, default=MIN_SAMPLES)
+    check_parser.add_argument('--all-infobases', action='store_true',
+                              help='Сравнивать операцию по всем базам вместе')
+
+    report_parser = subparsers.add_parser('report', help='Процентили длительностей по окнам')
+    report_parser.add_argument('--db', required=True, help='Файл базы длительностей')
+    report_parser.add_argument('--window-hours', type=float, default=24)
+    report_parser.add_argument('--days', type=float, default=7, help='Глубина отчета в днях')
+    report_parser.add_argument('--operation', default='')
+
+    args = parser.parse_args(argv)
+    timing_db = TimingDB(args.db)
+
+    if args.command == 'report':
+        rows = timing_db.report(args.window_hours * 3600, since=time.time() - args.days * DAY_SECONDS,
+                                operation=args.operation)
+
+        for row in rows:
+            window = time.strftime('%Y-%m-%d %H:%M', time.localtime(row['window_start']))
+            print(f"{window}  {row['operation']}  {row['infobase']}  {row['platform_version']}  "
+                  f"n={row['count']}  p50={_format_seconds(row['p50'])}  "
+                  f"p95={_format_seconds(row['p95'])}  max={_format_seconds(row['max'])}  "
+                  f"ошибок={row['failures']}  пропущено={row['skipped']}")
+
+        return 0
+
+    regressions = timing_db.check_regressions(args.recent_days * DAY_SECONDS,
+                                              args.baseline_days * DAY_SECONDS,
+                                              args.margin, args.min_samples,
+                                              by_infobase=not args.all_infobases)
+
+    for regression in regressions:
+        print(f"Замедление {regression['operation']} {regression['infobase']}: "
+              f"медиана {regression['baseline_median']:.1f} -> {regression['recent_median']:.1f} сек")
+
+    return 1 if regressions else 0
+
+def _format_seconds(seconds: float) -> str:
+    return '-' if seconds is None else f'{seconds:.1f}'
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())